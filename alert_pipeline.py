@@ -0,0 +1,235 @@
+import os
+import json
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+
+from metrics import REGISTRY, record_error, stage_timer
+
+# --- 경고 파이프라인 설정 ---
+ALERT_COOLDOWN_SECONDS = 300       # 같은 (장치, 메트릭, 규칙) 경고의 재발송 금지 시간 (5분)
+ALERT_COALESCE_SECONDS = 30        # 이 시간 동안 들어온 경고를 모아 한 번에 요약/저장
+ALERT_BATCH_SIZE = 500             # 한 번의 insert 요청에 담을 최대 경고 수
+FLEET_ALERT_MIN_DEVICES = 10       # 같은 (메트릭, 규칙) 경고가 이 수 이상의 장치에서 동시에 나면 장치 전체 요약 경고 1건으로 대체
+FLEET_ALERT_MAX_DEVICE_IDS = 100   # 장치 전체 요약 경고의 details에 기록할 최대 장치 ID 수
+ALERT_STATE_PATH = "alert_state.json"
+
+SEVERITY_RANK = {"warning": 0, "high": 1, "critical": 2}
+
+# 경고 처리 결과별 카운터 (프로세스 내 모든 파이프라인 합계)
+ALERTS = REGISTRY.counter("cmos_alerts_total", "경고 파이프라인 처리 결과별 경고 수", ("outcome",))
+_ALERTS_RECEIVED = ALERTS.labels("received")
+_ALERTS_COOLDOWN = ALERTS.labels("suppressed_cooldown")
+_ALERTS_COALESCED = ALERTS.labels("coalesced")
+_ALERTS_WRITTEN = ALERTS.labels("written")
+_ALERTS_FAILED = ALERTS.labels("insert_failed")
+
+
+class AlertCooldownStore:
+    """
+    (장치, 메트릭, 규칙)별 마지막 경고 발송 시각을 저장하는 쿨다운 상태.
+    TTL(쿨다운 시간)이 지난 항목은 제거되므로 장치 수가 많아도 최근 경고가 난 키만 남습니다.
+    파일로 저장되어 재시작 직후에도 같은 경고가 한꺼번에 다시 발송되지 않습니다.
+    """
+
+    def __init__(self, ttl_seconds=ALERT_COOLDOWN_SECONDS, path=ALERT_STATE_PATH):
+        self.ttl_seconds = ttl_seconds
+        self.path = path
+        self._last_sent = {}  # (device_id, metric, rule) -> epoch 초
+        if path and os.path.exists(path):
+            try:
+                with open(path) as f:
+                    for device_id, metric, rule, sent_at in json.load(f):
+                        self._last_sent[(device_id, metric, rule)] = sent_at
+            except Exception as e:
+                print(f"경고 쿨다운 상태 파일을 읽지 못했습니다 (초기화합니다): {e}")
+
+    def in_cooldown(self, key, now):
+        sent_at = self._last_sent.get(key)
+        return sent_at is not None and now - sent_at < self.ttl_seconds
+
+    def mark(self, keys, now):
+        for key in keys:
+            self._last_sent[key] = now
+
+    def evict_expired(self, now):
+        """TTL이 지난 항목을 제거하고 제거한 수를 반환합니다."""
+        expired = [key for key, sent_at in self._last_sent.items() if now - sent_at >= self.ttl_seconds]
+        for key in expired:
+            del self._last_sent[key]
+        return len(expired)
+
+    def save(self):
+        """상태를 원자적으로(임시 파일 후 교체) 저장합니다."""
+        if not self.path:
+            return
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump([[*key, sent_at] for key, sent_at in self._last_sent.items()], f)
+        os.replace(tmp_path, self.path)
+
+    def __len__(self):
+        return len(self._last_sent)
+
+
+class AlertPipeline:
+    """
+    경고 중복 제거 및 일괄 저장 파이프라인. 탐지기의 alert_fn으로 사용합니다.
+
+    - 쿨다운 중인 (장치, 메트릭, 규칙) 경고는 즉시 버립니다.
+    - coalesce_seconds 동안 모인 경고는 키별로 1건(가장 높은 심각도, 발생 횟수 포함)으로 합칩니다.
+    - 같은 (메트릭, 규칙) 경고가 fleet_min_devices대 이상에서 동시에 나면 장치 전체 요약 경고 1건만 기록합니다.
+    - 결과는 batch_size 단위로 insert_fn에 전달합니다.
+    """
+
+    def __init__(self, insert_fn, cooldown=None, coalesce_seconds=ALERT_COALESCE_SECONDS,
+                 batch_size=ALERT_BATCH_SIZE, fleet_min_devices=FLEET_ALERT_MIN_DEVICES, clock=time.time,
+                 stamp_created_at=False, verbose=True):
+        self.insert_fn = insert_fn
+        self.cooldown = cooldown if cooldown is not None else AlertCooldownStore()
+        self.coalesce_seconds = coalesce_seconds
+        self.batch_size = batch_size
+        self.fleet_min_devices = fleet_min_devices
+        self.clock = clock
+        self.stamp_created_at = stamp_created_at  # True이면 created_at을 시계 기준으로 기록 (재생 시 가상 시각)
+        self.verbose = verbose
+        self._pending = {}  # (device_id, metric, rule) -> 합쳐진 경고
+        self._window_started = None
+        self.alerts_received = 0
+        self.alerts_suppressed = 0
+        self.alerts_written = 0
+
+    def submit(self, metric, severity, message, details, device_id=None, rule=None):
+        """경고 1건을 받아 대기열에 합칩니다. 실제 저장은 flush() 시점에 일괄로 이루어집니다."""
+        now = self.clock()
+        self.alerts_received += 1
+        _ALERTS_RECEIVED.inc()
+        key = (device_id, metric, rule)
+        if self.cooldown.in_cooldown(key, now):
+            self.alerts_suppressed += 1
+            _ALERTS_COOLDOWN.inc()
+            return
+
+        pending = self._pending.get(key)
+        if pending is None:
+            if self._window_started is None:
+                self._window_started = now
+            self._pending[key] = {
+                "severity": severity, "message": message, "details": details,
+                "occurrences": 1, "first_at": now, "last_at": now,
+            }
+            return
+
+        pending["occurrences"] += 1
+        pending["last_at"] = now
+        self.alerts_suppressed += 1
+        _ALERTS_COALESCED.inc()
+        if SEVERITY_RANK.get(severity, 0) >= SEVERITY_RANK.get(pending["severity"], 0):
+            pending.update(severity=severity, message=message, details=details)
+
+    def pending_count(self):
+        """합치기 대기 중인 경고 키 수."""
+        return len(self._pending)
+
+    def seconds_until_due(self):
+        if self._window_started is None:
+            return None
+        return max(0.0, self._window_started + self.coalesce_seconds - self.clock())
+
+    def maybe_flush(self):
+        """합치기 구간이 지났으면 flush합니다. 저장한 경고 수를 반환합니다."""
+        due = self.seconds_until_due()
+        if due is None or due > 0:
+            return 0
+        return self.flush()
+
+    def _summarize(self, now):
+        """대기 중인 경고를 저장할 행으로 변환합니다. 행과 각 행이 포함하는 쿨다운 키 목록을 반환합니다."""
+        by_rule = defaultdict(list)
+        for key in self._pending:
+            by_rule[(key[1], key[2])].append(key)
+
+        rows, covered = [], []
+        for (metric, rule), keys in by_rule.items():
+            if len(keys) >= self.fleet_min_devices:
+                entries = [self._pending[key] for key in keys]
+                worst = max(entries, key=lambda e: SEVERITY_RANK.get(e["severity"], 0))
+                device_ids = sorted((key[0] for key in keys), key=repr)
+                rows.append({
+                    "device_id": None,
+                    "metric": metric,
+                    "severity": worst["severity"],
+                    "message": f"{metric} 경고가 장치 {len(keys)}대에서 동시 발생 ({rule})",
+                    "details": {
+                        "rule": rule,
+                        "device_count": len(keys),
+                        "device_ids": device_ids[:FLEET_ALERT_MAX_DEVICE_IDS],
+                        "occurrences": sum(e["occurrences"] for e in entries),
+                        "example": worst["details"],
+                    },
+                })
+                covered.append(keys)
+                continue
+
+            for key in keys:
+                entry = self._pending[key]
+                details = dict(entry["details"], rule=rule)
+                if entry["occurrences"] > 1:
+                    details["occurrences"] = entry["occurrences"]
+                    details["window_seconds"] = round(entry["last_at"] - entry["first_at"], 1)
+                rows.append({
+                    "device_id": key[0],
+                    "metric": metric,
+                    "severity": entry["severity"],
+                    "message": entry["message"],
+                    "details": details,
+                })
+                covered.append([key])
+
+        if self.stamp_created_at:
+            created_at = datetime.fromtimestamp(now, tz=timezone.utc).replace(tzinfo=None).isoformat()
+            for row in rows:
+                row["created_at"] = created_at
+        return rows, covered
+
+    def flush(self):
+        """대기 중인 경고를 요약하여 일괄 저장합니다. 저장한 경고 수를 반환합니다."""
+        if not self._pending:
+            return 0
+        with stage_timer("alert_flush"):
+            return self._flush()
+
+    def _flush(self):
+        now = self.clock()
+        rows, covered = self._summarize(now)
+        self._pending = {}
+        self._window_started = None
+
+        written = 0
+        for start in range(0, len(rows), self.batch_size):
+            batch = rows[start:start + self.batch_size]
+            try:
+                self.insert_fn(batch)
+            except Exception as e:
+                # 저장에 실패한 경고는 쿨다운에 기록하지 않아 다음 발생 시 다시 시도됨
+                record_error("alert_pipeline")
+                _ALERTS_FAILED.inc(len(batch))
+                print(f"경고 삽입 중 오류 발생 ({len(batch)}건): {e}")
+                continue
+            for keys in covered[start:start + self.batch_size]:
+                self.cooldown.mark(keys, now)
+            written += len(batch)
+            if self.verbose:
+                for row in batch:
+                    print(f"🚨 [{datetime.now()}] 경고 발생! -> {row['message']}")
+
+        self.cooldown.evict_expired(now)
+        try:
+            self.cooldown.save()
+        except Exception as e:
+            record_error("alert_pipeline")
+            print(f"경고 쿨다운 상태 저장 중 오류 발생: {e}")
+
+        self.alerts_written += written
+        _ALERTS_WRITTEN.inc(written)
+        return written
@@ -1,22 +1,17 @@
 
 import os
 import time
-import pandas as pd
-from datetime import datetime, timedelta
-from supabase import create_client, Client
-from dotenv import load_dotenv
+from datetime import datetime, timedelta, timezone
 
-# .env.local 파일에서 환경 변수 로드
-load_dotenv(dotenv_path='.env.local')
+from alert_pipeline import AlertPipeline
+from metrics import count_rows, record_error, stage_timer, start_from_env, track_queue_depth
+from rolling_stats import DriftDetector, RunningMoments
+from spool import SPOOL_DIR, WriteAheadSpool
+from storage import INGESTED_AT_FIELD, LazyBackend
+from timeutil import parse_timestamp, to_epoch_ns
 
-# Supabase 클라이언트 초기화
-supabase_url = os.getenv("NEXT_PUBLIC_SUPABASE_URL")
-supabase_key = os.getenv("NEXT_PUBLIC_SUPABASE_ANON_KEY")
-
-if not supabase_url or not supabase_key:
-    raise ValueError("Supabase URL 또는 Key가 환경 변수에 설정되지 않았습니다.")
-
-supabase: Client = create_client(supabase_url, supabase_key)
+# 저장소 백엔드 (CMOS_STORAGE_BACKEND=supabase | sqlite). 처음 사용할 때 생성됨
+backend = LazyBackend()
 
 # --- 이상 징후 탐지 설정 ---
 # 1. 고정 임계값
@@ -31,90 +26,417 @@ SPIKE_SENSITIVITY = 1.5  # 50% 이상 급증 시 스파이크로 간주
 
 # 3. 3-Sigma 분석 설정
 SIGMA_FACTOR = 3
+MIN_SAMPLES_FOR_SIGMA = 10
 
-# 경고 중복 방지를 위한 마지막 경고 시간 기록
-last_alert_times = {}
-ALERT_COOLDOWN_SECONDS = 300  # 5분
-
-def trigger_alert(metric, severity, message, details):
-    """Supabase 'sensor_alerts' 테이블에 경고를 삽입합니다."""
-    
-    # 경고 쿨다운 확인
-    current_time = time.time()
-    last_alert_time = last_alert_times.get(metric)
-    if last_alert_time and (current_time - last_alert_time < ALERT_COOLDOWN_SECONDS):
-        print(f"[{datetime.now()}] 쿨다운: '{metric}'에 대한 경고는 이미 최근에 발생했습니다.")
-        return
-
-    try:
-        data_to_insert = {
-            "metric": metric,
-            "severity": severity,
-            "message": message,
-            "details": details,
-        }
-        data, count = supabase.table("sensor_alerts").insert(data_to_insert).execute()
-        print(f"🚨 [{datetime.now()}] 경고 발생! -> {message}")
-        last_alert_times[metric] = current_time
-
-    except Exception as e:
-        print(f"경고 삽입 중 오류 발생: {e}")
+# 4. EWMA/CUSUM 드리프트 탐지 (rolling_stats.DriftDetector)
+# 스파이크에 오염되지 않는 EWMA 기준선 대비 지속적인 치우침을 탐지할 메트릭. 기본값은 비활성화이며
+# 환경 변수 CMOS_DRIFT_METRICS(예: "temperature,noise_level")로 켬. 데드 픽셀처럼 계단식으로만 증가하는 메트릭에는 적합하지 않음
+DRIFT_METRICS = tuple(m.strip() for m in os.environ.get("CMOS_DRIFT_METRICS", "").split(",") if m.strip())
 
-def analyze_sensor_data():
+# 증분 분석 설정
+METRICS = ["temperature", "noise_level", "dead_pixel_count"]
+LOG_COLUMNS = "device_id, log_timestamp, temperature, noise_level, dead_pixel_count"
+ANALYSIS_WINDOW_SECONDS = 3600  # 롤링 통계 윈도우 (1시간)
+POLL_PAGE_SIZE = 1000  # 한 번의 요청으로 가져올 최대 행 수
+INGEST_SETTLE_SECONDS = 2  # 수신 시각 커서를 이만큼 앞에서부터 다시 읽음 (커밋이 수신 시각 순서보다 늦은 행 대비)
+INGEST_EPOCH = "1970-01-01T00:00:00+00:00"  # 수신 시각이 기록된 행이 없을 때의 커서
+
+# 경고 쓰기 선행 스풀: 저장소 장애 중에도 경고를 로컬에 남겼다가 복구 후 전송 (처음 경고를 쓸 때 디렉터리 생성)
+# 경고 파이프라인: (장치, 메트릭, 규칙)별 쿨다운, 버스트 합치기, 일괄 저장
+# 둘 다 처음 사용할 때 생성하므로 import만으로 쿨다운 상태 파일(alert_state.json)을 읽지 않음
+alert_spool = None
+alert_pipeline = None
+
+
+def get_alert_spool():
+    """경고 스풀을 반환합니다. 처음 호출할 때 생성합니다."""
+    global alert_spool
+    if alert_spool is None:
+        alert_spool = WriteAheadSpool(os.path.join(SPOOL_DIR, "sensor_alerts"), backend.insert_alerts, name="alerts")
+    return alert_spool
+
+
+def get_alert_pipeline():
     """
-    최근 센서 데이터를 분석하여 이상 징후를 탐지하고 경고를 발생시킵니다.
+    경고 파이프라인을 반환합니다. 처음 호출할 때 생성합니다.
+    스풀에서 늦게 전송되어도 발생 시각이 유지되도록 created_at을 파이프라인에서 기록합니다.
     """
-    # 지난 1시간의 데이터 가져오기
-    try:
-        one_hour_ago = (datetime.utcnow() - timedelta(hours=1)).isoformat()
-        response = supabase.table("sensor_health_logs") 
-            .select("*") 
-            .gte("log_timestamp", one_hour_ago) 
-            .order("log_timestamp", desc=True) 
-            .execute()
-
-        if not response.data:
-            print("지난 1시간 내에 분석할 데이터가 없습니다.")
+    global alert_pipeline
+    if alert_pipeline is None:
+        alert_pipeline = AlertPipeline(get_alert_spool().append, stamp_created_at=True)
+        track_queue_depth("detector_alerts_pending", alert_pipeline.pending_count)
+    return alert_pipeline
+
+
+def trigger_alert(metric, severity, message, details, device_id=None, rule=None):
+    """경고를 파이프라인에 전달합니다. 쿨다운/중복 제거 후 'sensor_alerts' 테이블에 일괄 삽입됩니다."""
+    get_alert_pipeline().submit(metric, severity, message, details, device_id=device_id, rule=rule)
+
+class IncrementalLogPoller:
+    """
+    마지막으로 가져온 위치(high-water mark) 이후의 새 로그만 조회합니다.
+    기본 커서는 저장소가 행을 받은 시각(ingested_at)이므로, 스풀 재전송 등으로 늦게 들어온 과거 타임스탬프의 행도
+    들어온 시점에 수신 순서대로 한 번 반환됩니다. cursor_column="log_timestamp"이면 샘플링 시각 순서로 조회하며,
+    high-water mark보다 이른 시각으로 늦게 들어온 행은 건너뜁니다 (과거 구간 재생용).
+
+    최초 조회(warm-up)는 롤링 윈도우를 채우기 위해 지난 윈도우 구간을 샘플링 시각 순서로 가져옵니다.
+    window_seconds가 None이면 전체 이력을, backfill_since를 주면 그 시각 이후를 가져오며,
+    warm-up이 끝나면 warm-up을 시작할 때 저장소가 마지막으로 받은 시각부터 수신 시각 커서로 이어서 조회합니다.
+    backfill_state(backfill_checkpoint()의 반환값)를 주면 중단된 warm-up을 그 위치부터 이어서 합니다.
+    device_id를 주면 해당 장치의 로그만 조회합니다. store를 지정하지 않으면 모듈의 저장소 백엔드에서 읽습니다.
+    """
+
+    def __init__(self, window_seconds=ANALYSIS_WINDOW_SECONDS, high_water_mark=None, seen_at_high_water_mark=(),
+                 columns=LOG_COLUMNS, cursor_column=INGESTED_AT_FIELD, backfill_since=None, device_id=None,
+                 backfill_state=None, store=None):
+        if columns != "*" and cursor_column not in (column.strip() for column in columns.split(",")):
+            columns = f"{columns}, {cursor_column}"
+        self.window_seconds = window_seconds
+        self.columns = columns
+        self.cursor_column = cursor_column
+        self.device_id = device_id
+        self.store = store or backend
+        # 수신 시각은 커밋 순서와 약간 어긋날 수 있으므로 그만큼 앞에서부터 다시 읽고 행 키로 중복 제거
+        self.settle_seconds = INGEST_SETTLE_SECONDS if cursor_column == INGESTED_AT_FIELD else 0
+        self.high_water_mark = high_water_mark
+        # 다시 읽는 구간에서 이미 반환한 행: 행 키 -> 커서 값(epoch 초)
+        mark = None if high_water_mark is None else parse_timestamp(high_water_mark)
+        self._seen = {tuple(key): mark for key in seen_at_high_water_mark}
+        self._backfill = None
+        self._backfill_cursor = None
+        self._backfill_cutoff = None
+        if cursor_column == INGESTED_AT_FIELD and high_water_mark is None:
+            if backfill_state is not None:
+                backfill_since, seen_at_high_water_mark = backfill_state["since"], backfill_state["seen"]
+            self._backfill = IncrementalLogPoller(
+                window_seconds, backfill_since, seen_at_high_water_mark, columns, "log_timestamp", device_id=device_id,
+                store=self.store,
+            )
+            self._seen = {}
+            if backfill_state is not None and backfill_state["cursor"] is not None:
+                self._backfill_cursor = backfill_state["cursor"]
+                self._backfill_cutoff = parse_timestamp(self._backfill_cursor) - self.settle_seconds
+                self._seen = {(device_id_, log_timestamp): mark for device_id_, log_timestamp, mark in backfill_state["ingested_seen"]}
+
+    def checkpoint(self):
+        """
+        재시작 후 같은 위치부터 이어서 조회할 수 있도록 (high-water mark, 다시 읽는 구간에서 처리한 행 키)를 반환합니다.
+        warm-up을 끝내기 전에는 high-water mark가 None이며, 이 상태로 재시작하면 warm-up부터 다시 합니다.
+        warm-up 도중의 위치까지 저장하려면 backfill_checkpoint()를 함께 사용합니다.
+        """
+        return self.high_water_mark, sorted(self._seen, key=repr)
+
+    def backfill_checkpoint(self):
+        """
+        warm-up 도중이면 IncrementalLogPoller(backfill_state=...)로 같은 위치부터 이어갈 수 있는 JSON 직렬화 가능한
+        상태를, warm-up 중이 아니면 None을 반환합니다 (warm-up을 여러 번에 나눠 읽는 경우용).
+        """
+        if self._backfill is None:
+            return None
+        since, seen = self._backfill.checkpoint()
+        return {"since": since, "seen": seen, "cursor": self._backfill_cursor,
+                "ingested_seen": [[*key, mark] for key, mark in self._seen.items()]}
+
+    def _select(self, since, offset):
+        if self.cursor_column == INGESTED_AT_FIELD:
+            return self.store.select_logs(ingested_since=since, order_by=INGESTED_AT_FIELD, columns=self.columns,
+                                          device_id=self.device_id, limit=POLL_PAGE_SIZE, offset=offset)
+        return self.store.select_logs(since=since, columns=self.columns, device_id=self.device_id,
+                                      limit=POLL_PAGE_SIZE, offset=offset)
+
+    def _fetch(self, max_rows=None):
+        column = self.cursor_column
+        if self.high_water_mark is None:
+            # 최초 실행: 롤링 윈도우를 채우기 위해 지난 윈도우 구간을 한 번만 가져옴
+            since = None
+            if self.window_seconds is not None:
+                since = (datetime.utcnow() - timedelta(seconds=self.window_seconds)).isoformat()
+        elif self.settle_seconds:
+            since = datetime.fromtimestamp(parse_timestamp(self.high_water_mark) - self.settle_seconds, tz=timezone.utc).isoformat()
+        else:
+            # 동일 타임스탬프로 나중에 삽입된 행을 놓치지 않도록 gte로 조회 후 중복 제거
+            since = self.high_water_mark
+
+        # 키셋(keyset) 페이지네이션: 다음 페이지는 직전 페이지의 마지막 커서 값부터 조회하고,
+        # 그 값에서 이미 받은 행 수만큼만 건너뜀 (큰 OFFSET 스캔 방지)
+        rows = []
+        offset = 0
+        while True:
+            page = self._select(since, offset)
+            rows.extend(row for row in page if _row_key(row) not in self._seen)
+            if len(page) < POLL_PAGE_SIZE or (max_rows is not None and len(rows) >= max_rows):
+                return rows
+            last = page[-1][column]
+            if last == since:
+                offset += len(page)
+            else:
+                since = last
+                offset = sum(1 for row in page if row[column] == last)
+
+    def _advance(self, rows):
+        """반환한 행(커서 순서)으로 high-water mark와 다시 읽는 구간의 행 키를 갱신합니다."""
+        column = self.cursor_column
+        new_mark = rows[-1][column]
+        if not self.settle_seconds:
+            if new_mark != self.high_water_mark:
+                self._seen = {}
+            self.high_water_mark = new_mark
+            self._seen.update((_row_key(row), None) for row in rows if row[column] == new_mark)
             return
+        cutoff = parse_timestamp(new_mark) - self.settle_seconds
+        self.high_water_mark = new_mark
+        self._seen = {key: mark for key, mark in self._seen.items() if mark >= cutoff}
+        for row in reversed(rows):
+            mark = parse_timestamp(row[column])
+            if mark < cutoff:
+                break
+            self._seen[_row_key(row)] = mark
+
+    def _latest_cursor(self):
+        """저장소가 지금까지 마지막으로 받은 시각 (수신 시각이 기록된 행이 없으면 INGEST_EPOCH)."""
+        rows = self.store.select_logs(ingested_since=INGEST_EPOCH, order_by=INGESTED_AT_FIELD, descending=True,
+                                      columns=INGESTED_AT_FIELD, device_id=self.device_id, limit=1)
+        return rows[0][INGESTED_AT_FIELD] if rows else INGEST_EPOCH
 
-        df = pd.DataFrame(response.data)
-        df["log_timestamp"] = pd.to_datetime(df["log_timestamp"])
-        
-        # 가장 최신 데이터 포인트를 분석 대상으로 함
-        latest_data = df.iloc[0]
-
-        # --- 분석 로직 ---
-        for metric in ["temperature", "noise_level", "dead_pixel_count"]:
-            value = latest_data[metric]
-            
-            # 1. 고정 임계값 분석
-            if value >= THRESHOLDS[metric]["critical"]:
-                trigger_alert(metric, "critical", f"{metric} 임계값 초과 (Critical)", {"value": value, "threshold": THRESHOLDS[metric]["critical"]})
-            elif value >= THRESHOLDS[metric]["warning"]:
-                trigger_alert(metric, "warning", f"{metric} 임계값 초과 (Warning)", {"value": value, "threshold": THRESHOLDS[metric]["warning"]})
-
-            if len(df) > 1:
-                previous_value = df.iloc[1][metric]
-                # 2. 스파이크 탐지
-                if previous_value > 0 and value > previous_value * SPIKE_SENSITIVITY:
-                     trigger_alert(metric, "high", f"{metric} 값 급증 (Spike)", {"from": previous_value, "to": value})
-
-            if len(df) > 10: # 통계적 의미를 위해 최소 10개 이상 데이터 필요
-                # 3. 3-Sigma 분석
-                mean = df[metric].mean()
-                std = df[metric].std()
-                upper_bound = mean + SIGMA_FACTOR * std
-                
-                if value > upper_bound:
-                    trigger_alert(metric, "high", f"{metric} 3-Sigma 상한 초과", {"value": value, "mean": round(mean,2), "upper_bound": round(upper_bound,2)})
-
-    except Exception as e:
-        print(f"데이터 분석 중 오류 발생: {e}")
+    def _fetch_backfill(self, max_rows=None):
+        if self._backfill_cursor is None:
+            # warm-up 이후에는 warm-up 시작 시점의 마지막 수신 시각부터 조회 (warm-up 중 들어온 행 포함)
+            self._backfill_cursor = self._latest_cursor()
+            self._backfill_cutoff = parse_timestamp(self._backfill_cursor) - self.settle_seconds
+        rows, _ = self._backfill.fetch(max_rows)
+        # warm-up에서 이미 반환했지만 수신 시각 커서로 다시 읽힐 행은 중복 제거 대상으로 기록
+        for row in rows:
+            ingested_at = row.get(INGESTED_AT_FIELD)
+            if ingested_at is not None:
+                mark = parse_timestamp(ingested_at)
+                if mark >= self._backfill_cutoff:
+                    self._seen[_row_key(row)] = mark
+        if max_rows is None or len(rows) < max_rows:
+            self.high_water_mark = self._backfill_cursor
+            self._backfill = None
+        return rows
+
+    def fetch(self, max_rows=None):
+        """
+        새 행 리스트와 warm-up 여부를 반환합니다.
+        max_rows를 지정하면 대략 그 행 수에서 멈추고, 나머지는 다음 호출에서 이어서 가져옵니다.
+        수신 시각 커서에서는 warm-up 구간을 다 읽을 때까지 warm-up으로 반환합니다.
+        """
+        if self._backfill is not None:
+            return self._fetch_backfill(max_rows), True
+        warming_up = self.high_water_mark is None
+        rows = self._fetch(max_rows)
+        if rows:
+            self._advance(rows)
+        return rows, warming_up
+
+    def rewind(self, high_water_mark):
+        """
+        다음 조회를 high_water_mark(커서 컬럼 기준)부터 다시 시작합니다 (이미 처리한 행도 다시 반환될 수 있음).
+        실시간 이벤트로 처리하던 중 연결이 끊겼을 때 빈 구간을 메우는 데 사용하며, 중복 제거는 호출한 쪽에서 합니다.
+        """
+        self.high_water_mark = high_water_mark
+        self._seen = {}
+        self._backfill = None
+
+
+class StreamingAnomalyDetector:
+    """
+    증분(Streaming) 이상 징후 탐지 엔진.
+    마지막으로 처리한 타임스탬프(high-water mark) 이후의 새 행만 가져오고,
+    장치/메트릭별 롤링 윈도우 통계를 유지하면서 각 샘플이 도착할 때마다 검사합니다.
+    임계값, 스파이크 민감도, 시그마 배수를 지정하면 모듈 기본값 대신 사용합니다 (재생/백테스트용).
+
+    샘플은 장치별 컬럼형 링 버퍼(telemetry_buffer.TelemetryStore)에 저장되고, 탐지기는 윈도우 시작 순번과
+    메트릭별 Welford 통계만 유지합니다. telemetry를 지정하면 다른 소비자(건강 점수 등)와 같은 버퍼를 공유하며,
+    이 경우 버퍼 보존 기간은 윈도우보다 길어야 합니다.
+    drift_metrics에 포함된 메트릭은 장치별 DriftDetector로 지속적인 상승/하강 추세도 검사합니다 (rule="drift").
+    """
+
+    def __init__(self, window_seconds=ANALYSIS_WINDOW_SECONDS, alert_fn=None, poller=None,
+                 thresholds=None, spike_sensitivity=SPIKE_SENSITIVITY, sigma_factor=SIGMA_FACTOR, telemetry=None,
+                 drift_metrics=DRIFT_METRICS):
+        if telemetry is not None and telemetry.retention_seconds is not None and telemetry.retention_seconds < window_seconds:
+            raise ValueError("공유 텔레메트리 버퍼의 보존 기간이 분석 윈도우보다 짧습니다.")
+        self.window_seconds = window_seconds
+        self.alert_fn = alert_fn or trigger_alert
+        self.poller = poller or IncrementalLogPoller(window_seconds)
+        self.thresholds = thresholds or THRESHOLDS
+        self.spike_sensitivity = spike_sensitivity
+        self.sigma_factor = sigma_factor
+        self.drift_metrics = tuple(drift_metrics)
+        self.telemetry = telemetry  # 첫 샘플을 처리할 때 생성 (NumPy를 import 시점에 로드하지 않도록)
+        self._window_ns = int(window_seconds * 1e9)
+        self._devices = {}  # device_id -> _DeviceWindow
+
+    @property
+    def high_water_mark(self):
+        return self.poller.high_water_mark
+
+    def _device_window(self, device_id):
+        window = self._devices.get(device_id)
+        if window is None:
+            if self.telemetry is None:
+                from telemetry_buffer import TelemetryStore
+
+                self.telemetry = TelemetryStore(retention_seconds=self.window_seconds)
+            window = self._devices[device_id] = _DeviceWindow(self.telemetry.buffer(device_id), self.drift_metrics)
+        return window
+
+    def process_sample(self, row, evaluate=True):
+        """샘플 한 개를 롤링 윈도우에 반영하고, evaluate=True이면 이상 징후를 검사합니다."""
+        device_id = row.get("device_id")
+        ts_ns = to_epoch_ns(parse_timestamp(row["log_timestamp"]))
+        window = self._device_window(device_id)
+        window.evict_before(ts_ns - self._window_ns)
+        buffer = self.telemetry.append_row(row, ts_ns)
+        stored = buffer.sample(buffer.seq_end - 1)
+        stats_by_metric, last_values, drift = window.stats, window.last_values, window.drift
+
+        # METRICS 순서는 sample() 튜플의 1~3번째 값(온도, 노이즈, 데드 픽셀)과 같음
+        for index, metric in enumerate(METRICS, 1):
+            value = row.get(metric)
+            if value is None:
+                continue
+            stats = stats_by_metric[metric]
+            previous_value = last_values.get(metric)
+            last_values[metric] = value
+            # 버퍼에 저장된 값(float32)으로 통계를 갱신해야 제거할 때 같은 값을 뺄 수 있음
+            stats.add_value(float(stored[index]))
+            if evaluate:
+                self._evaluate(device_id, metric, value, previous_value, stats)
+            # 드리프트 기준선은 윈도우와 무관한 EWMA이므로 warm-up 구간에서도 모든 샘플로 갱신
+            if drift and metric in drift:
+                detector = drift[metric]
+                z, direction = detector.update(value)
+                if direction and evaluate:
+                    self.alert_fn(
+                        metric, "warning", f"{metric} 지속적 {'상승' if direction > 0 else '하강'} 추세 (CUSUM)",
+                        {"value": value, "baseline": round(detector.mean, 2), "std": round(detector.std, 2), "z": round(z, 2)},
+                        device_id=device_id, rule="drift",
+                    )
+
+    def process_rows(self, rows, warming_up=False):
+        """시간순으로 정렬된 행들을 처리합니다. warm-up 구간은 통계만 채우고 장치별 최신 샘플만 검사합니다."""
+        with stage_timer("detector_process"):
+            if warming_up:
+                latest_index = {row.get("device_id"): i for i, row in enumerate(rows)}
+                evaluate_indices = set(latest_index.values())
+                for i, row in enumerate(rows):
+                    self.process_sample(row, evaluate=i in evaluate_indices)
+            else:
+                for row in rows:
+                    self.process_sample(row)
+        count_rows("detector", len(rows))
+
+    def _evaluate(self, device_id, metric, value, previous_value, stats):
+        alert = self.alert_fn
+        thresholds = self.thresholds[metric]
+
+        # 1. 고정 임계값 분석
+        if value >= thresholds["critical"]:
+            alert(metric, "critical", f"{metric} 임계값 초과 (Critical)", {"value": value, "threshold": thresholds["critical"]}, device_id=device_id, rule="threshold")
+        elif value >= thresholds["warning"]:
+            alert(metric, "warning", f"{metric} 임계값 초과 (Warning)", {"value": value, "threshold": thresholds["warning"]}, device_id=device_id, rule="threshold")
+
+        # 2. 스파이크 탐지
+        if previous_value is not None and previous_value > 0 and value > previous_value * self.spike_sensitivity:
+            alert(metric, "high", f"{metric} 값 급증 (Spike)", {"from": previous_value, "to": value}, device_id=device_id, rule="spike")
+
+        # 3. 3-Sigma 분석 (통계적 의미를 위해 최소 10개 이상 데이터 필요)
+        if len(stats) > MIN_SAMPLES_FOR_SIGMA:
+            mean = stats.mean
+            upper_bound = mean + self.sigma_factor * stats.std
+            if value > upper_bound:
+                alert(metric, "high", f"{metric} 3-Sigma 상한 초과", {"value": value, "mean": round(mean, 2), "upper_bound": round(upper_bound, 2)}, device_id=device_id, rule="sigma")
+
+    def poll(self):
+        """high-water mark 이후 새로 들어온 행만 가져와 순서대로 처리합니다. 처리한 행 수를 반환합니다."""
+        with stage_timer("detector_fetch"):
+            rows, warming_up = self.poller.fetch()
+        self.process_rows(rows, warming_up)
+        return len(rows)
+
+
+class _DeviceWindow:
+    """탐지기가 장치 1대에 대해 유지하는 상태: 공유 버퍼에서의 윈도우 시작 순번, 메트릭별 통계, 직전 원본 값, 드리프트 탐지기."""
+
+    __slots__ = ("buffer", "start_seq", "stats", "last_values", "drift")
+
+    def __init__(self, buffer, drift_metrics=()):
+        self.buffer = buffer
+        self.start_seq = buffer.seq_end
+        self.stats = {metric: RunningMoments() for metric in METRICS}
+        self.last_values = {}  # 스파이크 비교용 직전 값 (윈도우 밖이어도 유지, 버퍼의 float32가 아닌 원본 값)
+        self.drift = {metric: DriftDetector() for metric in drift_metrics}
+
+    def evict_before(self, cutoff_ns):
+        """윈도우를 벗어난 샘플과, 버퍼가 가득 차서 곧 밀려날 가장 오래된 샘플을 통계에서 제거합니다."""
+        buffer = self.buffer
+        if self.start_seq < buffer.seq_start:
+            # 다른 소비자가 버퍼를 먼저 비운 경우: 남아 있는 샘플로 통계를 다시 계산
+            self._rebuild(buffer.seq_start)
+        stop = buffer.seq_before(cutoff_ns, self.start_seq)
+        if buffer.full and stop == buffer.seq_start:
+            stop += 1
+        for seq in range(self.start_seq, stop):
+            self._remove(seq)
+        self.start_seq = stop
+
+    def _remove(self, seq):
+        # 값이 없던 샘플은 NaN(온도/노이즈) 또는 음수(데드 픽셀)로 저장되어 있음
+        _, temperature, noise_level, dead_pixel_count, _ = self.buffer.sample(seq)
+        stats = self.stats
+        if temperature == temperature:
+            stats["temperature"].remove_value(temperature)
+        if noise_level == noise_level:
+            stats["noise_level"].remove_value(noise_level)
+        if dead_pixel_count >= 0:
+            stats["dead_pixel_count"].remove_value(float(dead_pixel_count))
+
+    def _rebuild(self, start_seq):
+        self.stats = {metric: RunningMoments() for metric in METRICS}
+        self.start_seq = start_seq
+        window = self.buffer.window_from_seq(start_seq)
+        for metric in METRICS:
+            values = getattr(window, metric)
+            values = values[values >= 0] if metric == "dead_pixel_count" else values[values == values]
+            for value in values.tolist():
+                self.stats[metric].add_value(float(value))
+
+
+def _row_key(row):
+    return (row.get("device_id"), row["log_timestamp"])
+
+
+# 메인 탐지기 루프의 탐지기 (처음 분석할 때 생성)
+_detector = None
+
+
+def analyze_sensor_data():
+    """
+    마지막 분석 이후 새로 들어온 센서 데이터만 증분으로 분석하여 이상 징후를 탐지하고 경고를 발생시킵니다.
+    """
+    global _detector
+    if _detector is None:
+        _detector = StreamingAnomalyDetector()
+    with stage_timer("detector_cycle"):
+        try:
+            processed = _detector.poll()
+            if processed == 0 and _detector.high_water_mark is None:
+                print("지난 1시간 내에 분석할 데이터가 없습니다.")
+        except Exception as e:
+            record_error("detector")
+            print(f"데이터 분석 중 오류 발생: {e}")
+        get_alert_pipeline().maybe_flush()
 
 
 def run_detector():
     """메인 탐지기 루프. 10초마다 센서 데이터를 분석합니다."""
-    print("이상 징후 탐지 엔진을 시작합니다. 10초 간격으로 데이터를 분석합니다.")
+    print("이상 징후 탐지 엔진을 시작합니다. 10초 간격으로 새 데이터만 증분 분석합니다.")
+    start_from_env()
+    # 시작할 때 쿨다운 상태를 불러오고 대기 경고 수 지표를 등록
+    get_alert_pipeline()
     while True:
         analyze_sensor_data()
         time.sleep(10)
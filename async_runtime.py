@@ -0,0 +1,283 @@
+import os
+import asyncio
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import anomaly_detector
+import predictive_engine
+from alert_pipeline import ALERT_COALESCE_SECONDS, AlertPipeline
+from metrics import count_rows, record_error, stage_timer, start_from_env, track_queue_depth
+from realtime import REALTIME_ALERT_COALESCE_SECONDS, EventDrivenDetector, LocalEventSource, SupabaseRealtimeSource
+from sensor_emulator import VirtualSensorFleet
+from spool import SPOOL_DIR, WriteAheadSpool
+
+# --- 비동기 런타임 설정 ---
+MAX_IN_FLIGHT_WRITES = 4     # 동시에 진행 중인 쓰기 요청 수 상한 (= I/O 스레드 수)
+WRITE_BATCH_SIZE = 500       # 한 번의 쓰기 요청에 담을 최대 행 수
+WRITE_QUEUE_CAPACITY = 50000 # 쓰기 대기열 최대 크기. 초과 시 가장 새로운 행을 버림
+
+
+class AsyncWriteQueue:
+    """
+    비동기 쓰기 대기열. 생성자(producer)는 대기하지 않고 행을 넣기만 하며,
+    소비 태스크가 행을 배치로 묶어 최대 max_in_flight개의 요청을 동시에 보냅니다.
+    백엔드가 느려도 샘플링/탐지 주기가 밀리지 않도록 대기열이 가득 차면 행을 버리고 개수를 기록합니다.
+    """
+
+    def __init__(self, name, write_fn, executor, max_in_flight=MAX_IN_FLIGHT_WRITES,
+                 batch_size=WRITE_BATCH_SIZE, capacity=WRITE_QUEUE_CAPACITY):
+        self.name = name
+        self.write_fn = write_fn
+        self.executor = executor
+        self.batch_size = batch_size
+        self._queue = asyncio.Queue(maxsize=capacity)
+        self._in_flight = asyncio.Semaphore(max_in_flight)
+        self._pending = set()
+        self.rows_written = 0
+        self.rows_dropped = 0
+        self.errors = 0
+        track_queue_depth(f"async_{name}", self.qsize)
+
+    def put_nowait(self, rows):
+        dropped = 0
+        for row in rows:
+            try:
+                self._queue.put_nowait(row)
+            except asyncio.QueueFull:
+                dropped += 1
+        if dropped:
+            self.rows_dropped += dropped
+            count_rows(f"async_{self.name}_dropped", dropped)
+
+    def qsize(self):
+        return self._queue.qsize()
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < self.batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+
+            await self._in_flight.acquire()
+            task = asyncio.ensure_future(loop.run_in_executor(self.executor, self.write_fn, batch))
+            self._pending.add(task)
+            task.add_done_callback(lambda t, size=len(batch): self._on_done(t, size))
+
+    def _on_done(self, task, size):
+        self._pending.discard(task)
+        self._in_flight.release()
+        if task.cancelled():
+            # 종료 중 취소된 배치는 저장되지 않았으므로 기록 행 수에 포함하지 않음
+            print(f"[{self.name}] 쓰기 취소됨 ({size}행)")
+        elif task.exception() is not None:
+            self.errors += 1
+            record_error(f"async_{self.name}")
+            print(f"[{self.name}] 쓰기 오류 발생 ({size}행): {task.exception()}")
+        else:
+            self.rows_written += size
+            count_rows(f"async_{self.name}_written", size)
+
+
+class AsyncRuntime:
+    """
+    에뮬레이터, 이상 탐지기, 예측 엔진을 하나의 asyncio 이벤트 루프에서 실행합니다.
+    블로킹 백엔드 호출은 크기가 제한된 스레드 풀에서 실행되며, 같은 백엔드 클라이언트(HTTP 연결 풀)를 재사용합니다.
+    realtime_source를 지정하면 탐지기는 폴링 대신 INSERT 이벤트로 구동됩니다 (LocalEventSource는 로그 쓰기 직후 이벤트를 발행).
+    spool_dir를 지정하면 로그, 경고, 예측 결과, 장치 상태를 로컬 쓰기 선행 스풀에 기록하고 드레이너가 저장소로 보냅니다.
+    이 경우 쓰기 대기열은 로컬 디스크 기록만 기다리므로 저장소 장애 중에도 행을 버리지 않습니다.
+    backend를 지정하면 조회와 쓰기 모두 그 백엔드를 사용하며, 탐지/예측 계산은 이벤트 루프를 막지 않도록
+    별도의 계산 스레드에서 실행합니다.
+    """
+
+    def __init__(self, backend=None, max_in_flight=MAX_IN_FLIGHT_WRITES, realtime_source=None, spool_dir=None):
+        self.backend = backend or anomaly_detector.backend
+        self.realtime_source = realtime_source
+        self.realtime_detector = None
+        # 읽기 요청과 쓰기 요청이 서로를 막지 않도록 별도의 스레드 풀 사용
+        self.read_executor = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="cmos-read")
+        self.write_executor = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="cmos-write")
+        self.compute_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="cmos-compute")
+        write_logs = self._insert_and_publish if isinstance(realtime_source, LocalEventSource) else self.backend.insert_logs
+        write_alerts = self.backend.insert_alerts
+        self.spools = []
+        self.result_spools = None
+        if spool_dir is not None:
+            # 로컬 이벤트는 스풀 드레이너가 저장소에 쓴 직후 발행되므로 탐지기가 보는 순서는 그대로 유지됨
+            log_spool = WriteAheadSpool(os.path.join(spool_dir, "async_logs"), write_logs, name="async_logs")
+            alert_spool = WriteAheadSpool(os.path.join(spool_dir, "async_alerts"), write_alerts, name="async_alerts")
+            self.result_spools = predictive_engine.create_result_spools("async", spool_dir, store=self.backend)
+            self.spools = [log_spool, alert_spool, *self.result_spools]
+            write_logs, write_alerts = log_spool.append, alert_spool.append
+        self.log_writer = AsyncWriteQueue("logs", write_logs, self.write_executor, max_in_flight)
+        self.alert_writer = AsyncWriteQueue("alerts", write_alerts, self.write_executor, max_in_flight)
+        # 경고는 파이프라인에서 쿨다운/합치기를 거친 뒤 비동기 쓰기 대기열로 전달
+        # (스풀에서 늦게 전송되어도 발생 시각이 유지되도록 스풀 사용 시 created_at을 파이프라인에서 기록)
+        coalesce_seconds = REALTIME_ALERT_COALESCE_SECONDS if realtime_source is not None else ALERT_COALESCE_SECONDS
+        self.alerts = AlertPipeline(self.alert_writer.put_nowait, coalesce_seconds=coalesce_seconds,
+                                    stamp_created_at=spool_dir is not None)
+
+    def _insert_and_publish(self, rows):
+        self.backend.insert_logs(rows)
+        self.realtime_source.publish(rows)
+
+    async def _read(self, fn, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.read_executor, lambda: fn(*args, **kwargs))
+
+    async def _compute(self, fn, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.compute_executor, lambda: fn(*args, **kwargs))
+
+    async def run_emulator(self, num_devices, interval=5.0, seed=0):
+        """절대 시각 기준으로 interval마다 샘플을 생성하여 쓰기 대기열에 넣습니다."""
+        fleet = VirtualSensorFleet(num_devices, seed=seed)
+        loop = asyncio.get_running_loop()
+        next_tick = loop.time()
+        while True:
+            self.log_writer.put_nowait(fleet.sample_rows(datetime.utcnow().isoformat()))
+            next_tick += interval
+            await asyncio.sleep(max(0.0, next_tick - loop.time()))
+
+    async def run_detector(self, interval=10.0):
+        """interval마다 새 로그를 조회하여 증분 분석합니다. 경고는 비동기 대기열로 전송합니다."""
+        # 분석은 계산 스레드에서 실행되므로 경고를 모아 두었다가 이벤트 루프에서 파이프라인에 전달
+        # (경고 파이프라인과 쓰기 대기열은 스레드 안전하지 않음)
+        pending_alerts = []
+        detector = anomaly_detector.StreamingAnomalyDetector(
+            alert_fn=lambda *args, **kwargs: pending_alerts.append((args, kwargs)),
+            poller=anomaly_detector.IncrementalLogPoller(store=self.backend),
+        )
+        loop = asyncio.get_running_loop()
+        next_tick = loop.time()
+        while True:
+            try:
+                with stage_timer("detector_fetch"):
+                    rows, warming_up = await self._read(detector.poller.fetch)
+                await self._compute(detector.process_rows, rows, warming_up)
+                for args, kwargs in pending_alerts:
+                    self.alerts.submit(*args, **kwargs)
+                pending_alerts.clear()
+                self.alerts.maybe_flush()
+            except Exception as e:
+                record_error("detector")
+                print(f"데이터 분석 중 오류 발생: {e}")
+            next_tick += interval
+            await asyncio.sleep(max(0.0, next_tick - loop.time()))
+
+    async def run_realtime_detector(self):
+        """INSERT 이벤트가 도착할 때마다 분석합니다. 구독이 끊긴 동안에는 증분 폴링으로 대체합니다."""
+        detector = anomaly_detector.StreamingAnomalyDetector(
+            alert_fn=self.alerts.submit, poller=anomaly_detector.IncrementalLogPoller(store=self.backend),
+        )
+        self.realtime_detector = EventDrivenDetector(self.realtime_source, detector=detector, alerts=self.alerts,
+                                                     executor=self.read_executor)
+        await self.realtime_detector.run()
+
+    async def predict_once(self, rul_state):
+        """
+        독립적인 조회를 동시에 실행한 뒤 건강 점수와 RUL을 계산하고, 결과 쓰기도 동시에 보냅니다.
+        회귀 상태가 없는 장치는 run_predictive_engine()처럼 먼저 1시간 롤업으로 초기화하여 전체 이력을 읽지 않습니다.
+        """
+        import pandas as pd
+
+        pe = predictive_engine
+        device_id = pe.DEVICE_ID
+        one_day_ago = (datetime.utcnow() - timedelta(days=1)).isoformat()
+        if str(device_id) not in rul_state and await self._read(pe.bootstrap_rul_from_rollups, rul_state, device_id, self.backend):
+            print(f"장치 {device_id}의 RUL 회귀 상태를 1시간 롤업으로 초기화했습니다.")
+        poller = pe.rul_log_poller(rul_state, device_id, store=self.backend)
+
+        _, rows_24h, (rows_new, warming_up) = await asyncio.gather(
+            self._read(self.backend.ensure_device, device_id, {"device_name": f"Simulated-CMOS-{device_id}", "status": "initializing"}),
+            self._read(self.backend.select_logs, since=one_day_ago, device_id=device_id, columns=pe.HEALTH_COLUMNS, descending=True),
+            self._read(poller.fetch),
+        )
+
+        def analyze():
+            health_score = pe.get_health_score(pd.DataFrame(rows_24h))
+            rul = pe.predict_rul_incremental(rul_state, device_id, pd.DataFrame(rows_new), fresh_only=warming_up)
+            pe.record_rul_cursor(rul_state, device_id, poller)
+            pe.save_rul_state(rul_state)
+            return health_score, rul
+
+        health_score, (rul_days, rul_status) = await self._compute(analyze)
+        device_status = pe.get_device_status(health_score, rul_days)
+        now = datetime.utcnow().isoformat()
+
+        if self.result_spools is None:
+            write_predictions, write_statuses = self.backend.upsert_predictions, self.backend.update_devices
+        else:
+            write_predictions, write_statuses = pe.result_writers(self.result_spools)
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(
+            loop.run_in_executor(self.write_executor, write_predictions, [{
+                "device_id": device_id,
+                "predicted_rul_days": rul_days,
+                "health_score": health_score,
+                "prediction_status": rul_status,
+                "created_at": now,
+            }]),
+            loop.run_in_executor(self.write_executor, write_statuses, [{"id": device_id, "status": device_status, "last_updated": now}]),
+        )
+        print(f"[{datetime.now()}] 분석 완료: 건강 점수={health_score}, RUL={rul_days}일 ({rul_status}), 상태={device_status}")
+
+    async def run_predictor(self, interval=3600.0):
+        rul_state = predictive_engine.load_rul_state()
+        while True:
+            try:
+                with stage_timer("predict_cycle"):
+                    await self.predict_once(rul_state)
+            except Exception as e:
+                record_error("predictor")
+                print(f"예측 엔진 실행 중 오류 발생: {e}")
+            await asyncio.sleep(interval)
+
+    async def report(self, interval=30.0):
+        while True:
+            await asyncio.sleep(interval)
+            for writer in (self.log_writer, self.alert_writer):
+                print(f"[{datetime.now()}] {writer.name}: 기록 {writer.rows_written}행, 대기 {writer.qsize()}행, "
+                      f"버림 {writer.rows_dropped}행, 오류 {writer.errors}회")
+            if self.spools:
+                backlog = ", ".join(f"{spool.name} {spool.pending_rows():,}행" for spool in self.spools)
+                print(f"[{datetime.now()}] 스풀 미전송: {backlog}")
+            if self.realtime_detector is not None:
+                print(f"[{datetime.now()}] {self.realtime_detector.report()}")
+
+    async def run(self, devices=0, detector=True, predictor=True):
+        tasks = [self.log_writer.run(), self.alert_writer.run(), self.report()]
+        if devices:
+            tasks.append(self.run_emulator(devices))
+        if detector:
+            tasks.append(self.run_realtime_detector() if self.realtime_source is not None else self.run_detector())
+        if predictor:
+            tasks.append(self.run_predictor())
+        await asyncio.gather(*tasks)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="CMOS 센서 서비스 비동기 런타임")
+    parser.add_argument("--devices", type=int, default=1, help="에뮬레이터로 시뮬레이션할 장치 수 (0이면 에뮬레이터 미실행)")
+    parser.add_argument("--no-detector", action="store_true", help="이상 탐지기를 실행하지 않음")
+    parser.add_argument("--no-predictor", action="store_true", help="예측 엔진을 실행하지 않음")
+    parser.add_argument("--realtime", choices=["off", "supabase", "local"], default="off",
+                        help="탐지기를 INSERT 이벤트로 구동 (supabase: Realtime 구독, local: 에뮬레이터 쓰기 직후 로컬 이벤트)")
+    parser.add_argument("--max-in-flight", type=int, default=MAX_IN_FLIGHT_WRITES, help="동시 쓰기 요청 수 상한")
+    parser.add_argument("--spool-dir", default=SPOOL_DIR, help="로그/경고/예측 결과 쓰기용 로컬 스풀 디렉터리")
+    parser.add_argument("--no-spool", action="store_true", help="스풀 없이 저장소에 직접 기록 (장애 시 데이터 유실)")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    start_from_env()
+    source = None
+    if args.realtime == "supabase":
+        source = SupabaseRealtimeSource.from_env()
+    elif args.realtime == "local":
+        source = LocalEventSource()
+    runtime = AsyncRuntime(max_in_flight=args.max_in_flight, realtime_source=source,
+                           spool_dir=None if args.no_spool else args.spool_dir)
+    asyncio.run(runtime.run(args.devices, detector=not args.no_detector, predictor=not args.no_predictor))
@@ -0,0 +1,475 @@
+import os
+import glob
+import json
+import time
+import argparse
+from bisect import bisect_left
+from itertools import product
+
+import numpy as np
+import pandas as pd
+
+from alert_pipeline import ALERT_COOLDOWN_SECONDS
+from anomaly_detector import (
+    ANALYSIS_WINDOW_SECONDS,
+    LOG_COLUMNS,
+    METRICS,
+    MIN_SAMPLES_FOR_SIGMA,
+    SIGMA_FACTOR,
+    SPIKE_SENSITIVITY,
+    THRESHOLDS,
+)
+from replay import backend_rows
+from sensor_emulator import VirtualSensorFleet
+
+# --- 백테스트 설정 ---
+BACKTEST_COLUMNS = f"{LOG_COLUMNS}, status"
+SYNTHETIC_BLOCK_VALUES = 1_000_000  # 합성 데이터를 한 번에 생성할 값 수 (틱 수 × 장치 수)
+RULES = ("threshold", "spike", "sigma")
+SEVERITIES = ("warning", "critical", "high")
+
+# 파라미터 그리드에서 사용할 수 있는 이름과 기본값 (임계값은 "metric.level" 형식)
+DEFAULT_PARAMETERS = {
+    "spike_sensitivity": SPIKE_SENSITIVITY,
+    "sigma_factor": SIGMA_FACTOR,
+    "cooldown_seconds": ALERT_COOLDOWN_SECONDS,
+    **{f"{metric}.{level}": value for metric, levels in THRESHOLDS.items() for level, value in levels.items()},
+}
+
+
+def synthetic_logs(num_devices, start, end, interval=5.0, seed=0):
+    """에뮬레이터 센서 모델로 [start, end) 구간의 합성 로그를 DataFrame으로 생성합니다 (틱 블록 단위 벡터화)."""
+    fleet = VirtualSensorFleet(num_devices, seed=seed, start_time=start)
+    ticks = np.arange(start, end, interval)
+    ticks_per_block = max(1, SYNTHETIC_BLOCK_VALUES // num_devices)
+    frames = []
+    for i in range(0, len(ticks), ticks_per_block):
+        block = ticks[i:i + ticks_per_block]
+        temperature, noise_level, dead_pixel_count, status = fleet.sample_block(block)
+        frames.append(pd.DataFrame({
+            "device_id": np.tile(fleet.device_ids, len(block)),
+            "log_timestamp": np.repeat(block, num_devices),
+            "temperature": temperature.ravel(),
+            "noise_level": noise_level.ravel(),
+            "dead_pixel_count": dead_pixel_count.ravel(),
+            "status": pd.Categorical(status.ravel(), categories=["healthy", "warning", "critical"]),
+        }))
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=[*BACKTEST_COLUMNS.split(", ")])
+
+
+def backend_logs(since=None, until=None):
+    """설정된 저장소 백엔드의 과거 로그를 DataFrame으로 읽습니다."""
+    frames = [pd.DataFrame.from_records(rows) for rows in backend_rows(since, until, columns=BACKTEST_COLUMNS)]
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=[*BACKTEST_COLUMNS.split(", ")])
+
+
+def archive_logs(directory="archive"):
+    """archive_to_parquet()로 만든 날짜별 Parquet 아카이브를 DataFrame으로 읽습니다."""
+    frames = [pd.read_parquet(path) for path in sorted(glob.glob(os.path.join(directory, "sensor_health_logs_*.parquet")))]
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=[*BACKTEST_COLUMNS.split(", ")])
+
+
+def _epoch_seconds(values):
+    """log_timestamp 열(ISO 문자열, datetime, epoch 초)을 UTC epoch 초 배열로 변환합니다."""
+    if pd.api.types.is_numeric_dtype(values):
+        return values.to_numpy(dtype=np.float64)
+    parsed = pd.to_datetime(values, utc=True, format="ISO8601")
+    return (parsed - pd.Timestamp(0, tz="UTC")).dt.total_seconds().to_numpy()
+
+
+def parameter_grid(grid):
+    """
+    {이름: 값 목록} 그리드의 데카르트 곱을 설정 dict 목록으로 펼칩니다.
+    지정하지 않은 파라미터는 운영 기본값(DEFAULT_PARAMETERS)을 사용합니다.
+    """
+    unknown = [name for name in grid if name not in DEFAULT_PARAMETERS]
+    if unknown:
+        raise ValueError(f"알 수 없는 백테스트 파라미터입니다: {', '.join(unknown)} (사용 가능: {', '.join(DEFAULT_PARAMETERS)})")
+    names = list(grid)
+    return [dict(DEFAULT_PARAMETERS, **dict(zip(names, values))) for values in product(*(grid[name] for name in names))]
+
+
+def cooldown_scan(times, groups, cooldown_seconds):
+    """
+    쿨다운 억제를 한 번의 스캔으로 적용하여 실제 발송될 후보의 인덱스를 반환합니다.
+    times는 그룹(장치) 안에서 시간순으로 정렬된 후보 시각, groups는 후보의 그룹 번호입니다.
+    같은 그룹에서 직전 발송 후 cooldown_seconds가 지나지 않은 후보는 버립니다 (AlertCooldownStore와 같은 판정).
+    """
+    n = len(times)
+    if n == 0 or cooldown_seconds <= 0:
+        return np.arange(n)
+
+    # 직전 후보와 cooldown 이상 떨어진 후보(또는 그룹의 첫 후보)는 항상 발송되므로 벡터 연산으로 처리하고,
+    # 후보가 cooldown보다 길게 이어지는 구간만 이진 탐색으로 건너뛰며 순회 (반복 횟수 = 발송 수)
+    new_run = np.empty(n, dtype=bool)
+    new_run[0] = True
+    new_run[1:] = (np.diff(times) >= cooldown_seconds) | (groups[1:] != groups[:-1])
+    starts = np.flatnonzero(new_run)
+    ends = np.append(starts[1:], n)
+    long_runs = times[ends - 1] - times[starts] >= cooldown_seconds
+
+    emitted = [starts]
+    if long_runs.any():
+        extra = []
+        for start, end in zip(starts[long_runs].tolist(), ends[long_runs].tolist()):
+            run_times = times[start:end].tolist()
+            size = len(run_times)
+            i, step = 0, 1
+            while True:
+                # 다음 발송 위치는 보통 직전 간격 근처이므로 그 범위를 먼저 찾고, 없으면 나머지 전체를 탐색
+                target = run_times[i] + cooldown_seconds
+                hi = min(i + 2 * step + 1, size)
+                j = bisect_left(run_times, target, i + 1, hi)
+                if j == hi and hi < size:
+                    j = bisect_left(run_times, target, hi, size)
+                if j >= size:
+                    break
+                step, i = j - i, j
+                extra.append(start + i)
+        emitted.append(np.asarray(extra, dtype=np.int64))
+    return np.sort(np.concatenate(emitted))
+
+
+class RuleBacktester:
+    """
+    과거 로그 전체를 한 번 전처리한 뒤, 여러 규칙 파라미터 조합을 벡터 연산으로 평가합니다.
+    StreamingAnomalyDetector와 같은 규칙(고정 임계값, 직전 값 대비 스파이크, 롤링 윈도우 3-Sigma)을
+    장치×메트릭 배열 전체에 적용하고, (장치, 메트릭, 규칙)별 쿨다운을 적용한 경고 타임라인을 만듭니다.
+
+    롤링 평균/표준편차는 누적합(cumsum)으로, 스파이크 비율은 한 칸 민 배열로 계산하므로
+    파라미터 조합 수와 무관하게 전처리는 한 번만 수행되며, 같은 파라미터를 쓰는 규칙 결과는 조합 간에 재사용됩니다.
+    운영 파이프라인의 버스트 합치기(ALERT_COALESCE_SECONDS)와 장치 전체 요약 경고는 모델링하지 않으므로,
+    쿨다운은 첫 발생 시각부터 계산됩니다.
+    """
+
+    def __init__(self, logs, window_seconds=ANALYSIS_WINDOW_SECONDS):
+        self.window_seconds = window_seconds
+        device_codes, self.device_ids = pd.factorize(logs["device_id"], use_na_sentinel=False)
+        timestamps = _epoch_seconds(logs["log_timestamp"])
+        # 장치별 시간순 정렬 (같은 시각은 입력 순서 유지)
+        order = np.lexsort((timestamps, device_codes))
+        self.device_code = device_codes[order]
+        self.timestamp = timestamps[order]
+        self.rows = len(order)
+
+        # 장치 구간이 겹치지 않도록 (장치 번호 × stride + 경과 시간)을 단조 증가 키로 사용
+        self._origin = float(self.timestamp.min()) if self.rows else 0.0
+        span = float(self.timestamp.max()) - self._origin if self.rows else 0.0
+        self._stride = span + window_seconds + 1.0
+        self._key = self.device_code * self._stride + (self.timestamp - self._origin)
+
+        # status 열(에뮬레이터/수집기가 기록한 상태)이 있으면 탐지 지연과 정상 구간 경고 수 계산에 사용
+        self.healthy = None
+        if "status" in logs.columns and logs["status"].notna().any():
+            status = logs["status"]
+            self.healthy = (status.isna() | (status == "healthy")).to_numpy()[order]
+
+        self._full_window_left = None
+        self._series = {}
+        for metric in METRICS:
+            if metric not in logs.columns:
+                continue
+            values = pd.to_numeric(logs[metric], errors="coerce").to_numpy(dtype=np.float64)[order]
+            self._series[metric] = self._prepare_series(values)
+        self._candidate_cache = {}
+        self._cache = {}
+        self._episodes = self._health_episodes() if self.healthy is not None else None
+
+    def _prepare_series(self, values):
+        """한 메트릭의 유효한 샘플에 대해 직전 값과 롤링 윈도우 통계를 미리 계산합니다."""
+        rows = np.flatnonzero(~np.isnan(values))
+        value = values[rows]
+        key = self._key[rows]
+        group = self.device_code[rows]
+        n = len(rows)
+
+        # 직전 값: 같은 장치의 바로 앞 샘플 (윈도우 밖이어도 사용 - RollingWindowStats.last_value와 동일)
+        previous = np.full(n, np.nan)
+        if n > 1:
+            same_device = group[1:] == group[:-1]
+            previous[1:] = np.where(same_device, value[:-1], np.nan)
+
+        # 롤링 윈도우 [t - window, t]의 개수/평균/표본표준편차 (누적합)
+        # 윈도우 시작 위치는 결측이 없는 메트릭끼리 공유
+        if n == self.rows:
+            if self._full_window_left is None:
+                self._full_window_left = np.searchsorted(key, key - self.window_seconds, side="left")
+            left = self._full_window_left
+        else:
+            left = np.searchsorted(key, key - self.window_seconds, side="left")
+        right = np.arange(1, n + 1)
+        count = right - left
+
+        # 값의 크기가 시간에 따라 크게 변해도 누적합의 자릿수 손실이 없도록, 윈도우 길이의 시간 블록마다
+        # 블록 평균을 빼고 누적합을 구함. 윈도우는 최대 두 블록에 걸치므로 두 부분을 병렬 분산 공식(Chan)으로 합침
+        time_block = group * (int(self._stride // self.window_seconds) + 2) + np.floor(
+            (self.timestamp[rows] - self._origin) / self.window_seconds).astype(np.int64)
+        block_change = np.ones(n, dtype=bool)
+        block_change[1:] = time_block[1:] != time_block[:-1]
+        block = np.cumsum(block_change) - 1
+        block_start = np.flatnonzero(block_change)
+        center = np.bincount(block, weights=value) / np.bincount(block)
+
+        deviation = value - center[block]
+        cumsum = np.concatenate(([0.0], np.cumsum(deviation)))
+        cumsum_sq = np.concatenate(([0.0], np.cumsum(deviation * deviation)))
+
+        split = np.maximum(block_start[block], left)  # 현재 블록이 시작되는 위치 (윈도우 안)
+        head_count = split - left                     # 이전 블록에 속한 부분의 샘플 수
+        head_sum = cumsum[split] - cumsum[left]
+        head_sum_sq = cumsum_sq[split] - cumsum_sq[left]
+        delta = np.where(head_count > 0, center[block[np.minimum(left, n - 1)]] - center[block], 0.0)
+        window_sum = head_sum + head_count * delta + (cumsum[right] - cumsum[split])
+        window_sum_sq = (head_sum_sq + 2 * delta * head_sum + head_count * delta * delta
+                         + (cumsum_sq[right] - cumsum_sq[split]))
+        mean = window_sum / count
+        with np.errstate(invalid="ignore", divide="ignore"):
+            variance = np.maximum(window_sum_sq - window_sum * mean, 0.0) / (count - 1)
+        std = np.where(count >= 2, np.sqrt(variance), np.nan)
+        mean += center[block]
+
+        return {
+            "rows": rows, "value": value, "group": group, "time": self.timestamp[rows],
+            "previous": previous, "count": count, "mean": mean, "std": std,
+        }
+
+    def _candidates(self, metric, rule, rule_params):
+        """쿨다운 적용 전 경고 후보의 인덱스(시리즈 기준). 쿨다운만 다른 조합끼리 공유됩니다."""
+        cache_key = (metric, rule, rule_params)
+        cached = self._candidate_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        series = self._series[metric]
+        value = series["value"]
+        with np.errstate(invalid="ignore"):
+            if rule == "threshold":
+                mask = value >= min(rule_params)
+            elif rule == "spike":
+                previous = series["previous"]
+                mask = (previous > 0) & (value > previous * rule_params[0])
+            else:
+                mask = (series["count"] > MIN_SAMPLES_FOR_SIGMA) & (value > series["mean"] + rule_params[0] * series["std"])
+        cached = self._candidate_cache[cache_key] = np.flatnonzero(mask)
+        return cached
+
+    @staticmethod
+    def _rule_parameters(metric, rule, params):
+        if rule == "threshold":
+            return params[f"{metric}.warning"], params[f"{metric}.critical"]
+        if rule == "spike":
+            return (params["spike_sensitivity"],)
+        return (params["sigma_factor"],)
+
+    def _part(self, metric, rule, params):
+        """(메트릭, 규칙)의 쿨다운 적용 후 발송 결과. 같은 파라미터를 쓰는 조합 간에 캐시를 재사용합니다."""
+        rule_params = self._rule_parameters(metric, rule, params)
+        cache_key = (metric, rule, rule_params, params["cooldown_seconds"])
+        part = self._cache.get(cache_key)
+        if part is not None:
+            return part
+
+        series = self._series[metric]
+        candidates = self._candidates(metric, rule, rule_params)
+        emitted = candidates[cooldown_scan(series["time"][candidates], series["group"][candidates], params["cooldown_seconds"])]
+        rows = series["rows"][emitted]
+        if rule == "threshold":
+            severity = np.where(series["value"][emitted] >= rule_params[1], SEVERITIES.index("critical"), SEVERITIES.index("warning"))
+        else:
+            severity = np.full(len(emitted), SEVERITIES.index("high"))
+        part = self._cache[cache_key] = {
+            "metric": metric,
+            "rule": rule,
+            "emitted": emitted,
+            "keys": self._key[rows],  # 장치별 시간순으로 정렬되어 있음
+            "severity": severity.astype(np.int8),
+            "candidates": len(candidates),
+            "healthy_alerts": int(self.healthy[rows].sum()) if self.healthy is not None else None,
+        }
+        return part
+
+    def _parts(self, params):
+        return [self._part(metric, rule, params) for metric in self._series for rule in RULES]
+
+    def _health_episodes(self):
+        """status가 healthy가 아닌 구간(장치별 시작 키, 종료 키)을 찾습니다. 종료 키는 포함하지 않습니다."""
+        unhealthy = ~self.healthy
+        first_of_device = np.ones(self.rows, dtype=bool)
+        first_of_device[1:] = self.device_code[1:] != self.device_code[:-1]
+        previous_unhealthy = np.concatenate(([False], unhealthy[:-1])) & ~first_of_device
+        onsets = np.flatnonzero(unhealthy & ~previous_unhealthy)
+
+        # 종료: 같은 장치의 다음 healthy 샘플, 없으면 장치의 마지막 샘플 직후
+        last_of_device = np.append(np.flatnonzero(first_of_device)[1:], self.rows) - 1
+        end = self._key[last_of_device][self.device_code[onsets]] + 0.5
+        healthy_keys = self._key[self.healthy]
+        next_healthy = np.searchsorted(healthy_keys, self._key[onsets], side="right")
+        has_next = next_healthy < len(healthy_keys)
+        end[has_next] = np.minimum(end[has_next], healthy_keys[next_healthy[has_next]])
+        return self._key[onsets], end
+
+    def _time_to_detect(self, parts):
+        """각 비정상 구간의 시작부터 (어떤 규칙이든) 첫 경고까지의 지연. 구간이 끝날 때까지 경고가 없으면 미탐지."""
+        onset, end = self._episodes
+        first_alert = np.full(len(onset), np.inf)
+        for part in parts:
+            keys = part["keys"]
+            index = np.searchsorted(keys, onset, side="left")
+            found = index < len(keys)
+            first_alert[found] = np.minimum(first_alert[found], keys[index[found]])
+        detected = first_alert < end
+        delays = first_alert[detected] - onset[detected]
+        return {
+            "episodes": int(len(onset)),
+            "detected": int(detected.sum()),
+            "missed": int((~detected).sum()),
+            "median_seconds": float(np.median(delays)) if len(delays) else None,
+            "p90_seconds": float(np.percentile(delays, 90)) if len(delays) else None,
+            "max_seconds": float(delays.max()) if len(delays) else None,
+        }
+
+    def evaluate(self, params):
+        """파라미터 조합 하나의 경고 수, 규칙별 경고 수, 탐지 지연(time-to-detect)을 계산합니다."""
+        parts = self._parts(params)
+        alerts_by_rule = []
+        for part in parts:
+            counts = np.bincount(part["severity"], minlength=len(SEVERITIES))
+            alerts_by_rule.extend(
+                {"metric": part["metric"], "rule": part["rule"], "severity": level, "count": int(count)}
+                for level, count in zip(SEVERITIES, counts.tolist()) if count
+            )
+        return {
+            "params": params,
+            "alerts": sum(len(part["emitted"]) for part in parts),
+            "candidates": sum(part["candidates"] for part in parts),
+            "alerts_by_rule": alerts_by_rule,
+            "time_to_detect": self._time_to_detect(parts) if self._episodes is not None else None,
+            "alerts_while_healthy": sum(part["healthy_alerts"] for part in parts) if self.healthy is not None else None,
+        }
+
+    def timeline(self, params):
+        """파라미터 조합 하나의 경고 타임라인(장치별 시간순 DataFrame)을 만듭니다."""
+        parts = [part for part in self._parts(params) if len(part["emitted"])]
+        metrics = list(self._series)
+        if parts:
+            rows = np.concatenate([self._series[part["metric"]]["rows"][part["emitted"]] for part in parts])
+            order = np.argsort(np.concatenate([part["keys"] for part in parts]), kind="stable")
+            rows = rows[order]
+            metric_codes = np.concatenate([np.full(len(part["emitted"]), metrics.index(part["metric"]), dtype=np.int8) for part in parts])[order]
+            rule_codes = np.concatenate([np.full(len(part["emitted"]), RULES.index(part["rule"]), dtype=np.int8) for part in parts])[order]
+            severity = np.concatenate([part["severity"] for part in parts])[order]
+            value = np.concatenate([self._series[part["metric"]]["value"][part["emitted"]] for part in parts])[order]
+        else:
+            rows = np.empty(0, dtype=np.int64)
+            metric_codes = rule_codes = severity = np.empty(0, dtype=np.int8)
+            value = np.empty(0)
+
+        # 조합이 많을 때 메모리를 줄이기 위해 문자열 열은 범주형(category)으로 저장
+        return pd.DataFrame({
+            "device_id": self.device_ids.take(self.device_code[rows]),
+            "log_timestamp": pd.to_datetime(np.round(self.timestamp[rows] * 1e6).astype(np.int64), unit="us"),
+            "metric": pd.Categorical.from_codes(metric_codes, categories=metrics),
+            "rule": pd.Categorical.from_codes(rule_codes, categories=list(RULES)),
+            "severity": pd.Categorical.from_codes(severity, categories=list(SEVERITIES)),
+            "value": value,
+        })
+
+    def run(self, configs):
+        """여러 파라미터 조합(parameter_grid() 결과)을 평가하여 결과 목록을 반환합니다."""
+        return [self.evaluate(params) for params in configs]
+
+
+def backtest(logs, grid, window_seconds=ANALYSIS_WINDOW_SECONDS, timelines=False):
+    """
+    과거 로그 DataFrame에 파라미터 그리드의 모든 조합을 적용한 백테스트 결과 목록을 반환합니다.
+    timelines=True이면 각 결과에 경고 타임라인(DataFrame)을 "timeline" 키로 함께 담습니다.
+    """
+    backtester = RuleBacktester(logs, window_seconds)
+    results = backtester.run(parameter_grid(grid))
+    if timelines:
+        for result in results:
+            result["timeline"] = backtester.timeline(result["params"])
+    return results
+
+
+def summary_frame(results):
+    """백테스트 결과 목록을 조합별 한 행의 요약 DataFrame으로 변환합니다."""
+    records = []
+    for result in results:
+        record = dict(result["params"], alerts=result["alerts"], candidates=result["candidates"],
+                      alerts_while_healthy=result["alerts_while_healthy"])
+        ttd = result["time_to_detect"]
+        if ttd is not None:
+            record.update(detected=ttd["detected"], missed=ttd["missed"], ttd_median_seconds=ttd["median_seconds"],
+                          ttd_p90_seconds=ttd["p90_seconds"])
+        records.append(record)
+    return pd.DataFrame.from_records(records)
+
+
+def parse_grid(values):
+    """'name=v1,v2,...' 형식의 그리드 지정을 {이름: 값 목록}으로 변환합니다."""
+    grid = {}
+    for item in values or []:
+        name, _, raw = item.partition("=")
+        if not raw:
+            raise ValueError(f"잘못된 그리드 지정입니다 (예: spike_sensitivity=1.2,1.5,2.0): {item}")
+        grid[name.strip()] = [float(value) for value in raw.split(",") if value.strip()]
+    return grid
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="과거 로그에 대한 이상 탐지 규칙 파라미터 백테스트")
+    sub = parser.add_subparsers(dest="source", required=True)
+
+    gen = sub.add_parser("generate", help="에뮬레이터 모델로 합성 이력을 생성하여 백테스트")
+    gen.add_argument("--devices", type=int, default=1, help="장치 수")
+    gen.add_argument("--days", type=float, default=365, help="생성할 기간(일). 현재 시각에서 끝남")
+    gen.add_argument("--interval", type=float, default=5.0, help="샘플 간격(초)")
+    gen.add_argument("--seed", type=int, default=0, help="난수 시드")
+
+    src = sub.add_parser("backend", help="설정된 저장소 백엔드의 과거 로그로 백테스트")
+    src.add_argument("--since", help="시작 시각 (ISO 8601, 미지정 시 전체 이력)")
+    src.add_argument("--until", help="종료 시각 (ISO 8601, 미포함)")
+
+    arc = sub.add_parser("archive", help="Parquet 아카이브로 백테스트")
+    arc.add_argument("--directory", default="archive", help="아카이브 디렉터리")
+
+    for p in (gen, src, arc):
+        p.add_argument("--grid", action="append", metavar="NAME=V1,V2,...",
+                       help=f"파라미터 그리드 (여러 번 지정 가능). 사용 가능: {', '.join(DEFAULT_PARAMETERS)}")
+        p.add_argument("--window", type=float, default=ANALYSIS_WINDOW_SECONDS, help="롤링 통계 윈도우(초)")
+        p.add_argument("--output", help="조합별 요약 결과를 저장할 JSON 경로")
+        p.add_argument("--timelines", help="모든 조합의 경고 타임라인을 저장할 CSV 경로 (config 열 = 조합 번호)")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    grid = parse_grid(args.grid)
+
+    started = time.perf_counter()
+    if args.source == "generate":
+        end = time.time()
+        logs = synthetic_logs(args.devices, end - args.days * 86400, end, args.interval, args.seed)
+    elif args.source == "backend":
+        logs = backend_logs(args.since, args.until)
+    else:
+        logs = archive_logs(args.directory)
+    loaded = time.perf_counter()
+    print(f"로그 {len(logs):,}행을 {loaded - started:.1f}초에 불러왔습니다 (원본: {args.source}).")
+
+    backtester = RuleBacktester(logs, args.window)
+    prepared = time.perf_counter()
+    results = backtester.run(parameter_grid(grid))
+    finished = time.perf_counter()
+    print(f"파라미터 조합 {len(results)}개를 {finished - prepared:.1f}초에 평가했습니다 (전처리 {prepared - loaded:.1f}초).")
+
+    summary = summary_frame(results)
+    print(summary.to_string(index=False))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+    if args.timelines:
+        # 조합별 타임라인을 차례로 이어 써서 전체를 메모리에 올리지 않음
+        for i, result in enumerate(results):
+            backtester.timeline(result["params"]).assign(config=i).to_csv(
+                args.timelines, mode="w" if i == 0 else "a", header=i == 0, index=False)
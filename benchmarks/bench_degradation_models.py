@@ -0,0 +1,163 @@
+"""
+열화 모델(degradation_models) 벤치마크.
+
+sensor_emulator의 센서 모델(VirtualSensorFleet)로 합성 데이터를 청크 단위로 만들어, 플릿 예측 엔진과 같은 방식으로
+장치별 상태를 증분 갱신하면서 다음을 측정하여 JSON으로 저장합니다.
+  - 갱신 비용: 기존 OLS 회귀 상태(grouped_moments) 대비 시간 구간 요약, 온도-노이즈 모델, EWMA/CUSUM 드리프트 탐지
+  - 적합 비용: OLS 기울기 대비 Theil-Sen/Huber 적합 (예측 주기마다 1회)
+  - 강건성: 노이즈 스파이크를 섞었을 때 각 모델의 기울기가 같은 모델을 스파이크 없는 데이터에 적합한 기울기에서 벗어나는 정도
+  - 온도-노이즈 모델이 에뮬레이터의 0.5 * exp(0.08 * ΔT)를 복원하는지
+
+사용 예:
+    python benchmarks/bench_degradation_models.py                    # 기본 시나리오
+    python benchmarks/bench_degradation_models.py --scenario 1x1y
+    python benchmarks/bench_degradation_models.py --devices 100 --days 7 --interval 60
+"""
+import os
+import sys
+import json
+import time
+import argparse
+from datetime import datetime
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+RESULTS_DIR = os.path.join(REPO_ROOT, "benchmarks", "results")
+
+# 이름 -> (장치 수, 기간(일), 샘플 간격(초))
+SCENARIOS = {
+    "10kx1d": {"devices": 10000, "days": 1, "interval": 300},
+    "1x1y": {"devices": 1, "days": 365, "interval": 60},
+}
+DEFAULT_SCENARIOS = ["10kx1d", "1x1y"]
+
+CHUNK_ROWS = 200_000      # 한 번에 반영하는 행 수 (플릿 엔진의 한 주기 조회량에 해당)
+SPIKE_RATE = 0.01         # 노이즈 스파이크를 넣을 샘플 비율
+SPIKE_SIZE = 5.0          # 스파이크 크기 (노이즈 레벨에 더하는 값)
+
+
+def _timed(totals, key, fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    totals[key] = totals.get(key, 0.0) + time.perf_counter() - started
+    return result
+
+
+def run_scenario(name, devices, days, interval, seed=0, chunk_rows=CHUNK_ROWS):
+    """시나리오 하나를 실행하고 결과 dict를 반환합니다."""
+    import numpy as np
+
+    from degradation_models import DecimatedSeries, FleetDriftDetector, TemperatureNoiseModel, fit_trend
+    from online_regression import grouped_moments, merge_moments
+    from sensor_emulator import VirtualSensorFleet
+
+    start = 1.79e9
+    ticks = np.arange(start, start + days * 86400, interval)
+    fleet = VirtualSensorFleet(devices, seed=seed, start_time=start)
+    rng = np.random.default_rng(seed)
+    ticks_per_chunk = max(1, chunk_rows // devices)
+    print(f"[{name}] 장치 {devices}대 x {days}일, {interval}초 간격 ({len(ticks) * devices:,}행)")
+
+    codes_per_tick = np.arange(devices, dtype=np.int64)
+    clean_moments = tuple(np.zeros(devices) for _ in range(5))
+    moments = tuple(np.zeros(devices) for _ in range(5))
+    trend = DecimatedSeries(devices)
+    clean_trend = DecimatedSeries(devices)
+    thermal = TemperatureNoiseModel(devices)
+    drift = FleetDriftDetector(devices)
+    update_seconds, drift_alarms = {}, 0
+
+    for i in range(0, len(ticks), ticks_per_chunk):
+        block = ticks[i:i + ticks_per_chunk]
+        temperature, noise, _, _ = fleet.sample_block(block)
+        clean_noise = noise.ravel()
+        spikes = rng.random(clean_noise.shape) < SPIKE_RATE
+        noise = np.where(spikes, clean_noise + SPIKE_SIZE, clean_noise)
+        # 틱 순서(장치 안에서 시간순)로 펼친 배열. x는 시작 시각 기준 경과 초
+        codes = np.tile(codes_per_tick, len(block))
+        epochs = np.repeat(block, devices)
+        x = epochs - start
+
+        clean_batch = grouped_moments(codes, devices, x, clean_noise)
+        clean_moments = merge_moments(clean_moments, clean_batch)
+        clean_trend.extend(codes, epochs, clean_noise)
+
+        batch = _timed(update_seconds, "ols", grouped_moments, codes, devices, x, noise)
+        moments = _timed(update_seconds, "ols", merge_moments, moments, batch)
+        _timed(update_seconds, "decimated", trend.extend, codes, epochs, noise)
+        _timed(update_seconds, "thermal", thermal.update, codes, temperature.ravel(), clean_noise)
+        _, direction = _timed(update_seconds, "drift", drift.update, codes, noise)
+        drift_alarms += int(np.count_nonzero(direction))
+
+    fit_seconds = {}
+    slopes = {"ols": (_timed(fit_seconds, "ols", lambda: moments[3] / moments[4]), clean_moments[3] / clean_moments[4])}
+    for method in ("theil_sen", "huber"):
+        slopes[method] = (_timed(fit_seconds, method, fit_trend, trend, method)[0], fit_trend(clean_trend, method)[0])
+    slope_error = {
+        method: round(float(np.median(np.abs(slope - clean_slope) / np.abs(clean_slope))), 4)
+        for method, (slope, clean_slope) in slopes.items()
+    }
+
+    # 에뮬레이터의 기준 온도는 장치마다 다르므로 a는 장치 기준 온도에서의 노이즈로 환산하여 비교
+    amplitude = thermal.amplitude * np.exp(thermal.exponent * (fleet.base_temperature - thermal.reference_temperature))
+    rows = len(ticks) * devices
+    result = {
+        "scenario": name,
+        "devices": devices,
+        "days": days,
+        "interval": interval,
+        "rows": rows,
+        "update_seconds": {key: round(value, 4) for key, value in update_seconds.items()},
+        "update_rows_per_s": {key: round(rows / value, 1) for key, value in update_seconds.items() if value > 0},
+        "fit_seconds": {key: round(value, 4) for key, value in fit_seconds.items()},
+        "median_relative_slope_error": slope_error,
+        "thermal": {
+            "median_a": round(float(np.median(amplitude)), 4),
+            "median_b": round(float(np.median(thermal.exponent)), 4),
+        },
+        "drift_alarms_per_device_day": round(drift_alarms / devices / days, 3),
+        "state_bytes": {
+            "ols": int(sum(m.nbytes for m in moments)),
+            "decimated": int(trend.counts.nbytes + trend.sum_x.nbytes + trend.sum_y.nbytes),
+            "thermal": int(sum(getattr(thermal, field).nbytes for field in thermal._FIELDS)),
+        },
+    }
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+    return result
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="열화 모델 벤치마크 (합성 장치 데이터)")
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS),
+                        help=f"실행할 시나리오 (여러 번 지정 가능, 기본값: {', '.join(DEFAULT_SCENARIOS)})")
+    parser.add_argument("--devices", type=int, help="사용자 지정 시나리오의 장치 수")
+    parser.add_argument("--days", type=float, default=1, help="사용자 지정 시나리오의 기간(일)")
+    parser.add_argument("--interval", type=float, default=60, help="사용자 지정 시나리오의 샘플 간격(초)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="결과 JSON 경로 (기본값: benchmarks/results/<시각>_degradation.json)")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if args.devices:
+        scenarios = [("custom", {"devices": args.devices, "days": args.days, "interval": args.interval})]
+    else:
+        scenarios = [(name, SCENARIOS[name]) for name in (args.scenario or DEFAULT_SCENARIOS)]
+
+    report = {
+        "created_at": datetime.now().isoformat(),
+        "results": [run_scenario(name, seed=args.seed, **params) for name, params in scenarios],
+    }
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"{datetime.now().strftime('%Y%m%d-%H%M%S')}_degradation.json")
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"결과를 저장했습니다: {output}")
+
+
+if __name__ == "__main__":
+    main()
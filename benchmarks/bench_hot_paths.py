@@ -0,0 +1,309 @@
+"""
+이상 탐지/예측 핫 패스 벤치마크.
+
+sensor_emulator의 센서 모델(VirtualSensorFleet)로 합성 데이터셋을 만들어 인메모리 SQLite 백엔드에 넣고,
+analyze_sensor_data, get_health_score, predict_rul, get_health_status 분류의 처리량과
+p50/p99 지연 시간, 최대 RSS를 측정하여 JSON으로 저장합니다. 시나리오마다 별도 프로세스에서 실행됩니다.
+
+사용 예:
+    python benchmarks/bench_hot_paths.py                          # 기본 시나리오
+    python benchmarks/bench_hot_paths.py --scenario 10kx1d
+    python benchmarks/bench_hot_paths.py --devices 50 --days 3 --interval 60
+    python benchmarks/bench_hot_paths.py --compare benchmarks/results/old.json benchmarks/results/new.json
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import subprocess
+import multiprocessing as mp
+from datetime import datetime, timezone
+
+# 저장소 모듈이 백엔드를 처음 사용하기 전에 인메모리 SQLite 백엔드를 지정해야 함 (백엔드는 첫 사용 시점에 생성)
+os.environ["CMOS_STORAGE_BACKEND"] = "sqlite"
+os.environ["CMOS_SQLITE_PATH"] = ":memory:"
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+RESULTS_DIR = os.path.join(REPO_ROOT, "benchmarks", "results")
+
+# 이름 -> (장치 수, 기간(일), 샘플 간격(초))
+SCENARIOS = {
+    "1x1y": {"devices": 1, "days": 365, "interval": 60},
+    "100x7d": {"devices": 100, "days": 7, "interval": 60},
+    "10kx1d": {"devices": 10000, "days": 1, "interval": 300},
+}
+DEFAULT_SCENARIOS = ["1x1y", "100x7d"]
+
+POLL_ROWS = 1000          # analyze_sensor_data 1회 호출당 새로 들어오는 행 수 (근사값)
+SAMPLE_DEVICES = 50       # get_health_score/predict_rul을 측정할 장치 수
+REPEAT = 3                # 장치당 get_health_score/predict_rul 반복 측정 횟수
+REGRESSION_TOLERANCE = 0.10  # --compare에서 회귀로 판단할 성능 저하 비율
+
+
+def peak_rss_mb():
+    """현재 프로세스의 최대 RSS(MB). Linux는 KB, macOS는 바이트 단위로 보고됨."""
+    import resource
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024, 1)
+
+
+def summarize(latencies, rows):
+    """호출별 지연 시간(초) 목록을 처리량/백분위 요약으로 변환합니다."""
+    import numpy as np
+
+    latencies = np.asarray(latencies, dtype=np.float64)
+    total = float(latencies.sum())
+    return {
+        "calls": int(len(latencies)),
+        "rows": int(rows),
+        "total_seconds": round(total, 4),
+        "throughput_rows_per_s": round(rows / total, 1) if total > 0 else None,
+        "p50_ms": round(float(np.percentile(latencies, 50)) * 1000, 4) if len(latencies) else None,
+        "p99_ms": round(float(np.percentile(latencies, 99)) * 1000, 4) if len(latencies) else None,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def _iso(epoch_seconds):
+    return datetime.fromtimestamp(epoch_seconds, tz=timezone.utc).isoformat()
+
+
+def run_scenario(name, devices, days, interval, seed=0, poll_rows=POLL_ROWS,
+                 sample_devices=SAMPLE_DEVICES, repeat=REPEAT):
+    """시나리오 하나를 현재 프로세스에서 실행하고 결과 dict를 반환합니다."""
+    import contextlib
+
+    import numpy as np
+    import pandas as pd
+
+    import anomaly_detector as ad
+    import predictive_engine as pe
+    import sensor_emulator as se
+    from alert_pipeline import AlertCooldownStore, AlertPipeline
+    from storage import normalize_timestamp
+
+    # 각 모듈이 만든 인메모리 DB는 서로 독립적이므로 하나의 백엔드를 공유하도록 교체
+    backend = ad.backend
+    pe.backend = se.backend = backend
+    ad.alert_pipeline = AlertPipeline(backend.insert_alerts, cooldown=AlertCooldownStore(path=None))
+
+    end = time.time()
+    start = end - days * 86400
+    ticks = np.arange(start, end, interval)
+    fleet = se.VirtualSensorFleet(devices, seed=seed, start_time=start)
+    ticks_per_poll = max(1, -(-poll_rows // devices))
+
+    # 데이터 시작 직전을 high-water mark로 지정하여 모든 행이 warm-up 없이 검사되도록 함
+    ad._detector = ad.StreamingAnomalyDetector(
+        poller=ad.IncrementalLogPoller(high_water_mark=normalize_timestamp(_iso(start - 1)), cursor_column="log_timestamp")
+    )
+
+    print(f"[{name}] 장치 {devices}대 x {days}일, {interval}초 간격 ({len(ticks) * devices:,}행)")
+    insert_latencies, analyze_latencies, poll_sizes = [], [], []
+    # 틱 x 장치 행렬로 보관 (분류 벤치마크 입력). 작은 배열을 틱마다 보관하면 RSS 측정이 왜곡됨
+    sampled_temperature = np.empty((len(ticks), devices))
+    sampled_noise = np.empty((len(ticks), devices))
+    sampled_pixels = np.empty((len(ticks), devices), dtype=np.int64)
+    with open(os.devnull, "w") as devnull:
+        for i in range(0, len(ticks), ticks_per_poll):
+            rows = []
+            for k in range(i, min(i + ticks_per_poll, len(ticks))):
+                t = ticks[k]
+                temperature, noise_level, dead_pixel_count, status = fleet.sample(t)
+                sampled_temperature[k], sampled_noise[k], sampled_pixels[k] = temperature, noise_level, dead_pixel_count
+                log_time = _iso(t)
+                rows.extend(
+                    {
+                        "device_id": device_id,
+                        "log_timestamp": log_time,
+                        "temperature": temp,
+                        "noise_level": noise,
+                        "dead_pixel_count": pixels,
+                        "status": state,
+                    }
+                    for device_id, temp, noise, pixels, state in zip(
+                        fleet.device_ids.tolist(), temperature.tolist(), noise_level.tolist(),
+                        dead_pixel_count.tolist(), status.tolist(),
+                    )
+                )
+
+            started = time.perf_counter()
+            backend.insert_logs(rows)
+            insert_latencies.append(time.perf_counter() - started)
+
+            # 탐지기/경고 출력이 측정에 섞이지 않도록 표준 출력을 버림
+            with contextlib.redirect_stdout(devnull):
+                started = time.perf_counter()
+                ad.analyze_sensor_data()
+                analyze_latencies.append(time.perf_counter() - started)
+            poll_sizes.append(len(rows))
+
+    total_rows = sum(poll_sizes)
+    ops = {
+        "insert_logs": summarize(insert_latencies, total_rows),
+        "analyze_sensor_data": summarize(analyze_latencies, total_rows),
+    }
+
+    # get_health_score / predict_rul: 예측 엔진과 같은 조회 결과로 함수 자체만 측정
+    sampled = np.unique(np.linspace(0, devices - 1, min(devices, sample_devices)).astype(int))
+    health_latencies, health_rows, rul_latencies, rul_rows = [], 0, [], 0
+    since_24h = _iso(end - 86400)
+    for device_id in fleet.device_ids[sampled].tolist():
+        df_24h = pd.DataFrame(backend.select_logs(since=since_24h, columns=pe.HEALTH_COLUMNS,
+                                                  device_id=device_id, descending=True))
+        df_all = pd.DataFrame(backend.select_logs(columns=pe.RUL_COLUMNS, device_id=device_id))
+        for _ in range(repeat):
+            started = time.perf_counter()
+            pe.get_health_score(df_24h)
+            health_latencies.append(time.perf_counter() - started)
+            health_rows += len(df_24h)
+
+            started = time.perf_counter()
+            pe.predict_rul(df_all)
+            rul_latencies.append(time.perf_counter() - started)
+            rul_rows += len(df_all)
+    ops["get_health_score"] = summarize(health_latencies, health_rows)
+    ops["predict_rul"] = summarize(rul_latencies, rul_rows)
+
+    # get_health_status 분류: 틱 단위로 스칼라 버전과 벡터화 버전을 각각 측정
+    scalar_latencies, vector_latencies = [], []
+    for temperature, noise_level, dead_pixel_count in zip(sampled_temperature, sampled_noise, sampled_pixels):
+        temps, noises, pixels = temperature.tolist(), noise_level.tolist(), dead_pixel_count.tolist()
+        started = time.perf_counter()
+        [se.get_health_status(t, n, p) for t, n, p in zip(temps, noises, pixels)]
+        scalar_latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        se.get_health_status_array(temperature, noise_level, dead_pixel_count)
+        vector_latencies.append(time.perf_counter() - started)
+    ops["get_health_status"] = summarize(scalar_latencies, total_rows)
+    ops["get_health_status_array"] = summarize(vector_latencies, total_rows)
+
+    for op, stats in ops.items():
+        print(f"[{name}] {op:<24} {stats['throughput_rows_per_s'] or 0:>14,.0f} rows/s  "
+              f"p50={stats['p50_ms']:.3f}ms  p99={stats['p99_ms']:.3f}ms  peak RSS={stats['peak_rss_mb']}MB")
+
+    return {
+        "name": name,
+        "devices": devices,
+        "days": days,
+        "interval_seconds": interval,
+        "rows": total_rows,
+        "rows_per_poll": round(total_rows / max(len(poll_sizes), 1), 1),
+        "alerts_raised": ad.alert_pipeline.alerts_received,
+        "ops": ops,
+    }
+
+
+def _scenario_process(kwargs, queue):
+    try:
+        queue.put(("ok", run_scenario(**kwargs)))
+    except Exception as e:
+        queue.put(("error", f"{type(e).__name__}: {e}"))
+
+
+def run_isolated(**kwargs):
+    """최대 RSS가 시나리오끼리 섞이지 않도록 새 프로세스(spawn)에서 시나리오를 실행합니다."""
+    ctx = mp.get_context("spawn")
+    queue = ctx.Queue()
+    process = ctx.Process(target=_scenario_process, args=(kwargs, queue))
+    process.start()
+    status, payload = queue.get()
+    process.join()
+    if status != "ok":
+        raise RuntimeError(f"시나리오 '{kwargs['name']}' 실행 실패: {payload}")
+    return payload
+
+
+def git_revision():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+                             capture_output=True, text=True, check=True)
+        return out.stdout.strip()
+    except Exception:
+        return None
+
+
+def compare(base_path, new_path, tolerance=REGRESSION_TOLERANCE):
+    """두 결과 파일의 처리량/p99를 비교하여 출력합니다. 회귀가 있으면 True를 반환합니다."""
+    with open(base_path) as f:
+        base = {s["name"]: s for s in json.load(f)["scenarios"]}
+    with open(new_path) as f:
+        new = {s["name"]: s for s in json.load(f)["scenarios"]}
+
+    regressed = False
+    for name in sorted(base.keys() & new.keys()):
+        for op in sorted(base[name]["ops"].keys() & new[name]["ops"].keys()):
+            old_stats, new_stats = base[name]["ops"][op], new[name]["ops"][op]
+            old_tp, new_tp = old_stats["throughput_rows_per_s"], new_stats["throughput_rows_per_s"]
+            if not old_tp or not new_tp:
+                continue
+            ratio = new_tp / old_tp
+            p99_ratio = new_stats["p99_ms"] / old_stats["p99_ms"] if old_stats["p99_ms"] else float("nan")
+            marker = ""
+            if ratio < 1 - tolerance or p99_ratio > 1 + tolerance:
+                marker = "  <-- 회귀"
+                regressed = True
+            print(f"{name:<8} {op:<24} 처리량 x{ratio:.2f}  p99 x{p99_ratio:.2f}{marker}")
+    return regressed
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="이상 탐지/예측 핫 패스 벤치마크 (합성 장치 데이터, 인메모리 SQLite)")
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS),
+                        help=f"실행할 시나리오 (여러 번 지정 가능, 기본값: {', '.join(DEFAULT_SCENARIOS)})")
+    parser.add_argument("--devices", type=int, help="사용자 지정 시나리오의 장치 수")
+    parser.add_argument("--days", type=float, default=1, help="사용자 지정 시나리오의 기간(일)")
+    parser.add_argument("--interval", type=float, default=5, help="사용자 지정 시나리오의 샘플 간격(초)")
+    parser.add_argument("--seed", type=int, default=0, help="합성 데이터 난수 시드")
+    parser.add_argument("--poll-rows", type=int, default=POLL_ROWS, help="analyze_sensor_data 1회당 새 행 수")
+    parser.add_argument("--sample-devices", type=int, default=SAMPLE_DEVICES, help="건강 점수/RUL 측정 장치 수")
+    parser.add_argument("--repeat", type=int, default=REPEAT, help="장치당 건강 점수/RUL 반복 측정 횟수")
+    parser.add_argument("--output", help="결과 JSON 경로 (기본값: benchmarks/results/<시각>_<커밋>.json)")
+    parser.add_argument("--compare", nargs=2, metavar=("BASE", "NEW"), help="두 결과 JSON을 비교하고 종료")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if args.compare:
+        sys.exit(1 if compare(*args.compare) else 0)
+
+    if args.devices:
+        scenarios = {f"{args.devices}x{args.days:g}d": {"devices": args.devices, "days": args.days, "interval": args.interval}}
+    else:
+        scenarios = {name: SCENARIOS[name] for name in (args.scenario or DEFAULT_SCENARIOS)}
+
+    results = []
+    for name, spec in scenarios.items():
+        results.append(run_isolated(
+            name=name, seed=args.seed, poll_rows=args.poll_rows,
+            sample_devices=args.sample_devices, repeat=args.repeat, **spec,
+        ))
+
+    revision = git_revision()
+    report = {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "git_revision": revision,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "scenarios": results,
+    }
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        output = os.path.join(RESULTS_DIR, f"{stamp}_{revision or 'unknown'}.json")
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"결과를 저장했습니다: {output}")
+
+
+if __name__ == "__main__":
+    main()
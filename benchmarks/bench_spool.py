@@ -0,0 +1,165 @@
+"""
+쓰기 선행 스풀(spool.WriteAheadSpool) 장애 벤치마크.
+
+sensor_emulator의 플릿 모델(VirtualSensorFleet)로 행을 최대 속도로 만들어 BulkInsertBuffer에 넣고,
+원격 저장소를 흉내 낸 싱크(호출마다 latency초 지연, 장애 구간에는 예외)로 보냅니다.
+싱크 뒤의 실제 저장은 임시 SQLite 파일이며, 두 가지 방식을 비교하여 JSON으로 저장합니다.
+  - direct: 버퍼가 싱크를 직접 호출 (기존 방식). 장애 중 행은 유실되고 처리량은 원격 지연에 묶임
+  - spool: 버퍼가 로컬 스풀에 기록하고 드레이너가 싱크로 전송
+측정 항목은 장애 전/중/후 구간별 기록 처리량(rows/s), 생산 종료 후 미전송분을 모두 보내기까지의 시간,
+최종 저장 행 수와 중복(같은 ingest_key) 수입니다.
+
+사용 예:
+    python benchmarks/bench_spool.py                                   # 기본값: 30초, 10~20초 장애, 지연 50ms
+    python benchmarks/bench_spool.py --seconds 60 --outage-start 10 --outage-seconds 30 --latency 0.1
+    python benchmarks/bench_spool.py --mode spool --devices 10000
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+from datetime import datetime, timezone
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+RESULTS_DIR = os.path.join(REPO_ROOT, "benchmarks", "results")
+
+MODES = ("direct", "spool")
+DRAIN_TIMEOUT_SECONDS = 300   # 생산 종료 후 스풀 미전송분을 기다리는 최대 시간
+
+
+class FlakyRemoteSink:
+    """원격 저장소 흉내: 호출마다 latency초 지연, [outage_start, outage_end) 구간에는 ConnectionError."""
+
+    def __init__(self, backend, latency, outage_start, outage_end):
+        self.backend = backend
+        self.latency = latency
+        self.outage_start = outage_start
+        self.outage_end = outage_end
+        self.started = None
+        self.calls = 0
+        self.failed_calls = 0
+
+    def __call__(self, rows):
+        self.calls += 1
+        time.sleep(self.latency)
+        elapsed = time.monotonic() - self.started
+        if self.outage_start <= elapsed < self.outage_end:
+            self.failed_calls += 1
+            raise ConnectionError("simulated backend outage")
+        self.backend.insert_logs(rows)
+
+
+def run_mode(mode, devices, seconds, outage_start, outage_seconds, latency, batch_size, drain_batch, rate, workdir):
+    """한 방식(direct/spool)을 seconds초 동안 실행하고 결과 dict를 반환합니다. rate(rows/s)가 0이면 최대 속도로 생산합니다."""
+    from sensor_emulator import BulkInsertBuffer, VirtualSensorFleet
+    from spool import WriteAheadSpool
+    from storage import SQLiteBackend
+
+    backend = SQLiteBackend(os.path.join(workdir, f"{mode}.db"))
+    sink = FlakyRemoteSink(backend, latency, outage_start, outage_start + outage_seconds)
+    spool = None
+    if mode == "spool":
+        spool = WriteAheadSpool(os.path.join(workdir, "spool"), sink, batch_rows=drain_batch, verbose=False)
+        buffer = BulkInsertBuffer(spool.append, max_rows=batch_size, max_age_seconds=0.5)
+    else:
+        buffer = BulkInsertBuffer(sink, max_rows=batch_size, max_age_seconds=0.5)
+    fleet = VirtualSensorFleet(devices, seed=0, start_time=time.time())
+    print(f"[{mode}] 장치 {devices}대, {seconds}초 (장애 {outage_start}~{outage_start + outage_seconds}초, 지연 {latency * 1000:.0f}ms)")
+
+    # 구간별(장애 전/중/후) 버퍼가 기록을 마친 행 수. direct는 싱크 성공분, spool은 로컬 기록분
+    phases = {"before": [0, 0.0], "outage": [0, 0.0], "after": [0, 0.0]}
+    sink.started = started = time.monotonic()
+    tick = 0
+    while True:
+        now = time.monotonic() - started
+        if now >= seconds:
+            break
+        phase = "before" if now < outage_start else "outage" if now < outage_start + outage_seconds else "after"
+        written_before = buffer.rows_written
+        tick_started = time.monotonic()
+        buffer.extend(fleet.sample_rows(datetime.now(timezone.utc).isoformat(), now=time.time()))
+        phases[phase][0] += buffer.rows_written - written_before
+        tick += 1
+        if rate:
+            time.sleep(max(0.0, started + tick * devices / rate - time.monotonic()))
+        phases[phase][1] += time.monotonic() - tick_started
+    buffer.flush()
+    produced = tick * devices
+    produce_seconds = time.monotonic() - started
+
+    drain_seconds = None
+    if spool is not None:
+        drain_started = time.monotonic()
+        spool.wait_drained(DRAIN_TIMEOUT_SECONDS)
+        drain_seconds = round(time.monotonic() - drain_started, 3)
+        spool.close(timeout=0)
+    stored, distinct = backend.conn.execute(
+        "SELECT COUNT(*), COUNT(DISTINCT COALESCE(ingest_key, id)) FROM sensor_health_logs"
+    ).fetchone()
+
+    result = {
+        "mode": mode,
+        "rows_produced": produced,
+        "produce_seconds": round(produce_seconds, 3),
+        "rows_per_s": {
+            phase: round(rows / elapsed, 1) if elapsed > 0 else None for phase, (rows, elapsed) in phases.items()
+        },
+        "rows_stored": stored,
+        "rows_lost": produced - distinct,
+        "duplicates": stored - distinct,
+        "drain_seconds_after_stop": drain_seconds,
+        "sink_calls": sink.calls,
+        "sink_failed_calls": sink.failed_calls,
+    }
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+    return result
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="쓰기 선행 스풀 장애 벤치마크")
+    parser.add_argument("--mode", action="append", choices=MODES, help="실행할 방식 (여러 번 지정 가능, 기본값: 둘 다)")
+    parser.add_argument("--devices", type=int, default=1000, help="틱당 행 수 (가상 장치 수)")
+    parser.add_argument("--seconds", type=float, default=30, help="생산 시간(초)")
+    parser.add_argument("--outage-start", type=float, default=10, help="장애 시작 시점(초)")
+    parser.add_argument("--outage-seconds", type=float, default=10, help="장애 지속 시간(초)")
+    parser.add_argument("--latency", type=float, default=0.05, help="원격 저장소 호출당 지연(초)")
+    parser.add_argument("--batch-size", type=int, default=1000, help="BulkInsertBuffer 배치 크기(행)")
+    parser.add_argument("--drain-batch", type=int, default=10000, help="스풀 드레이너 배치 크기(행)")
+    parser.add_argument("--rate", type=float, default=0, help="생산 속도(rows/s). 0이면 최대 속도")
+    parser.add_argument("--output", help="결과 JSON 경로 (기본값: benchmarks/results/<시각>_spool.json)")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    workdir = tempfile.mkdtemp(prefix="cmos_spool_bench_")
+    try:
+        results = [
+            run_mode(mode, args.devices, args.seconds, args.outage_start, args.outage_seconds, args.latency,
+                     args.batch_size, args.drain_batch, args.rate, workdir)
+            for mode in (args.mode or MODES)
+        ]
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "created_at": datetime.now().isoformat(),
+        "params": {key: value for key, value in vars(args).items() if key not in ("mode", "output")},
+        "results": results,
+    }
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"{datetime.now().strftime('%Y%m%d-%H%M%S')}_spool.json")
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"결과를 저장했습니다: {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+서비스 진입점 import 시간(콜드 스타트) 예산 검사.
+
+각 모듈을 별도 프로세스에서 `python -X importtime -c "import <module>"`로 import하여
+누적 import 시간을 측정하고, 예산을 넘거나 import만으로 로드되면 안 되는 무거운 의존성
+(pandas, supabase 등)을 불러오면 실패로 보고합니다. Supabase 접속 정보가 없는 환경 변수로 실행하므로
+import 시점에 저장소 클라이언트를 만드는 모듈은 ValueError로 실패합니다.
+
+사용 예:
+    python benchmarks/import_budget.py
+    python benchmarks/import_budget.py anomaly_detector sensor_emulator --repeat 5
+    python benchmarks/import_budget.py --output benchmarks/results/import_budget.json
+"""
+import os
+import sys
+import json
+import argparse
+import platform
+import subprocess
+from datetime import datetime, timezone
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 모듈 -> (누적 import 시간 예산(ms), import 시 로드되면 안 되는 모듈)
+BUDGETS = {
+    "metrics": (30, ("numpy", "pandas", "supabase", "dotenv")),
+    "alert_pipeline": (30, ("numpy", "pandas", "supabase", "dotenv")),
+    "storage": (30, ("numpy", "pandas", "supabase", "dotenv")),
+    "timeutil": (30, ("numpy", "pandas", "supabase", "dotenv")),
+    "anomaly_detector": (50, ("numpy", "pandas", "supabase", "dotenv")),
+    "sensor_emulator": (50, ("numpy", "pandas", "supabase", "dotenv")),
+    "realtime": (150, ("numpy", "pandas", "supabase", "dotenv")),
+    "predictive_engine": (250, ("pandas", "supabase", "dotenv", "sklearn")),
+    "parallel_engine": (300, ("pandas", "supabase", "dotenv", "sklearn")),
+    "replay": (300, ("pandas", "supabase", "dotenv")),
+    "async_runtime": (300, ("pandas", "supabase", "dotenv")),
+    "frame_ingest": (300, ("pandas", "supabase", "dotenv")),
+    "backtest": (700, ("supabase", "dotenv")),
+    "rollup": (700, ("supabase", "dotenv")),
+    "report_generator": (700, ("supabase", "dotenv")),
+}
+REPEAT = 3  # 모듈당 측정 횟수 (최솟값 사용)
+
+
+def measure(module):
+    """모듈을 새 프로세스에서 import하고 (누적 시간(ms), 로드된 최상위 모듈 집합, 오류 메시지)를 반환합니다."""
+    env = dict(os.environ, CMOS_STORAGE_BACKEND="supabase", NEXT_PUBLIC_SUPABASE_URL="", NEXT_PUBLIC_SUPABASE_ANON_KEY="")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=REPO_ROOT, env=env, capture_output=True, text=True,
+    )
+    cumulative_us, loaded, other = None, set(), []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            other.append(line)
+            continue
+        parts = line.split("|")
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        name = parts[2].strip()
+        loaded.add(name.split(".")[0])
+        if name == module:
+            cumulative_us = int(parts[1])
+    error = None
+    if result.returncode != 0:
+        error = other[-1] if other else f"exit code {result.returncode}"
+    return (None if cumulative_us is None else cumulative_us / 1000), loaded, error
+
+
+def check(modules, repeat=REPEAT):
+    results = []
+    for module in modules:
+        budget_ms, forbidden = BUDGETS.get(module, (None, ()))
+        timings, loaded, error = [], set(), None
+        for _ in range(repeat):
+            elapsed_ms, loaded, error = measure(module)
+            if error is not None:
+                break
+            timings.append(elapsed_ms)
+        elapsed_ms = min(timings) if timings else None
+        heavy = sorted(name for name in forbidden if name in loaded)
+        ok = error is None and not heavy and (budget_ms is None or elapsed_ms <= budget_ms)
+        results.append({
+            "module": module,
+            "import_ms": None if elapsed_ms is None else round(elapsed_ms, 1),
+            "budget_ms": budget_ms,
+            "forbidden_loaded": heavy,
+            "error": error,
+            "ok": ok,
+        })
+    return results
+
+
+def print_report(results):
+    print(f"{'모듈':<20} {'import(ms)':>10} {'예산(ms)':>9}  결과")
+    for r in results:
+        elapsed = "-" if r["import_ms"] is None else f"{r['import_ms']:.1f}"
+        budget = "-" if r["budget_ms"] is None else str(r["budget_ms"])
+        if r["error"]:
+            verdict = f"실패: {r['error']}"
+        elif r["forbidden_loaded"]:
+            verdict = f"실패: 무거운 의존성 로드 ({', '.join(r['forbidden_loaded'])})"
+        elif not r["ok"]:
+            verdict = "실패: 예산 초과"
+        else:
+            verdict = "통과"
+        print(f"{r['module']:<20} {elapsed:>10} {budget:>9}  {verdict}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="서비스 진입점 import 시간 예산 검사")
+    parser.add_argument("modules", nargs="*", help=f"검사할 모듈 (기본: {', '.join(BUDGETS)})")
+    parser.add_argument("--repeat", type=int, default=REPEAT, help="모듈당 측정 횟수 (최솟값 사용)")
+    parser.add_argument("--output", help="결과를 저장할 JSON 파일 경로")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    results = check(args.modules or list(BUDGETS), args.repeat)
+    print_report(results)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump({
+                "created_at": datetime.now(timezone.utc).isoformat(),
+                "python": platform.python_version(),
+                "results": results,
+            }, f, indent=2, ensure_ascii=False)
+    sys.exit(0 if all(r["ok"] for r in results) else 1)
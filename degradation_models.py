@@ -0,0 +1,462 @@
+import numpy as np
+
+from online_regression import grouped_moments, merge_moments
+from rolling_stats import (
+    CUSUM_SLACK, CUSUM_THRESHOLD, DRIFT_ALPHA, DRIFT_CLIP_SIGMA, DRIFT_MIN_SAMPLES, DRIFT_MIN_STD, DriftDetector,
+)
+
+# --- 열화 모델 설정 ---
+# (EWMA/CUSUM 드리프트 탐지 설정과 장치 1대용 DriftDetector는 NumPy 없이 쓰도록 rolling_stats에 있음)
+FLEET_DRIFT_MIN_DEVICES = 64    # 배치의 장치 수가 이보다 적으면 장치별 Python 루프로 처리 (단계당 NumPy 호출 비용 때문)
+
+# 1. 강건(robust) 추세 추정
+DECIMATED_CAPACITY = 64         # 장치별로 유지할 시간 구간(bin) 수 (2의 거듭제곱)
+DECIMATED_BIN_SECONDS = 3600    # 최초 bin 폭. 이력이 capacity개 bin을 넘으면 인접 bin을 합쳐 두 배로 늘림
+HUBER_DELTA = 1.345             # Huber 손실의 전환점 (강건 척도 단위, 정규분포에서 효율 95%)
+HUBER_MAX_ITER = 10             # IRLS 최대 반복 횟수
+HUBER_TOLERANCE = 1e-4          # 기울기의 상대 변화가 이보다 작으면 해당 장치는 반복 종료
+THEIL_SEN_ROW_CHUNK = 512       # 장치 여러 대를 한 번에 계산할 때 메모리를 제한하기 위한 행 묶음 크기
+TREND_MODELS = ("ols", "theil_sen", "huber")  # fit_trend()가 지원하는 추세 모델
+
+# 2. 온도-노이즈 지수 모델: noise = a * exp(b * (T - T_ref))
+REFERENCE_TEMPERATURE = 25.0    # 기준 온도 (sensor_emulator.base_temperature와 동일)
+
+
+class FleetDriftDetector:
+    """
+    DriftDetector와 같은 규칙을 장치 N대의 상태 배열에 한 번에 적용합니다.
+    한 단계(step)는 장치마다 샘플 1개를 NumPy 연산으로 반영하며, 장치별로 정렬된 배치는
+    장치 내 순번별로 단계를 나누어 처리하므로 반복 횟수는 장치 수가 아니라 장치당 샘플 수에 비례합니다.
+    """
+
+    _STATE_FIELDS = ("count", "mean", "var", "upper", "lower")
+
+    def __init__(self, n_series=0, alpha=DRIFT_ALPHA, min_samples=DRIFT_MIN_SAMPLES, clip_sigma=DRIFT_CLIP_SIGMA,
+                 min_std=DRIFT_MIN_STD, slack=CUSUM_SLACK, threshold=CUSUM_THRESHOLD):
+        self.alpha = alpha
+        self.min_samples = min_samples
+        self.clip_sigma = clip_sigma
+        self.min_std = min_std
+        self.slack = slack
+        self.threshold = threshold
+        self.count = np.zeros(n_series, dtype=np.int64)
+        self.mean = np.zeros(n_series)
+        self.var = np.zeros(n_series)
+        self.upper = np.zeros(n_series)
+        self.lower = np.zeros(n_series)
+
+    def __len__(self):
+        return len(self.count)
+
+    def resize(self, n_series):
+        """장치 수를 n_series로 늘립니다 (새 장치는 초기 상태)."""
+        extra = n_series - len(self)
+        if extra > 0:
+            for field in self._STATE_FIELDS:
+                current = getattr(self, field)
+                setattr(self, field, np.concatenate([current, np.zeros(extra, dtype=current.dtype)]))
+
+    @property
+    def std(self):
+        return np.maximum(np.sqrt(self.var), self.min_std)
+
+    def step(self, index, values):
+        """장치 index(중복 없음)에 값 1개씩을 반영하고 (z-점수, 드리프트 방향) 배열을 반환합니다."""
+        values = np.asarray(values, dtype=np.float64)
+        count = self.count[index] + 1
+        self.count[index] = count
+        mean, var = self.mean[index], self.var[index]
+        residual = values - mean
+
+        warming = count <= self.min_samples
+        std = np.maximum(np.sqrt(var), self.min_std)
+        z = np.where(warming, 0.0, residual / std)
+        upper = np.where(warming, 0.0, np.maximum(0.0, self.upper[index] + z - self.slack))
+        lower = np.where(warming, 0.0, np.maximum(0.0, self.lower[index] - z - self.slack))
+        direction = np.where(upper > self.threshold, 1, np.where(lower > self.threshold, -1, 0))
+        alarmed = direction != 0
+        self.upper[index] = np.where(alarmed, 0.0, upper)
+        self.lower[index] = np.where(alarmed, 0.0, lower)
+
+        weight = np.where(warming, np.maximum(self.alpha, 1.0 / count), self.alpha)
+        limit = np.where(warming, np.inf, self.clip_sigma * std)
+        residual = np.clip(residual, -limit, limit)
+        self.mean[index] = mean + weight * residual
+        self.var[index] = (1 - weight) * (var + weight * residual * residual)
+        return z, direction
+
+    def update(self, codes, values):
+        """
+        장치 코드 배열과 값 배열(장치 안에서는 시간순)을 반영하고, 입력 순서대로 (z-점수, 드리프트 방향)을 반환합니다.
+        """
+        codes = np.asarray(codes, dtype=np.int64)
+        values = np.asarray(values, dtype=np.float64)
+        if codes.size and codes.max() >= len(self):
+            self.resize(int(codes.max()) + 1)
+        z = np.zeros(len(codes))
+        direction = np.zeros(len(codes), dtype=np.int8)
+        if codes.size and len(np.unique(codes)) < FLEET_DRIFT_MIN_DEVICES:
+            self._update_scalar(codes, values, z, direction)
+            return z, direction
+        rank = _rank_within_group(codes)
+        order = np.argsort(rank, kind="stable")
+        boundaries = np.searchsorted(rank[order], np.arange(rank.max() + 2 if rank.size else 0))
+        for start, stop in zip(boundaries[:-1], boundaries[1:]):
+            rows = order[start:stop]
+            z[rows], direction[rows] = self.step(codes[rows], values[rows])
+        return z, direction
+
+
+    def _update_scalar(self, codes, values, z, direction):
+        """장치 수가 적으면 단계별 NumPy 연산보다 장치별 DriftDetector 루프가 빠름 (같은 규칙)."""
+        for code in np.unique(codes).tolist():
+            rows = np.flatnonzero(codes == code)
+            detector = DriftDetector(self.alpha, self.min_samples, self.clip_sigma, self.min_std, self.slack, self.threshold)
+            for field in self._STATE_FIELDS:
+                setattr(detector, field, getattr(self, field)[code].item())
+            results = [detector.update(value) for value in values[rows].tolist()]
+            z[rows] = [result[0] for result in results]
+            direction[rows] = [result[1] for result in results]
+            for field in self._STATE_FIELDS:
+                getattr(self, field)[code] = getattr(detector, field)
+
+
+def _rank_within_group(codes):
+    """각 원소가 같은 코드 안에서 몇 번째로 등장했는지 (0부터, 입력 순서 기준)."""
+    if codes.size == 0:
+        return np.zeros(0, dtype=np.int64)
+    order = np.argsort(codes, kind="stable")
+    sorted_codes = codes[order]
+    starts = np.r_[0, np.flatnonzero(sorted_codes[1:] != sorted_codes[:-1]) + 1]
+    group_start = np.repeat(starts, np.diff(np.r_[starts, len(codes)]))
+    rank = np.empty(len(codes), dtype=np.int64)
+    rank[order] = np.arange(len(codes)) - group_start
+    return rank
+
+
+class DecimatedSeries:
+    """
+    장치별 (시각, 값) 시계열을 최대 capacity개의 등간격 시간 구간(bin)으로 요약하여 증분 유지합니다.
+    bin마다 (샘플 수, 시각 합, 값 합)만 저장하고, 이력이 capacity개 bin을 넘으면 인접 bin을 합쳐 폭을 두 배로 늘리므로
+    메모리는 이력 길이와 무관합니다. 강건 추세 추정(Theil-Sen, Huber)은 원본 대신 bin 평균점 위에서 수행합니다.
+    시각은 장치별 원점(origin, 첫 샘플 시각)으로부터의 경과 초입니다.
+    """
+
+    def __init__(self, n_series=0, capacity=DECIMATED_CAPACITY, bin_seconds=DECIMATED_BIN_SECONDS):
+        if capacity & (capacity - 1):
+            raise ValueError("capacity는 2의 거듭제곱이어야 합니다.")
+        self.capacity = capacity
+        self.initial_bin_seconds = float(bin_seconds)
+        self.origin = np.full(n_series, np.nan)
+        self.last_x = np.full(n_series, -np.inf)
+        self.bin_seconds = np.full(n_series, float(bin_seconds))
+        self.counts = np.zeros((n_series, capacity))
+        self.sum_x = np.zeros((n_series, capacity))
+        self.sum_y = np.zeros((n_series, capacity))
+
+    def __len__(self):
+        return len(self.origin)
+
+    def resize(self, n_series):
+        extra = n_series - len(self)
+        if extra <= 0:
+            return
+        self.origin = np.r_[self.origin, np.full(extra, np.nan)]
+        self.last_x = np.r_[self.last_x, np.full(extra, -np.inf)]
+        self.bin_seconds = np.r_[self.bin_seconds, np.full(extra, self.initial_bin_seconds)]
+        for field in ("counts", "sum_x", "sum_y"):
+            setattr(self, field, np.vstack([getattr(self, field), np.zeros((extra, self.capacity))]))
+
+    def _widen(self, rows, shifts):
+        """rows 장치의 bin 폭을 2**shifts배로 늘리고 기존 bin을 합칩니다."""
+        capacity = self.capacity
+        target = (np.arange(capacity)[None, :] >> shifts[:, None]) + (np.arange(len(rows)) * capacity)[:, None]
+        for field in ("counts", "sum_x", "sum_y"):
+            merged = np.bincount(target.ravel(), weights=getattr(self, field)[rows].ravel(), minlength=len(rows) * capacity)
+            getattr(self, field)[rows] = merged.reshape(len(rows), capacity)
+        self.bin_seconds[rows] *= 2.0 ** shifts
+
+    def reindex(self, positions, n_series):
+        """기존 장치 i를 positions[i] 행으로 옮긴 n_series대 크기의 새 시계열을 반환합니다 (장치 ID 합집합 정렬용)."""
+        series = DecimatedSeries(n_series, self.capacity, self.initial_bin_seconds)
+        for field in ("origin", "last_x", "bin_seconds", "counts", "sum_x", "sum_y"):
+            getattr(series, field)[positions] = getattr(self, field)
+        return series
+
+    def extend(self, codes, epochs, values, counts=None):
+        """
+        장치 코드, epoch 초, 값 배열을 반영합니다. 정렬되어 있지 않아도 되며 NaN 값은 무시합니다.
+        counts를 주면 각 점을 해당 개수의 샘플(예: 롤업 버킷의 평균)로 취급합니다.
+        """
+        codes = np.asarray(codes, dtype=np.int64)
+        epochs = np.asarray(epochs, dtype=np.float64)
+        values = np.asarray(values, dtype=np.float64)
+        if counts is not None:
+            counts = np.asarray(counts, dtype=np.float64)
+        valid = np.isfinite(values) & np.isfinite(epochs)
+        if not valid.all():
+            codes, epochs, values = codes[valid], epochs[valid], values[valid]
+            counts = None if counts is None else counts[valid]
+        if codes.size == 0:
+            return
+        n = max(len(self), int(codes.max()) + 1)
+        self.resize(n)
+
+        first = np.full(n, np.inf)
+        np.minimum.at(first, codes, epochs)
+        new = np.isnan(self.origin) & np.isfinite(first)
+        self.origin[new] = first[new]
+
+        x = epochs - self.origin[codes]
+        newest = np.full(n, -np.inf)
+        np.maximum.at(newest, codes, x)
+        self.last_x = np.maximum(self.last_x, newest)
+
+        # 새 샘플까지 capacity개 bin에 들어가도록 필요한 만큼 bin 폭을 두 배씩 늘림
+        needed = np.where(np.isfinite(self.last_x), self.last_x / (self.bin_seconds * self.capacity), 0.0)
+        shifts = np.where(needed >= 1, np.floor(np.log2(np.maximum(needed, 1))) + 1, 0).astype(np.int64)
+        rows = np.flatnonzero(shifts)
+        if rows.size:
+            self._widen(rows, np.minimum(shifts[rows], 62))
+
+        bins = np.clip((x * (1.0 / self.bin_seconds)[codes]).astype(np.int64), 0, self.capacity - 1)
+        flat = codes * self.capacity + bins
+        size = n * self.capacity
+        if counts is not None:
+            x, values = counts * x, counts * values
+        self.counts += np.bincount(flat, weights=counts, minlength=size).reshape(n, self.capacity)
+        self.sum_x += np.bincount(flat, weights=x, minlength=size).reshape(n, self.capacity)
+        self.sum_y += np.bincount(flat, weights=values, minlength=size).reshape(n, self.capacity)
+
+    def points(self, rows=None):
+        """bin 평균점 (x, y, 샘플 수) 2차원 배열을 반환합니다. 빈 bin은 NaN/0입니다."""
+        counts = self.counts if rows is None else self.counts[rows]
+        sum_x = self.sum_x if rows is None else self.sum_x[rows]
+        sum_y = self.sum_y if rows is None else self.sum_y[rows]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return sum_x / counts, sum_y / counts, counts
+
+    def to_dict(self, row):
+        """장치 1대의 상태를 JSON으로 저장할 수 있는 dict로 변환합니다 (비어 있는 bin 제외)."""
+        used = np.flatnonzero(self.counts[row])
+        return {
+            "origin": float(self.origin[row]),
+            "last_x": float(self.last_x[row]),
+            "bin_seconds": float(self.bin_seconds[row]),
+            "bins": used.tolist(),
+            "counts": self.counts[row, used].tolist(),
+            "sum_x": self.sum_x[row, used].tolist(),
+            "sum_y": self.sum_y[row, used].tolist(),
+        }
+
+    @classmethod
+    def from_dict(cls, state, capacity=DECIMATED_CAPACITY):
+        series = cls(1, capacity)
+        series.origin[0] = state["origin"]
+        series.last_x[0] = state["last_x"]
+        series.bin_seconds[0] = state["bin_seconds"]
+        bins = np.asarray(state["bins"], dtype=np.int64)
+        series.counts[0, bins] = state["counts"]
+        series.sum_x[0, bins] = state["sum_x"]
+        series.sum_y[0, bins] = state["sum_y"]
+        return series
+
+    def state_arrays(self, prefix):
+        """np.savez로 저장할 배열 dict (플릿 상태 파일용)."""
+        return {f"{prefix}_{field}": getattr(self, field)
+                for field in ("origin", "last_x", "bin_seconds", "counts", "sum_x", "sum_y")}
+
+    @classmethod
+    def from_arrays(cls, arrays, prefix):
+        counts = arrays[f"{prefix}_counts"]
+        series = cls(counts.shape[0], counts.shape[1])
+        for field in ("origin", "last_x", "bin_seconds", "counts", "sum_x", "sum_y"):
+            setattr(series, field, np.array(arrays[f"{prefix}_{field}"], dtype=np.float64))
+        return series
+
+
+def _row_median(values, valid):
+    """행마다 valid인 값들의 중앙값 (valid가 없으면 NaN). 유효 개수가 같은 행끼리 묶어 np.partition으로 계산합니다."""
+    n_rows = values.shape[0]
+    result = np.full(n_rows, np.nan)
+    filled = np.where(valid, values, np.inf)
+    sizes = valid.sum(axis=1)
+    for size in np.unique(sizes):
+        if size == 0:
+            continue
+        rows = np.flatnonzero(sizes == size)
+        lower, upper = (size - 1) // 2, size // 2
+        part = np.partition(filled[rows], (lower, upper) if lower != upper else lower, axis=1)
+        result[rows] = 0.5 * (part[:, lower] + part[:, upper])
+    return result
+
+
+def theil_sen_rows(x, y, valid=None, row_chunk=THEIL_SEN_ROW_CHUNK):
+    """
+    행(장치)마다 Theil-Sen 직선 (기울기 = 모든 점 쌍 기울기의 중앙값, 절편 = y - 기울기·x의 중앙값)을 적합합니다.
+    x, y는 (장치 수, 점 수) 배열이며, 점 수가 작도록(예: DecimatedSeries의 bin) 솎아낸 표본에 사용합니다.
+    (기울기, 절편) 배열을 반환합니다.
+    """
+    x = np.atleast_2d(x)
+    y = np.atleast_2d(y)
+    if valid is None:
+        valid = np.isfinite(x) & np.isfinite(y)
+    n_rows, n_points = x.shape
+    first, second = np.triu_indices(n_points, 1)
+    slope = np.full(n_rows, np.nan)
+    for start in range(0, n_rows, row_chunk):
+        rows = slice(start, start + row_chunk)
+        dx = x[rows][:, second] - x[rows][:, first]
+        dy = y[rows][:, second] - y[rows][:, first]
+        pair_valid = valid[rows][:, first] & valid[rows][:, second] & (dx != 0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            slope[rows] = _row_median(dy / dx, pair_valid)
+    with np.errstate(invalid="ignore"):
+        intercept = _row_median(y - slope[:, None] * x, valid & np.isfinite(slope)[:, None])
+    return slope, intercept
+
+
+def huber_rows(x, y, weights=None, delta=HUBER_DELTA, max_iter=HUBER_MAX_ITER, tolerance=HUBER_TOLERANCE):
+    """
+    행(장치)마다 Huber 손실 직선 회귀를 IRLS(반복 재가중 최소자승)로 적합합니다.
+    잔차 척도는 매 반복의 MAD(중앙 절대 편차)로 추정하며, 척도의 delta배를 넘는 잔차는 가중치를 줄입니다.
+    weights는 점별 기본 가중치(예: bin 샘플 수)이며, 수렴한 행은 다음 반복부터 제외합니다.
+    (기울기, 절편) 배열을 반환합니다. max_iter=1이면 가중 최소자승(OLS)과 같습니다.
+    """
+    x = np.atleast_2d(np.asarray(x, dtype=np.float64))
+    y = np.atleast_2d(np.asarray(y, dtype=np.float64))
+    valid = np.isfinite(x) & np.isfinite(y)
+    base = np.where(valid, 1.0 if weights is None else np.atleast_2d(weights), 0.0)
+    x = np.where(valid, x, 0.0)
+    y = np.where(valid, y, 0.0)
+    slope = np.full(x.shape[0], np.nan)
+    intercept = np.full(x.shape[0], np.nan)
+    rows = np.arange(x.shape[0])
+    w = base
+    for iteration in range(max_iter):
+        xr, yr, vr = x[rows], y[rows], valid[rows]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            total = w.sum(axis=1)
+            mean_x = (w * xr).sum(axis=1) / total
+            mean_y = (w * yr).sum(axis=1) / total
+            dx = xr - mean_x[:, None]
+            var_x = (w * dx * dx).sum(axis=1)
+            new_slope = np.where(var_x > 0, (w * dx * (yr - mean_y[:, None])).sum(axis=1) / var_x, np.nan)
+            new_intercept = mean_y - new_slope * mean_x
+            converged = np.abs(new_slope - slope[rows]) <= tolerance * np.abs(new_slope)
+        slope[rows] = new_slope
+        intercept[rows] = new_intercept
+        if iteration == max_iter - 1:
+            break
+
+        # 수렴했거나 기울기를 구할 수 없는 행은 제외
+        keep = ~converged & np.isfinite(new_slope)
+        rows, xr, yr, vr = rows[keep], xr[keep], yr[keep], vr[keep]
+        if rows.size == 0:
+            break
+        residual = np.abs(yr - (new_intercept[keep][:, None] + new_slope[keep][:, None] * xr))
+        scale = 1.4826 * _row_median(residual, vr)
+        base_rows = base[rows]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            limit = delta * scale[:, None]
+            w = np.where(residual <= limit, base_rows, base_rows * limit / residual)
+        # 잔차가 모두 0(완전한 직선)이면 척도가 0이 되므로 기본 가중치 유지
+        w = np.where(vr & np.isfinite(w) & (scale > 0)[:, None], w, np.where((scale > 0)[:, None], 0.0, base_rows))
+    return slope, intercept
+
+
+def fit_trend(series, method, rows=None):
+    """DecimatedSeries의 bin 평균점에 method("ols", "theil_sen", "huber") 직선을 적합하고 (기울기, 절편)을 반환합니다."""
+    x, y, counts = series.points(rows)
+    if method == "theil_sen":
+        return theil_sen_rows(x, y)
+    if method == "huber":
+        return huber_rows(x, y, counts)
+    if method == "ols":
+        return huber_rows(x, y, counts, max_iter=1)
+    raise ValueError(f"알 수 없는 추세 모델입니다: {method}")
+
+
+class TemperatureNoiseModel:
+    """
+    장치별 온도-노이즈 지수 모델 noise = a * exp(b * (T - T_ref))를 증분으로 적합합니다.
+    log(noise)와 (T - T_ref)의 가중 선형 회귀이므로 장치별 (가중치 합, 평균, 공분산/분산 누적합)만 유지하고,
+    새 배치는 grouped_moments로 장치 전체를 한 번에 병합합니다. 에뮬레이터 모델에서는 a≈0.5, b≈0.08입니다.
+    """
+
+    _FIELDS = ("weight", "mean_x", "mean_y", "cov_xy", "var_x")
+
+    def __init__(self, n_series=0, reference_temperature=REFERENCE_TEMPERATURE):
+        self.reference_temperature = reference_temperature
+        for field in self._FIELDS:
+            setattr(self, field, np.zeros(n_series))
+
+    def __len__(self):
+        return len(self.weight)
+
+    def resize(self, n_series):
+        extra = n_series - len(self)
+        if extra > 0:
+            for field in self._FIELDS:
+                setattr(self, field, np.r_[getattr(self, field), np.zeros(extra)])
+
+    def reindex(self, positions, n_series):
+        """기존 장치 i를 positions[i] 행으로 옮긴 n_series대 크기의 새 모델을 반환합니다."""
+        model = TemperatureNoiseModel(n_series, self.reference_temperature)
+        for field in self._FIELDS:
+            getattr(model, field)[positions] = getattr(self, field)
+        return model
+
+    def state_arrays(self, prefix):
+        return {f"{prefix}_{field}": getattr(self, field) for field in self._FIELDS}
+
+    @classmethod
+    def from_arrays(cls, arrays, prefix):
+        model = cls()
+        for field in cls._FIELDS:
+            setattr(model, field, np.array(arrays[f"{prefix}_{field}"], dtype=np.float64))
+        return model
+
+    def update(self, codes, temperature, noise):
+        """장치 코드, 온도, 노이즈 배열을 반영합니다. 노이즈가 0 이하이거나 값이 없는 샘플은 제외합니다."""
+        codes = np.asarray(codes, dtype=np.int64)
+        temperature = np.asarray(temperature, dtype=np.float64)
+        noise = np.asarray(noise, dtype=np.float64)
+        with np.errstate(invalid="ignore"):
+            valid = np.isfinite(temperature) & (noise > 0)
+        if not valid.all():
+            codes, temperature, noise = codes[valid], temperature[valid], noise[valid]
+        if codes.size == 0:
+            return
+        n = max(len(self), int(codes.max()) + 1)
+        self.resize(n)
+        # 가산 잡음을 가정하면 log(noise)의 분산은 1/noise²에 비례하므로 noise²로 가중 (노이즈가 작은 구간의 과대 영향 방지)
+        batch = grouped_moments(codes, n, temperature - self.reference_temperature, np.log(noise), noise * noise)
+        current = tuple(getattr(self, field) for field in self._FIELDS)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            merged = merge_moments(current, batch)
+        has_new = batch[0] > 0
+        for field, old, new in zip(self._FIELDS, current, merged):
+            setattr(self, field, np.where(has_new, new, old))
+
+    @property
+    def exponent(self):
+        """b (°C당 로그 노이즈 증가율)."""
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(self.var_x > 0, self.cov_xy / self.var_x, np.nan)
+
+    @property
+    def amplitude(self):
+        """a (기준 온도에서의 노이즈)."""
+        return np.exp(self.mean_y - self.exponent * self.mean_x)
+
+    def predict(self, codes, temperature):
+        """장치별 모델로 온도에서 기대되는 노이즈를 계산합니다."""
+        codes = np.asarray(codes, dtype=np.int64)
+        return self.amplitude[codes] * np.exp(self.exponent[codes] * (np.asarray(temperature) - self.reference_temperature))
+
+    def temperature_at(self, noise_level):
+        """노이즈가 noise_level에 도달하는 온도 (장치별). 온도에 따라 노이즈가 증가하지 않으면 NaN."""
+        b = self.exponent
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(b > 0, self.reference_temperature + np.log(noise_level / self.amplitude) / b, np.nan)
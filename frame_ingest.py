@@ -0,0 +1,247 @@
+import os
+import mmap
+import time
+import argparse
+from datetime import datetime
+
+import numpy as np
+
+from anomaly_detector import SIGMA_FACTOR, backend
+from sensor_emulator import get_health_status
+
+# --- 다크/플랫 프레임 분석 설정 ---
+CHUNK_BYTES = 32 * 1024 * 1024  # 청크 하나를 처리할 때 사용할 최대 작업 메모리 (float64 누적/임시 배열 기준)
+MAX_DEFECT_COORDINATES = 1000   # 로그에 기록할 결함 종류별 최대 좌표 수 (편차가 큰 순)
+DEFAULT_DTYPE = "<u2"           # 16비트 little-endian RAW
+
+
+def open_frame_stack(path, width=None, height=None, dtype=DEFAULT_DTYPE, header_bytes=0):
+    """
+    프레임 스택 파일을 복사 없이 (frames, height, width) 형태의 읽기 전용 memmap으로 엽니다.
+    .npy 파일은 저장된 shape를 사용하고, RAW 파일은 width/height와 파일 크기로 프레임 수를 계산합니다.
+    """
+    if path.endswith(".npy"):
+        stack = np.load(path, mmap_mode="r")
+        if stack.ndim == 2:
+            stack = stack[np.newaxis]
+        if stack.ndim != 3:
+            raise ValueError(f"프레임 스택은 (frames, height, width) 형태여야 합니다: {stack.shape}")
+        return stack
+
+    if not width or not height:
+        raise ValueError("RAW 프레임 파일은 width와 height를 지정해야 합니다.")
+    frame_bytes = width * height * np.dtype(dtype).itemsize
+    data_bytes = os.path.getsize(path) - header_bytes
+    if data_bytes <= 0 or data_bytes % frame_bytes:
+        raise ValueError(f"파일 크기({data_bytes}바이트)가 프레임 크기({frame_bytes}바이트)의 배수가 아닙니다: {path}")
+    return np.memmap(path, dtype=dtype, mode="r", offset=header_bytes, shape=(data_bytes // frame_bytes, height, width))
+
+
+def rows_per_chunk(stack, chunk_bytes=CHUNK_BYTES):
+    """작업 메모리(float64 누적/임시 배열)가 chunk_bytes를 넘지 않도록 한 번에 처리할 행(row) 수를 정합니다."""
+    frames, _, width = stack.shape
+    # 정수 RAW는 합/제곱합/임시 배열 3개, 실수 입력은 np.var가 청크 전체 크기의 임시 배열을 만듦
+    arrays = 3 if np.issubdtype(stack.dtype, np.integer) else frames + 2
+    return max(1, chunk_bytes // (arrays * width * 8))
+
+
+def _release_pages(stack, start, stop, frames=None):
+    """
+    처리가 끝난 행 구간의 memmap 페이지를 해제합니다 (파일 내용은 페이지 캐시에 남음).
+    해제하지 않으면 읽은 페이지가 모두 RSS로 잡혀 스택 파일 크기만큼 메모리 사용량이 커집니다.
+    """
+    mm = getattr(stack, "_mmap", None)
+    if mm is None or not hasattr(mm, "madvise") or not stack.flags.c_contiguous:
+        return
+    _, height, width = stack.shape
+    row_bytes = width * stack.itemsize
+    frame_bytes = height * row_bytes
+    base = stack.offset % mmap.ALLOCATIONGRANULARITY  # mmap 시작 위치 기준 배열의 위치
+    for frame in range(stack.shape[0]) if frames is None else frames:
+        begin = base + frame * frame_bytes + start * row_bytes
+        end = base + frame * frame_bytes + min(stop, height) * row_bytes
+        begin -= begin % mmap.PAGESIZE
+        mm.madvise(mmap.MADV_DONTNEED, begin, end - begin)
+
+
+def pixel_statistics(stack, chunk_bytes=CHUNK_BYTES):
+    """
+    프레임 스택의 픽셀별 시간 평균과 분산(ddof=1)을 (height, width) float32 배열로 계산합니다.
+    행 단위 청크로 나누어 처리하므로 메모리 사용량은 청크 크기와 결과 배열로 제한됩니다.
+    정수 RAW는 프레임별 합/제곱합을 float64로 누적하며, 16비트 값에서는 오차 없이 계산됩니다.
+    """
+    frames, height, width = stack.shape
+    mean = np.empty((height, width), dtype=np.float32)
+    var = np.zeros((height, width), dtype=np.float32)
+    step = rows_per_chunk(stack, chunk_bytes)
+    integer_input = np.issubdtype(stack.dtype, np.integer)
+    for start in range(0, height, step):
+        block = stack[:, start:start + step]  # memmap 뷰 (복사 없음)
+        if integer_input:
+            total = np.zeros(block.shape[1:], dtype=np.float64)
+            squares = np.zeros(block.shape[1:], dtype=np.float64)
+            tmp = np.empty(block.shape[1:], dtype=np.float64)
+            for index, frame in enumerate(block):
+                np.add(total, frame, out=total)
+                np.multiply(frame, frame, out=tmp, dtype=np.float64)
+                squares += tmp
+                _release_pages(stack, start, start + step, frames=(index,))
+            block_mean = total / frames
+            mean[start:start + step] = block_mean
+            if frames > 1:
+                var[start:start + step] = (squares - total * block_mean) / (frames - 1)
+        else:
+            mean[start:start + step] = block.mean(axis=0, dtype=np.float64)
+            if frames > 1:
+                var[start:start + step] = block.var(axis=0, dtype=np.float64, ddof=1)
+            _release_pages(stack, start, start + step)
+    return mean, var
+
+
+def _coordinates(mask, deviation, limit=MAX_DEFECT_COORDINATES):
+    """결함 마스크에서 편차가 큰 순으로 최대 limit개의 [x, y] 좌표를 뽑습니다."""
+    ys, xs = np.nonzero(mask)
+    if len(ys) > limit:
+        worst = np.argpartition(-np.abs(deviation[ys, xs]), limit - 1)[:limit]
+        ys, xs = ys[worst], xs[worst]
+    order = np.lexsort((xs, ys))
+    return np.column_stack((xs[order], ys[order])).tolist()
+
+
+def classify_pixels(mean, kind, sigma_factor=SIGMA_FACTOR):
+    """
+    픽셀별 평균 맵에 3-Sigma 규칙을 적용하여 결함 픽셀을 찾습니다.
+    - 다크 프레임(kind="dark"): 전체 평균 + sigma_factor·표준편차를 넘는 픽셀을 Hot Pixel로 분류
+    - 플랫 프레임(kind="flat"): 전체 평균 - sigma_factor·표준편차보다 낮은 픽셀을 Dead Pixel로 분류
+    (결함 마스크, 편차 맵, 전체 평균, 전체 표준편차)를 반환합니다.
+    """
+    global_mean = float(mean.mean(dtype=np.float64))
+    global_std = float(mean.std(dtype=np.float64))
+    deviation = mean - np.float32(global_mean)
+    if kind == "dark":
+        mask = deviation > sigma_factor * global_std
+    elif kind == "flat":
+        mask = deviation < -sigma_factor * global_std
+    else:
+        raise ValueError(f"알 수 없는 프레임 종류입니다: {kind}")
+    return mask, deviation, global_mean, global_std
+
+
+def analyze_frame_stack(stack, kind, sigma_factor=SIGMA_FACTOR, chunk_bytes=CHUNK_BYTES):
+    """프레임 스택 하나의 픽셀 통계와 결함 픽셀 목록을 계산합니다."""
+    started = time.perf_counter()
+    mean, var = pixel_statistics(stack, chunk_bytes)
+    mask, deviation, global_mean, global_std = classify_pixels(mean, kind, sigma_factor)
+    elapsed = time.perf_counter() - started
+    return {
+        "kind": kind,
+        "frames": stack.shape[0],
+        "height": stack.shape[1],
+        "width": stack.shape[2],
+        "defect_count": int(np.count_nonzero(mask)),
+        "coordinates": _coordinates(mask, deviation),
+        "global_mean": round(global_mean, 3),
+        "global_std": round(global_std, 3),
+        "temporal_noise": round(float(np.sqrt(np.median(var))), 3),  # 픽셀별 시간 표준편차의 중앙값 (DN)
+        "seconds": elapsed,
+        "mb_per_second": stack.nbytes / (1024 * 1024) / max(elapsed, 1e-9),
+    }
+
+
+def _latest_log(device_id):
+    rows = backend.select_logs(device_id=device_id, columns="temperature, noise_level, dead_pixel_count",
+                               descending=True, limit=1)
+    return rows[0] if rows else {}
+
+
+def ingest_calibration_frames(device_id, dark_path=None, flat_path=None, width=None, height=None,
+                              dtype=DEFAULT_DTYPE, header_bytes=0, temperature=None, noise_level=None,
+                              sigma_factor=SIGMA_FACTOR, chunk_bytes=CHUNK_BYTES):
+    """
+    다크/플랫 프레임 스택을 분석하여 Hot/Dead Pixel 수와 결함 좌표를 sensor_health_logs에 기록합니다.
+    촬영 시점의 온도/노이즈가 주어지지 않으면 장치의 최근 로그 값을 사용하여 시계열이 끊기지 않게 합니다.
+    기록한 로그 행을 반환합니다.
+    """
+    if dark_path is None and flat_path is None:
+        raise ValueError("다크 프레임 또는 플랫 프레임 중 하나 이상이 필요합니다.")
+
+    results = {}
+    for kind, path in (("dark", dark_path), ("flat", flat_path)):
+        if path is None:
+            continue
+        stack = open_frame_stack(path, width, height, dtype, header_bytes)
+        results[kind] = analyze_frame_stack(stack, kind, sigma_factor, chunk_bytes)
+        r = results[kind]
+        print(f"[{kind}] {r['frames']}프레임 {r['width']}x{r['height']}: 결함 {r['defect_count']}개, "
+              f"{r['seconds']:.2f}초 ({r['mb_per_second']:,.0f} MB/s)")
+
+    latest = _latest_log(device_id)
+    if temperature is None:
+        temperature = latest.get("temperature")
+    if noise_level is None:
+        noise_level = latest.get("noise_level")
+    # 플랫 프레임이 없으면 Dead Pixel 수는 측정할 수 없으므로 최근 값을 유지
+    dead_pixel_count = results["flat"]["defect_count"] if "flat" in results else latest.get("dead_pixel_count")
+    hot_pixel_count = results["dark"]["defect_count"] if "dark" in results else None
+
+    any_result = next(iter(results.values()))
+    row = {
+        "device_id": device_id,
+        "log_timestamp": datetime.utcnow().isoformat(),
+        "temperature": temperature,
+        "noise_level": noise_level,
+        "dead_pixel_count": dead_pixel_count,
+        "hot_pixel_count": hot_pixel_count,
+        "defect_pixels": {
+            "width": any_result["width"],
+            "height": any_result["height"],
+            "hot": results["dark"]["coordinates"] if "dark" in results else [],
+            "dead": results["flat"]["coordinates"] if "flat" in results else [],
+        },
+    }
+    if None not in (temperature, noise_level, dead_pixel_count):
+        row["status"] = get_health_status(temperature, noise_level, dead_pixel_count)
+    backend.insert_logs([row])
+    print(f"[{datetime.now()}] 장치 {device_id}: Hot Pixel {hot_pixel_count}개, Dead Pixel {dead_pixel_count}개를 기록했습니다.")
+    return row
+
+
+def write_synthetic_stack(path, frames, height, width, kind="dark", defect_fraction=1e-4, seed=0):
+    """
+    테스트/벤치마크용 합성 프레임 스택을 RAW(16비트) 파일로 씁니다. 프레임 단위로 기록하므로 메모리 사용량이 작습니다.
+    결함 픽셀의 (y, x) 좌표 배열을 반환합니다.
+    """
+    rng = np.random.default_rng(seed)
+    level, noise = (64.0, 4.0) if kind == "dark" else (2000.0, 30.0)
+    n_defects = max(1, int(height * width * defect_fraction))
+    ys = rng.integers(0, height, n_defects)
+    xs = rng.integers(0, width, n_defects)
+    offset = 800.0 if kind == "dark" else -1900.0
+    with open(path, "wb") as f:
+        for _ in range(frames):
+            frame = rng.normal(level, noise, (height, width)).astype(np.float32)
+            frame[ys, xs] += offset
+            np.clip(frame, 0, 65535, out=frame).astype(DEFAULT_DTYPE).tofile(f)
+    return ys, xs
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="다크/플랫 프레임 기반 Hot/Dead Pixel 분석 및 로그 적재")
+    parser.add_argument("--device-id", type=int, required=True, help="프레임을 촬영한 장치 ID")
+    parser.add_argument("--dark", help="다크 프레임 스택 파일 (.raw 또는 .npy)")
+    parser.add_argument("--flat", help="플랫 프레임 스택 파일 (.raw 또는 .npy)")
+    parser.add_argument("--width", type=int, help="RAW 프레임 가로 픽셀 수")
+    parser.add_argument("--height", type=int, help="RAW 프레임 세로 픽셀 수")
+    parser.add_argument("--dtype", default=DEFAULT_DTYPE, help="RAW 픽셀 자료형 (기본값: <u2, 16비트)")
+    parser.add_argument("--header-bytes", type=int, default=0, help="RAW 파일 앞부분의 헤더 크기(바이트)")
+    parser.add_argument("--temperature", type=float, help="촬영 시점의 센서 온도 (미지정 시 최근 로그 값)")
+    parser.add_argument("--chunk-mb", type=int, default=CHUNK_BYTES // (1024 * 1024), help="청크 작업 메모리(MB)")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    ingest_calibration_frames(
+        args.device_id, args.dark, args.flat, args.width, args.height, args.dtype, args.header_bytes,
+        temperature=args.temperature, chunk_bytes=args.chunk_mb * 1024 * 1024,
+    )
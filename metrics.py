@@ -0,0 +1,481 @@
+import os
+import sys
+import time
+import threading
+from functools import wraps
+from bisect import bisect_left
+from collections import Counter as _StackCounter
+
+# --- 계측(Instrumentation) 설정 ---
+# 단계별 소요 시간 히스토그램 구간 (초). 0.5ms ~ 60초
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+METRICS_HOST = "127.0.0.1"            # 메트릭 엔드포인트는 기본적으로 로컬에서만 접근 가능
+PROFILER_INTERVAL_SECONDS = 0.01      # 샘플링 프로파일러 기본 간격 (100Hz)
+PROFILER_MIN_INTERVAL_SECONDS = 0.001  # 최소 간격 (이보다 짧으면 샘플링 스레드가 CPU를 계속 점유)
+PROFILER_MAX_DEPTH = 64               # 스택 샘플당 기록할 최대 프레임 수
+PROFILER_MAX_STACKS = 20000           # 서로 다른 스택 최대 개수 (넘으면 새 스택은 "(기타)"로 합침)
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for _, v in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value)
+
+
+class _Metric:
+    """레이블별 하위 시계열(child)을 가진 메트릭의 공통 부분. 레이블이 없으면 메트릭 자체에 바로 기록합니다."""
+
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._children = {}
+        if not self.labelnames:
+            self._default = self._children[()] = self._new_child()
+
+    def labels(self, *values):
+        """레이블 값에 해당하는 하위 시계열을 반환합니다. 자주 쓰는 조합은 반환값을 보관해 두고 재사용하세요."""
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"{self.name}: 레이블 수가 맞지 않습니다 ({self.labelnames}).")
+        key = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for key, child in sorted(self._children.items()):
+            lines.extend(child.render(self.name, self.labelnames, key))
+        return lines
+
+
+class _CounterChild:
+    __slots__ = ("_lock", "value")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0.0
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def render(self, name, labelnames, key):
+        return [f"{name}{_format_labels(labelnames, key)} {_format_value(self.value)}"]
+
+
+class Counter(_Metric):
+    """단조 증가 카운터 (처리 행 수, 오류 수, 쿨다운으로 버린 경고 수 등)."""
+
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount=1):
+        self._default.inc(amount)
+
+
+class _GaugeChild:
+    __slots__ = ("_lock", "value", "_function")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0.0
+        self._function = None
+
+    def set(self, value):
+        self.value = value
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount=1):
+        self.inc(-amount)
+
+    def set_function(self, fn):
+        """수집(scrape) 시점에 fn()을 호출해 값을 읽습니다. 큐 길이처럼 이미 다른 곳에 있는 값을 비용 없이 노출할 때 사용합니다."""
+        self._function = fn
+
+    def render(self, name, labelnames, key):
+        value = self.value
+        if self._function is not None:
+            try:
+                value = float(self._function())
+            except Exception:
+                value = float("nan")
+        return [f"{name}{_format_labels(labelnames, key)} {_format_value(value)}"]
+
+
+class Gauge(_Metric):
+    """현재 값 (큐/버퍼 길이, 진행 중인 요청 수 등)."""
+
+    kind = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value):
+        self._default.set(value)
+
+    def inc(self, amount=1):
+        self._default.inc(amount)
+
+    def dec(self, amount=1):
+        self._default.dec(amount)
+
+    def set_function(self, fn):
+        self._default.set_function(fn)
+
+
+class _Timer:
+    """with 블록(또는 데코레이터) 실행 시간을 히스토그램에 기록합니다."""
+
+    __slots__ = ("_child", "_started")
+
+    def __init__(self, child):
+        self._child = child
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._child.observe(time.perf_counter() - self._started)
+        return False
+
+    def __call__(self, fn):
+        child = self._child
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                child.observe(time.perf_counter() - started)
+
+        return wrapper
+
+
+class _HistogramChild:
+    __slots__ = ("_lock", "_bounds", "_counts", "sum", "count")
+
+    def __init__(self, bounds):
+        self._lock = threading.Lock()
+        self._bounds = bounds
+        self._counts = [0] * (len(bounds) + 1)  # 마지막 칸은 +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        index = bisect_left(self._bounds, value)
+        with self._lock:
+            self._counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def time(self):
+        return _Timer(self)
+
+    def render(self, name, labelnames, key):
+        with self._lock:
+            counts, total, count = list(self._counts), self.sum, self.count
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip(self._bounds + (float("inf"),), counts):
+            cumulative += bucket_count
+            lines.append(f"{name}_bucket{_format_labels(labelnames, key, ('le', _format_value(float(bound))))} {cumulative}")
+        labels = _format_labels(labelnames, key)
+        lines.append(f"{name}_sum{labels} {_format_value(total)}")
+        lines.append(f"{name}_count{labels} {count}")
+        return lines
+
+
+class Histogram(_Metric):
+    """누적 버킷 히스토그램 (단계별 소요 시간 등). 관측 1회는 이진 탐색 1번과 잠금 1번입니다."""
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(float(bound) for bound in buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value):
+        self._default.observe(value)
+
+    def time(self):
+        return self._default.time()
+
+
+class MetricsRegistry:
+    """
+    프로세스 내 메트릭 모음. 같은 이름으로 다시 등록하면 기존 메트릭을 반환하므로
+    여러 모듈이 공통 메트릭(단계 시간, 오류 수 등)을 각자 선언해도 하나로 합쳐집니다.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+
+    def _get_or_create(self, cls, name, documentation, labelnames, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, documentation, labelnames, **kwargs)
+            elif not isinstance(metric, cls) or metric.labelnames != tuple(labelnames):
+                raise ValueError(f"메트릭 {name}이(가) 다른 종류 또는 레이블로 이미 등록되어 있습니다.")
+            return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._get_or_create(Counter, name, documentation, labelnames)
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._get_or_create(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._get_or_create(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def get(self, name):
+        return self._metrics.get(name)
+
+    def render(self):
+        """Prometheus 텍스트 형식(0.0.4)으로 모든 메트릭을 직렬화합니다."""
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: m.name)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+# 모든 서비스가 공유하는 공통 메트릭
+STAGE_SECONDS = REGISTRY.histogram("cmos_stage_duration_seconds", "파이프라인 단계별 소요 시간", ("stage",))
+ROWS = REGISTRY.counter("cmos_rows_total", "단계별 처리한 행 수", ("stage",))
+ERRORS = REGISTRY.counter("cmos_errors_total", "구성 요소별로 잡아서 처리한 예외 수", ("component",))
+QUEUE_DEPTH = REGISTRY.gauge("cmos_queue_depth", "대기 중인 항목 수 (버퍼/큐별)", ("queue",))
+
+
+def stage_timer(stage):
+    """단계 소요 시간 타이머. `with stage_timer("detector_poll"):` 또는 데코레이터로 사용합니다."""
+    return STAGE_SECONDS.labels(stage).time()
+
+
+def count_rows(stage, amount):
+    if amount:
+        ROWS.labels(stage).inc(amount)
+
+
+def record_error(component):
+    """broad except 블록에서 잡은 예외를 구성 요소별로 셉니다."""
+    ERRORS.labels(component).inc()
+
+
+def track_queue_depth(queue, fn):
+    """수집 시점에 fn()으로 큐/버퍼 길이를 읽도록 등록합니다 (핫 패스 비용 없음)."""
+    QUEUE_DEPTH.labels(queue).set_function(fn)
+
+
+class SamplingProfiler:
+    """
+    백그라운드 스레드에서 interval마다 모든 스레드의 현재 스택(sys._current_frames)을 샘플링해
+    스택별 횟수를 모으는 프로파일러. 실행 중에 켜고 끌 수 있으며, 꺼져 있을 때는 비용이 없습니다.
+    결과는 flamegraph.pl/speedscope가 읽는 collapsed 형식("함수;함수;함수 횟수")으로 내보냅니다.
+    """
+
+    def __init__(self, interval=PROFILER_INTERVAL_SECONDS, max_depth=PROFILER_MAX_DEPTH, max_stacks=PROFILER_MAX_STACKS):
+        self.interval = max(interval, PROFILER_MIN_INTERVAL_SECONDS)
+        self.max_depth = max_depth
+        self.max_stacks = max_stacks
+        self._lock = threading.Lock()
+        self._stacks = _StackCounter()
+        self._frame_names = {}  # 코드 객체 -> "함수 (파일:줄)" 캐시
+        self._thread = None
+        self._stop = threading.Event()
+        self.samples = 0
+        self.started_at = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, interval=None):
+        """프로파일링을 시작합니다. 이미 실행 중이면 간격만 바꿉니다."""
+        if interval is not None:
+            self.interval = max(interval, PROFILER_MIN_INTERVAL_SECONDS)
+        if self.running:
+            return False
+        self._stop.clear()
+        self.started_at = time.time()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self):
+        if not self.running:
+            return False
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        return True
+
+    def reset(self):
+        with self._lock:
+            self._stacks = _StackCounter()
+            self.samples = 0
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            with self._lock:
+                for thread_id, frame in frames.items():
+                    if thread_id == own_id:
+                        continue
+                    stack = self._collapse(frame)
+                    if stack not in self._stacks and len(self._stacks) >= self.max_stacks:
+                        stack = "(기타)"
+                    self._stacks[stack] += 1
+                self.samples += 1
+
+    def _collapse(self, frame):
+        names = []
+        cache = self._frame_names
+        while frame is not None and len(names) < self.max_depth:
+            code = frame.f_code
+            name = cache.get(code)
+            if name is None:
+                name = cache[code] = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+            names.append(name)
+            frame = frame.f_back
+        return ";".join(reversed(names))
+
+    def collapsed(self):
+        """collapsed 스택 형식 문자열 (횟수 내림차순)."""
+        with self._lock:
+            items = self._stacks.most_common()
+        return "".join(f"{stack} {count}\n" for stack, count in items)
+
+    def status(self):
+        return {
+            "running": self.running,
+            "interval": self.interval,
+            "samples": self.samples,
+            "stacks": len(self._stacks),
+            "started_at": self.started_at,
+        }
+
+
+PROFILER = SamplingProfiler()
+
+
+def _make_handler(registry, profiler):
+    from http.server import BaseHTTPRequestHandler
+    from urllib.parse import parse_qs, urlparse
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        """
+        GET /metrics                 Prometheus 텍스트 형식 메트릭
+        GET /profile                 collapsed 스택 (프로파일러가 모은 결과)
+        GET /profile/start?interval= 샘플링 프로파일러 시작 (간격 초, 생략 시 기본값)
+        GET /profile/stop            프로파일러 중지
+        GET /profile/reset           모은 스택 초기화
+        """
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            query = parse_qs(url.query)
+            if url.path == "/metrics":
+                self._reply(registry.render(), "text/plain; version=0.0.4; charset=utf-8")
+            elif url.path == "/profile":
+                self._reply(profiler.collapsed())
+            elif url.path == "/profile/start":
+                try:
+                    interval = float(query["interval"][0]) if "interval" in query else None
+                    if interval is not None and not interval > 0:
+                        raise ValueError(interval)
+                except ValueError:
+                    self._reply("interval은 0보다 큰 초 단위 숫자여야 합니다.\n", status=400)
+                    return
+                profiler.start(interval)
+                self._reply(f"{profiler.status()}\n")
+            elif url.path == "/profile/stop":
+                profiler.stop()
+                self._reply(f"{profiler.status()}\n")
+            elif url.path == "/profile/reset":
+                profiler.reset()
+                self._reply(f"{profiler.status()}\n")
+            else:
+                self._reply("not found\n", status=404)
+
+        def _reply(self, body, content_type="text/plain; charset=utf-8", status=200):
+            data = body.encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass  # 수집 요청마다 로그를 남기지 않음
+
+    return MetricsHandler
+
+
+def start_metrics_server(port, host=METRICS_HOST, registry=REGISTRY, profiler=PROFILER):
+    """메트릭/프로파일러 HTTP 엔드포인트를 데몬 스레드에서 시작하고 서버 객체를 반환합니다 (port=0이면 임의 포트)."""
+    from http.server import ThreadingHTTPServer
+
+    server = ThreadingHTTPServer((host, port), _make_handler(registry, profiler))
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True)
+    thread.start()
+    return server
+
+
+def start_from_env():
+    """
+    환경 변수에 따라 메트릭 엔드포인트와 프로파일러를 시작합니다. 서비스 진입점에서 호출합니다.
+    CMOS_METRICS_PORT: 지정하면 해당 포트에서 /metrics, /profile 엔드포인트 제공
+    CMOS_METRICS_HOST: 바인딩 주소 (기본값 127.0.0.1)
+    CMOS_PROFILER=1: 시작 시 샘플링 프로파일러를 켬 (엔드포인트에서 언제든 켜고 끌 수 있음)
+    """
+    server = None
+    port = os.environ.get("CMOS_METRICS_PORT")
+    if port:
+        try:
+            server = start_metrics_server(int(port), os.environ.get("CMOS_METRICS_HOST", METRICS_HOST))
+            host, bound_port = server.server_address[:2]
+            print(f"메트릭 엔드포인트: http://{host}:{bound_port}/metrics")
+        except Exception as e:
+            print(f"메트릭 엔드포인트를 시작하지 못했습니다: {e}")
+    if os.environ.get("CMOS_PROFILER", "").lower() in ("1", "true", "yes"):
+        PROFILER.start()
+        print(f"샘플링 프로파일러를 시작했습니다 ({PROFILER.interval * 1000:.0f}ms 간격).")
+    return server
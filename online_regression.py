@@ -0,0 +1,133 @@
+import math
+
+import numpy as np
+
+
+def merge_moments(a, b):
+    """
+    두 데이터 묶음의 (가중치 합, x 평균, y 평균, 공분산 누적합, x 분산 누적합)을 병합합니다.
+    Chan의 병렬 분산 공식을 사용하며, 스칼라와 NumPy 배열(장치별 병합) 모두 지원합니다.
+    """
+    weight_a, mean_x_a, mean_y_a, cov_a, var_a = a
+    weight_b, mean_x_b, mean_y_b, cov_b, var_b = b
+    total = weight_a + weight_b
+    delta_x = mean_x_b - mean_x_a
+    delta_y = mean_y_b - mean_y_a
+    factor = weight_a * weight_b / total
+    return (
+        total,
+        mean_x_a + delta_x * weight_b / total,
+        mean_y_a + delta_y * weight_b / total,
+        cov_a + cov_b + delta_x * delta_y * factor,
+        var_a + var_b + delta_x * delta_x * factor,
+    )
+
+
+def grouped_moments(codes, n_groups, x, y, weights=None):
+    """
+    그룹(장치) 코드별로 (가중치 합, x 평균, y 평균, 공분산 누적합, x 분산 누적합)을
+    np.bincount로 한 번에 계산합니다. 그룹별 Python 루프가 없습니다.
+    """
+    w = np.ones_like(x) if weights is None else weights
+    weight = np.bincount(codes, weights=w, minlength=n_groups)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean_x = np.bincount(codes, weights=w * x, minlength=n_groups) / weight
+        mean_y = np.bincount(codes, weights=w * y, minlength=n_groups) / weight
+    dx = x - mean_x[codes]
+    dy = y - mean_y[codes]
+    cov_xy = np.bincount(codes, weights=w * dx * dy, minlength=n_groups)
+    var_x = np.bincount(codes, weights=w * dx * dx, minlength=n_groups)
+    return weight, mean_x, mean_y, cov_xy, var_x
+
+
+class OnlineLinearRegression:
+    """
+    y = slope * x + intercept 형태의 단순 선형 회귀를 증분으로 적합합니다.
+    (가중치 합, x/y 평균, 공분산/분산 누적합)만 유지하므로 새 데이터만 반영하면 되고,
+    전체 이력을 다시 읽지 않고도 일괄 최소자승(OLS)과 동일한 기울기/절편을 얻습니다.
+    half_life_seconds를 지정하면 오래된 데이터의 가중치를 지수적으로 감쇠(forgetting)시킵니다.
+    """
+
+    def __init__(self, half_life_seconds=None):
+        self.half_life_seconds = half_life_seconds
+        self.count = 0          # 반영된 샘플 수 (가중치와 무관)
+        self.weight = 0.0       # Σw
+        self.mean_x = 0.0
+        self.mean_y = 0.0
+        self.cov_xy = 0.0       # Σw(x - mean_x)(y - mean_y)
+        self.var_x = 0.0        # Σw(x - mean_x)^2
+        self.last_x = None
+
+    def _decay(self, elapsed):
+        if not self.half_life_seconds or elapsed <= 0:
+            return 1.0
+        return 0.5 ** (elapsed / self.half_life_seconds)
+
+    def update(self, x, y, counts=None):
+        """
+        x, y 배열(또는 스칼라)을 한 번에 반영합니다.
+        counts를 주면 각 점을 해당 개수의 샘플(예: 롤업 버킷의 평균)로 취급합니다.
+        기존 마지막 x보다 이른 점(늦게 들어온 행)도 반영할 수 있으며, 이때 감쇠 기준 시점은 기존 마지막 x입니다.
+        """
+        x = np.atleast_1d(np.asarray(x, dtype=np.float64))
+        y = np.atleast_1d(np.asarray(y, dtype=np.float64))
+        if x.size == 0:
+            return
+        newest = float(x.max())
+        if self.last_x is not None:
+            newest = max(newest, self.last_x)
+
+        # 새 배치의 가중치: forgetting이 켜져 있으면 (기존 상태와 배치를 합친) 최신 시점 기준으로 감쇠
+        w = np.ones_like(x) if counts is None else np.asarray(counts, dtype=np.float64)
+        if self.half_life_seconds:
+            w = w * 0.5 ** ((newest - x) / self.half_life_seconds)
+        batch_weight = float(w.sum())
+        batch_mean_x = float(np.dot(w, x) / batch_weight)
+        batch_mean_y = float(np.dot(w, y) / batch_weight)
+        dx = x - batch_mean_x
+        dy = y - batch_mean_y
+        batch_cov_xy = float(np.dot(w * dx, dy))
+        batch_var_x = float(np.dot(w * dx, dx))
+
+        # 기존 누적값을 새 배치의 최신 시점까지 감쇠시킨 뒤 병합
+        if self.last_x is not None:
+            decay = self._decay(newest - self.last_x)
+            self.weight *= decay
+            self.cov_xy *= decay
+            self.var_x *= decay
+
+        self.weight, self.mean_x, self.mean_y, self.cov_xy, self.var_x = merge_moments(
+            (self.weight, self.mean_x, self.mean_y, self.cov_xy, self.var_x),
+            (batch_weight, batch_mean_x, batch_mean_y, batch_cov_xy, batch_var_x),
+        )
+        self.count += int(x.size) if counts is None else int(np.sum(counts))
+        self.last_x = newest
+
+    @property
+    def slope(self):
+        if self.var_x <= 0:
+            return math.nan
+        return self.cov_xy / self.var_x
+
+    @property
+    def intercept(self):
+        return self.mean_y - self.slope * self.mean_x
+
+    def to_dict(self):
+        return {
+            "half_life_seconds": self.half_life_seconds,
+            "count": self.count,
+            "weight": self.weight,
+            "mean_x": self.mean_x,
+            "mean_y": self.mean_y,
+            "cov_xy": self.cov_xy,
+            "var_x": self.var_x,
+            "last_x": self.last_x,
+        }
+
+    @classmethod
+    def from_dict(cls, state):
+        model = cls(state.get("half_life_seconds"))
+        for key in ("count", "weight", "mean_x", "mean_y", "cov_xy", "var_x", "last_x"):
+            setattr(model, key, state[key])
+        return model
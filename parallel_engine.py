@@ -0,0 +1,534 @@
+import os
+import math
+import time
+import queue
+import argparse
+import multiprocessing as mp
+from collections import defaultdict
+from datetime import datetime, timezone
+
+import numpy as np
+
+from alert_pipeline import AlertCooldownStore, AlertPipeline
+from metrics import count_rows, record_error, stage_timer, start_from_env
+from anomaly_detector import (
+    INGESTED_AT_FIELD,
+    IncrementalLogPoller,
+    StreamingAnomalyDetector,
+    backend,
+)
+from online_regression import OnlineLinearRegression
+from predictive_engine import (
+    RUL_HALF_LIFE_SECONDS,
+    bootstrap_rul_states_from_rollups,
+    classify_device_status,
+    health_components_from_window,
+    create_result_spools,
+    load_rul_state,
+    result_writers,
+    rul_from_model,
+    save_rul_state,
+    score_from_components,
+)
+from spool import SPOOL_DIR, WriteAheadSpool
+from telemetry_buffer import TelemetryStore
+from timeutil import parse_timestamp
+
+# --- 병렬 분석 설정 ---
+HEALTH_WINDOW_SECONDS = 86400  # 건강 점수 계산 구간 (24시간)
+HEALTH_BUFFER_CAPACITY = 17280  # 장치별 텔레메트리 버퍼 용량 (24시간을 5초 간격까지 수용)
+POLL_INTERVAL_SECONDS = 10     # 새 로그 조회 주기
+PREDICT_INTERVAL_SECONDS = 3600  # 건강 점수/RUL 갱신 주기
+FETCH_MAX_ROWS = 500000        # 한 번에 조회해 워커로 보내는 최대 행 수 (24시간 warm-up은 여러 번에 나누어 처리)
+WORKER_REPLY_TIMEOUT_SECONDS = 300  # 워커 응답 대기 상한 (넘으면 워커를 재시작하고 오류로 기록)
+PARALLEL_RUL_STATE_PATH = "parallel_rul_state.json"  # 샤드별 회귀 상태 체크포인트 (단일 장치 엔진과 별도)
+PARALLEL_ALERT_STATE_PATH = "parallel_alert_state.json"  # 병렬 엔진 전용 경고 쿨다운 상태 (단일 프로세스 탐지기와 별도)
+INGEST_CHECKPOINT_KEY = "_ingest_checkpoint"  # 회귀 상태 체크포인트에 함께 저장하는 로그 조회 위치 (장치 ID와 겹치지 않는 키)
+
+
+def shard_of(device_id, num_shards):
+    """장치 ID를 샤드 번호로 매핑합니다. 같은 장치는 항상 같은 워커가 처리합니다."""
+    return 0 if device_id is None else int(device_id) % num_shards
+
+
+class DeviceShard:
+    """
+    워커 프로세스 하나가 소유하는 장치 샤드의 분석 상태.
+    장치별 최근 24시간 샘플을 컬럼형 링 버퍼(TelemetryStore) 하나에 저장하고, 이상 탐지기와 건강 점수 계산이
+    이 버퍼를 함께 읽습니다. 장치별 증분 RUL 회귀 모델도 유지합니다.
+    DB에 직접 쓰지 않고 결과(경고, 예측)를 모아 상위 프로세스로 돌려줍니다.
+    """
+
+    def __init__(self):
+        self._alerts = []
+        self.telemetry = TelemetryStore(HEALTH_BUFFER_CAPACITY, retention_seconds=HEALTH_WINDOW_SECONDS)
+        self.detector = StreamingAnomalyDetector(alert_fn=self._collect_alert, telemetry=self.telemetry)
+        self._rul_models = {}
+        self._rul_origins = {}
+        self._rul_last_epoch = {}
+
+    def load_rul_state(self, entries):
+        """상위 프로세스가 보낸 장치별 회귀 상태(predictive_engine.load_rul_state 형식)를 복원합니다."""
+        for key, entry in entries.items():
+            device_id = int(key)
+            self._rul_models[device_id] = OnlineLinearRegression.from_dict(entry["model"])
+            self._rul_origins[device_id] = entry["origin"]
+            self._rul_last_epoch[device_id] = entry["last_epoch"]
+
+    def rul_state(self, device_ids=None):
+        """
+        체크포인트로 저장할 장치별 회귀 상태를 load_rul_state()와 같은 형식으로 반환합니다.
+        device_ids를 주면 그 장치들의 상태만 반환합니다.
+        """
+        models = self._rul_models if device_ids is None else {d: self._rul_models[d] for d in device_ids if d in self._rul_models}
+        return {
+            str(device_id): {
+                "origin": self._rul_origins[device_id],
+                "last_epoch": self._rul_last_epoch[device_id],
+                "last_timestamp": datetime.fromtimestamp(self._rul_last_epoch[device_id], tz=timezone.utc).isoformat(),
+                "model": model.to_dict(),
+            }
+            for device_id, model in models.items()
+        }
+
+    def _collect_alert(self, metric, severity, message, details, device_id=None, rule=None):
+        self._alerts.append({
+            "device_id": device_id,
+            "metric": metric,
+            "severity": severity,
+            "message": message,
+            "details": details,
+            "rule": rule,
+        })
+
+    def drain_alerts(self):
+        alerts, self._alerts = self._alerts, []
+        return alerts
+
+    def process_rows(self, rows, warming_up=False, rul_mask=None):
+        """
+        새 행을 이상 탐지기(공유 텔레메트리 버퍼 포함)와 RUL 상태에 반영하고, 회귀 상태가 바뀐 장치 ID를 반환합니다.
+        rul_mask(행별 bool)를 주면 warm-up 구간에서도 마지막 반영 시각 대신 이 표시로 RUL에 반영할 행을 고릅니다.
+        """
+        self.detector.process_rows(rows, warming_up)
+        if rul_mask is not None:
+            return self.update_rul([row for row, use in zip(rows, rul_mask) if use])
+        return self.update_rul(rows, fresh_only=warming_up)
+
+    def update_rul(self, rows, fresh_only=False):
+        """
+        행을 장치별 RUL 회귀 상태에만 반영하고 상태가 바뀐 장치 ID를 반환합니다.
+        fresh_only이면 체크포인트/롤업에 이미 반영된 시각 이후의 행만 사용합니다.
+        """
+        per_device = defaultdict(lambda: ([], []))
+        for row in rows:
+            noise = row["noise_level"]
+            if noise is None or noise != noise:
+                continue  # 결측(None/NaN) 노이즈는 회귀 모멘트를 영구히 오염시키므로 제외
+            seconds, values = per_device[row.get("device_id")]
+            seconds.append(parse_timestamp(row["log_timestamp"]))
+            values.append(noise)
+
+        # 장치별로 모아서 회귀 상태를 한 번에 갱신. warm-up 구간은 체크포인트/롤업에 이미 반영된 시각까지 건너뛰고,
+        # 이후 행은 수신 시각 커서로 처음 받은 행이므로 늦게 들어온 과거 시각의 행도 반영
+        updated = []
+        for device_id, (seconds, noise) in per_device.items():
+            seconds = np.asarray(seconds, dtype=np.float64)
+            noise = np.asarray(noise, dtype=np.float64)
+            last_epoch = self._rul_last_epoch.get(device_id)
+            if fresh_only and last_epoch is not None:
+                fresh = seconds > last_epoch
+                seconds, noise = seconds[fresh], noise[fresh]
+                if not seconds.size:
+                    continue
+            model = self._rul_models.get(device_id)
+            if model is None:
+                model = self._rul_models[device_id] = OnlineLinearRegression(RUL_HALF_LIFE_SECONDS)
+                self._rul_origins[device_id] = float(seconds[0])
+            model.update(seconds - self._rul_origins[device_id], noise)
+            self._rul_last_epoch[device_id] = max(float(seconds.max()), last_epoch or float("-inf"))
+            updated.append(device_id)
+        return updated
+
+    def predict(self):
+        """
+        샤드 내 모든 장치의 건강 점수, RUL, 상태를 계산합니다.
+        체크포인트로 복원됐지만 아직 새 샘플이 없는 장치는 건강 점수를 계산할 수 없으므로 건너뜁니다.
+        """
+        device_ids = [d for d in self._rul_models if self.telemetry.window(d) is not None]
+        if not device_ids:
+            return []
+
+        components = [health_components_from_window(self.telemetry.window(d, HEALTH_WINDOW_SECONDS)) for d in device_ids]
+        temp_std, latest_noise, pixel_growth = (np.array(column, dtype=np.float64) for column in zip(*components))
+        health_score = np.round(score_from_components(np.nan_to_num(temp_std), latest_noise, pixel_growth), 2)
+
+        ruls = [rul_from_model(self._rul_models[d], self._rul_origins[d]) for d in device_ids]
+        rul_days = np.array([np.nan if days is None else days for days, _ in ruls], dtype=np.float64)
+        device_status = classify_device_status(health_score, rul_days)
+
+        return [
+            {
+                "device_id": device_id,
+                "predicted_rul_days": days,
+                "health_score": score,
+                "prediction_status": rul_status,
+                "device_status": status,
+            }
+            for device_id, (days, rul_status), score, status in zip(device_ids, ruls, health_score.tolist(), device_status.tolist())
+        ]
+
+
+def _worker_main(shard_index, inbox, outbox):
+    """
+    워커 프로세스 루프. 자기 샤드의 상태를 소유하고 명령에 따라 결과를 돌려줍니다.
+    응답은 (status, shard_index, seq, payload) 형식이며, 명령 처리 중 예외가 나면 워커는 계속 살아 있고
+    status="error"와 예외 내용을 돌려줍니다.
+    """
+    shard = DeviceShard()
+    while True:
+        command, seq, payload = inbox.get()
+        if command == "stop":
+            break
+        try:
+            if command == "rows":
+                # 처리한 배치의 회귀 상태를 바로 돌려주어, 워커가 죽어도 상위 프로세스가 이 배치까지 복원할 수 있게 함
+                rows, warming_up, rul_state, rul_mask = payload
+                shard.load_rul_state(rul_state)
+                updated = shard.process_rows(rows, warming_up, rul_mask)
+                result = {"alerts": shard.drain_alerts(), "rul_state": shard.rul_state(updated)}
+            elif command == "rul_rows":
+                rows, rul_state = payload
+                shard.load_rul_state(rul_state)
+                result = {"alerts": [], "rul_state": shard.rul_state(shard.update_rul(rows))}
+            elif command == "predict":
+                result = {"predictions": shard.predict(), "rul_state": shard.rul_state()}
+            elif command == "checkpoint":
+                result = {"predictions": [], "rul_state": shard.rul_state()}
+            else:
+                raise ValueError(f"알 수 없는 명령: {command}")
+        except Exception as e:
+            outbox.put(("error", shard_index, seq, f"{type(e).__name__}: {e}"))
+        else:
+            outbox.put(("ok", shard_index, seq, result))
+
+
+class ParallelAnalysisEngine:
+    """
+    장치를 여러 워커 프로세스에 샤딩하여 이상 탐지와 건강 점수/RUL 예측을 병렬로 수행합니다.
+    조회와 DB 쓰기는 상위 프로세스 하나가 담당하며, 워커의 결과를 모아 일괄 저장합니다.
+    spool_dir를 지정하면 경고, 예측 결과, 장치 상태를 로컬 쓰기 선행 스풀을 거쳐 저장합니다 (None이면 직접 기록).
+
+    워커는 배치마다 갱신된 회귀 상태를 돌려주므로, 워커가 죽으면 마지막으로 응답한 배치까지의 상태로 재시작하고
+    응답받지 못한 배치를 다시 보냅니다. 회귀 상태 체크포인트에는 로그 조회 위치도 함께 저장하여, 재시작 후에는
+    텔레메트리 버퍼를 채우는 24시간 warm-up과 별도로 엔진이 멈춘 동안 들어온 행을 회귀 상태에 한 번씩 반영합니다.
+    """
+
+    def __init__(self, num_workers=None, rul_state_path=PARALLEL_RUL_STATE_PATH,
+                 alert_state_path=PARALLEL_ALERT_STATE_PATH, reply_timeout=WORKER_REPLY_TIMEOUT_SECONDS,
+                 spool_dir=None):
+        self.num_workers = num_workers or mp.cpu_count()
+        # 건강 점수 구간(24시간) 전체로 텔레메트리 버퍼를 채우도록 최초 조회 구간을 맞춤
+        self.poller = IncrementalLogPoller(window_seconds=HEALTH_WINDOW_SECONDS)
+        cooldown = AlertCooldownStore(path=alert_state_path)
+        if spool_dir is None:
+            self.alerts = AlertPipeline(backend.insert_alerts, cooldown=cooldown)
+            self.result_spools = None
+        else:
+            alert_spool = WriteAheadSpool(os.path.join(spool_dir, "parallel_alerts"), backend.insert_alerts,
+                                          name="parallel_alerts")
+            self.alerts = AlertPipeline(alert_spool.append, cooldown=cooldown, stamp_created_at=True)
+            self.result_spools = create_result_spools("parallel", spool_dir)
+        self.rul_state_path = rul_state_path
+        self.rul_state = load_rul_state(rul_state_path)
+        # 마지막 체크포인트의 조회 위치: warm-up과 그 이후 보충 조회가 끝날 때까지 회귀 상태에 반영할 행을 고르는 데 사용
+        self._resume = None
+        ingest_checkpoint = self.rul_state.pop(INGEST_CHECKPOINT_KEY, None)
+        if ingest_checkpoint is not None and ingest_checkpoint[0] is not None:
+            high_water_mark, seen = ingest_checkpoint
+            mark = parse_timestamp(high_water_mark) - self.poller.settle_seconds
+            self._resume = {
+                "mark": mark,
+                # 이 문자열보다 앞선 수신 시각(초 단위까지의 ISO 접두사)은 파싱하지 않고 반영된 것으로 판단
+                "mark_prefix": datetime.fromtimestamp(math.floor(mark) - 1, tz=timezone.utc).strftime("%Y-%m-%dT%H:%M:%S"),
+                "seen": {tuple(key) for key in seen},
+                "poller": IncrementalLogPoller(window_seconds=None, high_water_mark=high_water_mark,
+                                               seen_at_high_water_mark=seen),
+            }
+            # warm-up 구간 시작 시각을 고정해 두어, 그보다 오래된 행만 보충 조회에서 반영
+            self._resume["since"] = datetime.now(timezone.utc).timestamp() - HEALTH_WINDOW_SECONDS
+            self.poller = IncrementalLogPoller(
+                window_seconds=HEALTH_WINDOW_SECONDS,
+                backfill_since=datetime.fromtimestamp(self._resume["since"], tz=timezone.utc).isoformat(),
+            )
+        self.reply_timeout = reply_timeout
+        self._inboxes = []
+        self._outbox = None
+        self._processes = []
+        self._sent_devices = []  # 샤드별로 회귀 상태를 이미 보낸 장치 ID
+        self._seq = 0
+
+    def start(self):
+        self._outbox = mp.Queue()
+        self._inboxes = [None] * self.num_workers
+        self._processes = [None] * self.num_workers
+        self._sent_devices = [set() for _ in range(self.num_workers)]
+        for shard_index in range(self.num_workers):
+            self._start_worker(shard_index)
+
+    def _start_worker(self, shard_index):
+        inbox = mp.Queue()
+        process = mp.Process(target=_worker_main, args=(shard_index, inbox, self._outbox), daemon=True)
+        process.start()
+        self._inboxes[shard_index] = inbox
+        self._processes[shard_index] = process
+        # 재시작한 워커는 빈 상태이므로 이 샤드에 보냈던 장치를 마지막으로 응답받은 회귀 상태로 복원 (응답은 기다리지 않음)
+        restored = {str(d): self.rul_state[str(d)] for d in self._sent_devices[shard_index] if str(d) in self.rul_state}
+        if restored:
+            inbox.put(("rul_rows", 0, ([], restored)))
+
+    def _restart_worker(self, shard_index, reason):
+        record_error("parallel_engine")
+        print(f"워커 {shard_index}: {reason}. 마지막으로 응답한 배치의 회귀 상태로 워커를 재시작합니다 (텔레메트리 버퍼는 다시 채워집니다).")
+        process = self._processes[shard_index]
+        if process.is_alive():
+            process.terminate()
+        process.join(timeout=5)
+        self._start_worker(shard_index)
+
+    def stop(self):
+        for inbox in self._inboxes:
+            inbox.put(("stop", None, None))
+        for process in self._processes:
+            process.join(timeout=5)
+        self._inboxes, self._processes = [], []
+
+    def _send(self, payloads, command):
+        """샤드별 payload를 보내고, 응답을 구분할 일련번호를 반환합니다."""
+        self._seq += 1
+        for shard_index, payload in payloads.items():
+            self._inboxes[shard_index].put((command, self._seq, payload))
+        return self._seq
+
+    def _gather(self, seq, command, payloads):
+        """
+        seq 명령에 대한 샤드별 응답을 {shard_index: payload}로 모읍니다.
+        워커가 죽었거나 응답 시간을 넘기면 오류로 기록하고 재시작한 뒤 같은 명령을 한 번 다시 보냅니다.
+        다시 보낸 명령도 처리하지 못하면 (명령 자체가 워커를 죽이는 경우) 그 샤드의 결과는 버리고 나머지 샤드의
+        결과만 반환합니다. 워커가 보낸 오류도 기록하며, 이전 명령의 늦은 응답은 버립니다.
+        """
+        deadlines = {shard_index: time.monotonic() + self.reply_timeout for shard_index in payloads}
+        resent = set()
+        results = {}
+        while deadlines:
+            try:
+                status, shard_index, reply_seq, payload = self._outbox.get(timeout=1.0)
+            except queue.Empty:
+                for shard_index in sorted(deadlines):
+                    process = self._processes[shard_index]
+                    if process.is_alive() and time.monotonic() < deadlines[shard_index]:
+                        continue
+                    reason = (f"응답 없음 ({self.reply_timeout}초 초과)" if process.is_alive()
+                              else f"비정상 종료 (exitcode={process.exitcode})")
+                    self._restart_worker(shard_index, reason)
+                    if shard_index in resent:
+                        record_error("parallel_engine")
+                        print(f"워커 {shard_index}: 다시 보낸 '{command}' 명령도 처리하지 못해 이 샤드의 배치를 건너뜁니다.")
+                        del deadlines[shard_index]
+                    else:
+                        resent.add(shard_index)
+                        self._inboxes[shard_index].put((command, seq, payloads[shard_index]))
+                        deadlines[shard_index] = time.monotonic() + self.reply_timeout
+                continue
+            if status == "error":
+                record_error("parallel_engine")
+                print(f"워커 {shard_index} 처리 중 오류 발생: {payload}")
+            elif reply_seq == seq:
+                results[shard_index] = payload
+            if reply_seq == seq:
+                deadlines.pop(shard_index, None)
+        return results
+
+    def _rul_state_for(self, shard_index, device_ids):
+        """샤드에 처음 보내는 장치의 회귀 상태를 체크포인트에서, 없으면 1시간 롤업에서 가져옵니다."""
+        new_ids = set(device_ids) - self._sent_devices[shard_index]
+        if not new_ids:
+            return {}
+        self._sent_devices[shard_index].update(new_ids)
+        missing = [d for d in new_ids if d is not None and str(d) not in self.rul_state]
+        if missing:
+            bootstrap_rul_states_from_rollups(self.rul_state, missing)
+        return {str(d): self.rul_state[str(d)] for d in new_ids if d is not None and str(d) in self.rul_state}
+
+    def _dispatch(self, command, payloads):
+        """샤드별 명령을 보내고, 응답의 회귀 상태를 반영한 뒤 발생한 경고를 경고 파이프라인에 전달합니다."""
+        seq = self._send(payloads, command)
+        for result in self._gather(seq, command, payloads).values():
+            self.rul_state.update(result["rul_state"])
+            for alert in result["alerts"]:
+                self.alerts.submit(**alert)
+
+    def _rul_mask(self, rows):
+        """재시작 전 체크포인트에 아직 반영되지 않은 행(체크포인트 위치 이후에 수신된 행)을 표시합니다."""
+        mark, mark_prefix, seen = self._resume["mark"], self._resume["mark_prefix"], self._resume["seen"]
+        mask = []
+        for row in rows:
+            ingested_at = row.get(INGESTED_AT_FIELD)
+            mask.append(
+                ingested_at is not None and ingested_at[:19] >= mark_prefix and parse_timestamp(ingested_at) >= mark
+                and (row.get("device_id"), row["log_timestamp"]) not in seen
+            )
+        return mask
+
+    def _catch_up(self):
+        """
+        warm-up이 끝난 뒤, 재시작 전 체크포인트 이후에 수신됐지만 warm-up 구간보다 오래된 행을 회귀 상태에만 반영합니다.
+        warm-up 이후의 수신 시각 커서가 읽는 구간(warm-up 시작 시점 이후 수신)은 그쪽에서 반영하므로 그 전까지만 읽습니다.
+        """
+        poller, since = self._resume["poller"], self._resume["since"]
+        # 보충 조회가 실패해 다음 주기에 다시 시작해도 warm-up 직후의 위치까지만 읽도록 처음 한 번만 정함
+        until = self._resume.setdefault("until", parse_timestamp(self.poller.high_water_mark) - self.poller.settle_seconds)
+        processed = 0
+        while True:
+            rows, _ = poller.fetch(max_rows=FETCH_MAX_ROWS)
+            late = [
+                row for row in rows
+                if parse_timestamp(row[INGESTED_AT_FIELD]) < until and parse_timestamp(row["log_timestamp"]) < since
+            ]
+            if late:
+                shards = defaultdict(list)
+                for row in late:
+                    shards[shard_of(row.get("device_id"), self.num_workers)].append(row)
+                self._dispatch("rul_rows", {
+                    shard_index: (shard_rows, self._rul_state_for(shard_index, {row.get("device_id") for row in shard_rows}))
+                    for shard_index, shard_rows in shards.items()
+                })
+                processed += len(late)
+            if len(rows) < FETCH_MAX_ROWS or parse_timestamp(rows[-1][INGESTED_AT_FIELD]) >= until:
+                break
+        self._resume = None
+        if processed:
+            print(f"[{datetime.now()}] 엔진이 멈춘 동안 들어온 과거 시각의 로그 {processed}행을 회귀 상태에 반영했습니다.")
+        return processed
+
+    @stage_timer("parallel_analyze")
+    def analyze(self):
+        """
+        새 로그를 샤드별로 나누어 워커에 보내고, 발생한 경고를 모아 경고 파이프라인에 전달합니다.
+        밀린 로그(최초 24시간 warm-up 포함)는 FETCH_MAX_ROWS씩 나누어 모두 처리합니다.
+        """
+        processed = 0
+        continuing_warm_up = False
+        while True:
+            with stage_timer("detector_fetch"):
+                rows, warming_up = self.poller.fetch(max_rows=FETCH_MAX_ROWS)
+            if not rows:
+                break
+            warming_up = warming_up or continuing_warm_up
+            count_rows("parallel", len(rows))
+
+            shards = defaultdict(list)
+            for row in rows:
+                shards[shard_of(row.get("device_id"), self.num_workers)].append(row)
+            # 청크 사이에 장치가 새로 나타날 수 있으므로 롤업 조회는 필요한 장치에 대해서만 수행
+            self._dispatch("rows", {
+                shard_index: (
+                    shard_rows, warming_up,
+                    self._rul_state_for(shard_index, {row.get("device_id") for row in shard_rows}),
+                    self._rul_mask(shard_rows) if warming_up and self._resume is not None else None,
+                )
+                for shard_index, shard_rows in shards.items()
+            })
+            processed += len(rows)
+            if len(rows) < FETCH_MAX_ROWS:
+                break
+            continuing_warm_up = warming_up
+        if self._resume is not None and self.poller.backfill_checkpoint() is None:
+            processed += self._catch_up()
+        return processed
+
+    def checkpoint(self, command="checkpoint"):
+        """
+        모든 워커의 회귀 상태를 모아 로그 조회 위치와 함께 체크포인트 파일에 저장하고, 워커가 계산한 예측 결과를 반환합니다.
+        재시작 후 warm-up과 보충 조회가 끝나기 전에는 저장된 조회 위치와 맞지 않으므로 파일을 갱신하지 않습니다.
+        """
+        payloads = {shard_index: None for shard_index in range(self.num_workers)}
+        seq = self._send(payloads, command)
+        results = []
+        for payload in self._gather(seq, command, payloads).values():
+            results.extend(payload["predictions"])
+            self.rul_state.update(payload["rul_state"])
+        if self._resume is None:
+            save_rul_state({**self.rul_state, INGEST_CHECKPOINT_KEY: list(self.poller.checkpoint())}, self.rul_state_path)
+        return results
+
+    @stage_timer("parallel_predict")
+    def predict(self):
+        """모든 워커에서 건강 점수/RUL을 계산하고 bulk upsert/update로 저장합니다. 회귀 상태도 함께 저장합니다."""
+        results = self.checkpoint("predict")
+        if not results:
+            return 0
+
+        write_predictions, write_statuses = result_writers(self.result_spools)
+        created_at = datetime.utcnow().isoformat()
+        write_predictions([
+            {
+                "device_id": r["device_id"],
+                "predicted_rul_days": r["predicted_rul_days"],
+                "health_score": r["health_score"],
+                "prediction_status": r["prediction_status"],
+                "created_at": created_at,
+            }
+            for r in results
+        ])
+        write_statuses([
+            {"id": r["device_id"], "status": r["device_status"], "last_updated": created_at} for r in results
+        ])
+        return len(results)
+
+    def run(self, poll_interval=POLL_INTERVAL_SECONDS, predict_interval=PREDICT_INTERVAL_SECONDS):
+        print(f"병렬 분석 엔진을 시작합니다. 워커 {self.num_workers}개.")
+        self.start()
+        next_predict = time.monotonic() + predict_interval
+        try:
+            while True:
+                started = time.perf_counter()
+                try:
+                    processed = self.analyze()
+                    if processed:
+                        elapsed = time.perf_counter() - started
+                        print(f"[{datetime.now()}] {processed}행 분석 ({processed / max(elapsed, 1e-9):,.0f} rows/s)")
+                    self.alerts.maybe_flush()
+                    if time.monotonic() >= next_predict:
+                        predicted = self.predict()
+                        print(f"[{datetime.now()}] 장치 {predicted}개의 건강 점수/RUL을 갱신했습니다.")
+                        next_predict += predict_interval
+                except Exception as e:
+                    record_error("parallel_engine")
+                    print(f"병렬 분석 중 오류 발생: {e}")
+                time.sleep(max(0.0, poll_interval - (time.perf_counter() - started)))
+        finally:
+            self.alerts.flush()
+            try:
+                self.checkpoint()
+            except Exception as e:
+                record_error("parallel_engine")
+                print(f"회귀 상태 저장 중 오류 발생: {e}")
+            self.stop()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="CMOS 센서 병렬 분석 엔진")
+    parser.add_argument("--workers", type=int, default=None, help="워커 프로세스 수 (기본값: CPU 코어 수)")
+    parser.add_argument("--poll-interval", type=float, default=POLL_INTERVAL_SECONDS, help="새 로그 조회 주기(초)")
+    parser.add_argument("--predict-interval", type=float, default=PREDICT_INTERVAL_SECONDS, help="건강 점수/RUL 갱신 주기(초)")
+    parser.add_argument("--spool-dir", default=SPOOL_DIR, help="경고/예측 결과 쓰기용 로컬 스풀 디렉터리")
+    parser.add_argument("--no-spool", action="store_true", help="스풀 없이 저장소에 직접 기록 (장애 시 결과 유실)")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    start_from_env()
+    engine = ParallelAnalysisEngine(args.workers, spool_dir=None if args.no_spool else args.spool_dir)
+    engine.run(args.poll_interval, args.predict_interval)
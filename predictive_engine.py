@@ -1,28 +1,35 @@
 
 import os
+import json
+import math
 import time
-import pandas as pd
+import argparse
 import numpy as np
-from datetime import datetime, timedelta
-from supabase import create_client, Client
-from dotenv import load_dotenv
-from sklearn.linear_model import LinearRegression
+from datetime import datetime, timedelta, timezone
 
-# .env.local 파일에서 환경 변수 로드
-load_dotenv(dotenv_path='.env.local')
+from degradation_models import TREND_MODELS, DecimatedSeries, TemperatureNoiseModel, fit_trend
+from metrics import count_rows, record_error, stage_timer, start_from_env
+from online_regression import OnlineLinearRegression, grouped_moments, merge_moments
+from spool import SPOOL_DIR, WriteAheadSpool
+from storage import LazyBackend
 
-# Supabase 클라이언트 초기화
-supabase_url = os.getenv("NEXT_PUBLIC_SUPABASE_URL")
-supabase_key = os.getenv("NEXT_PUBLIC_SUPABASE_ANON_KEY")
-
-if not supabase_url or not supabase_key:
-    raise ValueError("Supabase URL 또는 Key가 환경 변수에 설정되지 않았습니다.")
-
-supabase: Client = create_client(supabase_url, supabase_key)
+# 저장소 백엔드 (CMOS_STORAGE_BACKEND=supabase | sqlite). 처음 사용할 때 생성됨
+backend = LazyBackend()
 
 # --- 예측 및 분석 설정 ---
 DEVICE_ID = 1  # 분석 대상이 되는 센서의 고유 ID
 NOISE_CRITICAL_THRESHOLD = 5.0  # RUL 예측을 위한 노이즈 임계값
+MIN_RUL_SAMPLES = 10  # RUL 예측에 필요한 최소 데이터 포인트 수
+
+# 증분 RUL 회귀 설정
+RUL_STATE_PATH = "rul_state.json"  # 장치별 회귀 상태 체크포인트 파일
+RUL_HALF_LIFE_SECONDS = None  # 지정 시 오래된 데이터의 가중치를 지수 감쇠 (예: 7일 = 604800)
+FLEET_RUL_STATE_PATH = "fleet_rul_state.npz"  # 플릿 모드의 장치별 회귀 상태 (컬럼형 배열)
+FLEET_STATE_FIELDS = ("device_id", "origin", "last_epoch", "count", "weight", "mean_x", "mean_y", "cov_xy", "var_x")
+
+# RUL 추세 모델: "ols"(전체 이력 최소자승) | "theil_sen" | "huber" (시간 구간으로 솎아낸 표본에 강건 적합)
+# 강건 모델용 요약(degradation_models.DecimatedSeries)은 모델 선택과 무관하게 항상 함께 갱신됨
+RUL_MODEL = "ols"
 
 # 건강 점수 계산을 위한 가중치
 HEALTH_SCORE_WEIGHTS = {
@@ -39,6 +46,11 @@ METRIC_BOUNDS = {
     "pixel_growth": (0, 5),      # 24시간 동안의 데드 픽셀 증가량 기대 범위
 }
 
+# 조회 시 필요한 컬럼만 가져옴
+HEALTH_COLUMNS = "log_timestamp, temperature, noise_level, dead_pixel_count"
+RUL_COLUMNS = "log_timestamp, noise_level"
+FLEET_COLUMNS = "device_id, log_timestamp, temperature, noise_level, dead_pixel_count"
+
 
 def normalize_value(value, bounds):
     """값을 0과 1 사이로 정규화합니다. 값이 낮을수록 좋다고 가정합니다."""
@@ -46,88 +58,335 @@ def normalize_value(value, bounds):
     normalized = (value - min_val) / (max_val - min_val)
     return np.clip(1 - normalized, 0, 1) # 점수는 1에서 빼서, 값이 낮을수록 높은 점수가 나오게 함
 
+@stage_timer("health_score")
 def get_health_score(df_24h):
     """지난 24시간 데이터를 바탕으로 건강 점수를 계산합니다."""
     if df_24h.empty:
         return 0
 
-    # 1. 온도 안정성 점수
+    # 1. 온도 안정성
     temp_std = df_24h['temperature'].std()
-    temp_score = normalize_value(temp_std, METRIC_BOUNDS["temp_std"])
 
-    # 2. 노이즈 레벨 점수
+    # 2. 노이즈 레벨
     latest_noise = df_24h.iloc[0]['noise_level']
-    noise_score = normalize_value(latest_noise, METRIC_BOUNDS["noise_level"])
 
-    # 3. 데드 픽셀 증가율 점수
+    # 3. 데드 픽셀 증가량
     if len(df_24h) > 1:
         pixel_growth = df_24h.iloc[0]['dead_pixel_count'] - df_24h.iloc[-1]['dead_pixel_count']
     else:
         pixel_growth = 0
+
+    return round(score_from_components(temp_std, latest_noise, pixel_growth), 2)
+
+
+def score_from_components(temp_std, latest_noise, pixel_growth):
+    """온도 표준편차, 최신 노이즈, 데드 픽셀 증가량으로부터 건강 점수(0~100)를 계산합니다. 배열도 지원합니다."""
+    temp_score = normalize_value(temp_std, METRIC_BOUNDS["temp_std"])
+    noise_score = normalize_value(latest_noise, METRIC_BOUNDS["noise_level"])
     pixel_score = normalize_value(pixel_growth, METRIC_BOUNDS["pixel_growth"])
 
-    # 4. 가중 평균 계산
+    # 가중 평균 계산
     w = HEALTH_SCORE_WEIGHTS
-    health_score = (temp_score * w["temp_stability"] +
-                    noise_score * w["noise_level"] +
-                    pixel_score * w["pixel_growth"]) * 100
-    
-    return round(health_score, 2)
+    return (temp_score * w["temp_stability"] +
+            noise_score * w["noise_level"] +
+            pixel_score * w["pixel_growth"]) * 100
 
 
-def predict_rul(df_all):
-    """전체 노이즈 레벨 데이터를 선형 회귀로 분석하여 RUL을 예측합니다."""
-    if len(df_all) < 10: # 최소 데이터 포인트 수
+def health_components_from_window(window):
+    """
+    텔레메트리 링 버퍼 구간 뷰(telemetry_buffer.TelemetryWindow)에서 건강 점수 구성 요소
+    (온도 표준편차, 최신 노이즈, 데드 픽셀 증가량)를 계산합니다. 값이 없던 샘플은 제외합니다.
+    """
+    temperature = window.temperature[~np.isnan(window.temperature)].astype(np.float64)
+    temp_std = float(temperature.std(ddof=1)) if len(temperature) >= 2 else float("nan")
+
+    noise = window.noise_level[~np.isnan(window.noise_level)]
+    latest_noise = float(noise[-1]) if len(noise) else float("nan")
+
+    pixels = window.dead_pixel_count[window.dead_pixel_count >= 0]
+    pixel_growth = int(pixels[-1]) - int(pixels[0]) if len(pixels) > 1 else 0
+    return temp_std, latest_noise, pixel_growth
+
+
+def to_epoch_seconds(timestamps):
+    """타임스탬프 Series를 UTC epoch 초(float) 배열로 변환합니다."""
+    import pandas as pd
+
+    ts = pd.to_datetime(timestamps, utc=True)
+    return (ts - pd.Timestamp(0, tz="UTC")).dt.total_seconds().to_numpy()
+
+
+def rul_from_model(model, origin, now=None):
+    """
+    증분 회귀 모델로부터 RUL을 계산합니다.
+    x축은 origin(첫 샘플의 epoch 초)으로부터의 경과 시간(초)입니다.
+    now(epoch 초)는 남은 일수의 기준 시각이며, 재생 시에는 가상 시각을 넘깁니다.
+    """
+    if model.count < MIN_RUL_SAMPLES:
         return None, "데이터 부족"
+    return rul_from_line(model.slope, model.intercept, model.last_x, origin, now)
 
-    df_all['time_elapsed'] = (df_all['log_timestamp'] - df_all['log_timestamp'].min()).dt.total_seconds()
-    
-    X = df_all[['time_elapsed']]
-    y = df_all['noise_level']
 
-    model = LinearRegression()
-    model.fit(X, y)
+def rul_from_trend(trend, rul_model, count, now=None):
+    """DecimatedSeries(장치 1대)에 강건 추세 모델을 적합하여 RUL을 계산합니다. count는 반영된 원본 샘플 수입니다."""
+    if count < MIN_RUL_SAMPLES:
+        return None, "데이터 부족"
+    slope, intercept = fit_trend(trend, rul_model)
+    return rul_from_line(float(slope[0]), float(intercept[0]), float(trend.last_x[0]), float(trend.origin[0]), now)
 
-    slope = model.coef_[0]
 
+def rul_from_line(slope, intercept, last_x, origin, now=None):
+    """noise = slope * x + intercept 추세선이 임계값에 도달하는 시점으로부터 RUL을 계산합니다."""
     # 노이즈가 증가하지 않는 경우 RUL 예측 불가
-    if slope <= 0:
+    if not slope > 0:
         return None, "노이즈 증가 추세 없음"
 
-    intercept = model.intercept_
-    
     # y = slope * x + intercept  =>  x = (y - intercept) / slope
     seconds_to_threshold = (NOISE_CRITICAL_THRESHOLD - intercept) / slope
-    
-    if seconds_to_threshold <= df_all['time_elapsed'].max():
+
+    if seconds_to_threshold <= last_x:
         return 0, "임계값 이미 도달" # 이미 임계값을 넘은 경우
-        
-    predicted_end_date = df_all['log_timestamp'].min() + timedelta(seconds=seconds_to_threshold)
-    rul_days = (predicted_end_date - datetime.now()).days
+
+    predicted_end = origin + seconds_to_threshold
+    now = time.time() if now is None else now
+    rul_days = math.floor((predicted_end - now) / 86400)
 
     return max(0, rul_days), "예측 성공"
 
 
+@stage_timer("predict_rul")
+def predict_rul(df_all, now=None, rul_model=RUL_MODEL):
+    """전체 노이즈 레벨 데이터를 선형 회귀(rul_model)로 분석하여 RUL을 예측합니다."""
+    if len(df_all) < MIN_RUL_SAMPLES: # 최소 데이터 포인트 수
+        return None, "데이터 부족"
+
+    seconds = to_epoch_seconds(df_all['log_timestamp'])
+    noise = df_all['noise_level'].to_numpy(dtype=np.float64)
+    if rul_model != "ols":
+        trend = DecimatedSeries(1)
+        trend.extend(np.zeros(len(seconds), dtype=np.int64), seconds, noise)
+        return rul_from_trend(trend, rul_model, len(seconds), now)
+
+    origin = seconds.min()
+    order = np.argsort(seconds, kind="stable")
+
+    model = OnlineLinearRegression(RUL_HALF_LIFE_SECONDS)
+    model.update(seconds[order] - origin, noise[order])
+    return rul_from_model(model, origin, now)
+
+
+def load_rul_state(path=RUL_STATE_PATH):
+    """장치별 증분 회귀 상태 체크포인트를 불러옵니다."""
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_rul_state(state, path=RUL_STATE_PATH):
+    """체크포인트를 원자적으로(임시 파일 후 교체) 저장합니다."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp_path, path)
+
+
+def rul_log_poller(rul_state, device_id, store=None):
+    """
+    장치의 RUL 회귀 상태에 아직 반영하지 않은 로그를 가져오는 조회기를 만듭니다 (fleet_log_poller의 단일 장치 버전).
+    조회 위치가 없는 상태(이전 체크포인트, 롤업으로 초기화한 상태)는 마지막 반영 시각 이후를 warm-up으로 읽습니다.
+    처리한 뒤 record_rul_cursor()로 조회 위치를 상태에 기록합니다. store를 지정하지 않으면 모듈의 저장소 백엔드에서 읽습니다.
+    """
+    from anomaly_detector import IncrementalLogPoller
+
+    entry = rul_state.get(str(device_id))
+    if entry is not None and "ingest_checkpoint" in entry:
+        high_water_mark, seen = entry["ingest_checkpoint"]
+        return IncrementalLogPoller(window_seconds=None, high_water_mark=high_water_mark, seen_at_high_water_mark=seen,
+                                    columns=RUL_COLUMNS, device_id=device_id, store=store or backend)
+    since = entry["last_timestamp"] if entry is not None else None
+    return IncrementalLogPoller(window_seconds=None, backfill_since=since, columns=RUL_COLUMNS, device_id=device_id,
+                                store=store or backend)
+
+
+def record_rul_cursor(rul_state, device_id, poller):
+    """rul_log_poller()로 읽은 위치를 장치의 회귀 상태에 기록합니다 (상태가 아직 없으면 다음에 처음부터 다시 읽음)."""
+    entry = rul_state.get(str(device_id))
+    if entry is not None:
+        entry["ingest_checkpoint"] = list(poller.checkpoint())
+
+
+@stage_timer("predict_rul")
+def predict_rul_incremental(rul_state, device_id, df_new, rul_model=RUL_MODEL, fresh_only=True):
+    """
+    새 행(df_new)을 회귀 상태에 반영하고 RUL을 예측합니다.
+    fresh_only이면 마지막 체크포인트 이후 시각의 행만 사용하고, 아니면 늦게 들어온 과거 시각의 행도 반영합니다.
+    rul_state는 제자리에서 갱신되며, 호출자가 save_rul_state()로 저장합니다.
+    """
+    key = str(device_id)
+    entry = rul_state.get(key)
+    if entry is None:
+        model = OnlineLinearRegression(RUL_HALF_LIFE_SECONDS)
+        origin = None
+    else:
+        model = OnlineLinearRegression.from_dict(entry["model"])
+        origin = entry["origin"]
+    # 강건 추세용 요약이 없는 이전 체크포인트는 이후 데이터부터 새로 누적
+    trend = DecimatedSeries.from_dict(entry["trend"]) if entry is not None and "trend" in entry else DecimatedSeries(1)
+
+    if not df_new.empty:
+        seconds = to_epoch_seconds(df_new['log_timestamp'])
+        noise = df_new['noise_level'].to_numpy(dtype=np.float64)
+        order = np.argsort(seconds, kind="stable")
+        seconds, noise = seconds[order], noise[order]
+        if entry is not None and fresh_only:
+            # gte 조회로 다시 포함된 체크포인트 시점 이전/동일 행은 제외
+            fresh = seconds > entry["last_epoch"]
+            seconds, noise = seconds[fresh], noise[fresh]
+        if seconds.size:
+            if origin is None:
+                origin = float(seconds[0])
+            model.update(seconds - origin, noise)
+            trend.extend(np.zeros(len(seconds), dtype=np.int64), seconds, noise)
+            last_epoch = float(seconds[-1]) if entry is None else max(float(seconds[-1]), entry["last_epoch"])
+            rul_state[key] = {
+                "origin": origin,
+                "last_epoch": last_epoch,
+                "last_timestamp": datetime.fromtimestamp(last_epoch, tz=timezone.utc).isoformat(),
+                "model": model.to_dict(),
+                "trend": trend.to_dict(0),
+            }
+
+    if origin is None:
+        return None, "데이터 부족"
+    if rul_model != "ols":
+        return rul_from_trend(trend, rul_model, trend.counts.sum())
+    return rul_from_model(model, origin)
+
+
+def bootstrap_rul_from_rollups(rul_state, device_id, store=None):
+    """
+    체크포인트가 없는 장치의 회귀 상태를 전체 원본 로그 대신 1시간 롤업으로 초기화합니다.
+    각 버킷의 평균 노이즈를 버킷 중앙 시각의 점으로, 샘플 수를 가중치로 사용합니다.
+    롤업이 없으면 아무것도 하지 않으며, 이 경우 원본 로그 전체로 초기화됩니다.
+    """
+    return bool(bootstrap_rul_states_from_rollups(rul_state, [device_id], store))
+
+
+def bootstrap_rul_states_from_rollups(rul_state, device_ids, store=None):
+    """
+    bootstrap_rul_from_rollups()의 여러 장치 버전. 장치가 여럿이면 롤업을 한 번에 조회합니다.
+    rul_state에 초기화한 장치 ID 목록을 반환합니다. store를 지정하지 않으면 모듈의 저장소 백엔드에서 읽습니다.
+    """
+    import pandas as pd
+
+    store = store or backend
+
+    device_ids = list(device_ids)
+    if not device_ids:
+        return []
+    # 롤업 서비스가 아직 갱신 중일 수 있는 최근 버킷은 제외하고 원본 로그로 처리
+    complete_before = (math.floor(time.time() / 3600) - 1) * 3600
+    try:
+        rows = store.select_rollups(
+            "1h", until=datetime.fromtimestamp(complete_before, tz=timezone.utc).isoformat(),
+            device_id=device_ids[0] if len(device_ids) == 1 else None, metric="noise_level",
+        )
+    except Exception as e:
+        record_error("predictive_engine")
+        print(f"롤업 조회 중 오류 발생 (원본 로그로 초기화합니다): {e}")
+        return []
+    if not rows:
+        return []
+
+    df = pd.DataFrame(rows)
+    df = df[df["device_id"].isin(device_ids)]
+    seeded = []
+    for device_id, device_df in df.groupby("device_id", sort=False):
+        bucket_start = to_epoch_seconds(device_df["bucket_start"])
+        means = device_df["mean"].to_numpy(dtype=np.float64)
+        counts = device_df["count"].to_numpy()
+        origin = float(bucket_start[0])
+        model = OnlineLinearRegression(RUL_HALF_LIFE_SECONDS)
+        model.update(bucket_start + 1800 - origin, means, counts=counts)
+        trend = DecimatedSeries(1)
+        trend.extend(np.zeros(len(device_df), dtype=np.int64), bucket_start + 1800, means, counts=counts)
+
+        last_epoch = float(bucket_start[-1]) + 3600 - 1e-6
+        rul_state[str(device_id)] = {
+            "origin": origin,
+            "last_epoch": last_epoch,
+            "last_timestamp": datetime.fromtimestamp(last_epoch, tz=timezone.utc).isoformat(),
+            "model": model.to_dict(),
+            "trend": trend.to_dict(0),
+        }
+        seeded.append(device_id)
+    return seeded
+
+
+def get_device_status(health_score, rul_days):
+    """건강 점수와 RUL로부터 장치 상태를 결정합니다."""
+    device_status = "healthy"
+    if health_score < 50:
+        device_status = "warning"
+    if rul_days is not None and rul_days < 30:
+        device_status = "predictive_warning"
+    if health_score < 20 or (rul_days is not None and rul_days < 7):
+        device_status = "critical"
+    return device_status
+
+
 def ensure_device_exists():
     """분석 대상 장치가 DB에 존재하는지 확인하고, 없으면 생성합니다."""
     try:
-        response = supabase.table("sensor_devices").select("id").eq("id", DEVICE_ID).execute()
-        if not response.data:
-            print(f"장치 ID {DEVICE_ID}가 존재하지 않아 새로 생성합니다.")
-            supabase.table("sensor_devices").insert({
-                "id": DEVICE_ID,
-                "device_name": f"Simulated-CMOS-{DEVICE_ID}",
-                "status": "initializing"
-            }).execute()
+        created = backend.ensure_device(DEVICE_ID, {
+            "device_name": f"Simulated-CMOS-{DEVICE_ID}",
+            "status": "initializing"
+        })
+        if created:
+            print(f"장치 ID {DEVICE_ID}가 존재하지 않아 새로 생성했습니다.")
     except Exception as e:
+        record_error("predictor")
         print(f"장치 확인/생성 중 오류: {e}")
         # 이 경우, 테이블이 존재하지 않을 가능성이 높습니다.
         # 실제 환경에서는 DB 스키마 마이그레이션 도구를 사용해야 합니다.
 
-def run_predictive_engine():
-    """주기적으로 RUL과 건강 점수를 계산하고 DB를 업데이트합니다."""
+def create_result_spools(name, directory=SPOOL_DIR, store=None):
+    """
+    예측 결과(sensor_predictions)와 장치 상태(sensor_devices) 쓰기용 로컬 스풀 쌍.
+    둘 다 자연 키(device_id, id) 기준 upsert라 다시 보내도 결과가 같으므로 멱등 키는 붙이지 않습니다.
+    name은 서비스별로 달라야 합니다 (스풀 디렉터리는 한 프로세스만 사용할 수 있음).
+    store를 지정하지 않으면 모듈의 저장소 백엔드로 전송합니다.
+    """
+    store = store or backend
+    return (
+        WriteAheadSpool(os.path.join(directory, f"{name}_predictions"), store.upsert_predictions,
+                        name=f"{name}_predictions", idempotency_keys=False),
+        WriteAheadSpool(os.path.join(directory, f"{name}_device_status"), store.update_devices,
+                        name=f"{name}_device_status", idempotency_keys=False),
+    )
+
+
+def result_writers(result_spools=None):
+    """(예측 결과 upsert, 장치 상태 갱신) 함수 쌍. 스풀이 있으면 로컬 스풀에 기록하고, 없으면 저장소에 직접 씁니다."""
+    if result_spools is None:
+        return backend.upsert_predictions, backend.update_devices
+    prediction_spool, status_spool = result_spools
+    return prediction_spool.append, status_spool.append
+
+
+def run_predictive_engine(rul_model=RUL_MODEL, result_spools=None):
+    """
+    주기적으로 RUL과 건강 점수를 계산하고 DB를 업데이트합니다.
+    result_spools(create_result_spools)를 넘기면 결과를 로컬 스풀에 기록하므로 저장소 장애 중에도 잃지 않습니다.
+    """
+    import pandas as pd
+
     print("예측 유지보수 엔진을 시작합니다. (매시간 실행)")
-    
+    rul_state = load_rul_state()
+    write_predictions, write_statuses = result_writers(result_spools)
+    delivery = "업데이트" if result_spools is None else "스풀에 기록"
+
     while True:
         try:
             # 0. 대상 장치 확인
@@ -137,51 +396,362 @@ def run_predictive_engine():
             one_day_ago = (datetime.utcnow() - timedelta(days=1)).isoformat()
             
             # 지난 24시간 데이터
-            resp_24h = supabase.table("sensor_health_logs").select("*").gte("log_timestamp", one_day_ago).order("log_timestamp", desc=True).execute()
-            df_24h = pd.DataFrame(resp_24h.data)
+            with stage_timer("predict_fetch"):
+                df_24h = pd.DataFrame(backend.select_logs(
+                    since=one_day_ago, device_id=DEVICE_ID, columns=HEALTH_COLUMNS, descending=True,
+                ))
             if not df_24h.empty:
                  df_24h["log_timestamp"] = pd.to_datetime(df_24h["log_timestamp"])
             
-            # 전체 데이터
-            resp_all = supabase.table("sensor_health_logs").select("*").order("log_timestamp", asc=True).execute()
-            df_all = pd.DataFrame(resp_all.data)
-            if not df_all.empty:
-                df_all["log_timestamp"] = pd.to_datetime(df_all["log_timestamp"])
+            # 마지막 체크포인트 이후의 새 데이터만 가져옴 (최초 실행 시 가능하면 롤업으로 초기화)
+            if str(DEVICE_ID) not in rul_state and bootstrap_rul_from_rollups(rul_state, DEVICE_ID):
+                print(f"장치 {DEVICE_ID}의 RUL 회귀 상태를 1시간 롤업으로 초기화했습니다.")
+            # (수신 시각 기준이므로 늦게 들어온 과거 시각의 행도 포함)
+            poller = rul_log_poller(rul_state, DEVICE_ID)
+            with stage_timer("predict_fetch"):
+                rows_new, warming_up = poller.fetch()
+            df_new = pd.DataFrame(rows_new)
+            count_rows("predictor", len(df_24h) + len(df_new))
 
             # 2. 분석 실행
             health_score = get_health_score(df_24h)
-            rul_days, rul_status = predict_rul(df_all)
+            rul_days, rul_status = predict_rul_incremental(rul_state, DEVICE_ID, df_new, rul_model, fresh_only=warming_up)
+            record_rul_cursor(rul_state, DEVICE_ID, poller)
+            save_rul_state(rul_state)
             
             print(f"[{datetime.now()}] 분석 완료: 건강 점수={health_score}, RUL={rul_days}일 ({rul_status})")
 
             # 3. DB 업데이트
             # 3-1. sensor_predictions 테이블에 결과 저장 (Upsert)
-            supabase.table("sensor_predictions").upsert({
+            write_predictions([{
                 "device_id": DEVICE_ID,
                 "predicted_rul_days": rul_days,
                 "health_score": health_score,
                 "prediction_status": rul_status,
                 "created_at": datetime.utcnow().isoformat()
-            }, on_conflict="device_id").execute()
+            }])
 
             # 3-2. sensor_devices 테이블의 상태 업데이트
-            device_status = "healthy"
-            if health_score < 50:
-                device_status = "warning"
-            if rul_days is not None and rul_days < 30:
-                device_status = "predictive_warning"
-            if health_score < 20 or (rul_days is not None and rul_days < 7):
-                device_status = "critical"
-
-            supabase.table("sensor_devices").update({"status": device_status, "last_updated": datetime.utcnow().isoformat()}).eq("id", DEVICE_ID).execute()
-            print(f"장치 {DEVICE_ID}의 상태를 '{device_status}'로 업데이트했습니다.")
+            device_status = get_device_status(health_score, rul_days)
+            write_statuses([{"id": DEVICE_ID, "status": device_status, "last_updated": datetime.utcnow().isoformat()}])
+            print(f"장치 {DEVICE_ID}의 상태를 '{device_status}'로 {delivery}했습니다.")
 
         except Exception as e:
+            record_error("predictor")
             print(f"예측 엔진 실행 중 오류 발생: {e}")
 
         # 1시간 대기
         print("다음 분석까지 1시간 대기합니다...")
         time.sleep(3600)
 
+
+# --- 플릿(Fleet) 모드: 전체 장치를 한 번의 벡터화 연산으로 분석 ---
+
+def classify_device_status(health_score, rul_days):
+    """건강 점수와 RUL 배열로부터 장치 상태 배열을 결정합니다. (NaN RUL은 예측 불가로 취급)"""
+    return np.select(
+        [(health_score < 20) | (rul_days < 7), rul_days < 30, health_score < 50],
+        ["critical", "predictive_warning", "warning"],
+        default="healthy",
+    )
+
+
+def compute_fleet_health_scores(df):
+    """
+    (device_id, log_timestamp) 순으로 정렬된 24시간 로그로부터 장치별 건강 점수를 계산합니다.
+    get_health_score()와 같은 규칙을 groupby 집계로 한 번에 적용합니다.
+    """
+    import pandas as pd
+
+    groups = df.groupby("device_id", sort=True)
+    # 최신/가장 오래된 행은 값이 비어 있어도 그 행을 사용 (get_health_score()의 iloc와 같음, "first"/"last" 집계는 NaN을 건너뜀)
+    first = groups.head(1).set_index("device_id")
+    last = groups.tail(1).set_index("device_id")
+    # 샘플이 하나뿐인 장치는 표준편차가 NaN이므로 점수도 NaN (get_health_score()와 같음)
+    temp_std = groups["temperature"].std()
+    pixel_growth = np.where(groups.size() > 1, last["dead_pixel_count"] - first["dead_pixel_count"], 0)
+    health_score = score_from_components(
+        temp_std.to_numpy(dtype=np.float64),
+        last["noise_level"].to_numpy(dtype=np.float64),
+        pixel_growth.astype(np.float64),
+    )
+    return pd.Series(np.round(health_score, 2), index=temp_std.index, name="health_score")
+
+
+def empty_fleet_state():
+    state = {field: np.empty(0) for field in FLEET_STATE_FIELDS}
+    state["device_id"] = np.empty(0, dtype=np.int64)
+    state["checkpoint_epoch"] = None
+    state["ingest_checkpoint"] = None                # 새 로그 조회 위치 (IncrementalLogPoller.checkpoint())
+    state["trend"] = DecimatedSeries(0)              # 강건 추세 모델용 장치별 시간 구간 요약
+    state["thermal"] = TemperatureNoiseModel(0)      # 장치별 온도-노이즈 지수 모델
+    return state
+
+
+def load_fleet_state(path=FLEET_RUL_STATE_PATH):
+    """플릿 모드의 장치별 회귀 상태를 불러옵니다."""
+    if not os.path.exists(path):
+        return empty_fleet_state()
+    with np.load(path) as data:
+        state = {field: data[field] for field in FLEET_STATE_FIELDS}
+        checkpoint = float(data["checkpoint_epoch"])
+        n = len(state["device_id"])
+        # 추세/온도 모델이 없는 이전 상태 파일은 빈 요약으로 시작하여 이후 데이터부터 누적
+        state["trend"] = DecimatedSeries.from_arrays(data, "trend") if "trend_counts" in data else DecimatedSeries(n)
+        state["thermal"] = TemperatureNoiseModel.from_arrays(data, "thermal") if "thermal_weight" in data else TemperatureNoiseModel(n)
+        # 조회 위치가 없는 이전 상태 파일은 체크포인트 시각부터 이어서 읽은 뒤 수신 시각 커서로 전환
+        state["ingest_checkpoint"] = json.loads(str(data["ingest_checkpoint"])) if "ingest_checkpoint" in data else None
+    state["checkpoint_epoch"] = None if math.isnan(checkpoint) else checkpoint
+    return state
+
+
+def save_fleet_state(state, path=FLEET_RUL_STATE_PATH):
+    """플릿 회귀 상태를 원자적으로 저장합니다."""
+    checkpoint = state["checkpoint_epoch"]
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        np.savez(f, checkpoint_epoch=np.nan if checkpoint is None else checkpoint,
+                 ingest_checkpoint=np.array(json.dumps(state["ingest_checkpoint"])),
+                 **{field: state[field] for field in FLEET_STATE_FIELDS},
+                 **state["trend"].state_arrays("trend"), **state["thermal"].state_arrays("thermal"))
+    os.replace(tmp_path, path)
+
+
+def update_fleet_rul_state(state, device_ids, seconds, noise, temperature=None, fresh_only=True):
+    """
+    새 로그(장치 ID, epoch 초, 노이즈 배열)를 장치별 회귀 상태에 한 번에 반영합니다.
+    fresh_only이면 각 장치의 마지막 체크포인트 이후 행만 사용하고, 아니면 늦게 들어온 과거 시각의 행도 반영합니다.
+    새 장치는 첫 샘플 시각을 원점으로 등록합니다.
+    강건 추세 요약도 함께 갱신하고, temperature를 주면 온도-노이즈 모델도 갱신합니다.
+    """
+    all_ids = np.union1d(state["device_id"], device_ids)
+    n = len(all_ids)
+    existing = np.searchsorted(all_ids, state["device_id"])
+    trend = state["trend"].reindex(existing, n)
+    thermal = state["thermal"].reindex(existing, n)
+
+    def expand(field, fill):
+        values = np.full(n, fill, dtype=np.float64)
+        values[existing] = state[field]
+        return values
+
+    origin = expand("origin", np.nan)
+    last_epoch = expand("last_epoch", -np.inf)
+    count = expand("count", 0.0)
+    moments = tuple(expand(field, 0.0) for field in ("weight", "mean_x", "mean_y", "cov_xy", "var_x"))
+
+    codes = np.searchsorted(all_ids, device_ids)
+    if fresh_only:
+        fresh = seconds > last_epoch[codes]
+        codes, seconds, noise = codes[fresh], seconds[fresh], noise[fresh]
+        if temperature is not None:
+            temperature = temperature[fresh]
+    if temperature is not None:
+        thermal.update(codes, temperature, noise)
+    order = np.lexsort((seconds, codes))
+    codes, seconds, noise = codes[order], seconds[order], noise[order]
+
+    has_new = np.zeros(n, dtype=bool)
+    if codes.size:
+        groups, first_index, group_sizes = np.unique(codes, return_index=True, return_counts=True)
+        has_new[groups] = True
+        origin[groups] = np.where(np.isnan(origin[groups]), seconds[first_index], origin[groups])
+        newest = np.full(n, -np.inf)
+        newest[groups] = seconds[first_index + group_sizes - 1]
+        # 늦게 들어온 행만 있는 장치는 기존 마지막 시각을 감쇠 기준으로 유지
+        newest = np.maximum(newest, last_epoch)
+
+        x = seconds - origin[codes]
+        weights = None
+        if RUL_HALF_LIFE_SECONDS:
+            weights = 0.5 ** ((newest[codes] - seconds) / RUL_HALF_LIFE_SECONDS)
+            elapsed = np.where(np.isfinite(last_epoch), newest - last_epoch, 0.0)
+            decay = np.where(has_new, 0.5 ** (np.maximum(elapsed, 0) / RUL_HALF_LIFE_SECONDS), 1.0)
+            moments = (moments[0] * decay, moments[1], moments[2], moments[3] * decay, moments[4] * decay)
+
+        batch = grouped_moments(codes, n, x, noise, weights)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            merged = merge_moments(moments, batch)
+        moments = tuple(np.where(has_new, m, old) for m, old in zip(merged, moments))
+        count += np.bincount(codes, minlength=n)
+        last_epoch = np.where(has_new, newest, last_epoch)
+        trend.extend(codes, seconds, noise)
+
+    new_state = {"device_id": all_ids, "origin": origin, "last_epoch": last_epoch, "count": count}
+    new_state.update(zip(("weight", "mean_x", "mean_y", "cov_xy", "var_x"), moments))
+    new_state["checkpoint_epoch"] = state["checkpoint_epoch"]
+    new_state["ingest_checkpoint"] = state["ingest_checkpoint"]
+    new_state["trend"] = trend
+    new_state["thermal"] = thermal
+    return new_state
+
+
+def compute_fleet_rul(state, now=None, rul_model=RUL_MODEL):
+    """
+    회귀 상태 배열로부터 장치별 (RUL 일수, 예측 상태)를 rul_from_model()과 같은 규칙으로 계산합니다.
+    rul_model이 "ols"가 아니면 강건 추세 요약(state["trend"])에 해당 모델을 적합한 직선을 사용합니다.
+    """
+    now = time.time() if now is None else now
+    if rul_model == "ols":
+        with np.errstate(invalid="ignore", divide="ignore"):
+            slope = np.where(state["var_x"] > 0, state["cov_xy"] / state["var_x"], np.nan)
+            intercept = state["mean_y"] - slope * state["mean_x"]
+        origin = state["origin"]
+        last_x = state["last_epoch"] - origin
+    else:
+        trend = state["trend"]
+        slope, intercept = fit_trend(trend, rul_model)
+        origin, last_x = trend.origin, trend.last_x
+    with np.errstate(invalid="ignore", divide="ignore"):
+        seconds_to_threshold = (NOISE_CRITICAL_THRESHOLD - intercept) / slope
+
+    insufficient = state["count"] < MIN_RUL_SAMPLES
+    no_trend = ~insufficient & ~(slope > 0)
+    reached = ~insufficient & ~no_trend & (seconds_to_threshold <= last_x)
+    predicted = ~insufficient & ~no_trend & ~reached
+
+    rul_days = np.full(len(slope), np.nan)
+    rul_days[reached] = 0
+    remaining = (origin + seconds_to_threshold - now) / 86400
+    rul_days[predicted] = np.maximum(0, np.floor(remaining[predicted]))
+    rul_status = np.select(
+        [insufficient, no_trend, reached],
+        ["데이터 부족", "노이즈 증가 추세 없음", "임계값 이미 도달"],
+        default="예측 성공",
+    )
+    return rul_days, rul_status
+
+
+def fleet_log_poller(fleet_state):
+    """
+    플릿 회귀 상태에 아직 반영하지 않은 로그를 가져오는 조회기를 만듭니다.
+    최초 실행 시에는 전체 이력을, 조회 위치가 없는 이전 상태는 체크포인트 시각 이후를 warm-up으로 읽고,
+    이후에는 저장소 수신 시각 기준으로 새로 들어온 행(늦게 들어온 과거 시각의 행 포함)을 읽습니다.
+    """
+    from anomaly_detector import IncrementalLogPoller
+
+    if fleet_state["ingest_checkpoint"] is not None:
+        high_water_mark, seen = fleet_state["ingest_checkpoint"]
+        return IncrementalLogPoller(window_seconds=None, high_water_mark=high_water_mark,
+                                    seen_at_high_water_mark=seen, columns=FLEET_COLUMNS)
+    checkpoint = fleet_state["checkpoint_epoch"]
+    since = None if checkpoint is None else datetime.fromtimestamp(checkpoint, tz=timezone.utc).isoformat()
+    return IncrementalLogPoller(window_seconds=None, backfill_since=since, columns=FLEET_COLUMNS)
+
+
+def _fleet_frame(df):
+    """장치가 지정된 로그만 남기고 epoch 초 컬럼을 붙여 (device_id, epoch) 순으로 정렬합니다."""
+    df = df.dropna(subset=["device_id"])
+    df["device_id"] = df["device_id"].astype(np.int64)
+    df["epoch"] = to_epoch_seconds(df["log_timestamp"])
+    return df.sort_values(["device_id", "epoch"], kind="stable")
+
+
+def run_fleet_cycle(fleet_state, rul_model=RUL_MODEL, result_spools=None):
+    """
+    전체 장치의 건강 점수와 RUL을 한 번에 계산하고 bulk upsert/update로 저장합니다 (result_spools가 있으면 스풀 경유).
+    갱신된 플릿 회귀 상태를 반환합니다.
+    """
+    import pandas as pd
+
+    now = time.time()
+    one_day_ago = now - 86400
+
+    # 회귀 상태에는 지난 주기 이후 저장소에 들어온 행을, 건강 점수에는 지난 24시간 행을 사용
+    poller = fleet_log_poller(fleet_state)
+    with stage_timer("fleet_fetch"):
+        rows_new, warming_up = poller.fetch()
+        df_24h = pd.DataFrame(backend.select_logs(
+            since=datetime.fromtimestamp(one_day_ago, tz=timezone.utc).isoformat(), columns=FLEET_COLUMNS,
+        ))
+    count_rows("fleet", len(rows_new) + len(df_24h))
+    if df_24h.empty and not rows_new:
+        print(f"[{datetime.now()}] 분석할 플릿 데이터가 없습니다.")
+        return fleet_state
+
+    df_new = _fleet_frame(pd.DataFrame(rows_new, columns=[column.strip() for column in FLEET_COLUMNS.split(",")]))
+
+    # warm-up 구간은 체크포인트 이전 행을 건너뛰고, 이후에는 처음 받은 행이므로 과거 시각의 행도 반영
+    fleet_state = update_fleet_rul_state(
+        fleet_state, df_new["device_id"].to_numpy(), df_new["epoch"].to_numpy(),
+        df_new["noise_level"].to_numpy(dtype=np.float64), df_new["temperature"].to_numpy(dtype=np.float64),
+        fresh_only=warming_up,
+    )
+    if not df_new.empty:
+        newest = float(df_new["epoch"].max())
+        checkpoint = fleet_state["checkpoint_epoch"]
+        fleet_state["checkpoint_epoch"] = newest if checkpoint is None else max(checkpoint, newest)
+    fleet_state["ingest_checkpoint"] = list(poller.checkpoint())
+    save_fleet_state(fleet_state)
+    if df_24h.empty:
+        print(f"[{datetime.now()}] 지난 24시간 플릿 데이터가 없어 건강 점수를 계산하지 않습니다.")
+        return fleet_state
+
+    health_score = compute_fleet_health_scores(_fleet_frame(df_24h))
+    device_ids = health_score.index.to_numpy()
+    state_index = np.searchsorted(fleet_state["device_id"], device_ids)
+    rul_days, rul_status = compute_fleet_rul(fleet_state, now, rul_model)
+    rul_days, rul_status = rul_days[state_index], rul_status[state_index]
+    device_status = classify_device_status(health_score.to_numpy(), rul_days)
+
+    created_at = datetime.utcnow().isoformat()
+    rul_values = [None if math.isnan(days) else int(days) for days in rul_days.tolist()]
+    scores = [None if math.isnan(score) else score for score in health_score.tolist()]
+    predictions = [
+        {"device_id": device_id, "predicted_rul_days": days, "health_score": score,
+         "prediction_status": status, "created_at": created_at}
+        for device_id, days, score, status in zip(device_ids.tolist(), rul_values, scores, rul_status.tolist())
+    ]
+    write_predictions, write_statuses = result_writers(result_spools)
+    write_predictions(predictions)
+    write_statuses([
+        {"id": device_id, "status": status, "last_updated": created_at}
+        for device_id, status in zip(device_ids.tolist(), device_status.tolist())
+    ])
+
+    counts = pd.Series(device_status).value_counts().to_dict()
+    thermal = fleet_state["thermal"]
+    with np.errstate(invalid="ignore"):
+        exponent = np.nanmedian(thermal.exponent[state_index]) if len(state_index) else np.nan
+    print(f"[{datetime.now()}] 플릿 분석 완료: 장치 {len(device_ids)}개, 상태 분포={counts}, "
+          f"RUL 모델={rul_model}, 온도-노이즈 지수 중앙값={exponent:.3f}/°C")
+    return fleet_state
+
+
+def run_fleet_engine(interval=3600, rul_model=RUL_MODEL, result_spools=None):
+    """플릿 모드 메인 루프. 주기적으로 모든 장치를 한 번에 분석합니다."""
+    print("예측 유지보수 엔진을 플릿 모드로 시작합니다.")
+    fleet_state = load_fleet_state()
+
+    while True:
+        try:
+            with stage_timer("fleet_cycle"):
+                fleet_state = run_fleet_cycle(fleet_state, rul_model, result_spools)
+        except Exception as e:
+            record_error("predictor")
+            print(f"플릿 분석 중 오류 발생: {e}")
+
+        print(f"다음 분석까지 {interval}초 대기합니다...")
+        time.sleep(interval)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="CMOS 센서 예측 유지보수 엔진")
+    parser.add_argument("--fleet", action="store_true", help="모든 장치를 한 번에 분석하는 플릿 모드로 실행")
+    parser.add_argument("--interval", type=float, default=3600, help="플릿 모드 분석 주기(초)")
+    parser.add_argument("--rul-model", choices=TREND_MODELS, default=RUL_MODEL,
+                        help="RUL 추세 모델 (ols: 전체 이력 최소자승, theil_sen/huber: 솎아낸 표본에 강건 적합)")
+    parser.add_argument("--spool-dir", default=SPOOL_DIR, help="예측 결과/장치 상태 쓰기용 로컬 스풀 디렉터리")
+    parser.add_argument("--no-spool", action="store_true", help="스풀 없이 저장소에 직접 기록 (장애 시 결과 유실)")
+    return parser.parse_args()
+
+
 if __name__ == "__main__":
-    run_predictive_engine()
+    args = parse_args()
+    start_from_env()
+    if args.fleet:
+        spools = None if args.no_spool else create_result_spools("fleet_predictor", args.spool_dir)
+        run_fleet_engine(args.interval, args.rul_model, spools)
+    else:
+        spools = None if args.no_spool else create_result_spools("predictor", args.spool_dir)
+        run_predictive_engine(args.rul_model, spools)
@@ -0,0 +1,383 @@
+import os
+import time
+import asyncio
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import anomaly_detector
+from alert_pipeline import AlertPipeline
+from anomaly_detector import StreamingAnomalyDetector
+from metrics import REGISTRY, count_rows, record_error, start_from_env, track_queue_depth
+from timeutil import parse_timestamp
+
+# --- 이벤트 기반(실시간) 탐지 설정 ---
+REALTIME_TABLE = "sensor_health_logs"
+REALTIME_ALERT_COALESCE_SECONDS = 0.5   # 이벤트 모드의 경고 합치기 시간. 한 틱의 장치 전체 버스트는 이 안에 도착하므로 요약 경고는 유지됨
+FALLBACK_POLL_INTERVAL_SECONDS = 10     # 구독이 끊긴 동안 사용하는 증분 폴링 주기 (기존 run_detector와 동일)
+RECONNECT_INITIAL_SECONDS = 1           # 재연결 대기 시간 초기값 (실패할 때마다 두 배)
+RECONNECT_MAX_SECONDS = 60              # 재연결 대기 시간 상한
+CATCH_UP_OVERLAP_SECONDS = 60           # 끊김 후 보충 조회 시 마지막으로 처리한 수신 시각보다 이만큼 앞에서부터 다시 조회 (이벤트 지연, 시계 차이 대비)
+EVENT_QUEUE_CAPACITY = 100000           # 처리 대기 이벤트 상한. 초과 시 버리고 보충 조회로 복구
+RECENT_KEYS_MIN_SWEEP = 10000           # 중복 제거용 최근 행 키가 이 수를 넘으면 오래된 키를 정리
+
+# 로그 타임스탬프(샘플링 시각)부터 검사 완료까지의 지연 (_count가 처리한 이벤트 수)
+EVENT_LATENCY_SECONDS = REGISTRY.histogram("cmos_realtime_event_latency_seconds", "실시간 이벤트의 샘플링 시각부터 검사 완료까지 지연")
+
+
+def _iso(epoch_seconds):
+    return datetime.fromtimestamp(epoch_seconds, tz=timezone.utc).replace(tzinfo=None).isoformat()
+
+
+def _payload_record(payload):
+    """Realtime postgres_changes 페이로드에서 삽입된 행을 꺼냅니다 (클라이언트 버전별 형식 모두 지원)."""
+    if not isinstance(payload, dict):
+        return None
+    data = payload.get("data")
+    if isinstance(data, dict) and data.get("record") is not None:
+        return data["record"]
+    return payload.get("new") or payload.get("record")
+
+
+class LogEventSource:
+    """
+    sensor_health_logs INSERT 이벤트 소스 인터페이스.
+    콜백은 임의의 스레드에서 호출될 수 있습니다.
+    """
+
+    async def start(self, on_row, on_status):
+        """구독을 시작합니다. 새 행마다 on_row(row)를, 연결 상태가 바뀌면 on_status("connected" | "disconnected")를 호출합니다."""
+        raise NotImplementedError
+
+    async def stop(self):
+        """구독을 해제합니다. 구독 중이 아니면 아무것도 하지 않습니다."""
+        raise NotImplementedError
+
+
+class SupabaseRealtimeSource(LogEventSource):
+    """
+    Supabase Realtime(postgres_changes) 구독. 대시보드의 실시간 차트/경고 토스트와 같은 방식으로
+    sensor_health_logs 테이블의 INSERT를 받습니다. 테이블이 supabase_realtime publication에 포함되어 있어야 합니다.
+    """
+
+    def __init__(self, url, key, table=REALTIME_TABLE, schema="public"):
+        self.url = url
+        self.key = key
+        self.table = table
+        self.schema = schema
+        self._client = None
+        self._channel = None
+
+    @classmethod
+    def from_env(cls):
+        from dotenv import load_dotenv
+
+        # 저장소 백엔드는 지연 생성되므로 구독 전에 .env.local을 직접 로드 (storage.create_backend와 동일)
+        load_dotenv(dotenv_path='.env.local')
+        supabase_url = os.getenv("NEXT_PUBLIC_SUPABASE_URL")
+        supabase_key = os.getenv("NEXT_PUBLIC_SUPABASE_ANON_KEY")
+
+        if not supabase_url or not supabase_key:
+            raise ValueError("Supabase URL 또는 Key가 환경 변수에 설정되지 않았습니다.")
+
+        return cls(supabase_url, supabase_key)
+
+    async def start(self, on_row, on_status):
+        # Realtime 구독은 비동기 클라이언트에서만 지원됨
+        from supabase import acreate_client
+
+        if self._client is None:
+            self._client = await acreate_client(self.url, self.key)
+
+        def on_insert(payload):
+            record = _payload_record(payload)
+            if record is not None:
+                on_row(record)
+
+        def on_subscribe(state, error=None):
+            state = getattr(state, "value", state)
+            if state == "SUBSCRIBED":
+                on_status("connected")
+            elif state in ("CHANNEL_ERROR", "TIMED_OUT", "CLOSED"):
+                if error is not None:
+                    print(f"실시간 구독 오류 ({state}): {error}")
+                on_status("disconnected")
+
+        channel = self._client.channel(f"detector-{self.table}")
+        channel.on_postgres_changes("INSERT", schema=self.schema, table=self.table, callback=on_insert)
+        self._channel = channel
+        await channel.subscribe(on_subscribe)
+
+    async def stop(self):
+        if self._channel is None:
+            return
+        channel, self._channel = self._channel, None
+        try:
+            await self._client.remove_channel(channel)
+        except Exception as e:
+            print(f"실시간 구독 해제 중 오류 발생: {e}")
+
+
+class LocalEventSource(LogEventSource):
+    """
+    테스트/로컬 실행용 이벤트 소스. publish()로 전달한 행을 INSERT 이벤트처럼 구독자에게 보냅니다.
+    disconnect()로 연결 끊김을 흉내 낼 수 있으며, 끊긴 동안 publish된 행은 실제 Realtime처럼 전달되지 않습니다.
+    """
+
+    def __init__(self):
+        self.refuse_connections = False  # True이면 start()가 실패 (재연결 실패 흉내)
+        self._on_row = None
+        self._on_status = None
+
+    async def start(self, on_row, on_status):
+        if self.refuse_connections:
+            raise ConnectionError("로컬 이벤트 소스가 연결을 거부했습니다.")
+        self._on_row, self._on_status = on_row, on_status
+        on_status("connected")
+
+    async def stop(self):
+        self._on_row = None
+
+    def publish(self, rows):
+        """삽입이 끝난 행들을 구독자에게 전달합니다. 어느 스레드에서나 호출할 수 있습니다."""
+        on_row = self._on_row
+        if on_row is None:
+            return
+        for row in rows:
+            on_row(row)
+
+    def disconnect(self, refuse_reconnect=False):
+        """구독 연결이 끊긴 것처럼 동작합니다."""
+        self.refuse_connections = refuse_reconnect
+        on_status, self._on_row = self._on_status, None
+        if on_status is not None:
+            on_status("disconnected")
+
+
+class EventDrivenDetector:
+    """
+    INSERT 이벤트가 도착할 때마다 행을 바로 검사하는 이벤트 기반 탐지기.
+
+    - 구독 중에는 DB를 조회하지 않으며, 시작/재연결 시에만 증분 조회로 그 사이 들어온 행을 보충합니다.
+    - 구독이 끊기면 poll_interval마다 증분 폴링으로 전환하고, 지수 백오프로 재연결을 시도합니다.
+    - 이벤트와 보충 조회가 겹치는 행은 (장치, 타임스탬프) 키로 한 번만 처리합니다.
+    """
+
+    def __init__(self, source, detector=None, alerts=None, poll_interval=FALLBACK_POLL_INTERVAL_SECONDS,
+                 executor=None, queue_capacity=EVENT_QUEUE_CAPACITY):
+        self.source = source
+        self.alerts = alerts or AlertPipeline(anomaly_detector.get_alert_spool().append,
+                                              coalesce_seconds=REALTIME_ALERT_COALESCE_SECONDS, stamp_created_at=True)
+        self.detector = detector or StreamingAnomalyDetector(alert_fn=self.alerts.submit)
+        self.poll_interval = poll_interval
+        self.executor = executor or ThreadPoolExecutor(max_workers=1, thread_name_prefix="cmos-realtime")
+        self.queue_capacity = queue_capacity
+        self.connected = False
+        self._loop = None
+        self._queue = None
+        self._gap = False           # 이벤트를 놓쳤을 수 있음 (끊김/대기열 초과) -> 다음 조회 시 되감아 보충
+        self._gap_since = None      # 처음 놓쳤을 때까지 처리한 커서 위치 (보충 조회는 여기서부터 되감음)
+        self._high_water = None     # 처리한 행 중 가장 늦은 조회 커서 위치 (기본: 저장소 수신 시각, epoch 초)
+        self._recent = {}           # (device_id, 샘플링 epoch 초) -> 커서 위치(epoch 초), 중복 제거용
+        self._sweep_at = RECENT_KEYS_MIN_SWEEP
+        self._backoff = RECONNECT_INITIAL_SECONDS
+        self._next_poll = None
+        self._next_reconnect = None
+        # 통계
+        self.events_processed = 0
+        self.events_dropped = 0
+        self.rows_polled = 0
+        self.duplicates = 0
+        self.queries = 0
+        self.disconnects = 0
+        self._latency_sum = 0.0
+        self._latency_max = 0.0
+        self._latency_count = 0
+
+    # --- 이벤트 소스 콜백 (임의의 스레드에서 호출됨) ---
+    def _on_row(self, row):
+        self._loop.call_soon_threadsafe(self._offer, ("row", row))
+
+    def _on_status(self, status):
+        self._loop.call_soon_threadsafe(self._offer, ("status", status))
+
+    def _offer(self, item):
+        if item[0] == "row" and self._queue.qsize() >= self.queue_capacity:
+            # 버린 행은 대기열이 비었을 때 되감기 조회로 다시 가져옴
+            self.events_dropped += 1
+            count_rows("realtime_dropped", 1)
+            self._mark_gap()
+            return
+        self._queue.put_nowait(item)
+
+    def _mark_gap(self):
+        """
+        이벤트를 놓쳤을 수 있음을 기록합니다. 놓친 뒤에도 대기열의 행을 처리하며 _high_water가 계속 올라가므로,
+        처음 놓친 시점까지 처리한 위치를 남겨 두고 보충 조회는 그 위치부터 되감습니다.
+        """
+        if not self._gap:
+            self._gap = True
+            self._gap_since = self._high_water
+
+    # --- 처리 ---
+    def _admit(self, row):
+        """처음 보는 행이면 기록하고 True를 반환합니다."""
+        key = (row.get("device_id"), parse_timestamp(row["log_timestamp"]))
+        if key in self._recent:
+            self.duplicates += 1
+            return False
+        # 늦게 들어온 과거 타임스탬프 행도 되감기 기준은 수신 시각이므로, 샘플링 시각이 아닌 커서 위치로 기록
+        cursor = self._cursor_position(row)
+        self._recent[key] = cursor
+        if self._high_water is None or cursor > self._high_water:
+            self._high_water = cursor
+        # 보충 조회를 기다리는 동안에는 되감을 위치 이후의 키를 남겨 둠 (위치를 모르면 정리하지 않음)
+        if len(self._recent) > self._sweep_at and not (self._gap and self._gap_since is None):
+            # 되감기 조회 범위(CATCH_UP_OVERLAP_SECONDS)보다 오래된 키는 다시 들어올 수 없으므로 제거
+            cutoff = (self._gap_since if self._gap else self._high_water) - CATCH_UP_OVERLAP_SECONDS
+            self._recent = {k: t for k, t in self._recent.items() if t >= cutoff}
+            self._sweep_at = max(RECENT_KEYS_MIN_SWEEP, 2 * len(self._recent))
+        return True
+
+    def _cursor_position(self, row):
+        """행의 증분 조회 커서 값(epoch 초). 로컬 이벤트처럼 수신 시각이 없는 행은 받은 시각으로 대신합니다."""
+        value = row.get(self.detector.poller.cursor_column)
+        return time.time() if value is None else parse_timestamp(value)
+
+    def _process_event(self, row):
+        if not self._admit(row):
+            return
+        self.detector.process_sample(row)
+        self.events_processed += 1
+        # 측정 지연 = 로그 타임스탬프(샘플링 시각)부터 검사 완료까지
+        latency = max(0.0, time.time() - parse_timestamp(row["log_timestamp"]))
+        EVENT_LATENCY_SECONDS.observe(latency)
+        self._latency_sum += latency
+        self._latency_count += 1
+        self._latency_max = max(self._latency_max, latency)
+
+    async def _catch_up(self):
+        """증분 조회로 아직 처리하지 않은 행을 가져와 처리합니다. 이벤트를 놓쳤을 수 있으면 먼저 되감습니다."""
+        poller = self.detector.poller
+        if self._gap and self._gap_since is not None:
+            poller.rewind(_iso(self._gap_since - CATCH_UP_OVERLAP_SECONDS))
+        self._gap = False
+        self._gap_since = None
+        try:
+            self.queries += 1
+            rows, warming_up = await self._loop.run_in_executor(self.executor, poller.fetch)
+        except Exception as e:
+            record_error("realtime")
+            print(f"데이터 분석 중 오류 발생: {e}")
+            return
+        rows = [row for row in rows if self._admit(row)]
+        self.detector.process_rows(rows, warming_up)
+        self.rows_polled += len(rows)
+        count_rows("realtime_polled", len(rows))
+
+    async def _connect(self):
+        try:
+            await self.source.stop()
+            await self.source.start(self._on_row, self._on_status)
+        except Exception as e:
+            record_error("realtime")
+            print(f"실시간 구독 연결 실패 ({self._backoff:.0f}초 후 재시도): {e}")
+        self._next_reconnect = self._loop.time() + self._backoff
+        self._backoff = min(self._backoff * 2, RECONNECT_MAX_SECONDS)
+
+    async def _set_connected(self, connected):
+        if connected == self.connected:
+            return
+        self.connected = connected
+        if connected:
+            self._backoff = RECONNECT_INITIAL_SECONDS
+            print("실시간 구독 연결됨: 이벤트 기반 탐지로 전환합니다 (폴링 중지).")
+            # 구독 전/끊긴 동안 들어온 행 보충. 구독 이후 이벤트와 겹치는 행은 중복 제거됨
+            await self._catch_up()
+        else:
+            self.disconnects += 1
+            self._mark_gap()
+            now = self._loop.time()
+            self._next_poll = now
+            self._next_reconnect = now + self._backoff
+            print(f"실시간 구독이 끊겼습니다: {self.poll_interval:.0f}초 간격 증분 폴링으로 전환하고 재연결을 시도합니다.")
+
+    def _timeout(self):
+        """다음 할 일(경고 flush, 폴링, 재연결)까지 남은 시간. 구독 중이고 대기 경고가 없으면 None(무기한 대기)."""
+        deadlines = []
+        due = self.alerts.seconds_until_due()
+        if due is not None:
+            deadlines.append(due)
+        if not self.connected:
+            now = self._loop.time()
+            deadlines.append(self._next_poll - now)
+            deadlines.append(self._next_reconnect - now)
+        return max(0.0, min(deadlines)) if deadlines else None
+
+    async def run(self):
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        track_queue_depth("realtime_events", self._queue.qsize)
+        now = self._loop.time()
+        self._next_poll = now + self.poll_interval
+        await self._connect()
+        # 최초 warm-up: 롤링 윈도우를 채우고, 구독 시작 전에 들어온 행을 처리
+        await self._catch_up()
+
+        while True:
+            try:
+                kind, value = await asyncio.wait_for(self._queue.get(), self._timeout())
+            except asyncio.TimeoutError:
+                kind = value = None
+
+            if kind == "row":
+                self._process_event(value)
+            elif kind == "status":
+                await self._set_connected(value == "connected")
+
+            if self._queue.empty():
+                now = self._loop.time()
+                if not self.connected:
+                    if now >= self._next_reconnect:
+                        await self._connect()
+                    if now >= self._next_poll:
+                        await self._catch_up()
+                        self._next_poll = now + self.poll_interval
+                elif self._gap:
+                    await self._catch_up()
+            self.alerts.maybe_flush()
+
+    def report(self):
+        """지난 보고 이후의 이벤트 지연 시간과 누적 통계를 문자열로 반환하고 지연 시간 통계를 초기화합니다."""
+        mean = self._latency_sum / self._latency_count if self._latency_count else 0.0
+        text = (f"실시간 탐지({'구독 중' if self.connected else '폴링 중'}): 이벤트 {self.events_processed}건, "
+                f"보충 조회 {self.rows_polled}행 / DB 조회 {self.queries}회, 중복 {self.duplicates}건, "
+                f"버림 {self.events_dropped}건, 끊김 {self.disconnects}회, "
+                f"지연 평균 {mean * 1000:.0f}ms / 최대 {self._latency_max * 1000:.0f}ms")
+        self._latency_sum = self._latency_max = 0.0
+        self._latency_count = 0
+        return text
+
+
+async def run_realtime_detector(source, report_interval=60.0):
+    detector = EventDrivenDetector(source)
+    print("이벤트 기반 이상 징후 탐지 엔진을 시작합니다. 새 로그가 삽입될 때마다 즉시 분석합니다.")
+
+    async def report():
+        while True:
+            await asyncio.sleep(report_interval)
+            print(f"[{datetime.now()}] {detector.report()}")
+
+    await asyncio.gather(detector.run(), report())
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Supabase Realtime 기반 이벤트 구동 이상 탐지기")
+    parser.add_argument("--report-interval", type=float, default=60.0, help="통계 출력 주기 (초)")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    start_from_env()
+    asyncio.run(run_realtime_detector(SupabaseRealtimeSource.from_env(), args.report_interval))
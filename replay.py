@@ -0,0 +1,291 @@
+import os
+import glob
+import json
+import time
+import argparse
+from collections import Counter
+from datetime import datetime, timezone
+from itertools import groupby
+
+import numpy as np
+
+from alert_pipeline import AlertCooldownStore, AlertPipeline
+from anomaly_detector import (
+    LOG_COLUMNS,
+    SIGMA_FACTOR,
+    SPIKE_SENSITIVITY,
+    THRESHOLDS,
+    IncrementalLogPoller,
+    StreamingAnomalyDetector,
+    backend,
+)
+from predictive_engine import compute_fleet_rul, empty_fleet_state, update_fleet_rul_state
+from sensor_emulator import BulkInsertBuffer, VirtualSensorFleet
+from sim_clock import SimulatedClock
+from storage import SQLiteBackend
+from timeutil import parse_timestamp
+
+# --- 재생(Replay)/백필 설정 ---
+REPLAY_CHUNK_ROWS = 50000          # 한 번에 처리할 행 수
+PREDICT_INTERVAL_SECONDS = 86400   # 가상 시각 기준 RUL 예측 주기 (1일)
+LOG_WRITE_BATCH_SIZE = 5000        # 로그를 기록할 때 bulk insert 한 번에 보낼 행 수
+PROGRESS_INTERVAL_SECONDS = 10     # 진행 상황 출력 주기 (실제 시간)
+
+
+def _iso(epoch_seconds):
+    return datetime.fromtimestamp(epoch_seconds, tz=timezone.utc).replace(tzinfo=None).isoformat()
+
+
+def generate_rows(num_devices, start, end, interval=5.0, seed=0, chunk_rows=REPLAY_CHUNK_ROWS):
+    """에뮬레이터의 센서 모델로 [start, end) 구간의 합성 로그를 생성하여 청크(행 리스트) 단위로 돌려줍니다."""
+    fleet = VirtualSensorFleet(num_devices, seed=seed, start_time=start)
+    ticks_per_chunk = max(1, chunk_rows // num_devices)
+    ticks = np.arange(start, end, interval)
+    for i in range(0, len(ticks), ticks_per_chunk):
+        rows = []
+        for t in ticks[i:i + ticks_per_chunk].tolist():
+            rows.extend(fleet.sample_rows(_iso(t), now=t))
+        yield rows
+
+
+def backend_rows(since=None, until=None, chunk_rows=REPLAY_CHUNK_ROWS, columns=LOG_COLUMNS):
+    """설정된 저장소 백엔드의 과거 로그를 시간순으로 청크 단위로 돌려줍니다."""
+    # 과거 구간 재생은 샘플링 시각 순서가 필요하므로 수신 시각 대신 log_timestamp를 커서로 사용
+    poller = IncrementalLogPoller(window_seconds=None, high_water_mark=since, columns=columns, cursor_column="log_timestamp")
+    until_epoch = None if until is None else parse_timestamp(until)
+    while True:
+        rows, _ = poller.fetch(max_rows=chunk_rows)
+        if not rows:
+            return
+        if until_epoch is not None:
+            rows = [row for row in rows if parse_timestamp(row["log_timestamp"]) < until_epoch]
+            if not rows:
+                return
+        yield rows
+
+
+def archive_rows(directory="archive", chunk_rows=REPLAY_CHUNK_ROWS):
+    """archive_to_parquet()로 만든 날짜별 Parquet 아카이브를 시간순으로 청크 단위로 돌려줍니다."""
+    import pandas as pd
+
+    columns = [column.strip() for column in LOG_COLUMNS.split(",")]
+    for path in sorted(glob.glob(os.path.join(directory, "sensor_health_logs_*.parquet"))):
+        df = pd.read_parquet(path, columns=columns).sort_values("log_timestamp", kind="stable")
+        df = df.astype(object).where(df.notna(), None)
+        for start in range(0, len(df), chunk_rows):
+            yield df.iloc[start:start + chunk_rows].to_dict("records")
+
+
+class ReplayRunner:
+    """
+    과거(또는 합성) 로그를 가상 시각 기준으로 빠르게 재생합니다.
+    운영과 같은 StreamingAnomalyDetector와 경고 파이프라인(쿨다운/합치기)을 사용하며,
+    RUL은 플릿 회귀 상태를 청크 단위로 갱신하여 predict_interval마다 가상 시각 기준으로 예측합니다.
+    output 백엔드를 지정하면 경고/예측(과 write_logs=True일 때 로그)을 기록합니다.
+    """
+
+    def __init__(self, output=None, write_logs=False, predict_interval=PREDICT_INTERVAL_SECONDS, speedup=None,
+                 thresholds=None, spike_sensitivity=SPIKE_SENSITIVITY, sigma_factor=SIGMA_FACTOR):
+        self.output = output
+        self.predict_interval = predict_interval
+        self.clock = SimulatedClock(start=0, speedup=speedup)
+        self.alerts = AlertPipeline(
+            self._write_alerts, cooldown=AlertCooldownStore(path=None), clock=self.clock.time,
+            stamp_created_at=True, verbose=False,
+        )
+        self.detector = StreamingAnomalyDetector(
+            alert_fn=self.alerts.submit, thresholds=thresholds,
+            spike_sensitivity=spike_sensitivity, sigma_factor=sigma_factor,
+        )
+        self.log_buffer = None
+        if output is not None and write_logs:
+            self.log_buffer = BulkInsertBuffer(output.insert_logs, max_rows=LOG_WRITE_BATCH_SIZE, max_age_seconds=float("inf"))
+        self.rul_state = empty_fleet_state()
+        self.next_predict = None
+        self.first_timestamp = None
+        self.rows_processed = 0
+        self.alert_counts = Counter()
+        self.rul_history = []
+
+    def _write_alerts(self, rows):
+        if self.output is not None:
+            self.output.insert_alerts(rows)
+        for row in rows:
+            self.alert_counts[(row["metric"], row["details"].get("rule"), row["severity"])] += 1
+
+    def process(self, rows):
+        """시간순으로 정렬된 행 청크를 처리합니다."""
+        if not rows:
+            return
+        if self.log_buffer is not None:
+            self.log_buffer.extend(rows)
+
+        # 같은 타임스탬프의 행을 묶어 가상 시각을 맞춘 뒤 탐지 (경고 쿨다운/합치기가 가상 시각을 따름)
+        for timestamp, group in groupby(rows, key=lambda row: row["log_timestamp"]):
+            now = parse_timestamp(timestamp)
+            if self.first_timestamp is None:
+                self.first_timestamp = now
+                self.clock.set_time(now)
+                self.next_predict = now + self.predict_interval
+            self.clock.advance_to(now)
+            self.detector.process_rows(list(group))
+            self.alerts.maybe_flush()
+
+        self.rows_processed += len(rows)
+
+        # RUL 회귀 상태는 청크 전체를 한 번에 갱신
+        rul_rows = [row for row in rows if row.get("device_id") is not None and row.get("noise_level") is not None]
+        if rul_rows:
+            count = len(rul_rows)
+            self.rul_state = update_fleet_rul_state(
+                self.rul_state,
+                np.fromiter((row["device_id"] for row in rul_rows), dtype=np.int64, count=count),
+                np.fromiter((parse_timestamp(row["log_timestamp"]) for row in rul_rows), dtype=np.float64, count=count),
+                np.fromiter((row["noise_level"] for row in rul_rows), dtype=np.float64, count=count),
+            )
+
+        if self.clock.time() >= self.next_predict:
+            self.predict()
+            while self.next_predict <= self.clock.time():
+                self.next_predict += self.predict_interval
+
+    def predict(self):
+        """현재 가상 시각 기준으로 전체 장치의 RUL을 계산하고 기록합니다."""
+        if not len(self.rul_state["device_id"]):
+            return
+        now = self.clock.time()
+        rul_days, rul_status = compute_fleet_rul(self.rul_state, now)
+        self.rul_history.append({
+            "time": _iso(now),
+            "devices": int(len(rul_days)),
+            "status_counts": dict(Counter(rul_status.tolist())),
+            "median_rul_days": None if np.isnan(rul_days).all() else float(np.nanmedian(rul_days)),
+        })
+        if self.output is not None:
+            created_at = _iso(now)
+            self.output.upsert_predictions([
+                {"device_id": device_id, "predicted_rul_days": None if np.isnan(days) else int(days),
+                 "health_score": None, "prediction_status": status, "created_at": created_at}
+                for device_id, days, status in zip(self.rul_state["device_id"].tolist(), rul_days.tolist(), rul_status.tolist())
+            ])
+
+    def finish(self):
+        """남은 경고/로그를 기록하고 마지막 RUL을 계산합니다."""
+        self.alerts.flush()
+        if self.log_buffer is not None:
+            self.log_buffer.flush()
+        self.predict()
+
+    def summary(self, wall_seconds):
+        simulated_seconds = self.clock.time() - self.first_timestamp if self.first_timestamp is not None else 0.0
+        return {
+            "rows": self.rows_processed,
+            "devices": int(len(self.rul_state["device_id"])),
+            "simulated_start": None if self.first_timestamp is None else _iso(self.first_timestamp),
+            "simulated_end": None if self.first_timestamp is None else _iso(self.clock.time()),
+            "simulated_days": round(simulated_seconds / 86400, 3),
+            "wall_seconds": round(wall_seconds, 3),
+            "speedup": round(simulated_seconds / wall_seconds, 1) if wall_seconds > 0 else None,
+            "rows_per_second": round(self.rows_processed / wall_seconds, 1) if wall_seconds > 0 else None,
+            "alerts_received": self.alerts.alerts_received,
+            "alerts_suppressed": self.alerts.alerts_suppressed,
+            "alerts_written": self.alerts.alerts_written,
+            "alerts_by_rule": [
+                {"metric": metric, "rule": rule, "severity": severity, "count": count}
+                for (metric, rule, severity), count in sorted(self.alert_counts.items(), key=str)
+            ],
+            "rul": self.rul_history,
+        }
+
+
+def run_replay(chunks, runner):
+    """청크 스트림을 끝까지 재생하고 요약 dict를 반환합니다."""
+    started = time.perf_counter()
+    last_report = started
+    for rows in chunks:
+        runner.process(rows)
+        if time.perf_counter() - last_report >= PROGRESS_INTERVAL_SECONDS:
+            last_report = time.perf_counter()
+            elapsed = last_report - started
+            print(f"[{datetime.now()}] 가상 시각 {_iso(runner.clock.time())}까지 {runner.rows_processed:,}행 처리 "
+                  f"({runner.rows_processed / elapsed:,.0f} rows/s, 경고 {runner.alerts.alerts_written}건)")
+    runner.finish()
+    return runner.summary(time.perf_counter() - started)
+
+
+def parse_threshold_overrides(values):
+    """'metric.level=value' 형식의 임계값 변경을 THRESHOLDS 사본에 적용합니다."""
+    thresholds = {metric: dict(levels) for metric, levels in THRESHOLDS.items()}
+    for item in values or []:
+        key, _, value = item.partition("=")
+        metric, _, level = key.partition(".")
+        if metric not in thresholds or level not in thresholds[metric] or not value:
+            raise ValueError(f"잘못된 임계값 지정입니다 (예: temperature.warning=50): {item}")
+        thresholds[metric][level] = float(value)
+    return thresholds
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="CMOS 센서 로그 가속 재생(replay) 및 백필")
+    sub = parser.add_subparsers(dest="source", required=True)
+
+    gen = sub.add_parser("generate", help="에뮬레이터 모델로 합성 이력을 생성하여 재생")
+    gen.add_argument("--devices", type=int, default=1, help="장치 수")
+    gen.add_argument("--days", type=float, default=30, help="생성할 기간(일). 현재 시각에서 끝남")
+    gen.add_argument("--interval", type=float, default=5.0, help="샘플 간격(초)")
+    gen.add_argument("--seed", type=int, default=0, help="난수 시드")
+
+    src = sub.add_parser("backend", help="설정된 저장소 백엔드의 과거 로그를 재생")
+    src.add_argument("--since", help="시작 시각 (ISO 8601, 미지정 시 전체 이력)")
+    src.add_argument("--until", help="종료 시각 (ISO 8601, 미포함)")
+
+    arc = sub.add_parser("archive", help="Parquet 아카이브를 재생")
+    arc.add_argument("--directory", default="archive", help="아카이브 디렉터리")
+
+    for p in (gen, src, arc):
+        p.add_argument("--threshold", action="append", metavar="METRIC.LEVEL=VALUE",
+                       help="임계값 변경 (예: temperature.warning=50, 여러 번 지정 가능)")
+        p.add_argument("--spike-sensitivity", type=float, default=SPIKE_SENSITIVITY, help="스파이크 탐지 배율")
+        p.add_argument("--sigma-factor", type=float, default=SIGMA_FACTOR, help="3-Sigma 분석 배수")
+        p.add_argument("--predict-interval", type=float, default=PREDICT_INTERVAL_SECONDS, help="가상 시각 기준 RUL 예측 주기(초)")
+        p.add_argument("--speedup", type=float, default=None, help="재생 속도 배율 (미지정 시 최대 속도)")
+        p.add_argument("--output-db", help="경고/예측을 기록할 SQLite 파일 (운영 백엔드와 분리된 백테스트용)")
+        p.add_argument("--write-logs", action="store_true", help="--output-db에 재생한 로그도 함께 기록")
+        p.add_argument("--summary", help="요약 결과를 저장할 JSON 경로")
+    gen.add_argument("--backfill", action="store_true", help="생성한 로그/경고/예측을 설정된 저장소 백엔드에 기록")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    output, write_logs = None, args.write_logs
+    if getattr(args, "backfill", False):
+        output, write_logs = backend, True
+    elif args.output_db:
+        output = SQLiteBackend(args.output_db)
+
+    runner = ReplayRunner(
+        output=output, write_logs=write_logs, predict_interval=args.predict_interval, speedup=args.speedup,
+        thresholds=parse_threshold_overrides(args.threshold),
+        spike_sensitivity=args.spike_sensitivity, sigma_factor=args.sigma_factor,
+    )
+    if args.source == "generate":
+        end = time.time()
+        chunks = generate_rows(args.devices, end - args.days * 86400, end, args.interval, args.seed)
+    elif args.source == "backend":
+        chunks = backend_rows(args.since, args.until)
+    else:
+        chunks = archive_rows(args.directory)
+
+    print(f"재생을 시작합니다 (원본: {args.source}).")
+    summary = run_replay(chunks, runner)
+    print(f"재생 완료: {summary['rows']:,}행, 가상 {summary['simulated_days']}일을 {summary['wall_seconds']}초에 처리 "
+          f"(x{summary['speedup']}), 경고 {summary['alerts_written']}건")
+    for item in summary["alerts_by_rule"]:
+        print(f"  {item['metric']:<18} {item['rule']:<10} {item['severity']:<9} {item['count']}건")
+    if summary["rul"]:
+        print(f"  최종 RUL: {summary['rul'][-1]}")
+    if args.summary:
+        with open(args.summary, "w") as f:
+            json.dump(summary, f, indent=2, ensure_ascii=False)
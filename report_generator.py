@@ -0,0 +1,613 @@
+import os
+import json
+import html
+import math
+import time
+import hashlib
+import argparse
+import multiprocessing as mp
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+
+from degradation_models import REFERENCE_TEMPERATURE, DecimatedSeries, TemperatureNoiseModel, fit_trend
+from metrics import count_rows, record_error, stage_timer, start_from_env
+from predictive_engine import (
+    NOISE_CRITICAL_THRESHOLD,
+    RUL_MODEL,
+    TREND_MODELS,
+    get_device_status,
+    get_health_score,
+    predict_rul,
+    to_epoch_seconds,
+)
+from storage import LazyBackend
+
+# 저장소 백엔드 (CMOS_STORAGE_BACKEND=supabase | sqlite). 워커 프로세스는 각자 새로 생성함
+backend = LazyBackend()
+
+# --- 보고서 설정 ---
+REPORT_DIR = "reports"                 # 보고서 출력 디렉터리 (기간별 하위 디렉터리)
+REPORT_CACHE_FILE = "report_cache.json"  # (장치, 기간) -> 데이터 버전/파일/요약 캐시
+REPORT_FORMAT_VERSION = 1              # 보고서 내용이나 서식을 바꾸면 올려서 기존 캐시를 무효화
+REPORT_FORMATS = ("html", "pdf")
+REPORT_LOG_COLUMNS = "log_timestamp, temperature, noise_level, dead_pixel_count"
+REPORT_ALERT_COLUMNS = "created_at, device_id, metric, severity, message"  # 상세(details)는 보고서에 쓰지 않으므로 제외
+CHART_MAX_POINTS = 720                 # 차트당 최대 포인트 수 (구간 평균으로 다운샘플)
+RECENT_ALERTS = 20                     # 보고서에 나열할 최근 경고 수
+PDF_FONT_FAMILY = ["NanumGothic", "Malgun Gothic", "AppleGothic", "Noto Sans CJK KR", "DejaVu Sans"]  # 한글 글꼴 우선
+
+# 차트 메트릭: (컬럼, 제목, 단위, 색, 기준선)
+CHART_METRICS = (
+    ("temperature", "온도", "°C", "#f59e0b", ()),
+    ("noise_level", "노이즈 레벨", "", "#06b6d4", ((NOISE_CRITICAL_THRESHOLD, "임계값"),)),
+    ("dead_pixel_count", "데드 픽셀 수", "개", "#ef4444", ()),
+)
+
+
+def parse_period(period=None, since=None, until=None, now=None):
+    """
+    보고서 기간을 (기간 키, 시작, 끝) UTC datetime으로 해석합니다.
+    period는 'YYYY-MM'(월) 또는 'YYYY-MM-DD'(일)이며, since/until을 직접 지정할 수도 있습니다.
+    아무것도 지정하지 않으면 지난 달입니다.
+    """
+    if since is not None or until is not None:
+        start = _parse_utc(since) if since is not None else datetime(1970, 1, 1, tzinfo=timezone.utc)
+        end = _parse_utc(until) if until is not None else now or datetime.now(timezone.utc)
+        return f"{start:%Y%m%dT%H%M}-{end:%Y%m%dT%H%M}", start, end
+
+    if period is None:
+        first_of_month = (now or datetime.now(timezone.utc)).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        period = f"{first_of_month - timedelta(days=1):%Y-%m}"
+    parts = [int(part) for part in period.split("-")]
+    if len(parts) == 2:
+        start = datetime(parts[0], parts[1], 1, tzinfo=timezone.utc)
+        end = datetime(parts[0] + parts[1] // 12, parts[1] % 12 + 1, 1, tzinfo=timezone.utc)
+    elif len(parts) == 3:
+        start = datetime(*parts, tzinfo=timezone.utc)
+        end = start + timedelta(days=1)
+    else:
+        raise ValueError(f"기간 형식이 올바르지 않습니다 (YYYY-MM 또는 YYYY-MM-DD): {period}")
+    return period, start, end
+
+
+def _parse_utc(value):
+    ts = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    return ts.replace(tzinfo=timezone.utc) if ts.tzinfo is None else ts.astimezone(timezone.utc)
+
+
+def data_version(log_version, alerts, prediction, options):
+    """
+    보고서 입력의 버전 문자열. 장치의 구간 로그 수/마지막 시각, 경고 수/마지막 시각, 반영한 예측 시각,
+    보고서 옵션과 서식 버전 중 하나라도 바뀌면 달라집니다.
+    """
+    payload = [
+        REPORT_FORMAT_VERSION, options, list(log_version),
+        len(alerts), alerts[-1].get("created_at") if alerts else None,
+        prediction.get("created_at") if prediction else None,
+    ]
+    return hashlib.sha1(json.dumps(payload, default=str).encode()).hexdigest()[:16]
+
+
+class ReportCache:
+    """
+    (장치, 기간)별로 마지막으로 생성한 보고서의 데이터 버전, 파일 목록, 요약을 JSON 파일에 보관합니다.
+    버전이 같고 파일이 모두 남아 있으면 다시 생성하지 않습니다.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        if os.path.exists(path):
+            try:
+                with open(path) as f:
+                    self.entries = json.load(f)
+            except Exception as e:
+                print(f"보고서 캐시를 읽지 못해 새로 시작합니다: {e}")
+
+    @staticmethod
+    def _key(device_id, period):
+        return f"{device_id}:{period}"
+
+    def lookup(self, device_id, period, version):
+        entry = self.entries.get(self._key(device_id, period))
+        if entry is None or entry["version"] != version:
+            return None
+        if not all(os.path.exists(path) for path in entry["files"]):
+            return None
+        return entry
+
+    def store(self, device_id, period, version, files, summary):
+        self.entries[self._key(device_id, period)] = {"version": version, "files": files, "summary": summary}
+
+    def save(self):
+        """캐시를 원자적으로(임시 파일 후 교체) 저장합니다."""
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.entries, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+
+# --- 보고서 내용 계산 ---
+
+def build_report(df, alerts, since, until, prediction=None, rul_model=RUL_MODEL):
+    """
+    장치 1대의 구간 로그(DataFrame)와 경고 목록으로 보고서 내용을 계산합니다.
+    건강 점수와 RUL은 predictive_engine과 같은 함수로 계산하며, 기준 시각은 구간 끝(진행 중인 구간이면 현재)입니다.
+    """
+    df = df.copy()
+    df["epoch"] = to_epoch_seconds(df["log_timestamp"])
+    df = df.sort_values("epoch", kind="stable").reset_index(drop=True)
+    for column in ("temperature", "noise_level", "dead_pixel_count"):
+        df[column] = pd.to_numeric(df[column], errors="coerce")
+    as_of = min(until.timestamp(), time.time())
+
+    # 1. 건강 점수/RUL/상태 (건강 점수는 구간의 마지막 24시간, get_health_score는 최신순 입력을 기대함)
+    last_day = df[df["epoch"] >= df["epoch"].iloc[-1] - 86400].iloc[::-1]
+    health_score = float(get_health_score(last_day))
+    rul_days, rul_status = predict_rul(df, now=as_of, rul_model=rul_model)
+    summary = {
+        "samples": int(len(df)),
+        "first_timestamp": _iso(df["epoch"].iloc[0]),
+        "last_timestamp": _iso(df["epoch"].iloc[-1]),
+        "health_score": round(health_score, 2),
+        "rul_days": rul_days,
+        "rul_status": rul_status,
+        "device_status": get_device_status(health_score, rul_days),
+        "alerts": len(alerts),
+    }
+    if prediction:
+        summary["stored_prediction"] = {
+            key: prediction.get(key) for key in ("predicted_rul_days", "health_score", "prediction_status", "created_at")
+        }
+
+    # 2. 추세 요약: 노이즈 추세(모델별 일당 증가량)와 온도-노이즈 지수 모델
+    codes = np.zeros(len(df), dtype=np.int64)
+    noise = df["noise_level"].to_numpy(dtype=np.float64)
+    trend = DecimatedSeries(1)
+    trend.extend(codes, df["epoch"].to_numpy(), noise)
+    slopes = {}
+    for method in TREND_MODELS:
+        slope, _ = fit_trend(trend, method)
+        slopes[method] = None if not np.isfinite(slope[0]) else round(float(slope[0]) * 86400, 5)
+    thermal = TemperatureNoiseModel(1)
+    thermal.update(codes, df["temperature"].to_numpy(dtype=np.float64), noise)
+    summary["trend"] = {
+        "noise_slope_per_day": slopes,
+        "thermal_amplitude": _finite_or_none(thermal.amplitude[0], 4),
+        "thermal_exponent": _finite_or_none(thermal.exponent[0], 4),
+    }
+
+    # 3. 일별 요약
+    day = (df["epoch"] // 86400).astype(np.int64)
+    daily = df.groupby(day).agg(
+        samples=("epoch", "size"),
+        temp_mean=("temperature", "mean"),
+        temp_max=("temperature", "max"),
+        noise_mean=("noise_level", "mean"),
+        noise_max=("noise_level", "max"),
+        dead_pixels=("dead_pixel_count", "last"),
+    )
+    alert_days = pd.Series([_alert_epoch(alert) // 86400 for alert in alerts], dtype="float64").value_counts()
+    daily["alerts"] = alert_days.reindex(daily.index).fillna(0).astype(int)
+    daily_rows = [
+        {"date": datetime.fromtimestamp(index * 86400, tz=timezone.utc).strftime("%Y-%m-%d"),
+         **{key: _finite_or_none(value, 3) for key, value in row.items()}}
+        for index, row in zip(daily.index.tolist(), daily.to_dict("records"))
+    ]
+
+    # 4. 경고 요약 (메트릭/심각도별 건수와 최근 경고)
+    alert_counts = {}
+    for alert in alerts:
+        key = f"{alert.get('metric')}/{alert.get('severity')}"
+        alert_counts[key] = alert_counts.get(key, 0) + 1
+    recent_alerts = [
+        {"created_at": alert.get("created_at"), "metric": alert.get("metric"),
+         "severity": alert.get("severity"), "message": alert.get("message")}
+        for alert in alerts[-RECENT_ALERTS:][::-1]
+    ]
+
+    return {
+        "summary": summary,
+        "daily": daily_rows,
+        "alert_counts": dict(sorted(alert_counts.items())),
+        "recent_alerts": recent_alerts,
+        "charts": chart_series(df),
+    }
+
+
+def chart_series(df, max_points=CHART_MAX_POINTS):
+    """차트용으로 구간을 최대 max_points개 시간 구간의 평균으로 줄입니다."""
+    epoch = df["epoch"].to_numpy()
+    span = max(epoch[-1] - epoch[0], 1.0)
+    bucket_seconds = max(60.0, math.ceil(span / max_points / 60) * 60)
+    grouped = df.groupby(((epoch - epoch[0]) // bucket_seconds).astype(np.int64))
+    means = grouped[[metric for metric, *_ in CHART_METRICS]].mean()
+    return {
+        "epoch": (grouped["epoch"].mean()).round(1).tolist(),
+        **{metric: [_finite_or_none(value, 3) for value in means[metric].tolist()] for metric, *_ in CHART_METRICS},
+    }
+
+
+def _alert_epoch(alert):
+    return _parse_utc(alert["created_at"]).timestamp() if alert.get("created_at") else float("nan")
+
+
+def _finite_or_none(value, digits):
+    value = float(value)
+    return round(value, digits) if math.isfinite(value) else None
+
+
+def _iso(epoch_seconds):
+    return datetime.fromtimestamp(epoch_seconds, tz=timezone.utc).isoformat()
+
+
+# --- 렌더링 ---
+
+def svg_line_chart(epoch, values, title, unit="", color="#06b6d4", hlines=(), width=720, height=200):
+    """epoch 초와 값 목록으로 외부 라이브러리 없이 인라인 SVG 꺾은선 그래프를 만듭니다. None 값은 선을 끊습니다."""
+    left, right, top, bottom = 56, 12, 24, 28
+    points = [(x, y) for x, y in zip(epoch, values) if y is not None]
+    if not points:
+        return f'<p class="empty">{html.escape(title)}: 데이터 없음</p>'
+    xs = [x for x, _ in points]
+    ys = [y for _, y in points] + [level for level, _ in hlines]
+    x_min, x_max = min(xs), max(max(xs), min(xs) + 1)
+    y_min, y_max = min(ys), max(ys)
+    if y_max - y_min < 1e-9:
+        y_min, y_max = y_min - 1, y_max + 1
+    pad = (y_max - y_min) * 0.05
+    y_min, y_max = y_min - pad, y_max + pad
+
+    def sx(x):
+        return left + (x - x_min) / (x_max - x_min) * (width - left - right)
+
+    def sy(y):
+        return top + (y_max - y) / (y_max - y_min) * (height - top - bottom)
+
+    segments, current = [], []
+    for x, y in zip(epoch, values):
+        if y is None:
+            if current:
+                segments.append(current)
+            current = []
+        else:
+            current.append(f"{sx(x):.1f},{sy(y):.1f}")
+    if current:
+        segments.append(current)
+
+    parts = [f'<svg class="chart" viewBox="0 0 {width} {height}" width="{width}" height="{height}" role="img">',
+             f'<text x="{left}" y="16" class="title">{html.escape(title)}{f" ({html.escape(unit)})" if unit else ""}</text>']
+    for i in range(5):
+        level = y_min + (y_max - y_min) * i / 4
+        y = sy(level)
+        parts.append(f'<line x1="{left}" x2="{width - right}" y1="{y:.1f}" y2="{y:.1f}" class="grid"/>')
+        parts.append(f'<text x="{left - 6}" y="{y + 4:.1f}" class="tick" text-anchor="end">{level:.2f}</text>')
+    for x in (x_min, (x_min + x_max) / 2, x_max):
+        anchor = "start" if x == x_min else "end" if x == x_max else "middle"
+        label = datetime.fromtimestamp(x, tz=timezone.utc).strftime("%m-%d %H:%M")
+        parts.append(f'<text x="{sx(x):.1f}" y="{height - 8}" class="tick" text-anchor="{anchor}">{label}</text>')
+    for level, label in hlines:
+        y = sy(level)
+        parts.append(f'<line x1="{left}" x2="{width - right}" y1="{y:.1f}" y2="{y:.1f}" class="threshold"/>')
+        parts.append(f'<text x="{width - right}" y="{y - 4:.1f}" class="tick threshold-label" text-anchor="end">{html.escape(label)} {level:g}</text>')
+    for segment in segments:
+        parts.append(f'<polyline points="{" ".join(segment)}" fill="none" stroke="{color}" stroke-width="1.5"/>')
+    parts.append("</svg>")
+    return "\n".join(parts)
+
+
+HTML_STYLE = """
+body { font-family: -apple-system, "Segoe UI", "Malgun Gothic", "Apple SD Gothic Neo", sans-serif; margin: 32px; color: #111827; }
+h1 { margin-bottom: 4px; } .meta { color: #6b7280; margin-top: 0; }
+.cards { display: flex; gap: 12px; flex-wrap: wrap; margin: 20px 0; }
+.card { border: 1px solid #e5e7eb; border-radius: 8px; padding: 12px 16px; min-width: 140px; }
+.card .label { color: #6b7280; font-size: 12px; } .card .value { font-size: 20px; font-weight: 600; }
+.status-critical { color: #dc2626; } .status-predictive_warning, .status-warning { color: #d97706; } .status-healthy { color: #059669; }
+table { border-collapse: collapse; margin: 12px 0 24px; font-size: 13px; }
+th, td { border-bottom: 1px solid #e5e7eb; padding: 4px 10px; text-align: right; } th:first-child, td:first-child { text-align: left; }
+.chart .grid { stroke: #f3f4f6; } .chart .threshold { stroke: #dc2626; stroke-dasharray: 4 3; }
+.chart .tick { font-size: 10px; fill: #6b7280; } .chart .title { font-size: 13px; font-weight: 600; fill: #111827; }
+.empty { color: #9ca3af; } @media print { body { margin: 0; } }
+"""
+
+
+def render_html(device_id, device, period, report):
+    """보고서 내용을 차트가 포함된 단일 HTML 문서로 만듭니다."""
+    summary = report["summary"]
+    name = (device or {}).get("device_name") or f"장치 {device_id}"
+    rul = "-" if summary["rul_days"] is None else f"{summary['rul_days']}일"
+    cards = [
+        ("상태", f'<span class="status-{summary["device_status"]}">{summary["device_status"]}</span>'),
+        ("건강 점수", f"{summary['health_score']:.2f}"),
+        ("RUL", f"{rul} <small>({html.escape(summary['rul_status'])})</small>"),
+        ("샘플 수", f"{summary['samples']:,}"),
+        ("경고", f"{summary['alerts']:,}건"),
+    ]
+    trend = summary["trend"]
+    trend_rows = "".join(
+        f"<tr><td>{method}</td><td>{'-' if slope is None else f'{slope:+.5f}'}</td></tr>"
+        for method, slope in trend["noise_slope_per_day"].items()
+    )
+    charts = report["charts"]
+    chart_html = "\n".join(
+        svg_line_chart(charts["epoch"], charts[metric], title, unit, color, hlines)
+        for metric, title, unit, color, hlines in CHART_METRICS
+    )
+    daily_header = "".join(f"<th>{label}</th>" for label in
+                           ("날짜", "샘플", "평균 온도", "최고 온도", "평균 노이즈", "최대 노이즈", "데드 픽셀", "경고"))
+    daily_rows = "".join(
+        "<tr>" + "".join(f"<td>{'-' if row[key] is None else row[key]}</td>" for key in
+                         ("date", "samples", "temp_mean", "temp_max", "noise_mean", "noise_max", "dead_pixels", "alerts")) + "</tr>"
+        for row in report["daily"]
+    )
+    alert_count_rows = "".join(f"<tr><td>{html.escape(key)}</td><td>{count:,}</td></tr>" for key, count in report["alert_counts"].items())
+    alert_rows = "".join(
+        f"<tr><td>{html.escape(str(alert['created_at']))}</td><td>{html.escape(str(alert['severity']))}</td>"
+        f"<td style=\"text-align:left\">{html.escape(str(alert['message']))}</td></tr>"
+        for alert in report["recent_alerts"]
+    )
+    stored = summary.get("stored_prediction")
+    stored_html = "" if not stored else (
+        f"<p class=\"meta\">예측 엔진의 최신 예측 ({html.escape(str(stored['created_at']))}): "
+        f"건강 점수 {stored['health_score']}, RUL {stored['predicted_rul_days']}일 ({html.escape(str(stored['prediction_status']))})</p>"
+    )
+    return f"""<!DOCTYPE html>
+<html lang="ko"><head><meta charset="utf-8"><title>{html.escape(name)} 신뢰성 보고서 ({html.escape(period)})</title>
+<style>{HTML_STYLE}</style></head>
+<body>
+<h1>{html.escape(name)} 신뢰성 보고서</h1>
+<p class="meta">장치 ID {device_id} · 기간 {html.escape(period)} ({summary['first_timestamp']} ~ {summary['last_timestamp']}) · 생성 {datetime.now(timezone.utc).isoformat(timespec='seconds')}</p>
+<div class="cards">{''.join(f'<div class="card"><div class="label">{label}</div><div class="value">{value}</div></div>' for label, value in cards)}</div>
+{stored_html}
+<h2>추세</h2>
+{chart_html}
+<table><tr><th>노이즈 추세 모델</th><th>일당 증가량</th></tr>{trend_rows}</table>
+<p class="meta">온도-노이즈 모델: noise = {trend['thermal_amplitude']} × exp({trend['thermal_exponent']} × (T − {REFERENCE_TEMPERATURE:g}°C))</p>
+<h2>일별 요약</h2>
+<table><tr>{daily_header}</tr>{daily_rows}</table>
+<h2>경고</h2>
+<table><tr><th>메트릭/심각도</th><th>건수</th></tr>{alert_count_rows}</table>
+<table><tr><th>시각</th><th>심각도</th><th>메시지</th></tr>{alert_rows}</table>
+</body></html>
+"""
+
+
+def render_pdf(device_id, device, period, report, path):
+    """보고서 내용을 A4 PDF(요약 + 차트 페이지, 일별 요약 페이지)로 저장합니다. matplotlib가 필요합니다."""
+    import matplotlib
+
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    from matplotlib.backends.backend_pdf import PdfPages
+
+    plt.rcParams["font.family"] = PDF_FONT_FAMILY
+    plt.rcParams["axes.unicode_minus"] = False
+    summary = report["summary"]
+    charts = report["charts"]
+    name = (device or {}).get("device_name") or f"장치 {device_id}"
+    times = [datetime.fromtimestamp(x, tz=timezone.utc) for x in charts["epoch"]]
+
+    with PdfPages(path) as pdf:
+        fig = plt.figure(figsize=(8.27, 11.69))
+        fig.text(0.06, 0.96, f"{name} 신뢰성 보고서 ({period})", fontsize=16, weight="bold")
+        lines = [
+            f"상태: {summary['device_status']}    건강 점수: {summary['health_score']:.2f}    "
+            f"RUL: {'-' if summary['rul_days'] is None else summary['rul_days']}일 ({summary['rul_status']})",
+            f"샘플 {summary['samples']:,}개 · 경고 {summary['alerts']:,}건 · {summary['first_timestamp']} ~ {summary['last_timestamp']}",
+            "노이즈 추세(일당): " + ", ".join(
+                f"{method} {'-' if slope is None else f'{slope:+.5f}'}"
+                for method, slope in summary["trend"]["noise_slope_per_day"].items()),
+        ]
+        for i, line in enumerate(lines):
+            fig.text(0.06, 0.93 - i * 0.02, line, fontsize=9)
+        for i, (metric, title, unit, color, hlines) in enumerate(CHART_METRICS):
+            ax = fig.add_axes([0.1, 0.62 - i * 0.26, 0.85, 0.2])
+            values = [np.nan if value is None else value for value in charts[metric]]
+            ax.plot(times, values, color=color, linewidth=1)
+            for level, label in hlines:
+                ax.axhline(level, color="#dc2626", linestyle="--", linewidth=0.8, label=f"{label} {level:g}")
+                ax.legend(loc="upper left", fontsize=7)
+            ax.set_title(f"{title} ({unit})" if unit else title, fontsize=10, loc="left")
+            ax.tick_params(labelsize=7)
+            ax.grid(alpha=0.3)
+        pdf.savefig(fig)
+        plt.close(fig)
+
+        fig = plt.figure(figsize=(8.27, 11.69))
+        fig.text(0.06, 0.96, "일별 요약", fontsize=13, weight="bold")
+        columns = ("date", "samples", "temp_mean", "temp_max", "noise_mean", "noise_max", "dead_pixels", "alerts")
+        cells = [["-" if row[key] is None else row[key] for key in columns] for row in report["daily"][:40]]
+        if cells:
+            ax = fig.add_axes([0.05, 0.05, 0.9, 0.88])
+            ax.axis("off")
+            table = ax.table(cellText=cells, colLabels=("날짜", "샘플", "평균 온도", "최고 온도", "평균 노이즈", "최대 노이즈", "데드 픽셀", "경고"),
+                             loc="upper center")
+            table.auto_set_font_size(False)
+            table.set_fontsize(7)
+        pdf.savefig(fig)
+        plt.close(fig)
+
+
+def render_index(period, entries, path):
+    """기간의 전체 장치 보고서 목록(상태, 건강 점수, RUL, 링크)을 HTML로 저장합니다."""
+    rows = []
+    for device_id, entry in sorted(entries.items()):
+        summary = entry["summary"]
+        links = " ".join(
+            f'<a href="{html.escape(os.path.basename(file))}">{os.path.splitext(file)[1][1:].upper()}</a>' for file in entry["files"]
+        )
+        rows.append(
+            f"<tr><td>{device_id}</td><td class=\"status-{summary['device_status']}\">{summary['device_status']}</td>"
+            f"<td>{summary['health_score']:.2f}</td><td>{'-' if summary['rul_days'] is None else summary['rul_days']}</td>"
+            f"<td>{summary['samples']:,}</td><td>{summary['alerts']:,}</td><td>{links}</td></tr>"
+        )
+    document = f"""<!DOCTYPE html>
+<html lang="ko"><head><meta charset="utf-8"><title>플릿 신뢰성 보고서 ({html.escape(period)})</title>
+<style>{HTML_STYLE}</style></head>
+<body>
+<h1>플릿 신뢰성 보고서</h1>
+<p class="meta">기간 {html.escape(period)} · 장치 {len(entries):,}대 · 생성 {datetime.now(timezone.utc).isoformat(timespec='seconds')}</p>
+<table><tr><th>장치</th><th>상태</th><th>건강 점수</th><th>RUL(일)</th><th>샘플</th><th>경고</th><th>보고서</th></tr>
+{''.join(rows)}
+</table>
+</body></html>
+"""
+    _write_atomic(path, document)
+
+
+def _write_atomic(path, text):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+# --- 배치 실행 ---
+
+def _init_worker():
+    """워커 프로세스는 상위 프로세스에서 복사된 연결 대신 자기 저장소 연결을 사용합니다."""
+    global backend
+    backend = LazyBackend()
+
+
+def render_device_report(task):
+    """
+    장치 1대의 구간 로그를 조회하여 보고서를 계산하고 지정한 형식으로 저장합니다 (워커 프로세스에서 실행).
+    결과 dict를 반환하며, 실패하면 error 항목에 메시지를 담습니다.
+    """
+    device_id = task["device_id"]
+    try:
+        with stage_timer("report_fetch"):
+            rows = backend.select_logs(since=task["since"], until=task["until"], columns=REPORT_LOG_COLUMNS, device_id=device_id)
+        if not rows:
+            return {"device_id": device_id, "error": "구간 내 로그 없음"}
+        with stage_timer("report_render"):
+            report = build_report(
+                pd.DataFrame(rows), task["alerts"], _parse_utc(task["since"]), _parse_utc(task["until"]),
+                task["prediction"], task["rul_model"],
+            )
+            files = []
+            base = os.path.join(task["output_dir"], f"device_{device_id}")
+            if "html" in task["formats"]:
+                _write_atomic(f"{base}.html", render_html(device_id, task["device"], task["period"], report))
+                files.append(f"{base}.html")
+            if "pdf" in task["formats"]:
+                render_pdf(device_id, task["device"], task["period"], report, f"{base}.pdf.tmp")
+                os.replace(f"{base}.pdf.tmp", f"{base}.pdf")
+                files.append(f"{base}.pdf")
+        return {"device_id": device_id, "version": task["version"], "files": files, "summary": report["summary"], "rows": len(rows)}
+    except Exception as e:
+        return {"device_id": device_id, "error": str(e)}
+
+
+def generate_reports(period=None, since=None, until=None, device_ids=None, formats=("html",), output_dir=REPORT_DIR,
+                     workers=None, rul_model=RUL_MODEL, force=False):
+    """
+    기간 내 로그가 있는 장치(또는 device_ids)의 보고서를 프로세스 풀에서 생성하고 요약 dict를 반환합니다.
+    (장치, 기간, 데이터 버전)이 캐시와 같으면 건너뛰며, force=True이면 모두 다시 생성합니다.
+    """
+    period_key, start, end = parse_period(period, since, until)
+    since_iso, until_iso = start.isoformat(), end.isoformat()
+    period_dir = os.path.join(output_dir, period_key)
+    os.makedirs(period_dir, exist_ok=True)
+
+    with stage_timer("report_fetch"):
+        versions = backend.select_log_versions(since=since_iso, until=until_iso)
+        alerts = backend.select_alerts(since=since_iso, until=until_iso, columns=REPORT_ALERT_COLUMNS)
+        devices = {row["id"]: row for row in backend.select_devices()}
+        # 진행 중인 구간에만 예측 엔진의 최신 예측을 함께 표시 (지난 구간의 보고서가 매 예측마다 무효화되지 않도록)
+        open_period = end.timestamp() > time.time()
+        predictions = {row["device_id"]: row for row in backend.select_predictions()} if open_period else {}
+
+    alerts_by_device = {}
+    for alert in alerts:
+        if alert.get("device_id") is not None:
+            alerts_by_device.setdefault(alert["device_id"], []).append(alert)
+
+    targets = sorted(versions) if device_ids is None else [d for d in device_ids if d in versions]
+    options = {"formats": sorted(formats), "rul_model": rul_model}
+    cache = ReportCache(os.path.join(output_dir, REPORT_CACHE_FILE))
+    tasks, entries = [], {}
+    for device_id in targets:
+        device_alerts = alerts_by_device.get(device_id, [])
+        prediction = predictions.get(device_id)
+        version = data_version(versions[device_id], device_alerts, prediction, options)
+        entry = None if force else cache.lookup(device_id, period_key, version)
+        if entry is not None:
+            entries[device_id] = entry
+            continue
+        tasks.append({
+            "device_id": device_id, "device": devices.get(device_id), "period": period_key,
+            "since": since_iso, "until": until_iso, "alerts": device_alerts, "prediction": prediction,
+            "formats": tuple(formats), "output_dir": period_dir, "rul_model": rul_model, "version": version,
+        })
+
+    started = time.perf_counter()
+    print(f"[{datetime.now()}] 기간 {period_key}: 장치 {len(targets)}대 중 {len(tasks)}대 생성, {len(entries)}대는 변경 없음")
+    failed = {}
+    if tasks:
+        workers = min(workers or mp.cpu_count(), len(tasks))
+        if workers <= 1:
+            results = map(render_device_report, tasks)
+            pool = None
+        else:
+            pool = mp.Pool(workers, initializer=_init_worker)
+            results = pool.imap_unordered(render_device_report, tasks)
+        try:
+            for result in results:
+                if "error" in result:
+                    record_error("report")
+                    failed[result["device_id"]] = result["error"]
+                    print(f"장치 {result['device_id']} 보고서 생성 실패: {result['error']}")
+                    continue
+                count_rows("report", result["rows"])
+                cache.store(result["device_id"], period_key, result["version"], result["files"], result["summary"])
+                entries[result["device_id"]] = cache.lookup(result["device_id"], period_key, result["version"])
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+        cache.save()
+
+    render_index(period_key, entries, os.path.join(period_dir, "index.html"))
+    elapsed = time.perf_counter() - started
+    print(f"[{datetime.now()}] 보고서 생성 완료: {len(tasks) - len(failed)}건 생성, {len(targets) - len(tasks)}건 캐시 사용, "
+          f"{len(failed)}건 실패 ({elapsed:.1f}초) -> {period_dir}")
+    return {
+        "period": period_key,
+        "devices": len(targets),
+        "generated": len(tasks) - len(failed),
+        "cached": len(targets) - len(tasks),
+        "failed": failed,
+        "seconds": round(elapsed, 3),
+        "output_dir": period_dir,
+    }
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="CMOS 센서 장치별 신뢰성 보고서 일괄 생성")
+    parser.add_argument("--period", help="보고서 기간: YYYY-MM(월) 또는 YYYY-MM-DD(일). 기본값: 지난 달")
+    parser.add_argument("--since", help="기간 시작 (ISO 시각, --period 대신 사용)")
+    parser.add_argument("--until", help="기간 끝 (ISO 시각, 미포함)")
+    parser.add_argument("--device", type=int, action="append", dest="devices", help="대상 장치 ID (여러 번 지정 가능, 기본값: 기간 내 로그가 있는 모든 장치)")
+    parser.add_argument("--format", action="append", dest="formats", choices=REPORT_FORMATS, help="출력 형식 (여러 번 지정 가능, 기본값: html)")
+    parser.add_argument("--output", default=REPORT_DIR, help="출력 디렉터리")
+    parser.add_argument("--workers", type=int, default=None, help="워커 프로세스 수 (기본값: CPU 코어 수)")
+    parser.add_argument("--rul-model", choices=TREND_MODELS, default=RUL_MODEL, help="RUL 추세 모델")
+    parser.add_argument("--force", action="store_true", help="캐시를 무시하고 모두 다시 생성")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    start_from_env()
+    formats = args.formats or ["html"]
+    if "pdf" in formats:
+        try:
+            import matplotlib  # noqa: F401
+        except ImportError:
+            raise SystemExit("PDF 출력에는 matplotlib가 필요합니다. (pip install matplotlib)")
+    generate_reports(args.period, args.since, args.until, args.devices, formats, args.output, args.workers, args.rul_model, args.force)
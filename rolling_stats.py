@@ -0,0 +1,159 @@
+import math
+from collections import deque
+
+# EWMA/CUSUM 드리프트 탐지 설정
+DRIFT_ALPHA = 0.02              # EWMA 평활 계수 (약 50샘플의 기억)
+DRIFT_MIN_SAMPLES = 30          # 이 수만큼은 누적 평균/분산으로 기준선만 만들고 판정하지 않음
+DRIFT_CLIP_SIGMA = 3.0          # 기준선 갱신 시 잔차를 ±3σ로 잘라 스파이크가 평균/분산을 오염시키지 않게 함
+DRIFT_MIN_STD = 0.01            # 값이 거의 일정할 때 z-점수가 폭주하지 않도록 하는 표준편차 하한
+CUSUM_SLACK = 0.5               # CUSUM 허용량 k (σ 단위). 이보다 작은 치우침은 누적하지 않음
+CUSUM_THRESHOLD = 5.0           # CUSUM 경보 임계값 h (σ 단위)
+
+
+class RunningMoments:
+    """
+    Welford 알고리즘으로 평균/분산을 O(1)로 유지합니다. 추가한 값을 역연산으로 제거할 수 있습니다.
+    값 자체는 저장하지 않으므로, 제거할 값은 호출한 쪽(예: 링 버퍼)이 보관합니다.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+
+    def add_value(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+
+    def remove_value(self, value):
+        if self.count <= 1:
+            self.count = 0
+            self.mean = 0.0
+            self._m2 = 0.0
+            return
+        self.count -= 1
+        delta = value - self.mean
+        self.mean -= delta / self.count
+        self._m2 -= delta * (value - self.mean)
+        # 부동소수점 누적 오차로 음수가 되는 것을 방지
+        if self._m2 < 0:
+            self._m2 = 0.0
+
+    @property
+    def variance(self):
+        """표본 분산 (pandas의 std()와 동일하게 ddof=1)."""
+        if self.count < 2:
+            return float("nan")
+        return self._m2 / (self.count - 1)
+
+    @property
+    def std(self):
+        return math.sqrt(self.variance) if self.count >= 2 else float("nan")
+
+    def __len__(self):
+        return self.count
+
+
+class RollingWindowStats(RunningMoments):
+    """
+    시간 기반 슬라이딩 윈도우의 평균/표준편차를 O(1)로 유지합니다.
+    Welford 알고리즘으로 값을 추가하고, 윈도우를 벗어난 값은 역연산으로 제거합니다.
+    """
+
+    def __init__(self, window_seconds):
+        super().__init__()
+        self.window_seconds = window_seconds
+        self._samples = deque()  # (timestamp_seconds, value)
+
+    def add(self, timestamp, value):
+        """새 값을 추가하고, 윈도우를 벗어난 오래된 값을 제거합니다."""
+        value = float(value)
+        self._samples.append((timestamp, value))
+        self.add_value(value)
+        self.evict_before(timestamp - self.window_seconds)
+
+    def evict_before(self, cutoff):
+        """cutoff 이전의 값을 윈도우에서 제거합니다."""
+        while self._samples and self._samples[0][0] < cutoff:
+            _, value = self._samples.popleft()
+            self.remove_value(value)
+
+    @property
+    def first_value(self):
+        return self._samples[0][1] if self._samples else None
+
+    @property
+    def last_value(self):
+        return self._samples[-1][1] if self._samples else None
+
+
+class DriftDetector:
+    """
+    샘플 1개씩 갱신하는 EWMA + 양방향 CUSUM 드리프트 탐지기 (장치/메트릭 1개).
+
+    기준선은 EWMA 평균/분산이며, 갱신할 때 잔차를 ±clip_sigma·σ로 잘라 단발성 스파이크에 오염되지 않습니다.
+    각 샘플은 갱신 전 기준선으로 표준화한 z-점수를 CUSUM에 누적하고, 누적값이 threshold(σ 단위)를 넘으면
+    지속적인 상승(+1) 또는 하강(-1) 드리프트로 보고한 뒤 CUSUM을 초기화합니다.
+    """
+
+    __slots__ = ("alpha", "min_samples", "clip_sigma", "min_std", "slack", "threshold",
+                 "count", "mean", "var", "upper", "lower")
+
+    def __init__(self, alpha=DRIFT_ALPHA, min_samples=DRIFT_MIN_SAMPLES, clip_sigma=DRIFT_CLIP_SIGMA,
+                 min_std=DRIFT_MIN_STD, slack=CUSUM_SLACK, threshold=CUSUM_THRESHOLD):
+        self.alpha = alpha
+        self.min_samples = min_samples
+        self.clip_sigma = clip_sigma
+        self.min_std = min_std
+        self.slack = slack
+        self.threshold = threshold
+        self.count = 0
+        self.mean = 0.0
+        self.var = 0.0
+        self.upper = 0.0
+        self.lower = 0.0
+
+    @property
+    def std(self):
+        return max(math.sqrt(self.var), self.min_std)
+
+    def update(self, value):
+        """값 1개를 반영하고 (z-점수, 드리프트 방향)을 반환합니다. 기준선을 만드는 동안에는 (0.0, 0)입니다."""
+        self.count += 1
+        residual = value - self.mean
+        if self.count <= self.min_samples:
+            # 초기 구간: 가중치 1/n으로 누적 평균/분산 (모분산)
+            weight = 1.0 / self.count
+            if weight < self.alpha:
+                weight = self.alpha
+            self.mean += weight * residual
+            self.var = (1 - weight) * (self.var + weight * residual * residual)
+            return 0.0, 0
+
+        std = math.sqrt(self.var)
+        if std < self.min_std:
+            std = self.min_std
+        z = residual / std
+        upper = self.upper + z - self.slack
+        lower = self.lower - z - self.slack
+        direction = 0
+        if upper > self.threshold:
+            direction = 1
+        elif lower > self.threshold:
+            direction = -1
+        if direction:
+            upper = lower = 0.0
+        self.upper = upper if upper > 0.0 else 0.0
+        self.lower = lower if lower > 0.0 else 0.0
+
+        limit = self.clip_sigma * std
+        if residual > limit:
+            residual = limit
+        elif residual < -limit:
+            residual = -limit
+        alpha = self.alpha
+        self.mean += alpha * residual
+        self.var = (1 - alpha) * (self.var + alpha * residual * residual)
+        return z, direction
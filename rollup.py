@@ -0,0 +1,243 @@
+import os
+import json
+import time
+import argparse
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from anomaly_detector import METRICS, IncrementalLogPoller, backend
+from metrics import record_error
+
+# --- 롤업 설정 ---
+# 해상도 이름 -> 버킷 크기(초). 작은 해상도부터 나열
+RESOLUTIONS = {"1m": 60, "1h": 3600, "1d": 86400}
+ROLLUP_STATE_PATH = "rollup_state.json"  # 마지막으로 집계한 로그 위치(high-water mark)
+ROLLUP_INTERVAL_SECONDS = 60
+ROLLUP_FETCH_MAX_ROWS = 50000  # 한 번에 집계할 최대 로그 행 수 (첫 생성 시에도 전체 이력을 한 번에 읽지 않음)
+MAX_TREND_POINTS = 2200  # 추세 조회 시 장치/메트릭당 최대 포인트 수 (90일 구간이 1시간 버킷 2,160개로 들어가도록)
+STAT_COLUMNS = ["count", "mean", "m2", "min", "max"]
+
+
+def choose_resolution(span_seconds, max_points=MAX_TREND_POINTS):
+    """조회 구간에 대해 max_points 이하로 표현 가능한 가장 세밀한 해상도를 고릅니다. 원본이 충분하면 None."""
+    if span_seconds / 5 <= max_points:
+        return None  # 원본 로그(5초 간격)로 충분
+    for resolution, bucket_seconds in RESOLUTIONS.items():
+        if span_seconds / bucket_seconds <= max_points:
+            return resolution
+    return list(RESOLUTIONS)[-1]
+
+
+def aggregate_buckets(df, bucket_seconds):
+    """
+    long 형식 로그(device_id, epoch, metric, value)를 버킷별로 집계합니다.
+    반환 DataFrame의 인덱스는 (device_id, bucket, metric), 컬럼은 count/mean/m2/min/max입니다.
+    """
+    bucket = (df["epoch"] // bucket_seconds) * bucket_seconds
+    grouped = df.assign(bucket=bucket).groupby(["device_id", "bucket", "metric"])["value"]
+    agg = grouped.agg(["count", "mean", "var", "min", "max"])
+    agg["m2"] = (agg.pop("var") * (agg["count"] - 1)).fillna(0.0)
+    return agg[STAT_COLUMNS]
+
+
+def merge_buckets(existing, batch):
+    """두 버킷 집계를 Chan의 병렬 분산 공식으로 병합합니다. existing에 없는 버킷은 batch 값을 그대로 사용합니다."""
+    existing = existing.reindex(batch.index)
+    n_a = existing["count"].fillna(0).to_numpy()
+    n_b = batch["count"].to_numpy()
+    n = n_a + n_b
+    mean_a = existing["mean"].fillna(0).to_numpy()
+    delta = batch["mean"].to_numpy() - mean_a
+    merged = pd.DataFrame(index=batch.index)
+    merged["count"] = n
+    merged["mean"] = mean_a + delta * n_b / n
+    merged["m2"] = existing["m2"].fillna(0).to_numpy() + batch["m2"].to_numpy() + delta ** 2 * n_a * n_b / n
+    merged["min"] = np.fmin(existing["min"].to_numpy(), batch["min"].to_numpy())
+    merged["max"] = np.fmax(existing["max"].to_numpy(), batch["max"].to_numpy())
+    return merged
+
+
+def _iso(epoch_seconds):
+    return datetime.fromtimestamp(epoch_seconds, tz=timezone.utc).isoformat()
+
+
+class RollupService:
+    """
+    sensor_health_logs의 새 행만 읽어 1분/1시간/1일 버킷의 min/max/mean/std/count를 증분으로 갱신합니다.
+    새 행이 속한 버킷만 다시 계산하여 upsert하고, 최근 버킷은 메모리에 캐시하여 재조회를 피합니다.
+    """
+
+    def __init__(self, state_path=ROLLUP_STATE_PATH):
+        self.state_path = state_path
+        self._restore()
+
+    def _restore(self):
+        """메모리 상태(커서, 캐시, 미반영 배치)를 마지막으로 저장한 상태 파일 기준으로 되돌립니다."""
+        state = {}
+        if os.path.exists(self.state_path):
+            with open(self.state_path) as f:
+                state = json.load(f)
+        # 상태 파일이 없으면 전체 이력으로 롤업을 처음부터 생성. 커서는 수신 시각이므로 늦게 들어온 행도
+        # 들어온 뒤 한 번 집계되어 해당(과거) 버킷에 병합됨
+        if state.get("backfill") is not None:
+            # 첫 생성(또는 이전 상태 파일 변환)을 청크 단위로 하던 중이면 그 위치부터 이어서 읽음
+            self.poller = IncrementalLogPoller(window_seconds=None, backfill_state=state["backfill"])
+        elif "cursor_column" in state:
+            self.poller = IncrementalLogPoller(
+                window_seconds=None,
+                high_water_mark=state["high_water_mark"],
+                seen_at_high_water_mark=state["seen_at_high_water_mark"],
+                cursor_column=state["cursor_column"],
+            )
+        else:
+            # 샘플링 시각(log_timestamp) 커서로 저장된 이전 상태 파일은 그 위치부터 이어서 읽은 뒤 수신 시각 커서로 전환
+            self.poller = IncrementalLogPoller(
+                window_seconds=None,
+                backfill_since=state.get("high_water_mark"),
+                seen_at_high_water_mark=state.get("seen_at_high_water_mark", ()),
+            )
+        # 커서는 이미 넘어갔지만 아직 upsert되지 않은 롤업 행 (재시도 시 같은 값을 다시 upsert하므로 중복 집계되지 않음)
+        self._pending = state.get("pending_rollups")
+        self._cache = {resolution: None for resolution in RESOLUTIONS}
+
+    def _save_state(self):
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, "w") as f:
+            high_water_mark, seen = self.poller.checkpoint()
+            json.dump({"cursor_column": self.poller.cursor_column, "high_water_mark": high_water_mark,
+                       "seen_at_high_water_mark": seen, "backfill": self.poller.backfill_checkpoint(),
+                       "pending_rollups": self._pending}, f)
+        os.replace(tmp_path, self.state_path)
+
+    def _load_stored(self, resolution, keys):
+        """캐시에 없는 버킷을 저장소에서 읽어옵니다."""
+        buckets = keys.get_level_values("bucket")
+        rows = backend.select_rollups(resolution, since=_iso(buckets.min()), until=_iso(buckets.max() + 1))
+        if not rows:
+            return None
+        stored = pd.DataFrame(rows)
+        stored["bucket"] = (pd.to_datetime(stored["bucket_start"], utc=True) - pd.Timestamp(0, tz="UTC")).dt.total_seconds()
+        return stored.set_index(["device_id", "bucket", "metric"])[STAT_COLUMNS]
+
+    def _merge_resolution(self, resolution, bucket_seconds, long_df):
+        """배치를 기존 버킷에 병합하여 (upsert할 행 목록, 새 캐시)를 반환합니다. 캐시와 저장소는 바꾸지 않습니다."""
+        batch = aggregate_buckets(long_df, bucket_seconds)
+        cache = self._cache[resolution]
+        existing = cache if cache is not None else batch.iloc[0:0]
+        missing = batch.index.difference(existing.index)
+        if len(missing):
+            stored = self._load_stored(resolution, missing)
+            if stored is not None:
+                existing = pd.concat([existing, stored.loc[stored.index.intersection(missing)]])
+
+        merged = merge_buckets(existing, batch)
+
+        # 캐시에는 현재와 직전 버킷만 유지 (과거 버킷은 다시 갱신될 가능성이 낮음)
+        cache = pd.concat([existing[~existing.index.isin(merged.index)], merged])
+        latest = cache.index.get_level_values("bucket").max()
+        cache = cache[cache.index.get_level_values("bucket") >= latest - bucket_seconds]
+
+        out = merged.reset_index()
+        out["std"] = np.sqrt(out["m2"] / (out["count"] - 1)).where(out["count"] > 1)
+        out["bucket_start"] = pd.to_datetime(out["bucket"], unit="s", utc=True).dt.strftime("%Y-%m-%dT%H:%M:%S.%f+00:00")
+        out["resolution"] = resolution
+        out["count"] = out["count"].astype(int)
+        out = out.astype(object).where(out.notna(), None)
+        return out[["device_id", "resolution", "bucket_start", "metric", *STAT_COLUMNS, "std"]].to_dict("records"), cache
+
+    def _flush_pending(self):
+        """상태 파일에 기록해 둔 롤업 행을 upsert한 뒤 미반영 표시를 지웁니다."""
+        if self._pending is None:
+            return
+        backend.upsert_rollups(self._pending)
+        self._pending = None
+        self._save_state()
+
+    def _apply(self, rows):
+        """한 청크의 로그를 모든 해상도에 병합하고, 결과를 새 커서와 함께 상태 파일에 기록한 뒤 upsert합니다."""
+        records, caches = [], {}
+        df = pd.DataFrame(rows).dropna(subset=["device_id"]) if rows else pd.DataFrame()  # 장치가 지정되지 않은 로그는 집계하지 않음
+        if not df.empty:
+            df["device_id"] = df["device_id"].astype(np.int64)
+            df["epoch"] = (pd.to_datetime(df["log_timestamp"], utc=True) - pd.Timestamp(0, tz="UTC")).dt.total_seconds()
+            long_df = df.melt(id_vars=["device_id", "epoch"], value_vars=METRICS, var_name="metric").dropna(subset=["value"])
+            for resolution, bucket_seconds in RESOLUTIONS.items():
+                resolution_records, caches[resolution] = self._merge_resolution(resolution, bucket_seconds, long_df)
+                records.extend(resolution_records)
+
+        self._pending = records or None
+        self._save_state()
+        self._flush_pending()
+        self._cache.update(caches)
+
+    def run_once(self, max_rows=ROLLUP_FETCH_MAX_ROWS):
+        """
+        새 로그를 모든 해상도의 롤업에 반영합니다. 처리한 로그 행 수를 반환합니다.
+        로그는 max_rows 행씩 나눠 읽고 청크마다 커서를 저장합니다. 각 청크는 모든 해상도를 먼저 병합해 결과를
+        커서와 함께 상태 파일에 기록한 뒤 upsert하므로, 도중에 실패하면 메모리 상태를 상태 파일 기준으로 되돌리고
+        다음 호출에서 같은 행을 다시 upsert합니다.
+        """
+        try:
+            self._flush_pending()
+            processed = 0
+            while True:
+                rows, warming_up = self.poller.fetch(max_rows=max_rows)
+                if rows or warming_up:
+                    self._apply(rows)
+                processed += len(rows)
+                if not warming_up and len(rows) < max_rows:
+                    return processed
+        except Exception:
+            self._restore()
+            raise
+
+    def run(self, interval=ROLLUP_INTERVAL_SECONDS):
+        print(f"롤업 서비스를 시작합니다. {interval}초 간격으로 {', '.join(RESOLUTIONS)} 버킷을 갱신합니다.")
+        while True:
+            try:
+                started = time.perf_counter()
+                processed = self.run_once()
+                if processed:
+                    print(f"[{datetime.now()}] 로그 {processed}행을 롤업에 반영했습니다. ({time.perf_counter() - started:.2f}초)")
+            except Exception as e:
+                record_error("rollup")
+                print(f"롤업 갱신 중 오류 발생: {e}")
+            time.sleep(interval)
+
+
+def load_trend(device_id, metric, since, until=None, max_points=MAX_TREND_POINTS):
+    """
+    구간을 max_points 이하로 표현할 수 있는 가장 세밀한 해상도(choose_resolution)를 골라 추세 데이터를 읽습니다.
+    반환 DataFrame은 timestamp, mean, min, max, count 컬럼을 가지며, 원본을 사용할 때는 mean=min=max입니다.
+    """
+    since_ts = pd.Timestamp(since)
+    until_ts = pd.Timestamp.now(tz="UTC") if until is None else pd.Timestamp(until)
+    if since_ts.tzinfo is None:
+        since_ts = since_ts.tz_localize("UTC")
+    if until_ts.tzinfo is None:
+        until_ts = until_ts.tz_localize("UTC")
+    resolution = choose_resolution((until_ts - since_ts).total_seconds(), max_points)
+
+    if resolution is None:
+        rows = backend.select_logs(since=since_ts.isoformat(), until=until_ts.isoformat(), device_id=device_id,
+                                   columns=f"log_timestamp, {metric}")
+        df = pd.DataFrame(rows, columns=["log_timestamp", metric])
+        return pd.DataFrame({
+            "timestamp": pd.to_datetime(df["log_timestamp"], utc=True),
+            "mean": df[metric], "min": df[metric], "max": df[metric], "count": 1,
+        })
+
+    rows = backend.select_rollups(resolution, since=since_ts.isoformat(), until=until_ts.isoformat(),
+                                  device_id=device_id, metric=metric)
+    df = pd.DataFrame(rows, columns=["bucket_start", "mean", "min", "max", "count"])
+    df["timestamp"] = pd.to_datetime(df.pop("bucket_start"), utc=True)
+    return df[["timestamp", "mean", "min", "max", "count"]]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="CMOS 센서 로그 롤업(다운샘플링) 서비스")
+    parser.add_argument("--interval", type=float, default=ROLLUP_INTERVAL_SECONDS, help="롤업 갱신 주기(초)")
+    args = parser.parse_args()
+    RollupService().run(args.interval)
@@ -3,21 +3,19 @@ import os
 import time
 import random
 import math
+import argparse
 from datetime import datetime
-from supabase import create_client, Client
-from dotenv import load_dotenv
 
-# .env.local 파일에서 환경 변수 로드
-load_dotenv(dotenv_path='.env.local')
+from metrics import STAGE_SECONDS, count_rows, record_error, stage_timer, start_from_env, track_queue_depth
+from sim_clock import SimulatedClock, SystemClock
+from spool import SPOOL_DIR, WriteAheadSpool
+from storage import LazyBackend
 
-# Supabase 클라이언트 초기화
-supabase_url = os.getenv("NEXT_PUBLIC_SUPABASE_URL")
-supabase_key = os.getenv("NEXT_PUBLIC_SUPABASE_ANON_KEY")
+# 저장소 백엔드 (CMOS_STORAGE_BACKEND=supabase | sqlite). 처음 사용할 때 생성됨
+backend = LazyBackend()
 
-if not supabase_url or not supabase_key:
-    raise ValueError("Supabase URL 또는 Key가 환경 변수에 설정되지 않았습니다.")
-
-supabase: Client = create_client(supabase_url, supabase_key)
+# 단일 센서 모드에서 사용하는 장치 ID (predictive_engine.DEVICE_ID와 동일)
+DEVICE_ID = 1
 
 # 센서의 초기 상태 설정
 base_temperature = 25.0  # 섭씨
@@ -25,16 +23,17 @@ temperature_drift = 0.1  # 시간당 온도 상승률
 base_dead_pixels = 5
 simulation_start_time = time.time()
 
-def get_sensor_data():
+def get_sensor_data(now=None):
     """
     시간이 지남에 따라 온도가 서서히 오르고,
     그에 따라 노이즈가 지수적으로 증가하는 것을 시뮬레이션합니다.
     불량 픽셀 수도 시간에 따라 서서히 증가할 수 있습니다.
+    now(epoch 초)를 지정하면 실제 시각 대신 해당 시각 기준으로 생성합니다.
     """
     global base_temperature, simulation_start_time
 
     # 현재까지 경과된 시간(초)
-    elapsed_time = time.time() - simulation_start_time
+    elapsed_time = (time.time() if now is None else now) - simulation_start_time
 
     # 온도 모델링: 시간에 따라 선형적으로 증가
     current_temperature = base_temperature + (elapsed_time / 3600) * temperature_drift
@@ -60,24 +59,37 @@ def get_health_status(temp, noise, pixels):
     else:
         return "healthy"
 
-def run_simulator():
+def create_log_spool(directory=SPOOL_DIR):
+    """sensor_health_logs 쓰기용 로컬 스풀. 기록은 디스크에 먼저 남고 백그라운드에서 저장소로 전송됩니다."""
+    return WriteAheadSpool(os.path.join(directory, "sensor_health_logs"), backend.insert_logs, name="logs")
+
+
+def run_simulator(clock=None, spool=None, interval=5.0):
     """
-    메인 시뮬레이터 루프. 5초마다 센서 데이터를 생성하고 Supabase에 전송합니다.
+    메인 시뮬레이터 루프. interval초(기본 5초)마다 센서 데이터를 생성하고 저장소 백엔드에 전송합니다.
+    clock에 SimulatedClock을 넘기면 가상 시각 기준으로 가속하여 실행합니다.
+    spool(WriteAheadSpool)을 넘기면 로컬 스풀에 기록하므로, 저장소 장애나 지연이 샘플링 주기를 밀지 않고 데이터도 잃지 않습니다.
     """
-    print("CMOS 센서 시뮬레이터를 시작합니다. 5초 간격으로 데이터를 Supabase에 전송합니다.")
-    print(f"Supabase URL: {supabase_url}")
-    
+    global simulation_start_time
+    clock = clock or SystemClock()
+    simulation_start_time = clock.time()
+    print(f"CMOS 센서 시뮬레이터를 시작합니다. {interval}초 간격으로 데이터를 전송합니다.")
+    print(f"저장소 백엔드: {backend.name}")
+    insert_logs = spool.append if spool is not None else backend.insert_logs
+    delivery = "데이터 전송 성공" if spool is None else "스풀 기록 완료"
+
     while True:
         try:
             # 1. 가상 센서 데이터 생성
-            temp, noise, pixels = get_sensor_data()
+            temp, noise, pixels = get_sensor_data(clock.time())
 
             # 2. 센서 상태 평가
             status = get_health_status(temp, noise, pixels)
 
-            # 3. Supabase에 저장할 데이터 구성
-            log_time = datetime.utcnow().isoformat()
+            # 3. 저장할 데이터 구성
+            log_time = clock.utcnow().isoformat()
             data_to_insert = {
+                "device_id": DEVICE_ID,
                 "log_timestamp": log_time,
                 "temperature": temp,
                 "noise_level": noise,
@@ -85,19 +97,253 @@ def run_simulator():
                 "status": status,
             }
 
-            # 4. Supabase 'sensor_health_logs' 테이블에 데이터 삽입
-            # 실제 'table' 이름은 Supabase 프로젝트의 테이블 이름과 일치해야 합니다.
-            data, count = supabase.table("sensor_health_logs").insert(data_to_insert).execute()
+            # 4. 'sensor_health_logs' 테이블에 데이터 삽입 (스풀 사용 시 로컬 기록 후 비동기 전송)
+            insert_logs([data_to_insert])
+            count_rows("emulator", 1)
             
-            print(f"[{log_time}] 데이터 전송 성공: Temp={temp}°C, Noise={noise}, Dead Pixels={pixels}, Status={status}")
+            print(f"[{log_time}] {delivery}: Temp={temp}°C, Noise={noise}, Dead Pixels={pixels}, Status={status}")
 
         except Exception as e:
+            record_error("emulator")
             print(f"오류 발생: {e}")
 
-        # 5초 대기
-        time.sleep(5)
+        # 샘플링 간격만큼 대기
+        clock.sleep(interval)
+
+def get_health_status_array(temp, noise, pixels):
+    """get_health_status()의 벡터화 버전. 장치 배열 전체의 상태를 한 번에 결정합니다."""
+    import numpy as np
+
+    critical = (temp > 60) | (noise > 5.0) | (pixels > 50)
+    warning = (temp > 45) | (noise > 2.5) | (pixels > 20)
+    return np.where(critical, "critical", np.where(warning, "warning", "healthy"))
+
+
+class VirtualSensorFleet:
+    """
+    N개의 가상 센서를 NumPy 배열로 한 번에 시뮬레이션합니다.
+    장치마다 (seed, device_id)로부터 독립적인 기준 온도, 온도 상승률, 초기 불량 픽셀 수를 갖습니다.
+    단일 센서 모드와 get_health_status()만 쓰는 경우 NumPy를 로드하지 않도록 플릿 모드에서만 import합니다.
+    """
+
+    def __init__(self, num_devices, seed=0, first_device_id=1, start_time=None):
+        import numpy as np
+
+        self.device_ids = np.arange(first_device_id, first_device_id + num_devices, dtype=np.int64)
+        self.start_time = time.time() if start_time is None else start_time
+        self.base_temperature = np.empty(num_devices)
+        self.temperature_drift = np.empty(num_devices)
+        self.base_dead_pixels = np.empty(num_devices, dtype=np.int64)
+        for i, device_id in enumerate(self.device_ids):
+            device_rng = np.random.default_rng([seed, int(device_id)])
+            self.base_temperature[i] = device_rng.uniform(23.0, 27.0)
+            self.temperature_drift[i] = device_rng.uniform(0.05, 0.2)
+            self.base_dead_pixels[i] = device_rng.integers(3, 8)
+        self._rng = np.random.default_rng([seed, num_devices, first_device_id])
+
+    def __len__(self):
+        return len(self.device_ids)
+
+    def sample(self, now=None):
+        """한 틱(tick)의 전체 장치 데이터를 (온도, 노이즈, 불량 픽셀, 상태) 배열로 생성합니다."""
+        now = time.time() if now is None else now
+        temperature, noise_level, dead_pixel_count, status = self.sample_block([now])
+        return temperature[0], noise_level[0], dead_pixel_count[0], status[0]
+
+    def sample_block(self, times):
+        """여러 틱을 한 번에 생성합니다. 각 값은 (틱 수, 장치 수) 배열입니다 (백테스트용 대량 합성 데이터)."""
+        import numpy as np
+
+        elapsed_time = np.asarray(times, dtype=np.float64)[:, None] - self.start_time
+        shape = (elapsed_time.shape[0], len(self))
+
+        temperature = self.base_temperature + (elapsed_time / 3600) * self.temperature_drift
+        temperature += self._rng.uniform(-0.5, 0.5, shape)
+
+        noise_level = 0.5 * np.exp(0.08 * (temperature - self.base_temperature))
+        noise_level += self._rng.uniform(-0.1, 0.1, shape)
+
+        dead_pixel_count = self.base_dead_pixels + np.trunc(elapsed_time / 7200).astype(np.int64) + self._rng.integers(0, 3, shape)
+
+        temperature = np.round(temperature, 2)
+        noise_level = np.round(noise_level, 2)
+        status = get_health_status_array(temperature, noise_level, dead_pixel_count)
+        return temperature, noise_level, dead_pixel_count, status
+
+    def sample_rows(self, log_time, now=None):
+        """sample() 결과를 DB 삽입용 행(dict) 리스트로 변환합니다."""
+        temperature, noise_level, dead_pixel_count, status = self.sample(now)
+        return [
+            {
+                "device_id": device_id,
+                "log_timestamp": log_time,
+                "temperature": temp,
+                "noise_level": noise,
+                "dead_pixel_count": pixels,
+                "status": state,
+            }
+            for device_id, temp, noise, pixels, state in zip(
+                self.device_ids.tolist(), temperature.tolist(), noise_level.tolist(),
+                dead_pixel_count.tolist(), status.tolist(),
+            )
+        ]
+
+
+_FLUSH_SECONDS = STAGE_SECONDS.labels("emulator_flush")
+
+
+class BulkInsertBuffer:
+    """
+    행을 모아 두었다가 행 수(max_rows) 또는 경과 시간(max_age_seconds) 기준으로
+    한 번의 bulk insert로 전송하는 버퍼입니다.
+    """
+
+    def __init__(self, insert_fn, max_rows=1000, max_age_seconds=2.0):
+        self.insert_fn = insert_fn
+        self.max_rows = max_rows
+        self.max_age_seconds = max_age_seconds
+        self._rows = []
+        self._oldest = None
+        self.rows_written = 0
+        self.rows_dropped = 0
+        self.flush_latencies = []
+
+    def __len__(self):
+        return len(self._rows)
+
+    def extend(self, rows):
+        if not rows:
+            return
+        if self._oldest is None:
+            self._oldest = time.monotonic()
+        self._rows.extend(rows)
+        while len(self._rows) >= self.max_rows:
+            self._flush_batch(self._rows[:self.max_rows])
+            del self._rows[:self.max_rows]
+        if not self._rows:
+            self._oldest = None
+
+    def seconds_until_due(self):
+        """버퍼가 시간 기준으로 비워져야 할 때까지 남은 시간(초). 버퍼가 비어 있으면 None."""
+        if self._oldest is None:
+            return None
+        return max(0.0, self.max_age_seconds - (time.monotonic() - self._oldest))
+
+    def maybe_flush(self):
+        due = self.seconds_until_due()
+        if due is not None and due <= 0:
+            self.flush()
+
+    def flush(self):
+        if self._rows:
+            self._flush_batch(self._rows)
+        self._rows = []
+        self._oldest = None
+
+    def _flush_batch(self, rows):
+        started = time.perf_counter()
+        try:
+            self.insert_fn(rows)
+            self.rows_written += len(rows)
+            count_rows("emulator", len(rows))
+        except Exception as e:
+            self.rows_dropped += len(rows)
+            record_error("emulator")
+            count_rows("emulator_dropped", len(rows))
+            print(f"Bulk insert 오류 발생 ({len(rows)}행): {e}")
+        elapsed = time.perf_counter() - started
+        self.flush_latencies.append(elapsed)
+        _FLUSH_SECONDS.observe(elapsed)
+
+    def pop_flush_latencies(self):
+        latencies, self.flush_latencies = self.flush_latencies, []
+        return latencies
+
+
+def run_fleet_simulator(num_devices, interval=5.0, seed=0, batch_size=1000, max_batch_age=2.0, report_interval=30.0,
+                        clock=None, spool=None):
+    """
+    N개의 가상 센서를 동시에 시뮬레이션합니다.
+    매 틱마다 전체 장치 데이터를 벡터화하여 생성하고, BulkInsertBuffer를 통해 일괄 전송합니다.
+    spool을 넘기면 버퍼는 로컬 스풀에 기록하고, 저장소 전송은 스풀 드레이너가 맡습니다.
+    """
+    clock = clock or SystemClock()
+    fleet = VirtualSensorFleet(num_devices, seed=seed, start_time=clock.time())
+    buffer = BulkInsertBuffer(spool.append if spool is not None else backend.insert_logs,
+                              max_rows=batch_size, max_age_seconds=max_batch_age)
+    track_queue_depth("emulator_buffer", buffer.__len__)
+    print(f"CMOS 센서 플릿 시뮬레이터를 시작합니다. 장치 {num_devices}개, {interval}초 간격, 배치 크기 {batch_size}.")
+
+    next_tick = clock.monotonic()
+    report_started = time.monotonic()
+    report_rows = buffer.rows_written
+    while True:
+        log_time = clock.utcnow().isoformat()
+        with stage_timer("emulator_sample"):
+            rows = fleet.sample_rows(log_time, now=clock.time())
+        buffer.extend(rows)
+        next_tick += interval
+
+        # 다음 틱까지 대기하면서 오래된 버퍼를 시간 기준으로 비움
+        while True:
+            remaining = next_tick - clock.monotonic()
+            if remaining <= 0:
+                break
+            due = buffer.seconds_until_due()
+            clock.sleep(remaining if due is None else min(remaining, due))
+            buffer.maybe_flush()
+
+        elapsed = time.monotonic() - report_started
+        if elapsed >= report_interval:
+            latencies = sorted(buffer.pop_flush_latencies())
+            rows_per_sec = (buffer.rows_written - report_rows) / elapsed
+            backlog = "" if spool is None else f", 스풀 미전송 {spool.pending_rows():,}행"
+            if latencies:
+                p50 = latencies[len(latencies) // 2] * 1000
+                worst = latencies[-1] * 1000
+                print(f"[{datetime.now()}] 처리량: {rows_per_sec:,.0f} rows/s, flush {len(latencies)}회 (p50 {p50:.1f} ms, max {worst:.1f} ms), 누락 {buffer.rows_dropped}행{backlog}")
+            else:
+                print(f"[{datetime.now()}] 처리량: {rows_per_sec:,.0f} rows/s, flush 없음{backlog}")
+            report_started = time.monotonic()
+            report_rows = buffer.rows_written
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="CMOS 센서 데이터 에뮬레이터")
+    parser.add_argument("--devices", type=int, default=1, help="시뮬레이션할 가상 센서 수 (기본값: 1)")
+    parser.add_argument("--interval", type=float, default=5.0, help="샘플링 간격(초)")
+    parser.add_argument("--seed", type=int, default=0, help="플릿 난수 시드")
+    parser.add_argument("--batch-size", type=int, default=1000, help="bulk insert 한 번에 보낼 최대 행 수")
+    parser.add_argument("--max-batch-age", type=float, default=2.0, help="버퍼된 행을 보내기 전 최대 대기 시간(초)")
+    parser.add_argument("--report-interval", type=float, default=30.0, help="처리량 보고 간격(초)")
+    parser.add_argument("--speedup", type=float, default=None, help="가상 시각 가속 배율 (예: 720이면 1시간 분량을 5초에 생성)")
+    parser.add_argument("--start-days-ago", type=float, default=0.0,
+                        help="가속 실행 시 가상 시각의 시작점 (며칠 전). 현재 시각을 따라잡으면 실시간으로 진행")
+    parser.add_argument("--spool-dir", default=SPOOL_DIR, help="로컬 쓰기 선행 스풀 디렉터리")
+    parser.add_argument("--no-spool", action="store_true", help="스풀 없이 저장소에 직접 기록 (장애 시 데이터 유실)")
+    return parser.parse_args()
+
 
 if __name__ == "__main__":
     # 스크립트가 백그라운드에서 실행될 수 있도록
     # 'python sensor_emulator.py &' 와 같이 실행할 수 있습니다.
-    run_simulator()
+    # 다중 장치 부하 테스트: 'python sensor_emulator.py --devices 1000'
+    args = parse_args()
+    start_from_env()
+    clock = None
+    if args.speedup or args.start_days_ago:
+        clock = SimulatedClock(time.time() - args.start_days_ago * 86400, speedup=args.speedup, follow_wall_clock=True)
+    spool = None if args.no_spool else create_log_spool(args.spool_dir)
+    if args.devices == 1:
+        run_simulator(clock, spool, interval=args.interval)
+    else:
+        run_fleet_simulator(
+            args.devices,
+            interval=args.interval,
+            seed=args.seed,
+            batch_size=args.batch_size,
+            max_batch_age=args.max_batch_age,
+            report_interval=args.report_interval,
+            clock=clock,
+            spool=spool,
+        )
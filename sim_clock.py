@@ -0,0 +1,65 @@
+import time
+from datetime import datetime, timezone
+
+
+class SystemClock:
+    """실제 시각을 사용하는 기본 시계."""
+
+    def time(self):
+        return time.time()
+
+    def monotonic(self):
+        return time.monotonic()
+
+    def sleep(self, seconds):
+        if seconds > 0:
+            time.sleep(seconds)
+
+    def utcnow(self):
+        """datetime.utcnow()와 같은 naive UTC datetime을 반환합니다."""
+        return datetime.fromtimestamp(self.time(), tz=timezone.utc).replace(tzinfo=None)
+
+
+class SimulatedClock(SystemClock):
+    """
+    재생(replay)/백필용 가상 시계. sleep()은 가상 시각만 앞당기며,
+    speedup이 주어지면 실제로는 (경과 시간 / speedup)만큼만 대기합니다. speedup이 None이면 대기하지 않습니다.
+    follow_wall_clock=True이면 가상 시각이 현재 시각을 따라잡은 뒤에는 실시간으로 진행합니다.
+    """
+
+    def __init__(self, start=None, speedup=None, follow_wall_clock=False):
+        self._now = time.time() if start is None else float(start)
+        self.speedup = speedup
+        self.follow_wall_clock = follow_wall_clock
+
+    def time(self):
+        return self._now
+
+    def monotonic(self):
+        return self._now
+
+    def sleep(self, seconds):
+        if seconds <= 0:
+            return
+        if self.follow_wall_clock and self._now + seconds > time.time():
+            # 현재 시각에 도달한 부분까지만 가속하고 나머지는 실시간으로 대기
+            accelerated = max(0.0, time.time() - self._now)
+            self._advance(accelerated)
+            time.sleep(seconds - accelerated)
+            self._now = max(self._now + seconds - accelerated, time.time())
+            return
+        self._advance(seconds)
+
+    def _advance(self, seconds):
+        if self.speedup:
+            time.sleep(seconds / self.speedup)
+        self._now += seconds
+
+    def set_time(self, timestamp):
+        """대기 없이 가상 시각을 timestamp(epoch 초)로 지정합니다."""
+        self._now = float(timestamp)
+
+    def advance_to(self, timestamp):
+        """가상 시각을 timestamp(epoch 초)로 옮깁니다. 뒤로 되돌리지는 않습니다."""
+        if timestamp > self._now:
+            self.sleep(timestamp - self._now)
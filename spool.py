@@ -0,0 +1,448 @@
+import os
+import json
+import time
+import uuid
+import zlib
+import atexit
+import random
+import struct
+import itertools
+import threading
+from datetime import datetime, timezone
+
+from metrics import count_rows, record_error, stage_timer, track_queue_depth
+from storage import IDEMPOTENCY_KEY_FIELD
+
+# --- 로컬 쓰기 선행(write-ahead) 스풀 설정 ---
+SPOOL_DIR = "spool"                       # 스풀 루트 디렉터리 (스트림별 하위 디렉터리 사용)
+SPOOL_SEGMENT_BYTES = 16 * 1024 * 1024    # 세그먼트 파일 최대 크기 (넘으면 다음 세그먼트로 전환)
+SPOOL_FSYNC_INTERVAL_SECONDS = 0.05       # 기록한 데이터를 디스크에 fsync하기까지의 최대 지연 (그룹 커밋)
+SPOOL_DRAIN_BATCH_ROWS = 1000             # 드레이너가 한 번에 백엔드로 보내는 최대 행 수 (레코드 단위로 자름)
+SPOOL_BACKOFF_INITIAL_SECONDS = 0.5       # 전송 실패 시 첫 재시도 대기 시간
+SPOOL_BACKOFF_MAX_SECONDS = 60.0          # 재시도 대기 시간 상한 (실패할 때마다 두 배)
+SPOOL_POISON_FAILURES = 5                 # 같은 배치가 연속으로 이만큼 실패하면 나눠 보내서 거부되는 행을 격리
+
+# 레코드 = 헤더(페이로드 길이, 행 수, CRC32) + JSON 페이로드(행 리스트)
+_HEADER = struct.Struct("<III")
+_SEGMENT_SUFFIX = ".seg"
+_CURSOR_FILE = "cursor.json"
+_LOCK_FILE = "LOCK"
+_DEAD_LETTER_FILE = "dead_letter.jsonl"  # 격리한 행 (한 줄에 하나: 격리 시각, 오류, 행)
+
+
+def _iter_records(f, offset, limit=None, decode=True):
+    """
+    파일 f의 offset부터 온전한 레코드를 차례로 읽어 (행 리스트 또는 행 수, 레코드 끝 오프셋)을 반환합니다.
+    limit(바이트)에 닿거나, 레코드가 잘렸거나, CRC가 맞지 않으면 멈춥니다.
+    decode=False이면 페이로드를 해석하지 않고 헤더의 행 수만 반환합니다 (CRC는 확인).
+    """
+    f.seek(offset)
+    while limit is None or offset + _HEADER.size <= limit:
+        header = f.read(_HEADER.size)
+        if len(header) < _HEADER.size:
+            return
+        length, row_count, crc = _HEADER.unpack(header)
+        end = offset + _HEADER.size + length
+        if limit is not None and end > limit:
+            return
+        payload = f.read(length)
+        if len(payload) < length or zlib.crc32(payload) != crc:
+            return
+        yield (json.loads(payload) if decode else row_count), end
+        offset = end
+
+
+class WriteAheadSpool:
+    """
+    저장소 쓰기를 로컬 디스크에 먼저 기록하고, 백그라운드 드레이너가 백엔드로 옮기는 append-only 스풀.
+
+    - append()는 행 리스트를 CRC가 붙은 레코드 하나로 현재 세그먼트 파일에 추가하고 바로 반환합니다.
+      원격 저장소의 지연이나 장애와 무관하게 로컬 디스크 속도로 기록됩니다.
+    - fsync는 별도 스레드가 fsync_interval마다 모아서 수행합니다 (그룹 커밋).
+      프로세스가 죽어도 기록된 데이터는 남으며, 전원 장애 시에는 최대 fsync_interval만큼 잃을 수 있습니다.
+    - 드레이너는 커서(cursor.json) 위치부터 최대 batch_rows행씩 sink(rows)로 보내고, 성공하면 커서를 옮기고
+      다 보낸 세그먼트를 삭제합니다. 실패하면 지수 백오프(지터 포함) 후 같은 배치를 다시 보냅니다.
+    - 같은 배치가 poison_failures번 연속 실패하면 배치를 반씩 나눠 다시 보내고, 혼자서도 거부되는 행
+      (제약 조건 위반, 잘못된 컬럼, 너무 큰 페이로드 등)을 dead_letter.jsonl로 옮긴 뒤 커서를 넘깁니다.
+      나눠 보낸 부분이 하나도 성공하지 못하면 저장소 장애로 보고 행을 격리하지 않은 채 재시도를 이어갑니다.
+    - 전송은 최소 한 번(at-least-once)이므로 커서 저장 전에 죽으면 같은 배치가 다시 전송될 수 있습니다.
+      행마다 멱등 키(ingest_key)를 기록해 두어 백엔드가 중복을 무시합니다. 예측 결과나 장치 상태처럼
+      자연 키 기준 upsert로 쓰는 스트림은 다시 보내도 결과가 같으므로 idempotency_keys=False로 키를 붙이지 않습니다.
+    - 시작 시 마지막 세그먼트를 검사해 잘리거나 CRC가 맞지 않는 꼬리 레코드를 잘라냅니다.
+
+    디렉터리는 처음 append()할 때 만들어지며 (import만으로는 디스크나 스레드를 건드리지 않음),
+    한 디렉터리는 한 프로세스만 사용할 수 있습니다.
+    """
+
+    def __init__(self, directory, sink, name=None, segment_bytes=SPOOL_SEGMENT_BYTES,
+                 fsync_interval=SPOOL_FSYNC_INTERVAL_SECONDS, batch_rows=SPOOL_DRAIN_BATCH_ROWS,
+                 backoff_initial=SPOOL_BACKOFF_INITIAL_SECONDS, backoff_max=SPOOL_BACKOFF_MAX_SECONDS,
+                 poison_failures=SPOOL_POISON_FAILURES, idempotency_keys=True, verbose=True):
+        self.directory = directory
+        self.sink = sink
+        self.idempotency_keys = idempotency_keys
+        self.name = name or os.path.basename(os.path.normpath(directory))
+        self.segment_bytes = segment_bytes
+        self.fsync_interval = fsync_interval
+        self.batch_rows = batch_rows
+        self.backoff_initial = backoff_initial
+        self.backoff_max = backoff_max
+        self.poison_failures = poison_failures
+        self.verbose = verbose
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._threads = []
+        self._opened = False
+        self._lock_fd = None
+        self._fd = None            # 쓰기 중인 세그먼트의 파일 디스크립터
+        self._segment = None       # 쓰기 중인 세그먼트 번호
+        self._size = 0             # 쓰기 중인 세그먼트에 기록 완료된 바이트 수
+        self._dirty = False        # 마지막 fsync 이후 기록이 있었는지
+        self._cursor = (1, 0)      # 다음에 전송할 (세그먼트, 오프셋)
+        self._pending_rows = 0
+        self._key_prefix = None
+        self._key_counter = None
+        self.rows_appended = 0
+        self.rows_delivered = 0
+        self.delivery_failures = 0
+        self.rows_dead_lettered = 0
+        self.last_error = None
+        track_queue_depth(f"spool_{self.name}", self.pending_rows)
+
+    # --- 파일 배치 ---
+
+    def _path(self, segment):
+        return os.path.join(self.directory, f"{segment:012d}{_SEGMENT_SUFFIX}")
+
+    def _segments(self):
+        return sorted(
+            int(entry[:-len(_SEGMENT_SUFFIX)]) for entry in os.listdir(self.directory)
+            if entry.endswith(_SEGMENT_SUFFIX) and entry[:-len(_SEGMENT_SUFFIX)].isdigit()
+        )
+
+    def _lock_directory(self):
+        """다른 프로세스가 같은 스풀 디렉터리에 쓰지 않도록 잠급니다 (fcntl이 없는 Windows에서는 생략)."""
+        try:
+            import fcntl
+        except ImportError:
+            return
+        fd = os.open(os.path.join(self.directory, _LOCK_FILE), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            raise RuntimeError(f"스풀 디렉터리를 다른 프로세스가 사용 중입니다: {self.directory}")
+        self._lock_fd = fd
+
+    def _load_cursor(self, segments):
+        cursor = None
+        path = os.path.join(self.directory, _CURSOR_FILE)
+        if os.path.exists(path):
+            try:
+                with open(path) as f:
+                    state = json.load(f)
+                cursor = (int(state["segment"]), int(state["offset"]))
+            except Exception as e:
+                record_error("spool")
+                print(f"스풀({self.name}) 커서를 읽지 못해 남은 세그먼트를 처음부터 다시 전송합니다: {e}")
+        if not segments:
+            return cursor or (1, 0)
+        if cursor is None or cursor[0] < segments[0]:
+            return segments[0], 0
+        return cursor
+
+    def _save_cursor(self):
+        path = os.path.join(self.directory, _CURSOR_FILE)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"segment": self._cursor[0], "offset": self._cursor[1]}, f)
+        os.replace(tmp_path, path)
+
+    def _recover(self, segment):
+        """세그먼트의 온전한 레코드 끝까지만 남기고 잘린 꼬리를 제거합니다. 남은 크기를 반환합니다."""
+        path = self._path(segment)
+        size = os.path.getsize(path)
+        valid = 0
+        with open(path, "rb") as f:
+            for _, valid in _iter_records(f, 0, decode=False):
+                pass
+        if valid < size:
+            record_error("spool")
+            print(f"스풀({self.name}) 세그먼트 {path}의 손상된 꼬리 {size - valid}바이트를 잘라냅니다.")
+            with open(path, "r+b") as f:
+                f.truncate(valid)
+        return valid
+
+    def _count_pending(self, segments):
+        """커서 이후의 미전송 행 수 (레코드 헤더만 읽음)."""
+        pending = 0
+        for segment in segments:
+            if segment < self._cursor[0]:
+                continue
+            offset = self._cursor[1] if segment == self._cursor[0] else 0
+            with open(self._path(segment), "rb") as f:
+                for row_count, _ in _iter_records(f, offset, decode=False):
+                    pending += row_count
+        return pending
+
+    def _open(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self._lock_directory()
+        segments = self._segments()
+        self._cursor = self._load_cursor(segments)
+        if segments:
+            self._segment = segments[-1]
+            self._size = self._recover(self._segment)
+        else:
+            self._segment, self._size = self._cursor[0], 0
+        if self._cursor > (self._segment, self._size):
+            self._cursor = (self._segment, self._size)
+        self._pending_rows = self._count_pending(segments)
+        self._fd = os.open(self._path(self._segment), os.O_WRONLY | os.O_CREAT | os.O_APPEND | getattr(os, "O_BINARY", 0), 0o644)
+        # 멱등 키: 프로세스(스풀을 연 시점)마다 고유한 접두사 + 일련번호
+        self._key_prefix = uuid.uuid4().hex[:16]
+        self._key_counter = itertools.count()
+        self._stop.clear()
+        self._threads = [
+            threading.Thread(target=self._drain_loop, name=f"spool-drain-{self.name}", daemon=True),
+            threading.Thread(target=self._sync_loop, name=f"spool-sync-{self.name}", daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+        self._opened = True
+        atexit.register(self.close, 0)
+        if self.pending_rows() and self.verbose:
+            print(f"스풀({self.name}): 이전 실행에서 전송하지 못한 {self._pending_rows}행을 이어서 전송합니다.")
+
+    def _roll(self):
+        """현재 세그먼트를 fsync 후 닫고 다음 세그먼트를 엽니다 (self._lock 보유 상태에서 호출)."""
+        os.fsync(self._fd)
+        os.close(self._fd)
+        self._segment += 1
+        self._size = 0
+        self._dirty = False
+        self._fd = os.open(self._path(self._segment), os.O_WRONLY | os.O_CREAT | os.O_APPEND | getattr(os, "O_BINARY", 0), 0o644)
+
+    # --- 기록 ---
+
+    def append(self, rows):
+        """
+        행(dict) 리스트를 스풀에 기록합니다. idempotency_keys가 켜져 있으면 멱등 키가 없는 행에
+        ingest_key를 추가합니다 (행 dict를 직접 수정).
+        로컬 기록만 기다리며, 백엔드 전송은 드레이너가 비동기로 수행합니다.
+        """
+        if not rows:
+            return
+        if not self._opened:
+            with self._lock:
+                if not self._opened:
+                    self._open()
+        if self.idempotency_keys:
+            for row in rows:
+                if IDEMPOTENCY_KEY_FIELD not in row:
+                    row[IDEMPOTENCY_KEY_FIELD] = f"{self._key_prefix}-{next(self._key_counter)}"
+        payload = json.dumps(rows, separators=(",", ":"), default=float).encode()
+        record = _HEADER.pack(len(payload), len(rows), zlib.crc32(payload)) + payload
+        with self._lock:
+            if self._size and self._size + len(record) > self.segment_bytes:
+                self._roll()
+            view = memoryview(record)
+            while view:
+                view = view[os.write(self._fd, view):]
+            self._size += len(record)
+            self._dirty = True
+            self._pending_rows += len(rows)
+            self.rows_appended += len(rows)
+        count_rows("spool_append", len(rows))
+        self._wake.set()
+
+    def sync(self):
+        """기록한 데이터를 디스크에 fsync합니다. 기록을 막지 않도록 복제한 디스크립터로 수행합니다."""
+        with self._lock:
+            if not self._dirty or self._fd is None:
+                return
+            fd = os.dup(self._fd)
+            self._dirty = False
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def _sync_loop(self):
+        while not self._stop.wait(self.fsync_interval):
+            try:
+                self.sync()
+            except Exception as e:
+                record_error("spool")
+                print(f"스풀({self.name}) fsync 중 오류 발생: {e}")
+
+    # --- 전송 ---
+
+    def pending_rows(self):
+        """아직 백엔드로 전송하지 못한 행 수."""
+        return self._pending_rows
+
+    def _read_batch(self):
+        """커서부터 최대 batch_rows행을 읽어 (행 리스트, 행 수, 다음 커서)를 반환합니다. 읽을 것이 없으면 None."""
+        segment, offset = self._cursor
+        rows, row_count = [], 0
+        while row_count < self.batch_rows:
+            with self._lock:
+                active, active_size = self._segment, self._size
+            limit = active_size if segment == active else None
+            if limit is not None and offset >= limit:
+                break
+            path = self._path(segment)
+            with open(path, "rb") as f:
+                for records, end in _iter_records(f, offset, limit):
+                    rows.extend(records)
+                    row_count += len(records)
+                    offset = end
+                    if row_count >= self.batch_rows:
+                        break
+            if row_count >= self.batch_rows or segment == active:
+                break
+            # 닫힌 세그먼트를 끝까지 읽지 못했으면 손상된 부분을 건너뜀
+            size = os.path.getsize(path)
+            if offset < size:
+                record_error("spool")
+                print(f"스풀({self.name}) 세그먼트 {path}가 손상되어 남은 {size - offset}바이트를 건너뜁니다.")
+            segment, offset = segment + 1, 0
+        if (segment, offset) == self._cursor:
+            return None
+        return rows, row_count, (segment, offset)
+
+    def _advance(self, cursor, row_count):
+        previous_segment = self._cursor[0]
+        self._cursor = cursor
+        self._save_cursor()
+        with self._lock:
+            self._pending_rows -= row_count
+        for segment in range(previous_segment, cursor[0]):
+            try:
+                os.remove(self._path(segment))
+            except FileNotFoundError:
+                pass
+
+    def _isolate(self, rows):
+        """
+        계속 거부되는 배치를 반씩 나눠 다시 보내고, 혼자서도 거부되는 행을 (행, 오류) 리스트로 반환합니다.
+        나머지 행은 전송됩니다. 한 번도 성공하지 못한 채 실패가 이어지면 저장소 장애로 보고 None을 반환합니다
+        (이때는 아무 행도 전송하지 않았으므로 배치 전체를 그대로 다시 보냄).
+        """
+        # 거부되는 행이 맨 앞에 있어도 첫 성공까지의 실패는 대략 2 * log2(행 수)번
+        budget = 2 * len(rows).bit_length()
+        delivered, failures, rejected = False, 0, []
+        middle = len(rows) // 2
+        stack = [rows[middle:], rows[:middle]] if middle else []
+        while stack:
+            part = stack.pop()
+            try:
+                with stage_timer("spool_drain"):
+                    self.sink(part)
+                delivered = True
+            except Exception as e:
+                failures += 1
+                if not delivered and failures > budget:
+                    return None
+                if len(part) == 1:
+                    rejected.append((part[0], e))
+                else:
+                    middle = len(part) // 2
+                    stack.extend([part[middle:], part[:middle]])
+        return rejected if delivered else None
+
+    def _dead_letter(self, rejected):
+        """격리한 행을 dead_letter.jsonl에 추가합니다. 원인을 고친 뒤 이 파일의 행을 다시 보낼 수 있습니다."""
+        rejected_at = datetime.now(timezone.utc).isoformat()
+        with open(os.path.join(self.directory, _DEAD_LETTER_FILE), "a") as f:
+            for row, error in rejected:
+                f.write(json.dumps({"rejected_at": rejected_at, "error": str(error), "row": row}, default=float) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self.rows_dead_lettered += len(rejected)
+        count_rows("spool_dead_letter", len(rejected))
+        record_error("spool")
+        print(f"스풀({self.name}) 저장소가 계속 거부한 {len(rejected)}행을 {_DEAD_LETTER_FILE}로 옮기고 다음 행부터 전송합니다: {rejected[0][1]}")
+
+    def _drain_loop(self):
+        backoff = self.backoff_initial
+        failures = 0  # 현재 배치의 연속 전송 실패 횟수
+        while not self._stop.is_set():
+            self._wake.clear()
+            try:
+                batch = self._read_batch()
+            except Exception as e:
+                record_error("spool")
+                print(f"스풀({self.name}) 읽기 중 오류 발생: {e}")
+                self._stop.wait(self.backoff_max)
+                continue
+            if batch is None:
+                self._wake.wait(1.0)
+                continue
+
+            rows, row_count, cursor = batch
+            rejected = []
+            if rows:
+                try:
+                    with stage_timer("spool_drain"):
+                        self.sink(rows)
+                except Exception as e:
+                    record_error("spool")
+                    self.delivery_failures += 1
+                    self.last_error = str(e)
+                    failures += 1
+                    rejected = None
+                    if failures >= self.poison_failures:
+                        failures = 0
+                        try:
+                            rejected = self._isolate(rows)
+                            if rejected:
+                                self._dead_letter(rejected)
+                        except Exception as isolate_error:
+                            rejected = None
+                            record_error("spool")
+                            print(f"스풀({self.name}) 거부된 행을 격리하는 중 오류 발생: {isolate_error}")
+                    if rejected is None:
+                        delay = random.uniform(backoff / 2, backoff)
+                        if self.verbose:
+                            print(f"스풀({self.name}) 전송 실패 ({row_count}행, 미전송 {self._pending_rows}행), {delay:.1f}초 후 재시도: {e}")
+                        self._stop.wait(delay)
+                        backoff = min(backoff * 2, self.backoff_max)
+                        continue
+            failures = 0
+            backoff = self.backoff_initial
+            self._advance(cursor, row_count)
+            self.rows_delivered += row_count - len(rejected)
+            count_rows("spool_drain", row_count - len(rejected))
+
+    def wait_drained(self, timeout=None):
+        """미전송 행이 없어질 때까지 기다립니다. 모두 전송했으면 True를 반환합니다."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self._pending_rows > 0:
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def close(self, timeout=5.0):
+        """최대 timeout초 동안 남은 행을 전송한 뒤 스레드를 멈추고, 세그먼트를 fsync 후 닫습니다."""
+        if not self._opened:
+            return
+        if timeout:
+            self.wait_drained(timeout)
+        self._stop.set()
+        self._wake.set()
+        for thread in self._threads:
+            thread.join(timeout=1.0)
+        with self._lock:
+            if self._fd is not None:
+                os.fsync(self._fd)
+                os.close(self._fd)
+                self._fd = None
+            if self._lock_fd is not None:
+                os.close(self._lock_fd)
+                self._lock_fd = None
+            self._opened = False
+        atexit.unregister(self.close)
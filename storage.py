@@ -0,0 +1,610 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from functools import partial
+
+from metrics import REGISTRY
+
+# 로그 테이블의 컬럼 목록 (삽입 순서)
+LOG_FIELDS = (
+    "device_id", "log_timestamp", "temperature", "noise_level", "dead_pixel_count", "status",
+    "hot_pixel_count", "defect_pixels", "ingest_key",
+)
+
+# 스풀(spool.py)이 행마다 부여하는 멱등 키 컬럼. 같은 키의 행이 다시 전송되면 삽입하지 않음
+IDEMPOTENCY_KEY_FIELD = "ingest_key"
+
+# 저장소가 행을 받은 시각 컬럼 (저장소가 기록). 스풀 재전송 등으로 늦게 들어온 과거 타임스탬프 행도
+# 이 시각 기준으로는 새 행이므로, 증분 조회는 log_timestamp 대신 이 컬럼을 커서로 사용
+INGESTED_AT_FIELD = "ingested_at"
+
+# 롤업 테이블의 컬럼 목록
+ROLLUP_FIELDS = ("device_id", "resolution", "bucket_start", "metric", "count", "mean", "m2", "std", "min", "max")
+
+# Supabase(PostgREST)가 한 번의 요청으로 반환하는 최대 행 수
+SUPABASE_PAGE_SIZE = 1000
+
+# LazyBackend를 거치는 저장소 호출의 소요 시간/실패 수 (백엔드, 메서드별)
+STORAGE_SECONDS = REGISTRY.histogram("cmos_storage_call_seconds", "저장소 호출 소요 시간", ("backend", "method"))
+STORAGE_ERRORS = REGISTRY.counter("cmos_storage_errors_total", "예외로 끝난 저장소 호출 수", ("backend", "method"))
+
+
+class StorageBackend:
+    """
+    센서 서비스들이 사용하는 저장소 연산의 공통 인터페이스.
+    에뮬레이터, 이상 탐지기, 예측 엔진은 이 인터페이스만 사용하므로
+    Supabase 대신 로컬 SQLite 백엔드로 바꿔 오프라인 실행 및 벤치마크가 가능합니다.
+    """
+
+    name = "base"
+
+    def insert_logs(self, rows):
+        """sensor_health_logs에 행(dict 리스트)을 일괄 삽입합니다. ingest_key가 이미 있는 행은 건너뜁니다."""
+        raise NotImplementedError
+
+    def select_logs(self, since=None, until=None, columns="*", device_id=None, descending=False, limit=None, offset=0,
+                    ingested_since=None, order_by="log_timestamp"):
+        """
+        sensor_health_logs를 log_timestamp 기준으로 정렬하여 조회합니다.
+        since 이상(gte), until 미만(lt) 구간으로 제한할 수 있으며, limit이 없으면 전체를 반환합니다.
+        ingested_since를 주면 저장소가 그 시각 이후에 받은 행(ingested_at gte)만 조회하고,
+        order_by="ingested_at"이면 받은 순서(ingested_at, id)로 정렬합니다.
+        """
+        raise NotImplementedError
+
+    def select_log_versions(self, since=None, until=None):
+        """
+        구간 내 장치별 (로그 수, 마지막 log_timestamp)를 {device_id: (count, last)} dict로 반환합니다.
+        보고서 캐시의 데이터 버전 확인용이며, 기본 구현은 두 컬럼만 조회하여 집계합니다.
+        """
+        versions = {}
+        for row in self.select_logs(since=since, until=until, columns="device_id, log_timestamp"):
+            count, _ = versions.get(row["device_id"], (0, None))
+            versions[row["device_id"]] = (count + 1, row["log_timestamp"])
+        return versions
+
+    def insert_alerts(self, rows):
+        """sensor_alerts에 경고를 일괄 삽입합니다. ingest_key가 이미 있는 경고는 건너뜁니다."""
+        raise NotImplementedError
+
+    def select_alerts(self, since=None, until=None, device_id=None, columns="*"):
+        """sensor_alerts를 created_at 오름차순으로 조회합니다 (since 이상, until 미만)."""
+        raise NotImplementedError
+
+    def select_predictions(self):
+        """sensor_predictions의 장치별 최신 예측을 모두 조회합니다."""
+        raise NotImplementedError
+
+    def select_devices(self):
+        """sensor_devices의 장치 정보를 모두 조회합니다."""
+        raise NotImplementedError
+
+    def upsert_predictions(self, rows):
+        """sensor_predictions에 device_id 기준으로 예측 결과를 upsert합니다."""
+        raise NotImplementedError
+
+    def update_device(self, device_id, fields):
+        """sensor_devices의 장치 정보를 갱신합니다."""
+        raise NotImplementedError
+
+    def update_devices(self, rows):
+        """여러 장치의 상태를 한 번에 갱신합니다. 각 행은 id, status, last_updated를 포함합니다."""
+        raise NotImplementedError
+
+    def ensure_device(self, device_id, defaults):
+        """장치가 없으면 defaults 값으로 생성합니다. 새로 생성했으면 True를 반환합니다."""
+        raise NotImplementedError
+
+    def upsert_rollups(self, rows):
+        """sensor_health_rollups에 (device_id, resolution, bucket_start, metric) 기준으로 집계 버킷을 upsert합니다."""
+        raise NotImplementedError
+
+    def select_rollups(self, resolution, since=None, until=None, device_id=None, metric=None):
+        """지정한 해상도의 집계 버킷을 bucket_start 오름차순으로 조회합니다."""
+        raise NotImplementedError
+
+
+class SupabaseBackend(StorageBackend):
+    """Supabase(PostgREST) 원격 백엔드."""
+
+    name = "supabase"
+
+    def __init__(self, client):
+        self.client = client
+
+    @classmethod
+    def from_env(cls):
+        supabase_url = os.getenv("NEXT_PUBLIC_SUPABASE_URL")
+        supabase_key = os.getenv("NEXT_PUBLIC_SUPABASE_ANON_KEY")
+
+        if not supabase_url or not supabase_key:
+            raise ValueError("Supabase URL 또는 Key가 환경 변수에 설정되지 않았습니다.")
+
+        from supabase import create_client
+
+        return cls(create_client(supabase_url, supabase_key))
+
+    def _insert(self, table, rows):
+        # 멱등 키가 있는 행은 (ingest_key unique 제약 기준) 중복을 무시하는 upsert로 삽입
+        if rows and IDEMPOTENCY_KEY_FIELD in rows[0]:
+            self.client.table(table).upsert(rows, on_conflict=IDEMPOTENCY_KEY_FIELD, ignore_duplicates=True).execute()
+        else:
+            self.client.table(table).insert(rows).execute()
+
+    def insert_logs(self, rows):
+        self._insert("sensor_health_logs", rows)
+
+    def select_logs(self, since=None, until=None, columns="*", device_id=None, descending=False, limit=None, offset=0,
+                    ingested_since=None, order_by="log_timestamp"):
+        def build_query():
+            query = self.client.table("sensor_health_logs").select(columns)
+            if since is not None:
+                query = query.gte("log_timestamp", since)
+            if until is not None:
+                query = query.lt("log_timestamp", until)
+            if ingested_since is not None:
+                query = query.gte(INGESTED_AT_FIELD, ingested_since)
+            if device_id is not None:
+                query = query.eq("device_id", device_id)
+            if order_by == INGESTED_AT_FIELD:
+                # 같은 시각에 받은 행은 id 순서로 고정해야 페이지를 나눠 읽을 때 빠지거나 겹치지 않음
+                return query.order(INGESTED_AT_FIELD, desc=descending).order("id", desc=descending)
+            return query.order("log_timestamp", desc=descending)
+
+        if limit is not None:
+            return build_query().range(offset, offset + limit - 1).execute().data
+        return self._select_all(build_query, offset)
+
+    def _select_all(self, build_query, offset=0):
+        """서버의 최대 반환 행 수 제한에 걸리지 않도록 build_query()의 결과를 offset부터 페이지 단위로 모두 가져옵니다."""
+        rows = []
+        while True:
+            page = build_query().range(offset, offset + SUPABASE_PAGE_SIZE - 1).execute().data
+            rows.extend(page)
+            if len(page) < SUPABASE_PAGE_SIZE:
+                return rows
+            offset += SUPABASE_PAGE_SIZE
+
+    def insert_alerts(self, rows):
+        self._insert("sensor_alerts", rows)
+
+    def select_alerts(self, since=None, until=None, device_id=None, columns="*"):
+        def build_query():
+            query = self.client.table("sensor_alerts").select(columns)
+            if since is not None:
+                query = query.gte("created_at", since)
+            if until is not None:
+                query = query.lt("created_at", until)
+            if device_id is not None:
+                query = query.eq("device_id", device_id)
+            return query.order("created_at")
+
+        return self._select_all(build_query)
+
+    def select_predictions(self):
+        return self._select_all(lambda: self.client.table("sensor_predictions").select("*").order("device_id"))
+
+    def select_devices(self):
+        return self._select_all(lambda: self.client.table("sensor_devices").select("*").order("id"))
+
+    def upsert_predictions(self, rows):
+        self.client.table("sensor_predictions").upsert(rows, on_conflict="device_id").execute()
+
+    def update_device(self, device_id, fields):
+        self.client.table("sensor_devices").update(fields).eq("id", device_id).execute()
+
+    def update_devices(self, rows):
+        # PostgREST upsert는 전달한 컬럼만 병합하므로 기존 device_name 등은 유지됨
+        self.client.table("sensor_devices").upsert(rows, on_conflict="id").execute()
+
+    def ensure_device(self, device_id, defaults):
+        response = self.client.table("sensor_devices").select("id").eq("id", device_id).execute()
+        if response.data:
+            return False
+        self.client.table("sensor_devices").insert({"id": device_id, **defaults}).execute()
+        return True
+
+    def upsert_rollups(self, rows):
+        self.client.table("sensor_health_rollups") \
+            .upsert(rows, on_conflict="device_id,resolution,bucket_start,metric") \
+            .execute()
+
+    def select_rollups(self, resolution, since=None, until=None, device_id=None, metric=None):
+        def build_query():
+            query = self.client.table("sensor_health_rollups").select("*").eq("resolution", resolution)
+            if since is not None:
+                query = query.gte("bucket_start", since)
+            if until is not None:
+                query = query.lt("bucket_start", until)
+            if device_id is not None:
+                query = query.eq("device_id", device_id)
+            if metric is not None:
+                query = query.eq("metric", metric)
+            return query.order("bucket_start")
+
+        return self._select_all(build_query)
+
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sensor_health_logs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    device_id INTEGER,
+    log_timestamp TEXT NOT NULL,
+    temperature REAL,
+    noise_level REAL,
+    dead_pixel_count INTEGER,
+    status TEXT,
+    hot_pixel_count INTEGER,
+    defect_pixels TEXT,
+    ingest_key TEXT,
+    ingested_at TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_logs_device_ts ON sensor_health_logs (device_id, log_timestamp);
+CREATE INDEX IF NOT EXISTS idx_logs_ts ON sensor_health_logs (log_timestamp);
+
+CREATE TABLE IF NOT EXISTS sensor_alerts (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created_at TEXT NOT NULL,
+    device_id INTEGER,
+    metric TEXT,
+    severity TEXT,
+    message TEXT,
+    details TEXT,
+    ingest_key TEXT
+);
+
+CREATE TABLE IF NOT EXISTS sensor_predictions (
+    device_id INTEGER PRIMARY KEY,
+    predicted_rul_days INTEGER,
+    health_score REAL,
+    prediction_status TEXT,
+    created_at TEXT
+);
+
+CREATE TABLE IF NOT EXISTS sensor_health_rollups (
+    device_id INTEGER NOT NULL,
+    resolution TEXT NOT NULL,
+    bucket_start TEXT NOT NULL,
+    metric TEXT NOT NULL,
+    count INTEGER,
+    mean REAL,
+    m2 REAL,
+    std REAL,
+    min REAL,
+    max REAL,
+    PRIMARY KEY (device_id, resolution, bucket_start, metric)
+);
+CREATE INDEX IF NOT EXISTS idx_rollups_resolution_ts ON sensor_health_rollups (resolution, bucket_start);
+
+CREATE TABLE IF NOT EXISTS sensor_devices (
+    id INTEGER PRIMARY KEY,
+    device_name TEXT,
+    status TEXT,
+    last_updated TEXT
+);
+"""
+
+
+def normalize_timestamp(value):
+    """
+    타임스탬프를 UTC 기준 'YYYY-MM-DDTHH:MM:SS.ffffff' 문자열로 통일합니다.
+    SQLite에서는 문자열 비교로 시간 범위를 조회하므로 형식이 일정해야 합니다.
+    """
+    if value is None:
+        return None
+    ts = value if isinstance(value, datetime) else datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    if ts.tzinfo is not None:
+        ts = ts.astimezone(timezone.utc).replace(tzinfo=None)
+    return ts.strftime("%Y-%m-%dT%H:%M:%S.%f")
+
+
+class SQLiteBackend(StorageBackend):
+    """
+    로컬 임베디드 SQLite 백엔드.
+    (device_id, log_timestamp) 인덱스로 장치별 시간 범위 조회를 빠르게 처리하고,
+    오래된 로그는 선택적으로 Parquet 파일로 아카이빙할 수 있습니다.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path="cmos_health.db"):
+        self.path = path
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        if path != ":memory:":
+            # 에뮬레이터/탐지기/예측 엔진이 서로 다른 프로세스에서 동시에 접근할 수 있도록 WAL 사용
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SQLITE_SCHEMA)
+        self._migrate()
+        # 비동기 런타임 등에서 여러 스레드가 같은 연결을 공유하므로 트랜잭션을 직렬화
+        self._lock = threading.RLock()
+
+    def _migrate(self):
+        """이전 버전 스키마로 만들어진 DB 파일에 새 컬럼을 추가합니다."""
+        columns = {row["name"] for row in self.conn.execute("PRAGMA table_info(sensor_health_logs)")}
+        with self.conn:
+            if "hot_pixel_count" not in columns:
+                self.conn.execute("ALTER TABLE sensor_health_logs ADD COLUMN hot_pixel_count INTEGER")
+            if "defect_pixels" not in columns:
+                self.conn.execute("ALTER TABLE sensor_health_logs ADD COLUMN defect_pixels TEXT")
+            if "ingest_key" not in columns:
+                self.conn.execute("ALTER TABLE sensor_health_logs ADD COLUMN ingest_key TEXT")
+            if INGESTED_AT_FIELD not in columns:
+                # 기존 행은 NULL로 남으며 수신 시각 기준 증분 조회에는 포함되지 않음
+                self.conn.execute(f"ALTER TABLE sensor_health_logs ADD COLUMN {INGESTED_AT_FIELD} TEXT")
+            alert_columns = {row["name"] for row in self.conn.execute("PRAGMA table_info(sensor_alerts)")}
+            if "ingest_key" not in alert_columns:
+                self.conn.execute("ALTER TABLE sensor_alerts ADD COLUMN ingest_key TEXT")
+            # 키가 없는(NULL) 행은 unique 제약에 걸리지 않음
+            self.conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_logs_ingest_key ON sensor_health_logs (ingest_key)")
+            self.conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_alerts_ingest_key ON sensor_alerts (ingest_key)")
+            self.conn.execute(f"CREATE INDEX IF NOT EXISTS idx_logs_ingested_at ON sensor_health_logs ({INGESTED_AT_FIELD})")
+
+    def insert_logs(self, rows):
+        # 결함 좌표(defect_pixels)는 JSON 문자열로 저장
+        rows = (
+            dict(row, defect_pixels=json.dumps(row["defect_pixels"])) if row.get("defect_pixels") is not None else row
+            for row in rows
+        )
+        values = [
+            tuple(normalize_timestamp(row.get(f)) if f == "log_timestamp" else row.get(f) for f in LOG_FIELDS)
+            for row in rows
+        ]
+        placeholders = ", ".join("?" for _ in LOG_FIELDS)
+        with self._lock, self.conn:
+            # 수신 시각은 쓰기 잠금을 얻은 뒤 SQL 안에서 기록하므로 여러 프로세스가 써도 커밋 순서와 같음
+            # (normalize_timestamp와 같은 마이크로초 6자리 형식이어야 문자열 비교가 맞음)
+            self.conn.executemany(
+                f"INSERT INTO sensor_health_logs ({', '.join(LOG_FIELDS)}, {INGESTED_AT_FIELD}) "
+                f"VALUES ({placeholders}, strftime('%Y-%m-%dT%H:%M:%f', 'now') || '000') "
+                f"ON CONFLICT ({IDEMPOTENCY_KEY_FIELD}) DO NOTHING",
+                values,
+            )
+
+    def select_logs(self, since=None, until=None, columns="*", device_id=None, descending=False, limit=None, offset=0,
+                    ingested_since=None, order_by="log_timestamp"):
+        clauses, params = [], []
+        if since is not None:
+            clauses.append("log_timestamp >= ?")
+            params.append(normalize_timestamp(since))
+        if until is not None:
+            clauses.append("log_timestamp < ?")
+            params.append(normalize_timestamp(until))
+        if ingested_since is not None:
+            clauses.append(f"{INGESTED_AT_FIELD} >= ?")
+            params.append(normalize_timestamp(ingested_since))
+        if device_id is not None:
+            clauses.append("device_id = ?")
+            params.append(device_id)
+
+        sql = f"SELECT {columns} FROM sensor_health_logs"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        direction = "DESC" if descending else "ASC"
+        if order_by == INGESTED_AT_FIELD:
+            sql += f" ORDER BY {INGESTED_AT_FIELD} {direction}, id {direction}"
+        else:
+            sql += f" ORDER BY log_timestamp {direction}"
+        if limit is not None:
+            sql += " LIMIT ? OFFSET ?"
+            params.extend([limit, offset])
+        with self._lock:
+            rows = [dict(row) for row in self.conn.execute(sql, params)]
+        # 결함 좌표는 JSON 문자열로 저장되어 있으므로 Supabase(jsonb)와 같은 형태로 변환
+        if rows and "defect_pixels" in rows[0]:
+            for row in rows:
+                if row["defect_pixels"] is not None:
+                    row["defect_pixels"] = json.loads(row["defect_pixels"])
+        return rows
+
+    def select_log_versions(self, since=None, until=None):
+        clauses, params = [], []
+        if since is not None:
+            clauses.append("log_timestamp >= ?")
+            params.append(normalize_timestamp(since))
+        if until is not None:
+            clauses.append("log_timestamp < ?")
+            params.append(normalize_timestamp(until))
+        sql = "SELECT device_id, COUNT(*), MAX(log_timestamp) FROM sensor_health_logs"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " GROUP BY device_id"
+        with self._lock:
+            return {device_id: (count, last) for device_id, count, last in self.conn.execute(sql, params)}
+
+    def insert_alerts(self, rows):
+        now = datetime.utcnow().isoformat()
+        values = [
+            (row.get("created_at", now), row.get("device_id"), row.get("metric"), row.get("severity"),
+             row.get("message"), json.dumps(row.get("details"), default=float), row.get(IDEMPOTENCY_KEY_FIELD))
+            for row in rows
+        ]
+        with self._lock, self.conn:
+            self.conn.executemany(
+                "INSERT INTO sensor_alerts (created_at, device_id, metric, severity, message, details, ingest_key) "
+                f"VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT ({IDEMPOTENCY_KEY_FIELD}) DO NOTHING",
+                values,
+            )
+
+    def select_alerts(self, since=None, until=None, device_id=None, columns="*"):
+        clauses, params = [], []
+        if since is not None:
+            clauses.append("created_at >= ?")
+            params.append(normalize_timestamp(since))
+        if until is not None:
+            clauses.append("created_at < ?")
+            params.append(normalize_timestamp(until))
+        if device_id is not None:
+            clauses.append("device_id = ?")
+            params.append(device_id)
+        sql = f"SELECT {columns} FROM sensor_alerts"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY created_at"
+        with self._lock:
+            rows = [dict(row) for row in self.conn.execute(sql, params)]
+        # 상세 정보는 JSON 문자열로 저장되어 있으므로 Supabase(jsonb)와 같은 형태로 변환
+        if rows and "details" in rows[0]:
+            for row in rows:
+                if row["details"] is not None:
+                    row["details"] = json.loads(row["details"])
+        return rows
+
+    def select_predictions(self):
+        with self._lock:
+            return [dict(row) for row in self.conn.execute("SELECT * FROM sensor_predictions ORDER BY device_id")]
+
+    def select_devices(self):
+        with self._lock:
+            return [dict(row) for row in self.conn.execute("SELECT * FROM sensor_devices ORDER BY id")]
+
+    def upsert_predictions(self, rows):
+        fields = ("device_id", "predicted_rul_days", "health_score", "prediction_status", "created_at")
+        with self._lock, self.conn:
+            self.conn.executemany(
+                f"INSERT OR REPLACE INTO sensor_predictions ({', '.join(fields)}) VALUES (?, ?, ?, ?, ?)",
+                [tuple(row.get(f) for f in fields) for row in rows],
+            )
+
+    def update_device(self, device_id, fields):
+        assignments = ", ".join(f"{key} = ?" for key in fields)
+        with self._lock, self.conn:
+            self.conn.execute(f"UPDATE sensor_devices SET {assignments} WHERE id = ?", [*fields.values(), device_id])
+
+    def update_devices(self, rows):
+        with self._lock, self.conn:
+            self.conn.executemany(
+                "INSERT INTO sensor_devices (id, status, last_updated) VALUES (?, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET status = excluded.status, last_updated = excluded.last_updated",
+                [(row["id"], row["status"], row.get("last_updated")) for row in rows],
+            )
+
+    def ensure_device(self, device_id, defaults):
+        row = {"id": device_id, **defaults}
+        with self._lock, self.conn:
+            cursor = self.conn.execute(
+                f"INSERT OR IGNORE INTO sensor_devices ({', '.join(row)}) VALUES ({', '.join('?' for _ in row)})",
+                list(row.values()),
+            )
+        return cursor.rowcount > 0
+
+    def upsert_rollups(self, rows):
+        values = [
+            tuple(normalize_timestamp(row[f]) if f == "bucket_start" else row.get(f) for f in ROLLUP_FIELDS)
+            for row in rows
+        ]
+        with self._lock, self.conn:
+            self.conn.executemany(
+                f"INSERT OR REPLACE INTO sensor_health_rollups ({', '.join(ROLLUP_FIELDS)}) "
+                f"VALUES ({', '.join('?' for _ in ROLLUP_FIELDS)})",
+                values,
+            )
+
+    def select_rollups(self, resolution, since=None, until=None, device_id=None, metric=None):
+        clauses, params = ["resolution = ?"], [resolution]
+        if since is not None:
+            clauses.append("bucket_start >= ?")
+            params.append(normalize_timestamp(since))
+        if until is not None:
+            clauses.append("bucket_start < ?")
+            params.append(normalize_timestamp(until))
+        if device_id is not None:
+            clauses.append("device_id = ?")
+            params.append(device_id)
+        if metric is not None:
+            clauses.append("metric = ?")
+            params.append(metric)
+        sql = f"SELECT * FROM sensor_health_rollups WHERE {' AND '.join(clauses)} ORDER BY bucket_start"
+        with self._lock:
+            return [dict(row) for row in self.conn.execute(sql, params)]
+
+    def archive_to_parquet(self, before, directory="archive"):
+        """
+        before 이전의 로그를 날짜별 Parquet 파일로 옮기고 SQLite에서 삭제합니다.
+        pandas와 pyarrow가 필요합니다. 아카이빙한 행 수를 반환합니다.
+        """
+        import pandas as pd
+
+        cutoff = normalize_timestamp(before)
+        df = pd.read_sql_query(
+            "SELECT * FROM sensor_health_logs WHERE log_timestamp < ? ORDER BY log_timestamp",
+            self.conn, params=[cutoff],
+        )
+        if df.empty:
+            return 0
+
+        os.makedirs(directory, exist_ok=True)
+        for day, day_df in df.groupby(df["log_timestamp"].str.slice(0, 10)):
+            path = os.path.join(directory, f"sensor_health_logs_{day}.parquet")
+            if os.path.exists(path):
+                day_df = pd.concat([pd.read_parquet(path), day_df], ignore_index=True)
+            day_df.to_parquet(path, index=False)
+
+        with self._lock, self.conn:
+            self.conn.execute("DELETE FROM sensor_health_logs WHERE log_timestamp < ?", [cutoff])
+        return len(df)
+
+
+def create_backend(kind=None):
+    """
+    환경 변수 CMOS_STORAGE_BACKEND(supabase | sqlite)에 따라 저장소 백엔드를 생성합니다.
+    sqlite를 사용하는 경우 CMOS_SQLITE_PATH로 DB 파일 경로를 지정할 수 있습니다.
+    """
+    from dotenv import load_dotenv
+
+    # .env.local 파일에서 환경 변수 로드
+    load_dotenv(dotenv_path='.env.local')
+
+    kind = (kind or os.getenv("CMOS_STORAGE_BACKEND", "supabase")).lower()
+    if kind == "supabase":
+        return SupabaseBackend.from_env()
+    if kind == "sqlite":
+        return SQLiteBackend(os.getenv("CMOS_SQLITE_PATH", "cmos_health.db"))
+    raise ValueError(f"알 수 없는 저장소 백엔드입니다: {kind}")
+
+
+class LazyBackend:
+    """
+    처음 사용하는 시점에 실제 백엔드를 생성하는 프록시.
+    모듈을 import하는 것만으로는 .env.local을 읽거나 네트워크 클라이언트를 만들지 않으며,
+    환경 변수 누락 같은 설정 오류도 저장소를 실제로 사용할 때 발생합니다.
+    인터페이스 메서드 호출은 소요 시간과 실패 수를 cmos_storage_* 메트릭으로 기록합니다.
+    """
+
+    def __init__(self, factory=create_backend):
+        self._factory = factory
+        self._backend = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        """실제 백엔드를 반환합니다. 아직 없으면 생성합니다 (스레드 안전)."""
+        if self._backend is None:
+            with self._lock:
+                if self._backend is None:
+                    self._backend = self._factory()
+        return self._backend
+
+    @property
+    def initialized(self):
+        return self._backend is not None
+
+    def __getattr__(self, name):
+        if callable(getattr(StorageBackend, name, None)):
+            # AlertPipeline(backend.insert_alerts)처럼 메서드를 참조만 하는 경우에는 아직 생성하지 않음
+            return partial(self._call, name)
+        return getattr(self.get(), name)
+
+    def _call(self, name, *args, **kwargs):
+        backend = self.get()
+        started = time.perf_counter()
+        try:
+            return getattr(backend, name)(*args, **kwargs)
+        except Exception:
+            STORAGE_ERRORS.labels(backend.name, name).inc()
+            raise
+        finally:
+            STORAGE_SECONDS.labels(backend.name, name).observe(time.perf_counter() - started)
@@ -0,0 +1,259 @@
+from collections import namedtuple
+
+import numpy as np
+
+from timeutil import parse_timestamp, to_epoch_ns
+
+# --- 장치별 텔레메트리 링 버퍼 설정 ---
+DEFAULT_CAPACITY = 4096          # 장치별 최대 샘플 수 (1시간 윈도우를 약 1Hz 샘플링까지 수용)
+BUFFER_INITIAL_CAPACITY = 64     # 장치별 초기 할당 크기. 필요할 때 두 배씩 늘려 capacity까지 확장
+MISSING_PIXELS = -1              # dead_pixel_count가 없는 샘플 표시 (온도/노이즈는 NaN)
+
+# 상태 문자열 <-> uint8 코드
+STATUS_NAMES = ("healthy", "warning", "critical")
+STATUS_CODES = {name: code for code, name in enumerate(STATUS_NAMES)}
+STATUS_UNKNOWN = 255
+
+COLUMNS = ("timestamps", "temperature", "noise_level", "dead_pixel_count", "status")
+DTYPES = (np.int64, np.float32, np.float32, np.int32, np.uint8)
+BYTES_PER_SAMPLE = sum(np.dtype(dtype).itemsize for dtype in DTYPES)
+NAN = float("nan")
+
+# 링 버퍼의 시간 구간 뷰. 각 필드는 복사 없는 배열 슬라이스이며 다음 append 전까지만 유효합니다.
+TelemetryWindow = namedtuple("TelemetryWindow", COLUMNS)
+
+
+def encode_row(row, ts_ns=None):
+    """로그 행을 버퍼 컬럼 값 (ts_ns, 온도, 노이즈, 데드 픽셀, 상태 코드) 튜플로 변환합니다."""
+    if ts_ns is None:
+        ts_ns = to_epoch_ns(parse_timestamp(row["log_timestamp"]))
+    temperature = row.get("temperature")
+    noise_level = row.get("noise_level")
+    dead_pixel_count = row.get("dead_pixel_count")
+    return (
+        ts_ns,
+        NAN if temperature is None else float(temperature),
+        NAN if noise_level is None else float(noise_level),
+        MISSING_PIXELS if dead_pixel_count is None else int(dead_pixel_count),
+        STATUS_CODES.get(row.get("status"), STATUS_UNKNOWN),
+    )
+
+
+class TelemetryRingBuffer:
+    """
+    장치 1대의 최근 샘플을 컬럼별 NumPy 배열(int64 epoch ns, float32 온도/노이즈, int32 데드 픽셀, uint8 상태)에
+    도착 순서대로 저장하는 고정 용량 버퍼. capacity를 넘으면 가장 오래된 샘플을 버립니다.
+
+    살아 있는 샘플은 항상 배열의 연속 구간 [start, end)에 있으므로 시간 구간 조회는 복사 없는 뷰를 반환합니다.
+    배열 끝에 도달하면 살아 있는 샘플을 앞으로 옮기거나(할당 크기의 3/4 이하일 때) 할당을 두 배로 늘립니다.
+    각 샘플에는 단조 증가하는 순번(seq)이 붙어, 소비자가 자기 윈도우의 시작 위치를 순번으로 추적할 수 있습니다.
+    """
+
+    def __init__(self, capacity=DEFAULT_CAPACITY, initial_capacity=BUFFER_INITIAL_CAPACITY):
+        if capacity < 1:
+            raise ValueError("버퍼 용량은 1 이상이어야 합니다.")
+        self.capacity = capacity
+        # 용량이 찬 상태에서도 앞으로 옮길 여유 공간(용량의 1/3)을 둠 -> 샘플당 평균 복사 3회 이하
+        self._max_size = capacity + max(1, capacity // 3)
+        self._allocate(min(initial_capacity, self._max_size))
+        self._start = 0
+        self._end = 0
+        self._seq_offset = 0  # 순번 = 배열 위치 + _seq_offset
+
+    def _allocate(self, size):
+        self.timestamps = np.empty(size, dtype=np.int64)
+        self.temperature = np.empty(size, dtype=np.float32)
+        self.noise_level = np.empty(size, dtype=np.float32)
+        self.dead_pixel_count = np.empty(size, dtype=np.int32)
+        self.status = np.empty(size, dtype=np.uint8)
+        # 샘플 단위 읽기/쓰기는 NumPy 스칼라 대신 memoryview로 처리 (파이썬 float/int를 바로 주고받아 훨씬 빠름)
+        self._views = tuple(memoryview(column) for column in self._arrays())
+
+    def _arrays(self):
+        return (self.timestamps, self.temperature, self.noise_level, self.dead_pixel_count, self.status)
+
+    def _make_room(self, needed=1):
+        """배열 끝에 needed개를 쓸 공간을 만듭니다 (앞으로 옮기기 또는 확장)."""
+        live = self._end - self._start
+        size = len(self.timestamps)
+        if (live + needed) * 4 > size * 3 and size < self._max_size:
+            new_size = size
+            while new_size < self._max_size and (live + needed) * 4 > new_size * 3:
+                new_size = min(self._max_size, new_size * 2)
+            old = self._arrays()
+            self._allocate(new_size)
+        else:
+            old = self._arrays()
+        for target, source in zip(self._arrays(), old):
+            target[:live] = source[self._start:self._end]
+        self._seq_offset += self._start
+        self._start = 0
+        self._end = live
+
+    def append(self, ts_ns, temperature, noise_level, dead_pixel_count, status=STATUS_UNKNOWN):
+        """샘플 1개를 추가합니다. 용량이 차 있으면 가장 오래된 샘플을 버립니다."""
+        if self._end - self._start >= self.capacity:
+            self._start += 1
+        if self._end == len(self.timestamps):
+            self._make_room()
+        i = self._end
+        timestamps, temperatures, noise_levels, dead_pixel_counts, statuses = self._views
+        timestamps[i] = ts_ns
+        temperatures[i] = temperature
+        noise_levels[i] = noise_level
+        dead_pixel_counts[i] = dead_pixel_count
+        statuses[i] = status
+        self._end = i + 1
+
+    def extend(self, timestamps, temperature, noise_level, dead_pixel_count, status):
+        """시간순으로 정렬된 여러 샘플(같은 길이의 배열)을 한 번에 추가합니다."""
+        columns = [np.asarray(column) for column in (timestamps, temperature, noise_level, dead_pixel_count, status)]
+        n = len(columns[0])
+        if n == 0:
+            return
+        if n >= self.capacity:
+            # 새 샘플만으로 용량이 차므로 기존 샘플은 모두 버림
+            self._seq_offset += self._end + n - self.capacity
+            columns = [column[-self.capacity:] for column in columns]
+            n = self.capacity
+            self._start = self._end = 0
+        else:
+            self._start += max(0, (self._end - self._start) + n - self.capacity)
+        if self._end + n > len(self.timestamps):
+            self._make_room(n)
+        for target, source in zip(self._arrays(), columns):
+            target[self._end:self._end + n] = source
+        self._end += n
+
+    def evict_before(self, cutoff_ns):
+        """도착 순서상 맨 앞에서부터 cutoff_ns보다 오래된 샘플을 버리고, 버린 수를 반환합니다."""
+        start, end, timestamps = self._start, self._end, self._views[0]
+        while start < end and timestamps[start] < cutoff_ns:
+            start += 1
+        evicted = start - self._start
+        self._start = start
+        return evicted
+
+    @property
+    def seq_start(self):
+        """가장 오래된 샘플의 순번."""
+        return self._start + self._seq_offset
+
+    @property
+    def seq_end(self):
+        """다음에 추가될 샘플의 순번 (= 마지막 샘플 순번 + 1)."""
+        return self._end + self._seq_offset
+
+    @property
+    def full(self):
+        return self._end - self._start >= self.capacity
+
+    def timestamp(self, seq):
+        """순번 seq 샘플의 타임스탬프(epoch ns)."""
+        return self._views[0][seq - self._seq_offset]
+
+    def sample(self, seq):
+        """순번 seq 샘플의 (ts_ns, 온도, 노이즈, 데드 픽셀, 상태 코드)를 파이썬 값 튜플로 반환합니다 (온도/노이즈는 float32 정밀도)."""
+        i = seq - self._seq_offset
+        timestamps, temperatures, noise_levels, dead_pixel_counts, statuses = self._views
+        return timestamps[i], temperatures[i], noise_levels[i], dead_pixel_counts[i], statuses[i]
+
+    def seq_before(self, cutoff_ns, seq):
+        """순번 seq부터 도착 순서대로 보아 처음으로 타임스탬프가 cutoff_ns 이상인 샘플의 순번 (없으면 seq_end)."""
+        offset, end, timestamps = self._seq_offset, self._end, self._views[0]
+        i = max(seq - offset, self._start)
+        while i < end and timestamps[i] < cutoff_ns:
+            i += 1
+        return i + offset
+
+    def window(self, since_ns=None, until_ns=None):
+        """[since_ns, until_ns) 구간 샘플의 뷰를 반환합니다. 장치별로 시간순 도착을 가정합니다."""
+        start, end = self._start, self._end
+        if since_ns is not None:
+            start += int(np.searchsorted(self.timestamps[start:end], since_ns, side="left"))
+        if until_ns is not None:
+            end = self._start + int(np.searchsorted(self.timestamps[self._start:end], until_ns, side="left"))
+        return TelemetryWindow(*(column[start:end] for column in self._arrays()))
+
+    def window_from_seq(self, seq):
+        """순번 seq부터 최신 샘플까지의 뷰를 반환합니다."""
+        start = max(self._start, seq - self._seq_offset)
+        return TelemetryWindow(*(column[start:self._end] for column in self._arrays()))
+
+    @property
+    def latest_ns(self):
+        return int(self.timestamps[self._end - 1]) if self._end > self._start else None
+
+    @property
+    def nbytes(self):
+        """할당된 배열의 총 바이트 수."""
+        return sum(column.nbytes for column in self._arrays())
+
+    def __len__(self):
+        return self._end - self._start
+
+
+class TelemetryStore:
+    """
+    장치별 TelemetryRingBuffer 모음. 이상 탐지기와 건강 점수 계산 등 여러 소비자가 같은 버퍼를 공유합니다.
+    retention_seconds를 지정하면 행을 추가할 때 그 장치의 최신 샘플 기준으로 더 오래된 샘플을 버립니다.
+    """
+
+    def __init__(self, capacity=DEFAULT_CAPACITY, retention_seconds=None):
+        self.capacity = capacity
+        self.retention_seconds = retention_seconds
+        self._retention_ns = None if retention_seconds is None else int(retention_seconds * 1e9)
+        self._buffers = {}
+
+    def buffer(self, device_id):
+        """장치의 버퍼를 반환합니다. 없으면 만듭니다."""
+        buffer = self._buffers.get(device_id)
+        if buffer is None:
+            buffer = self._buffers[device_id] = TelemetryRingBuffer(self.capacity)
+        return buffer
+
+    def get(self, device_id):
+        return self._buffers.get(device_id)
+
+    def append_row(self, row, ts_ns=None):
+        """로그 행 1개를 해당 장치의 버퍼에 추가하고 그 버퍼를 반환합니다."""
+        buffer = self.buffer(row.get("device_id"))
+        values = encode_row(row, ts_ns)
+        buffer.append(*values)
+        if self._retention_ns is not None:
+            buffer.evict_before(values[0] - self._retention_ns)
+        return buffer
+
+    def extend_rows(self, rows):
+        """여러 행을 장치별로 모아 배열 단위로 추가합니다. 장치별로 시간순이어야 합니다."""
+        per_device = {}
+        for row in rows:
+            per_device.setdefault(row.get("device_id"), []).append(encode_row(row))
+        for device_id, values in per_device.items():
+            buffer = self.buffer(device_id)
+            columns = list(zip(*values))
+            buffer.extend(*(np.asarray(column, dtype=dtype) for column, dtype in zip(columns, DTYPES)))
+            if self._retention_ns is not None:
+                buffer.evict_before(buffer.latest_ns - self._retention_ns)
+
+    def window(self, device_id, seconds=None):
+        """장치의 최신 샘플 기준 최근 seconds초 구간 뷰를 반환합니다 (None이면 버퍼 전체). 장치가 없으면 None."""
+        buffer = self._buffers.get(device_id)
+        if buffer is None:
+            return None
+        if seconds is None or len(buffer) == 0:
+            return buffer.window()
+        return buffer.window(since_ns=buffer.latest_ns - int(seconds * 1e9))
+
+    def device_ids(self):
+        return list(self._buffers)
+
+    def nbytes(self):
+        """모든 장치 버퍼에 할당된 배열의 총 바이트 수."""
+        return sum(buffer.nbytes for buffer in self._buffers.values())
+
+    def __contains__(self, device_id):
+        return device_id in self._buffers
+
+    def __len__(self):
+        return len(self._buffers)
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# 루트의 모듈(spool, predictive_engine 등)을 패키지 없이 import할 수 있도록 저장소 루트를 경로에 추가
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
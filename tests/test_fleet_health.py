@@ -0,0 +1,51 @@
+import math
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from predictive_engine import _fleet_frame, compute_fleet_health_scores, get_health_score
+
+START = datetime(2026, 1, 1)
+
+
+def _rows(device_id, temperature, noise, pixels):
+    return [
+        {"device_id": device_id, "log_timestamp": (START + timedelta(minutes=i)).isoformat(),
+         "temperature": t, "noise_level": n, "dead_pixel_count": p}
+        for i, (t, n, p) in enumerate(zip(temperature, noise, pixels))
+    ]
+
+
+def _scalar_scores(rows):
+    """장치별로 predictor 모드와 같이 최신 행이 먼저 오도록 정렬하여 get_health_score()를 계산합니다."""
+    df = pd.DataFrame(rows)
+    scores = {}
+    for device_id, group in df.groupby("device_id"):
+        df_24h = group.sort_values("log_timestamp", ascending=False)[
+            ["log_timestamp", "temperature", "noise_level", "dead_pixel_count"]
+        ].reset_index(drop=True)
+        scores[device_id] = float(get_health_score(df_24h))
+    return scores
+
+
+def test_fleet_scores_match_scalar_health_score():
+    rows = (
+        _rows(1, [40.0, 41.5, 39.0, 45.0], [1.0, 1.2, 1.1, 2.5], [3, 3, 4, 6])
+        # 샘플이 하나뿐인 장치: 온도 표준편차가 없음
+        + _rows(2, [38.0], [0.8], [1])
+        # 최신 노이즈가 비어 있는 장치: 이전 값으로 대신하지 않음
+        + _rows(3, [30.0, 35.0, 33.0], [0.5, 0.7, np.nan], [0, 1, 2])
+        # 가장 오래된 데드 픽셀 수가 비어 있는 장치
+        + _rows(4, [50.0, 52.0, 55.0], [3.0, 3.5, 4.0], [np.nan, 10, 12])
+    )
+    expected = _scalar_scores(rows)
+
+    fleet = compute_fleet_health_scores(_fleet_frame(pd.DataFrame(rows)))
+
+    assert sorted(fleet.index) == sorted(expected)
+    for device_id, score in fleet.items():
+        if math.isnan(expected[device_id]):
+            assert math.isnan(score), device_id
+        else:
+            assert score == expected[device_id], device_id
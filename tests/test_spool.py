@@ -0,0 +1,133 @@
+import os
+import json
+import time
+import threading
+
+from spool import WriteAheadSpool
+
+
+class RecordingSink:
+    """전송된 행을 모으고, reject(row)가 참인 행이 섞인 배치나 down=True일 때는 예외를 냅니다."""
+
+    def __init__(self, reject=None, down=False):
+        self.reject = reject or (lambda row: False)
+        self.down = down
+        self.rows = []
+        self._lock = threading.Lock()
+
+    def __call__(self, rows):
+        if self.down:
+            raise ConnectionError("저장소 연결 실패")
+        if any(self.reject(row) for row in rows):
+            raise ValueError("제약 조건 위반")
+        with self._lock:
+            self.rows.extend(rows)
+
+    def values(self):
+        with self._lock:
+            return sorted(row["i"] for row in self.rows)
+
+
+def make_spool(directory, sink, **kwargs):
+    kwargs.setdefault("backoff_initial", 0.01)
+    kwargs.setdefault("backoff_max", 0.05)
+    return WriteAheadSpool(str(directory), sink, name="test", verbose=False, **kwargs)
+
+
+def segment_paths(directory):
+    return sorted(os.path.join(directory, entry) for entry in os.listdir(directory) if entry.endswith(".seg"))
+
+
+def write_offline(directory, batches, **kwargs):
+    """저장소가 내려간 상태에서 batches를 기록하고 스풀을 닫습니다 (전송되지 않은 채 디스크에 남음)."""
+    spool = make_spool(directory, RecordingSink(down=True), backoff_initial=60, backoff_max=60, **kwargs)
+    for batch in batches:
+        spool.append([{"i": i} for i in batch])
+    spool.close(timeout=0)
+
+
+def test_delivers_rows_and_resumes_from_cursor(tmp_path):
+    sink = RecordingSink()
+    spool = make_spool(tmp_path, sink)
+    spool.append([{"i": i} for i in range(5)])
+    assert spool.wait_drained(5)
+    spool.close()
+
+    # 다시 열어도 이미 전송한 행은 다시 보내지 않음
+    sink = RecordingSink()
+    spool = make_spool(tmp_path, sink)
+    spool.append([{"i": 5}])
+    assert spool.wait_drained(5)
+    spool.close()
+    assert sink.values() == [5]
+
+
+def test_recovers_torn_tail_after_crash(tmp_path):
+    write_offline(tmp_path, [range(0, 3), range(3, 6)])
+    # 레코드를 쓰는 도중 프로세스가 죽은 상황: 마지막 세그먼트 끝에 잘린 레코드가 남음
+    path = segment_paths(tmp_path)[-1]
+    size = os.path.getsize(path)
+    with open(path, "ab") as f:
+        f.write(b"\x40\x00\x00\x00\x01\x00\x00\x00\x00\x00\x00\x00[{\"i\":")
+
+    sink = RecordingSink()
+    spool = make_spool(tmp_path, sink)
+    spool.append([{"i": 6}])
+    assert spool.wait_drained(5)
+    spool.close()
+    assert sink.values() == list(range(7))
+    assert spool.rows_delivered == 7
+
+
+def test_skips_corrupt_record_in_closed_segment(tmp_path):
+    # 세그먼트마다 레코드 하나만 들어가도록 작은 세그먼트 크기 사용
+    write_offline(tmp_path, [range(0, 3), range(3, 6), range(6, 9)], segment_bytes=64)
+    paths = segment_paths(tmp_path)
+    assert len(paths) == 3
+    with open(paths[1], "r+b") as f:
+        f.seek(-3, os.SEEK_END)
+        f.write(b"###")  # 페이로드를 바꿔 CRC가 맞지 않게 함
+
+    sink = RecordingSink()
+    spool = make_spool(tmp_path, sink, segment_bytes=64)
+    spool.append([{"i": 9}])
+    assert spool.wait_drained(5)
+    spool.close()
+    assert sink.values() == [0, 1, 2, 6, 7, 8, 9]
+
+
+def test_moves_rejected_rows_to_dead_letter(tmp_path):
+    sink = RecordingSink(reject=lambda row: row["i"] in (3, 7))
+    spool = make_spool(tmp_path, sink, poison_failures=2)
+    spool.append([{"i": i} for i in range(10)])
+    assert spool.wait_drained(5)
+    # 거부된 행 뒤에 기록된 행도 막히지 않고 전송됨
+    spool.append([{"i": 10}])
+    assert spool.wait_drained(5)
+    spool.close()
+
+    assert sink.values() == [0, 1, 2, 4, 5, 6, 8, 9, 10]
+    assert spool.rows_dead_lettered == 2
+    assert spool.rows_delivered == 9
+    with open(os.path.join(tmp_path, "dead_letter.jsonl")) as f:
+        dead = [json.loads(line) for line in f]
+    assert sorted(entry["row"]["i"] for entry in dead) == [3, 7]
+    assert all("제약 조건 위반" in entry["error"] for entry in dead)
+
+
+def test_outage_does_not_dead_letter_rows(tmp_path):
+    sink = RecordingSink(down=True)
+    spool = make_spool(tmp_path, sink, poison_failures=2)
+    spool.append([{"i": i} for i in range(8)])
+    deadline = time.monotonic() + 5
+    while spool.delivery_failures < 6 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert spool.delivery_failures >= 6
+    assert spool.rows_dead_lettered == 0
+    assert spool.pending_rows() == 8
+
+    sink.down = False
+    assert spool.wait_drained(5)
+    spool.close()
+    assert sink.values() == list(range(8))
+    assert not os.path.exists(os.path.join(tmp_path, "dead_letter.jsonl"))
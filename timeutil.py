@@ -0,0 +1,28 @@
+from datetime import datetime, timezone
+from functools import lru_cache
+
+
+def parse_timestamp(value):
+    """ISO 8601 문자열(또는 datetime, epoch 초)을 UTC epoch 초로 변환합니다."""
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, datetime):
+        ts = value
+        if ts.tzinfo is None:
+            ts = ts.replace(tzinfo=timezone.utc)
+        return ts.timestamp()
+    return _parse_iso_timestamp(str(value))
+
+
+def to_epoch_ns(epoch_seconds):
+    """epoch 초(float)를 마이크로초 단위로 반올림한 epoch 나노초(int)로 변환합니다."""
+    return int(round(epoch_seconds * 1e6)) * 1000
+
+
+@lru_cache(maxsize=4096)
+def _parse_iso_timestamp(value):
+    # 플릿 데이터는 한 틱의 모든 장치가 같은 타임스탬프 문자열을 가지므로 캐시 효과가 큼
+    ts = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    return ts.timestamp()